@@ -0,0 +1,118 @@
+"""
+Collaboration Graph Builder
+Set-based rebuild of Collaboration rows for a repository: one grouped query for
+commit counts, pair metrics and strengths computed with numpy, one bulk upsert
+"""
+from django.db.models import Count
+from api.models import Repository, Commit, Collaboration
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Same scale as Collaboration.calculate_strength (100+ interactions = 1.0)
+STRENGTH_SCALE = 100.0
+BULK_BATCH_SIZE = 1000
+
+
+def build_collaborations(repository, contributors=None, max_contributors=None):
+    """
+    Create or refresh Collaboration rows for every pair of committers in `repository`
+
+    contributors: optionally restrict the graph to these contributors
+    max_contributors: optionally keep only the top committers (pairs grow quadratically)
+    Returns: {'created': n, 'updated': n}
+    """
+    counts = Commit.objects.filter(repository=repository).values('contributor').annotate(
+        commits=Count('id')
+    ).order_by('-commits', 'contributor')
+    if contributors is not None:
+        counts = counts.filter(contributor__in=[c.id for c in contributors])
+    if max_contributors:
+        counts = counts[:max_contributors]
+
+    rows = [(row['contributor'], row['commits']) for row in counts if row['contributor'] and row['commits'] > 0]
+    if len(rows) < 2:
+        return {'created': 0, 'updated': 0}
+
+    # Stable orientation: lower id is contributor_1 unless a row already exists the other way round
+    rows.sort()
+    ids = np.array([contributor_id for contributor_id, _ in rows])
+    commit_counts = np.array([commits for _, commits in rows])
+
+    first, second = np.triu_indices(len(ids), k=1)
+    shared_commits = np.minimum(commit_counts[first], commit_counts[second])
+
+    # Reviews / discussions aren't derived here - keep whatever existing rows have
+    existing = {}
+    for collab in Collaboration.objects.filter(repository=repository).only(
+        'id', 'contributor_1_id', 'contributor_2_id', 'code_reviews', 'issue_discussions'
+    ):
+        existing[(collab.contributor_1_id, collab.contributor_2_id)] = collab
+        existing[(collab.contributor_2_id, collab.contributor_1_id)] = collab
+
+    pair_ids = list(zip(ids[first].tolist(), ids[second].tolist()))
+    code_reviews = np.zeros(len(pair_ids), dtype=np.int64)
+    issue_discussions = np.zeros(len(pair_ids), dtype=np.int64)
+    for index, pair in enumerate(pair_ids):
+        collab = existing.get(pair)
+        if collab:
+            code_reviews[index] = collab.code_reviews
+            issue_discussions[index] = collab.issue_discussions
+
+    total_interactions = shared_commits + code_reviews * 2 + issue_discussions
+    strengths = np.minimum(total_interactions / STRENGTH_SCALE, 1.0)
+
+    collaborations = []
+    created = 0
+    for index, (c1, c2) in enumerate(pair_ids):
+        collab = existing.get((c1, c2))
+        if collab:
+            c1, c2 = collab.contributor_1_id, collab.contributor_2_id
+        else:
+            created += 1
+        collaborations.append(Collaboration(
+            contributor_1_id=c1,
+            contributor_2_id=c2,
+            repository=repository,
+            shared_commits=int(shared_commits[index]),
+            code_reviews=int(code_reviews[index]),
+            issue_discussions=int(issue_discussions[index]),
+            collaboration_strength=float(strengths[index]),
+        ))
+
+    Collaboration.objects.bulk_create(
+        collaborations,
+        batch_size=BULK_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['contributor_1', 'contributor_2', 'repository'],
+        update_fields=['shared_commits', 'collaboration_strength', 'updated_at'],
+    )
+
+    return {'created': created, 'updated': len(collaborations) - created}
+
+
+def rebuild_all_collaborations(max_contributors=None):
+    """
+    Rebuild the collaboration graph for all repositories
+    Run after bulk imports or as a periodic task
+    """
+    results = []
+
+    for repo in Repository.objects.all():
+        try:
+            counts = build_collaborations(repo, max_contributors=max_contributors)
+            results.append({
+                'repository': repo.name,
+                **counts,
+                'success': True
+            })
+        except Exception as e:
+            logger.error(f"Error building collaborations for {repo.name}: {e}")
+            results.append({
+                'repository': repo.name,
+                'error': str(e),
+                'success': False
+            })
+
+    return results
@@ -0,0 +1,86 @@
+"""
+Contributor Stats Refresher
+Recomputes commit/issue totals, preferred work hours and score for many
+contributors with a few GROUP BY queries and one bulk_update
+"""
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+from django.db.models import Count, F, Value
+from django.db.models.functions import ExtractHour, Greatest
+from django.utils import timezone
+from api.models import Contributor, Commit, Issue
+
+UPDATE_FIELDS = [
+    'total_commits', 'total_issues_closed', 'preferred_work_hours',
+    'total_score', 'experience_points', 'level', 'last_activity', 'updated_at',
+]
+BULK_BATCH_SIZE = 500
+# Score per commit in Contributor.apply_score()
+COMMIT_POINTS = 10
+
+
+def refresh_contributor_stats(contributors):
+    """
+    Refresh stats for `contributors` (Contributor instances, updated in place)
+    Same results as analyze_work_pattern() + calculate_score() per contributor
+    """
+    contributors = list(contributors)
+    ids = [c.id for c in contributors]
+    if not ids:
+        return contributors
+
+    commit_counts = dict(
+        Commit.objects.filter(contributor__in=ids)
+        .values_list('contributor').annotate(n=Count('id')).order_by()
+    )
+    closed_counts = dict(
+        Issue.objects.filter(work__contributor__in=ids, state='closed')
+        .values_list('work__contributor').annotate(n=Count('id')).order_by()
+    )
+
+    period_counts = defaultdict(lambda: {'morning': 0, 'afternoon': 0, 'evening': 0, 'night': 0})
+    hours = (
+        Commit.objects.filter(contributor__in=ids, committed_at__isnull=False)
+        .annotate(hour=ExtractHour('committed_at', tzinfo=dt_timezone.utc))
+        .values_list('contributor', 'hour').annotate(n=Count('id')).order_by()
+    )
+    for contributor_id, hour, n in hours:
+        period_counts[contributor_id][Contributor.work_period(hour)] += n
+
+    now = timezone.now()
+    for contributor in contributors:
+        contributor.total_commits = commit_counts.get(contributor.id, 0)
+        contributor.total_issues_closed = closed_counts.get(contributor.id, 0)
+        if contributor.id in period_counts:
+            counts = period_counts[contributor.id]
+            contributor.preferred_work_hours = max(counts, key=counts.get)
+        contributor.last_activity = now
+        contributor.updated_at = now
+        contributor.apply_score()
+
+    Contributor.objects.bulk_update(contributors, UPDATE_FIELDS, batch_size=BULK_BATCH_SIZE)
+    return contributors
+
+
+def add_commits(commit_counts):
+    """
+    Incremental counterpart of refresh_contributor_stats for newly ingested commits
+    commit_counts: contributor id -> number of new commits
+    Score, XP and level move by what apply_score() gives per commit, in one UPDATE
+    per distinct count (atomic, so concurrent ingests don't lose increments).
+    """
+    by_count = defaultdict(list)
+    for contributor_id, n in commit_counts.items():
+        by_count[n].append(contributor_id)
+
+    now = timezone.now()
+    for n, ids in by_count.items():
+        points = n * COMMIT_POINTS
+        Contributor.objects.filter(id__in=ids).update(
+            total_commits=F('total_commits') + n,
+            total_score=F('total_score') + points,
+            experience_points=F('experience_points') + points,
+            level=Greatest(Value(1), (F('experience_points') + points) / 1000),
+            last_activity=now,
+            updated_at=now,
+        )
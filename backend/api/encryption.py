@@ -0,0 +1,37 @@
+"""
+Encryption for secrets that have to sit in the database for a while
+(tokens in queued job payloads, cached installation tokens)
+
+Fernet (AES + HMAC) with a key derived from SECRET_KEY, so a database dump alone
+doesn't hand out GitHub access. Rotating SECRET_KEY makes stored values
+unreadable; decrypt() then returns None and callers treat the secret as absent.
+"""
+import base64
+import hashlib
+import logging
+from functools import lru_cache
+
+from cryptography.fernet import Fernet, InvalidToken
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=2)
+def _fernet(secret_key):
+    digest = hashlib.sha256(f'api.encryption:{secret_key}'.encode()).digest()
+    return Fernet(base64.urlsafe_b64encode(digest))
+
+
+def encrypt(value):
+    """Encrypt a string; returns URL-safe text"""
+    return _fernet(settings.SECRET_KEY).encrypt(value.encode()).decode()
+
+
+def decrypt(value):
+    """Decrypt what encrypt() returned (None if it can't be read with the current key)"""
+    try:
+        return _fernet(settings.SECRET_KEY).decrypt(value.encode()).decode()
+    except (InvalidToken, AttributeError, UnicodeError):
+        logger.warning("Could not decrypt a stored secret (SECRET_KEY changed?)")
+        return None
@@ -0,0 +1,327 @@
+"""
+Native git-log ingestion
+
+For repositories we have on disk (hosted on the built-in git server, or a clone
+of a GitHub repository) every commit's stats are available locally for free.
+`git log --numstat` runs as a subprocess and is parsed record by record while it
+streams, so a 200k-commit history is never held in memory; commits are written
+in BULK_BATCH_SIZE chunks with bulk_create, without a single GitHub API call.
+"""
+import logging
+import re
+import subprocess
+from collections import Counter
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from api.identity import default_username, resolve_contributors
+from api.models import ActivityLog, Commit, RepositoryWork
+
+logger = logging.getLogger(__name__)
+
+# \x1e starts a record, \x1f separates fields; the body is terminated by a
+# trailing \x1f because it can span lines. --numstat lines follow each header.
+GIT_LOG_FORMAT = '%x1e%H%x1f%P%x1f%an%x1f%ae%x1f%aI%x1f%B%x1f'
+HEADER_FIELDS = 6
+
+# GitHub's commit API lists at most 300 files; keep the same cap in raw_data
+MAX_FILES_PER_COMMIT = 300
+
+OBJECT_ID = re.compile(r'^[0-9a-f]{40}([0-9a-f]{24})?$')
+
+
+class GitLogError(Exception):
+    """git log exited with an error"""
+
+
+def parse_git_log(lines):
+    """Yield one commit dict per record from an iterable of `git log` output lines"""
+    commit = None
+    header = None
+
+    for line in lines:
+        if line.startswith('\x1e'):
+            if commit:
+                yield commit
+            commit = None
+            header = line[1:]
+        elif header is not None:
+            header += line
+        elif commit is not None:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            added, deleted, path = line.split('\t', 2)
+            # Binary files are reported as "-\t-"
+            additions = int(added) if added != '-' else 0
+            deletions = int(deleted) if deleted != '-' else 0
+            commit['additions'] += additions
+            commit['deletions'] += deletions
+            commit['files_changed'] += 1
+            if len(commit['files']) < MAX_FILES_PER_COMMIT:
+                commit['files'].append({'filename': path, 'additions': additions, 'deletions': deletions})
+
+        if header is not None and header.count('\x1f') >= HEADER_FIELDS:
+            sha, parents, name, email, date, message, _ = header.split('\x1f', HEADER_FIELDS)
+            commit = {
+                'sha': sha,
+                'parents': parents.split(),
+                'author_name': name,
+                'author_email': email,
+                'authored_at': datetime.fromisoformat(date),
+                'message': message.strip(),
+                'additions': 0,
+                'deletions': 0,
+                'files_changed': 0,
+                'files': [],
+            }
+            header = None
+
+    if commit:
+        yield commit
+
+
+def iter_git_log(git_dir, revisions=None, env=None):
+    """
+    Stream commits from `git log --numstat` in git_dir
+
+    revisions: e.g. ['main'] or ['<old>..<new>'] (default: every ref, --all)
+    env: environment for git (e.g. credentials for a partial clone's blob fetches)
+    """
+    cmd = [
+        'git', f'--git-dir={git_dir}', 'log', '--numstat', '--no-renames',
+        f'--format={GIT_LOG_FORMAT}', *(revisions or ['--all']),
+    ]
+    process = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env,
+        encoding='utf-8', errors='replace', bufsize=1 << 16,
+    )
+    try:
+        yield from parse_git_log(process.stdout)
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise GitLogError(stderr.strip() or f'git log exited with {process.returncode}')
+    finally:
+        # Consumer stopped early (or failed): don't leave git running
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def push_revisions(git_dir, updates):
+    """
+    `git log` arguments selecting exactly the commits a push introduced
+
+    updates: [{'old': sha, 'new': sha, 'ref': refname}] as given to post-receive.
+    Everything reachable from a ref's previous tip, or from refs the push didn't
+    touch, was already in the repository, so it is excluded with --not. Returns
+    None when the push only deleted refs.
+    """
+    for update in updates:
+        if not (OBJECT_ID.match(update.get('old', '')) and OBJECT_ID.match(update.get('new', ''))):
+            raise ValueError(f'Invalid ref update: {update}')
+
+    # All-zero ids mark a created (old) or deleted (new) ref
+    new = [u['new'] for u in updates if u['new'].strip('0')]
+    if not new:
+        return None
+    old = [u['old'] for u in updates if u['old'].strip('0')]
+
+    refs = subprocess.run(
+        ['git', f'--git-dir={git_dir}', 'for-each-ref', '--format=%(objectname) %(refname)'],
+        capture_output=True, text=True, check=True,
+    ).stdout.splitlines()
+    pushed = {u.get('ref') for u in updates}
+    untouched = [sha for sha, ref in (line.split(' ', 1) for line in refs if line) if ref not in pushed]
+
+    return new + ['--not'] + sorted(set(old + untouched))
+
+
+class GitLogIngester:
+    """Bulk-load a repository's commits from a local git directory"""
+
+    BULK_BATCH_SIZE = 1000
+
+    def __init__(self, repository, git_dir=None, env=None):
+        self.repository = repository
+        self.git_dir = git_dir or repository.local_path
+        self.env = env
+        self.works = None  # contributor id -> RepositoryWork, loaded on first use
+        # Commit page URLs: <repo url without .git>/commit/<sha>
+        self.commit_url = f"{repository.url.removesuffix('.git').rstrip('/')}/commit/"
+
+    def ingest(self, revisions=None, progress=None):
+        """
+        Import every commit in `revisions` not already stored
+        progress: optional callback(scanned=..., created=...) after each chunk
+        Returns {'scanned': n, 'created': n, 'contributors': [Contributor, ...]}
+        """
+        if not self.git_dir:
+            raise GitLogError(f'No local git directory for {self.repository.name}')
+
+        scanned = created = 0
+        touched = {}
+        self.created_by_contributor = Counter()
+        chunk = []
+        for commit in iter_git_log(self.git_dir, revisions, env=self.env):
+            chunk.append(commit)
+            if len(chunk) >= self.BULK_BATCH_SIZE:
+                created += self._write_chunk(chunk, touched)
+                scanned += len(chunk)
+                chunk = []
+                if progress:
+                    progress(scanned=scanned, created=created)
+        if chunk:
+            created += self._write_chunk(chunk, touched)
+            scanned += len(chunk)
+            if progress:
+                progress(scanned=scanned, created=created)
+
+        logger.info(f"git log ingest of {self.repository.name}: {created} new of {scanned} commits")
+        return {
+            'scanned': scanned,
+            'created': created,
+            'contributors': list(touched.values()),
+            'commit_counts': dict(self.created_by_contributor),  # contributor id -> new commits
+        }
+
+    def _write_chunk(self, chunk, touched):
+        """Insert the chunk's unknown commits plus their ActivityLogs. Returns the number created."""
+        known = set(Commit.objects.filter(sha__in=[c['sha'] for c in chunk]).values_list('sha', flat=True))
+        pending = [c for c in chunk if c['sha'] not in known]
+        if not pending:
+            return 0
+
+        authors = self._resolve_authors(pending)
+
+        commits = []
+        for commit in pending:
+            contributor = authors[commit['sha']]
+            touched[contributor.id] = contributor
+            commits.append(self._build_commit(commit, contributor))
+
+        with transaction.atomic():
+            # ignore_conflicts: a concurrent ingest/sync may have inserted the same SHA
+            Commit.objects.bulk_create(commits, ignore_conflicts=True)
+            inserted = set(
+                Commit.objects.filter(repository=self.repository, sha__in=[c.sha for c in commits])
+                .values_list('sha', flat=True)
+            )
+            new_commits = [c for c in commits if c.sha in inserted]
+            self.created_by_contributor.update(c.contributor_id for c in new_commits)
+            ActivityLog.objects.bulk_create([
+                ActivityLog(
+                    contributor=commit.contributor,
+                    repository=self.repository,
+                    activity_type='commit',
+                    timestamp=commit.committed_at,
+                    metadata={'sha': commit.sha[:7]}
+                )
+                for commit in new_commits
+            ])
+        return len(new_commits)
+
+    def _resolve_authors(self, commits):
+        """sha -> Contributor via the identity resolver, creating missing RepositoryWorks in bulk"""
+        emails = {c['author_email'].lower() for c in commits if c['author_email']}
+        # A local user with the author's email is known by their username
+        user_emails = {
+            email.lower(): username
+            for email, username in get_user_model().objects.filter(email__in=emails).values_list('email', 'username')
+        } if emails else {}
+
+        identities = []
+        for c in commits:
+            identity = {
+                'login': user_emails.get((c['author_email'] or '').lower()),
+                'email': c['author_email'],
+                'name': c['author_name'] or 'unknown',
+                'html_url': self.repository.url,
+            }
+            identity['avatar_url'] = f'https://ui-avatars.com/api/?name={default_username(identity)}&background=random'
+            identities.append(identity)
+        authors = dict(zip((c['sha'] for c in commits), resolve_contributors(identities)))
+
+        if self.works is None:
+            self.works = {w.contributor_id: w for w in RepositoryWork.objects.filter(repository=self.repository)}
+        needs_work = {contributor.id for contributor in authors.values()} - set(self.works)
+        if needs_work:
+            RepositoryWork.objects.bulk_create([
+                RepositoryWork(
+                    repository=self.repository,
+                    contributor_id=contributor_id,
+                    summary=f"Contributions to {self.repository.name}",
+                )
+                for contributor_id in needs_work
+            ], ignore_conflicts=True)
+            self.works.update(
+                (w.contributor_id, w)
+                for w in RepositoryWork.objects.filter(repository=self.repository, contributor_id__in=needs_work)
+            )
+        return authors
+
+    def _build_commit(self, commit, contributor):
+        additions, deletions = commit['additions'], commit['deletions']
+        total = additions + deletions
+        return Commit(
+            work=self.works[contributor.id],
+            sha=commit['sha'],
+            repository=self.repository,
+            contributor=contributor,
+            url=self.commit_url + commit['sha'],
+            raw_data={
+                'sha': commit['sha'],
+                'source': 'git',
+                'parents': commit['parents'],
+                'author': {'name': commit['author_name'], 'email': commit['author_email']},
+                'stats': {'additions': additions, 'deletions': deletions, 'total': total},
+                'files': commit['files'],
+            },
+            summary=commit['message'][:500],
+            message=commit['message'],
+            committed_at=commit['authored_at'] or timezone.now(),
+            additions=additions,
+            deletions=deletions,
+            files_changed=commit['files_changed'],
+            code_churn_ratio=deletions / total if total > 0 else 0.0,
+            stats_complete=True,
+        )
+
+
+def ingest_repository(repository, git_dir=None, revisions=None, progress=None):
+    """Full ingest + the aggregate refreshes an import does (contributor stats, collaborations, health)"""
+    from api.collaboration_graph import build_collaborations
+    from api.contributor_stats import refresh_contributor_stats
+
+    result = GitLogIngester(repository, git_dir).ingest(revisions, progress=progress)
+    if result['created']:
+        refresh_contributor_stats(result['contributors'])
+        build_collaborations(repository)
+        repository.calculate_health_score()
+    return {'scanned': result['scanned'], 'created': result['created'], 'contributors': len(result['contributors'])}
+
+
+def ingest_push(repository, updates, git_dir=None):
+    """
+    Ingest only the commits a push introduced, updating aggregates incrementally:
+    contributor totals move by the new commit counts and the health score is
+    recomputed on the debounced health_score job instead of inline.
+    """
+    from api.contributor_stats import add_commits
+    from api.jobs import schedule_health_score
+
+    git_dir = git_dir or repository.local_path
+    revisions = push_revisions(git_dir, updates)
+    if revisions is None:
+        return {'scanned': 0, 'created': 0, 'contributors': 0}
+
+    result = GitLogIngester(repository, git_dir).ingest(revisions)
+    if result['created']:
+        add_commits(result['commit_counts'])
+        schedule_health_score(repository)
+    return {'scanned': result['scanned'], 'created': result['created'], 'contributors': len(result['contributors'])}
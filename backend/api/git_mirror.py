@@ -0,0 +1,328 @@
+"""
+Local mirror store for GitHub repositories
+
+The REST commit list stops at a few hundred commits and GraphQL history costs
+one request per 100 commits on every import. Instead, each imported repository
+gets a bare partial clone (--filter=blob:none by default) under GIT_MIRROR_ROOT,
+refreshed with one incremental `git fetch`. Commits and numstat are then read
+locally by git_ingest: history depth is unlimited and a refresh costs a single
+fetch. numstat needs the blobs of changed files; left to git they would be
+fetched lazily one commit at a time, so the ones the new commits need are
+fetched up front in one batch (prefetch_blobs) and stay in the mirror.
+
+What still needs ingesting is measured against the ref tips last ingested
+(RepositorySyncCursor.ingested_refs), not against what the fetch moved: a
+fetch whose ingest failed leaves those commits for the next run.
+
+Mirrors are locked per repository while in use (fcntl, so mirror mode needs a
+POSIX worker; the module itself imports anywhere), and the store is kept under
+GIT_MIRROR_MAX_BYTES by evicting the least recently used mirrors.
+"""
+import base64
+import logging
+import os
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+from api import metrics
+
+logger = logging.getLogger(__name__)
+
+ZERO_SHA = '0' * 40
+# Touched on every use; its mtime orders mirrors for eviction
+LAST_USED_FILE = 'last_used'
+
+
+class MirrorError(Exception):
+    """A git clone / fetch for a mirror failed"""
+
+
+def git_env(token=None):
+    """
+    Environment for git commands against GitHub
+    The token goes in as an extra HTTP header through GIT_CONFIG_* variables,
+    so it is never written to the mirror's config and is inherited by the
+    fetches git runs on its own to fill in missing blobs.
+    """
+    env = {**os.environ, 'GIT_TERMINAL_PROMPT': '0'}
+    if token:
+        credentials = base64.b64encode(f'x-access-token:{token}'.encode()).decode()
+        env.update({
+            'GIT_CONFIG_COUNT': '1',
+            'GIT_CONFIG_KEY_0': 'http.extraHeader',
+            'GIT_CONFIG_VALUE_0': f'Authorization: Basic {credentials}',
+        })
+    return env
+
+
+class MirrorStore:
+    """Bare partial clones under `root`, one per repository, LRU-evicted past `max_bytes`"""
+
+    def __init__(self, root=None, max_bytes=None, filter_spec=None):
+        self._root = root
+        self._max_bytes = max_bytes
+        self._filter_spec = filter_spec
+
+    @property
+    def root(self):
+        return Path(self._root or settings.GIT_MIRROR_ROOT)
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes if self._max_bytes is not None else settings.GIT_MIRROR_MAX_BYTES
+
+    @property
+    def filter_spec(self):
+        return self._filter_spec if self._filter_spec is not None else settings.GIT_MIRROR_FILTER
+
+    def path_for(self, full_name):
+        owner, name = full_name.split('/', 1)
+        return self.root / owner / f'{name}.git'
+
+    @contextmanager
+    def lock(self, path, blocking=True):
+        """Exclusive lock on one mirror (across processes); yields False if busy and not blocking"""
+        import fcntl
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path.with_name(path.name + '.lock'), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _git(args, env, cwd=None):
+        result = subprocess.run(['git', *args], cwd=cwd, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise MirrorError(result.stderr.strip() or f"git {args[0]} exited with {result.returncode}")
+        return result.stdout
+
+    @classmethod
+    def refs(cls, path):
+        """{refname: sha} of a mirror"""
+        out = cls._git([f'--git-dir={path}', 'for-each-ref', '--format=%(objectname) %(refname)'], os.environ)
+        return {ref: sha for sha, ref in (line.split(' ', 1) for line in out.splitlines() if line)}
+
+    def sync(self, full_name, token=None):
+        """
+        Clone or fetch the mirror of `full_name` (owner/repo)
+        Returns (path, updates) with updates as [{'old', 'new', 'ref'}] (post-receive
+        style, all-zero old = new ref), ready for git_ingest.push_revisions.
+        """
+        with self.checkout(full_name, token) as (path, updates):
+            return path, updates
+
+    @contextmanager
+    def checkout(self, full_name, token=None):
+        """sync() that keeps the mirror locked (safe from eviction) until the block exits"""
+        path = self.path_for(full_name)
+        env = git_env(token)
+        remote = settings.GIT_MIRROR_REMOTE_URL.format(full_name=full_name)
+
+        with self.lock(path):
+            started = time.monotonic()
+            if (path / 'HEAD').exists():
+                before = self.refs(path)
+                self._git([f'--git-dir={path}', 'fetch', '--prune', '--quiet', 'origin'], env)
+                metrics.increment('git_mirror.fetches')
+            else:
+                before = {}
+                shutil.rmtree(path, ignore_errors=True)  # Leftovers of an interrupted clone
+                filter_args = [f'--filter={self.filter_spec}'] if self.filter_spec else []
+                self._git(['clone', '--bare', '--quiet', *filter_args, remote, str(path)], env)
+                # Branches and tags only (no pull request refs), mirrored 1:1 so fetch --prune tracks deletions
+                self._git([f'--git-dir={path}', 'config', 'remote.origin.fetch', '+refs/heads/*:refs/heads/*'], env)
+                self._git([f'--git-dir={path}', 'config', '--add', 'remote.origin.fetch', '+refs/tags/*:refs/tags/*'], env)
+                metrics.increment('git_mirror.clones')
+            after = self.refs(path)
+            (path / LAST_USED_FILE).touch()
+            metrics.observe('git_mirror.sync_seconds', time.monotonic() - started)
+
+            updates = [
+                {'old': before.get(ref, ZERO_SHA), 'new': after.get(ref, ZERO_SHA), 'ref': ref}
+                for ref in sorted(set(before) | set(after))
+                if before.get(ref) != after.get(ref)
+            ]
+            logger.info(f"Mirror of {full_name}: {len(updates)} ref(s) changed")
+            yield path, updates
+
+        self.evict(keep=path)
+
+    def prefetch_blobs(self, path, revisions, env=None):
+        """Fetch, in one request, the blobs missing from a partial clone for `revisions`. Returns the count."""
+        out = self._git([
+            f'--git-dir={path}', 'rev-list', '--objects', '--missing=print', *revisions,
+        ], env or os.environ)
+        missing = [line[1:] for line in out.splitlines() if line.startswith('?')]
+        return self._fetch_objects(path, missing, env)
+
+    def prefetch_commit_blobs(self, path, shas, env=None):
+        """
+        Fetch, in one request, the blobs `git log --numstat` needs for exactly these commits
+        (both sides of every changed file), without walking their history. Returns the count.
+        """
+        if not shas:
+            return 0
+        env = env or os.environ
+        # Raw diffs only read trees, which a blob:none clone has
+        out = subprocess.run(
+            ['git', f'--git-dir={path}', 'diff-tree', '--stdin', '-r', '--root', '--raw', '--no-renames'],
+            input=''.join(f'{sha}\n' for sha in shas), env=env, capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            raise MirrorError(out.stderr.strip() or 'diff-tree failed')
+        needed = set()
+        for line in out.stdout.splitlines():
+            if not line.startswith(':'):
+                continue
+            old_mode, new_mode, old_blob, new_blob = line[1:].split('\t', 1)[0].split()[:4]
+            for mode, blob in ((old_mode, old_blob), (new_mode, new_blob)):
+                if blob != ZERO_SHA and mode != '160000':  # 160000: submodule commit, not a blob
+                    needed.add(blob)
+        if not needed:
+            return 0
+        listing = self._git([
+            f'--git-dir={path}', 'rev-list', '--objects', '--no-walk', '--missing=print',
+            *shas, *(f'{sha}^@' for sha in shas),
+        ], env)
+        missing = sorted(needed & {line[1:] for line in listing.splitlines() if line.startswith('?')})
+        return self._fetch_objects(path, missing, env)
+
+    def _fetch_objects(self, path, shas, env=None):
+        """Fetch objects by id into a partial clone"""
+        if shas:
+            result = subprocess.run(
+                ['git', f'--git-dir={path}', '-c', 'fetch.negotiationAlgorithm=noop', 'fetch', 'origin',
+                 '--no-tags', '--no-write-fetch-head', '--recurse-submodules=no',
+                 f'--filter={self.filter_spec}', '--stdin'],
+                input='\n'.join(shas), env=env or os.environ, capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                raise MirrorError(result.stderr.strip() or 'blob prefetch failed')
+            metrics.increment('git_mirror.prefetched_blobs', len(shas))
+        return len(shas)
+
+    def known_commits(self, path, shas):
+        """The subset of `shas` that are commits in the mirror"""
+        if not shas:
+            return set()
+        result = subprocess.run(
+            ['git', f'--git-dir={path}', 'cat-file', '--batch-check=%(objectname) %(objecttype)'],
+            input='\n'.join(shas), capture_output=True, text=True,
+        )
+        return {
+            parts[0] for parts in (line.split() for line in result.stdout.splitlines())
+            if len(parts) == 2 and parts[1] == 'commit'
+        }
+
+    @staticmethod
+    def size(path):
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                try:
+                    total += os.lstat(os.path.join(dirpath, filename)).st_size
+                except OSError:
+                    pass
+        return total
+
+    def mirrors(self):
+        """[(path, last_used, size)] for every mirror in the store"""
+        if not self.root.exists():
+            return []
+        found = []
+        for path in self.root.glob('*/*.git'):
+            try:
+                last_used = (path / LAST_USED_FILE).stat().st_mtime
+            except OSError:
+                last_used = 0
+            found.append((path, last_used, self.size(path)))
+        return found
+
+    def evict(self, keep=None):
+        """Delete least recently used mirrors until the store fits max_bytes. Returns evicted paths."""
+        mirrors = self.mirrors()
+        total = sum(size for _, _, size in mirrors)
+        evicted = []
+        for path, _, size in sorted(mirrors, key=lambda m: m[1]):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            # A mirror in use by another worker is skipped, not waited for
+            with self.lock(path, blocking=False) as locked:
+                if not locked:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            evicted.append(path)
+            metrics.increment('git_mirror.evictions')
+            logger.info(f"Evicted mirror {path} ({size} bytes)")
+        return evicted
+
+    def stats(self):
+        mirrors = self.mirrors()
+        return {
+            'mirrors': len(mirrors),
+            'bytes': sum(size for _, _, size in mirrors),
+            'max_bytes': self.max_bytes,
+        }
+
+
+mirror_store = MirrorStore()
+
+
+def ingest_from_mirror(repository, full_name, token=None, progress=None):
+    """
+    Refresh the mirror of `full_name` and ingest every commit its refs gained since
+    the last successful ingest (the whole history the first time). The ingested
+    tips are recorded only once the ingest succeeded. Returns GitLogIngester.ingest()'s result.
+    """
+    from api.git_ingest import GitLogIngester, push_revisions
+    from api.models import RepositorySyncCursor
+
+    cursor, _ = RepositorySyncCursor.objects.get_or_create(repository=repository)
+    with mirror_store.checkout(full_name, token) as (path, updates):
+        current = mirror_store.refs(path)
+        if cursor.ingested_refs is None:
+            # Never recorded (mirror from before the cursor existed): the tips before this fetch were ingested
+            ingested = dict(current)
+            for update in updates:
+                if update['old'].strip('0'):
+                    ingested[update['ref']] = update['old']
+                else:
+                    ingested.pop(update['ref'], None)
+            cursor.ingested_refs = ingested
+            cursor.save(update_fields=['ingested_refs', 'updated_at'])
+        ingested = cursor.ingested_refs
+
+        # A tip rewritten away (force push) and pruned from the mirror can't be excluded: treat its ref as new
+        present = mirror_store.known_commits(path, sorted(set(ingested.values())))
+        pending = [
+            {'old': ingested[ref] if ingested.get(ref) in present else ZERO_SHA, 'new': current.get(ref, ZERO_SHA), 'ref': ref}
+            for ref in sorted(set(ingested) | set(current))
+            if ingested.get(ref) != current.get(ref)
+        ]
+        revisions = push_revisions(path, pending) if pending else None
+        if revisions is None:
+            result = {'scanned': 0, 'created': 0, 'contributors': [], 'commit_counts': {}}
+        else:
+            env = git_env(token)
+            if mirror_store.filter_spec:
+                mirror_store.prefetch_blobs(path, revisions, env)
+            result = GitLogIngester(repository, path, env=env).ingest(revisions, progress=progress)
+
+        cursor.ingested_refs = current
+        cursor.save(update_fields=['ingested_refs', 'updated_at'])
+        return result
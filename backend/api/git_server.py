@@ -2,6 +2,8 @@
 Git Server - Handle Git Push/Pull operations
 Allows users to push code directly to our app like GitHub/GitLab
 """
+import hashlib
+import hmac
 import os
 import subprocess
 import shutil
@@ -10,7 +12,7 @@ from django.conf import settings
 from django.http import HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 import logging
 
@@ -21,6 +23,14 @@ REPOS_BASE_DIR = Path(settings.BASE_DIR) / 'git_repositories'
 REPOS_BASE_DIR.mkdir(exist_ok=True)
 
 
+def git_hook_token():
+    """Shared secret the post-receive hook sends (GIT_HOOK_SECRET, or derived from SECRET_KEY)"""
+    secret = settings.GIT_HOOK_SECRET or hmac.new(
+        settings.SECRET_KEY.encode(), b'git-post-receive', hashlib.sha256
+    ).hexdigest()
+    return secret
+
+
 class GitRepository:
     """Handle Git repository operations"""
     
@@ -55,25 +65,50 @@ class GitRepository:
             logger.error(f"Error initializing repo: {str(e)}")
             return False
     
+    @staticmethod
+    def _post_receive_script():
+        """
+        post-receive hook: forwards every updated ref's "old new ref" line
+        so only the pushed commits get ingested
+        """
+        return f"""#!/bin/sh
+# Post-receive hook to trigger analysis
+updates=""
+while read oldrev newrev refname; do
+  updates="$updates{{\\"old\\": \\"$oldrev\\", \\"new\\": \\"$newrev\\", \\"ref\\": \\"$refname\\"}},"
+done
+echo "Code received! Processing..."
+curl -s -X POST {settings.GIT_HOOK_URL} \
+  -H "Content-Type: application/json" \
+  -H "X-Git-Hook-Token: {git_hook_token()}" \
+  -d "{{\\"repository\\": \\"$PWD\\", \\"updates\\": [${{updates%,}}]}}"
+"""
+    
     def _setup_hooks(self):
         """Set up Git hooks for post-receive processing"""
         hooks_dir = self.repo_path / 'hooks'
         hooks_dir.mkdir(exist_ok=True)
         
-        # Create post-receive hook
         post_receive = hooks_dir / 'post-receive'
-        post_receive.write_text("""#!/bin/sh
-# Post-receive hook to trigger analysis
-echo "Code received! Processing..."
-# Trigger Django management command or API endpoint
-curl -X POST http://localhost:8000/api/git/webhook/post-receive/ \
-  -H "Content-Type: application/json" \
-  -d "{\\"repository\\": \\"$PWD\\"}"
-""")
+        post_receive.write_text(self._post_receive_script())
         
         # Make executable
         os.chmod(post_receive, 0o755)
     
+    def ensure_hooks(self):
+        """
+        Rewrite an outdated post-receive hook (installed before the hook token or
+        ref forwarding existed, or with a since-changed secret / URL)
+        """
+        post_receive = self.repo_path / 'hooks' / 'post-receive'
+        try:
+            current = post_receive.read_text()
+        except OSError:
+            current = None
+        if current != self._post_receive_script():
+            self._setup_hooks()
+            logger.info(f"Updated post-receive hook of {self.repo_path}")
+    
     def handle_git_request(self, service, request):
         """
         Handle git-upload-pack (fetch/pull) and git-receive-pack (push)
@@ -268,6 +303,9 @@ def git_http_backend(request, username, repo_name, service):
     
     # Handle actual push/pull
     elif request.method == 'POST':
+        if service == 'git-receive-pack':
+            # Repositories created by older versions: the hook must send the current token
+            git_repo.ensure_hooks()
         output = git_repo.handle_git_request(service, request)
         
         if output:
@@ -449,22 +487,51 @@ def repository_commits(request, username, repo_name):
         return Response({'error': str(e)}, status=500)
 
 
+@csrf_exempt
 @api_view(['POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([AllowAny])
 def post_receive_webhook(request):
-    """Handle post-receive hook from Git"""
+    """
+    Handle post-receive hook from Git
+    The hook authenticates with X-Git-Hook-Token and sends the pushed ref updates;
+    only old..new of each ref is ingested. Without updates (authenticated callers)
+    the whole history is scanned. Hooks of repositories created before the token
+    existed are rewritten on their next push (GitRepository.ensure_hooks).
+    """
+    token = request.headers.get('X-Git-Hook-Token', '')
+    if not (request.user.is_authenticated or hmac.compare_digest(token, git_hook_token())):
+        return Response({'error': 'Invalid hook token'}, status=403)
+    
     try:
         repo_path = request.data.get('repository')
+        updates = request.data.get('updates')
         
         if not repo_path:
             return Response({'error': 'Repository path required'}, status=400)
         
         logger.info(f"Post-receive hook triggered for: {repo_path}")
         
-        # Trigger background analysis/import
-        # You can call your existing github_importer here to analyze the repo
+        from api.models import Repository
+        from api.git_ingest import OBJECT_ID
+        from api.jobs import enqueue
+        
+        repository = Repository.objects.filter(is_local=True, local_path=repo_path).first()
+        if not repository:
+            return Response({'error': 'Repository not found'}, status=404)
+        
+        # Commits are read straight from the bare repo by the job workers
+        if updates is not None:
+            updates = [
+                {'old': u.get('old', ''), 'new': u.get('new', ''), 'ref': u.get('ref', '')}
+                for u in updates if isinstance(u, dict)
+            ]
+            if not all(OBJECT_ID.match(u['old']) and OBJECT_ID.match(u['new']) for u in updates):
+                return Response({'error': 'Invalid ref update'}, status=400)
+            job = enqueue('git_ingest', repository=repository, payload={'updates': updates})
+        else:
+            job = enqueue('git_ingest', repository=repository, dedupe_key=f'git_ingest:{repository.id}')
         
-        return Response({'success': True, 'message': 'Post-receive hook processed'})
+        return Response({'success': True, 'message': 'Post-receive hook processed', 'job_id': job.id})
         
     except Exception as e:
         logger.error(f"Error in post-receive: {str(e)}")
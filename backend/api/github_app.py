@@ -2,8 +2,8 @@
 GitHub App Integration
 Enterprise-grade GitHub App for one-click org-wide repository imports and webhook management
 """
-import jwt
-import time
+import threading
+
 import requests
 from django.conf import settings
 from django.http import JsonResponse
@@ -12,7 +12,9 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from .models import GitHubAppInstallation, Repository
-from .github_importer import GitHubImporter
+from .github_http import CachedSession
+from .github_tokens import app_jwt, get_installation_token
+from .rate_governor import INTERACTIVE, github_priority
 from django.contrib.auth import get_user_model
 import logging
 
@@ -31,37 +33,28 @@ class GitHubAppClient:
         self.private_key = settings.GITHUB_APP_PRIVATE_KEY
         self.client_id = settings.GITHUB_APP_CLIENT_ID
         self.client_secret = settings.GITHUB_APP_CLIENT_SECRET
-        
+        self.session = CachedSession()
+        self._local = threading.local()
+        
+    def _installation_session(self, installation_id):
+        """
+        Session billed to the installation's rate-limit bucket, as the sync's are
+        (one per thread - requests sessions aren't thread-safe)
+        """
+        sessions = getattr(self._local, 'sessions', None)
+        if sessions is None:
+            sessions = self._local.sessions = {}
+        if installation_id not in sessions:
+            sessions[installation_id] = CachedSession(rate_limit_key=f'installation:{installation_id}')
+        return sessions[installation_id]
+    
     def generate_jwt(self):
-        """Generate JWT for GitHub App authentication"""
-        now = int(time.time())
-        payload = {
-            'iat': now,
-            'exp': now + 600,  # JWT expires in 10 minutes
-            'iss': self.app_id
-        }
-        
-        token = jwt.encode(payload, self.private_key, algorithm='RS256')
-        return token
+        """JWT for GitHub App authentication (shared, reused until near expiry)"""
+        return app_jwt()
     
     def get_installation_token(self, installation_id):
-        """Get installation access token for making API calls"""
-        jwt_token = self.generate_jwt()
-        
-        headers = {
-            'Authorization': f'Bearer {jwt_token}',
-            'Accept': 'application/vnd.github+json',
-            'X-GitHub-Api-Version': '2022-11-28'
-        }
-        
-        url = f'https://api.github.com/app/installations/{installation_id}/access_tokens'
-        response = requests.post(url, headers=headers)
-        
-        if response.status_code == 201:
-            return response.json()['token']
-        else:
-            logger.error(f"Failed to get installation token: {response.text}")
-            raise Exception("Failed to get installation access token")
+        """Installation access token from the shared token service"""
+        return get_installation_token(installation_id)
     
     def get_installation_repositories(self, installation_id):
         """Fetch all repositories accessible to the installation"""
@@ -79,7 +72,7 @@ class GitHubAppClient:
         
         while True:
             url = f'https://api.github.com/installation/repositories?per_page={per_page}&page={page}'
-            response = requests.get(url, headers=headers)
+            response = self._installation_session(installation_id).get(url, headers=headers)
             
             if response.status_code != 200:
                 logger.error(f"Failed to fetch repositories: {response.text}")
@@ -100,6 +93,24 @@ class GitHubAppClient:
         
         return all_repos
     
+    def get_installation_repository(self, installation_id, repository_id):
+        """One repository by GitHub id, as the installation sees it (None if it has no access)"""
+        token = self.get_installation_token(installation_id)
+        
+        headers = {
+            'Authorization': f'Bearer {token}',
+            'Accept': 'application/vnd.github+json',
+            'X-GitHub-Api-Version': '2022-11-28'
+        }
+        
+        response = self._installation_session(installation_id).get(
+            f'https://api.github.com/repositories/{repository_id}', headers=headers
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+    
     def create_webhook(self, installation_id, repo_full_name):
         """Create webhook for a repository"""
         token = self.get_installation_token(installation_id)
@@ -138,7 +149,7 @@ class GitHubAppClient:
         }
         
         url = f'https://api.github.com/repos/{repo_full_name}/hooks'
-        response = requests.post(url, json=webhook_config, headers=headers)
+        response = self._installation_session(installation_id).post(url, json=webhook_config, headers=headers)
         
         if response.status_code == 201:
             return response.json()
@@ -338,6 +349,7 @@ def list_installations(request):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@github_priority(INTERACTIVE)
 def installation_repositories(request, installation_id):
     """
     Fetch all repositories accessible through this installation
@@ -404,7 +416,12 @@ def bulk_import_repositories(request, installation_id):
     """
     Bulk import repositories with automatic webhook setup
     This is the WOW feature - import 50+ repos with one click!
+    Queued on the job workers - returns 202 with a job id whose progress
+    (current/total/success/failed, plus per-repository phase) can be polled at
+    /api/sync/jobs/<job_id>/
     """
+    from .jobs import enqueue, status_url
+    
     try:
         # If user is authenticated, filter by user
         if request.user.is_authenticated:
@@ -423,72 +440,19 @@ def bulk_import_repositories(request, installation_id):
     if not repo_ids:
         return Response({'error': 'No repositories selected'}, status=400)
     
-    try:
-        client = GitHubAppClient()
-        token = client.get_installation_token(installation.installation_id)
-        
-        # Fetch all repos to get their details
-        all_repos = client.get_installation_repositories(installation.installation_id)
-        selected_repos = [r for r in all_repos if r['id'] in repo_ids]
-        
-        results = []
-        success_count = 0
-        error_count = 0
-        
-        for repo in selected_repos:
-            try:
-                # Import repository
-                importer = GitHubImporter(token)
-                repo_data = importer.import_repository(repo['full_name'])
-                
-                # Create webhook if requested
-                webhook_status = None
-                if auto_webhook:
-                    try:
-                        webhook = client.create_webhook(
-                            installation.installation_id,
-                            repo['full_name']
-                        )
-                        webhook_status = 'created'
-                    except Exception as webhook_error:
-                        webhook_status = f'failed: {str(webhook_error)}'
-                
-                results.append({
-                    'repository': repo['full_name'],
-                    'status': 'success',
-                    'webhook': webhook_status,
-                    'data': {
-                        'name': repo_data.get('name'),
-                        'contributors': repo_data.get('contributors_count', 0),
-                        'commits': repo_data.get('commits_count', 0),
-                        'issues': repo_data.get('issues_count', 0)
-                    }
-                })
-                success_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to import {repo['full_name']}: {str(e)}")
-                results.append({
-                    'repository': repo['full_name'],
-                    'status': 'error',
-                    'error': str(e)
-                })
-                error_count += 1
-        
-        return Response({
-            'success': True,
-            'results': results,
-            'summary': {
-                'total': len(repo_ids),
-                'success': success_count,
-                'failed': error_count
-            },
-            'message': f'Imported {success_count} of {len(repo_ids)} repositories'
-        })
-        
-    except Exception as e:
-        logger.error(f"Bulk import error: {str(e)}")
-        return Response({'error': str(e)}, status=500)
+    job = enqueue(
+        'bulk_import',
+        payload={'repository_ids': repo_ids, 'auto_webhook': auto_webhook},
+        installation=installation,
+    )
+    
+    return Response({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': status_url(job),
+        'message': f'Queued import of {len(repo_ids)} repositories'
+    }, status=202)
 
 
 @csrf_exempt
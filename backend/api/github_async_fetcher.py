@@ -0,0 +1,291 @@
+"""
+Concurrent GitHub Repository Data Fetcher
+asyncio/httpx version of GitHubFetcher that fans out commit, issue and
+contributor-detail requests in parallel and paces itself through the shared
+rate-limit governor (X-RateLimit-* headers)
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import time
+
+import httpx
+from django.conf import settings
+
+from api.github_fetcher import GitHubFetcher
+from api.github_http import get_default_cache
+from api.rate_governor import current_priority, get_default_governor, rate_limit_key
+
+
+class AsyncGitHubFetcher(GitHubFetcher):
+    """
+    Drop-in replacement for GitHubFetcher.fetch_all_data
+
+    All requests go through one httpx.AsyncClient and a bounded semaphore,
+    so at most `max_concurrency` requests are in flight at any time.
+    """
+
+    # Keep this many requests in reserve before waiting for the rate-limit window to reset
+    RATE_LIMIT_RESERVE = 10
+    MAX_RETRIES = 5
+    BACKOFF_FACTOR = 2
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, github_token=None, max_concurrency=None, commit_mode='rest'):
+        super().__init__(github_token, commit_mode=commit_mode)
+        self.max_concurrency = max_concurrency or getattr(settings, 'GITHUB_FETCH_CONCURRENCY', 8)
+        self.rate_limit_remaining = None
+        self.rate_limit_reset = None
+        self._semaphore = None
+        self._rate_lock = None
+        self.http_cache = get_default_cache()
+        # Shared cross-process budget; local header pacing is the fallback when it's off
+        self.governor = get_default_governor()
+        self.rate_limit_key = f"{rate_limit_key(self.headers.get('Authorization'))}:core"
+
+    # ------------------------------------------------------------------
+    # Public (sync) API - same signature as GitHubFetcher
+    # ------------------------------------------------------------------
+
+    def fetch_all_data(self, repo_url):
+        """
+        Fetch all data for a repository
+        Returns: dict with repo, contributors, commits, issues
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.fetch_all_data_async(repo_url))
+
+        # Called from inside an event loop (e.g. ASGI) - run on a separate thread,
+        # carrying over the caller's context (request priority)
+        context = contextvars.copy_context()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(context.run, asyncio.run, self.fetch_all_data_async(repo_url)).result()
+
+    # ------------------------------------------------------------------
+    # Request plumbing
+    # ------------------------------------------------------------------
+
+    def _record_rate_limit(self, headers):
+        """Remember the latest X-RateLimit-* values reported by GitHub"""
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if remaining is not None:
+            self.rate_limit_remaining = int(remaining)
+        if reset is not None:
+            self.rate_limit_reset = int(reset)
+
+    async def _wait_for_rate_limit(self):
+        """Sleep until the rate-limit window resets if the remaining budget is exhausted"""
+        async with self._rate_lock:
+            if self.rate_limit_remaining is None or self.rate_limit_remaining > self.RATE_LIMIT_RESERVE:
+                if self.rate_limit_remaining is not None:
+                    self.rate_limit_remaining -= 1
+                return
+
+            wait_time = max(0, (self.rate_limit_reset or time.time()) - time.time()) + 1
+            print(f"    Rate limit nearly exhausted ({self.rate_limit_remaining} left). Waiting {wait_time:.0f}s for reset...")
+            await asyncio.sleep(wait_time)
+            # Unknown until the next response tells us the new budget
+            self.rate_limit_remaining = None
+
+    async def _acquire_permit(self, priority):
+        """Take a permit from the shared governor (blocking DB call, so off the event loop)"""
+        if self.governor:
+            await asyncio.to_thread(self.governor.acquire, self.rate_limit_key, priority)
+        else:
+            await self._wait_for_rate_limit()
+
+    async def _get(self, client, url, params=None):
+        """GET with bounded concurrency, rate-limit pacing, ETag revalidation and retry with backoff"""
+        priority = current_priority()
+        cache_key, entry, conditional = None, None, {}
+        if self.http_cache:
+            cache_key = self.http_cache.cache_key(url, params, self.headers)
+            entry, conditional = await asyncio.to_thread(self.http_cache.lookup, cache_key)
+
+        for attempt in range(self.MAX_RETRIES + 1):
+            async with self._semaphore:
+                await self._acquire_permit(priority)
+                response = await client.get(url, params=params, headers=conditional)
+                self._record_rate_limit(response.headers)
+                if self.governor:
+                    await asyncio.to_thread(self.governor.observe, self.rate_limit_key, response.headers)
+
+            if self.http_cache and response.status_code in (200, 304):
+                hit = await asyncio.to_thread(
+                    self.http_cache.record, cache_key, str(response.url), response.status_code,
+                    response.headers, response.content, entry,
+                )
+                if hit:
+                    # Replay the stored page; keep the 304's rate-limit headers
+                    headers = {**response.headers, **(entry.get('headers') or {})}
+                    return httpx.Response(200, headers=headers, content=entry['body'], request=response.request)
+
+            rate_limited = (
+                response.status_code in (403, 429)
+                and response.headers.get('X-RateLimit-Remaining') == '0'
+            )
+            if rate_limited:
+                # Next permit waits until X-RateLimit-Reset
+                if attempt < self.MAX_RETRIES:
+                    continue
+                return response
+
+            if response.status_code in self.RETRY_STATUSES and attempt < self.MAX_RETRIES:
+                retry_after = response.headers.get('Retry-After')
+                delay = int(retry_after) if retry_after and retry_after.isdigit() else self.BACKOFF_FACTOR ** attempt
+                await asyncio.sleep(delay)
+                continue
+
+            return response
+
+        return response
+
+    async def _get_ok(self, client, url, params=None):
+        response = await self._get(client, url, params)
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def _last_page(response):
+        """Read the last page number from the Link header (None if single page)"""
+        last = response.links.get('last')
+        if not last:
+            return None
+        return int(httpx.URL(last['url']).params.get('page', 1))
+
+    async def _fetch_paginated(self, client, url, params, max_items, item_filter=None):
+        """
+        Fetch the first page, then fetch the remaining pages (up to max_items) concurrently
+        using the page count advertised in the Link header
+        """
+        per_page = params['per_page']
+        first = await self._get_ok(client, url, {**params, 'page': 1})
+        pages = [first.json()]
+
+        last_page = self._last_page(first)
+        if last_page and last_page > 1:
+            max_pages = -(-max_items // per_page)  # ceil
+            page_numbers = range(2, min(last_page, max_pages) + 1)
+            responses = await asyncio.gather(*[
+                self._get_ok(client, url, {**params, 'page': page}) for page in page_numbers
+            ])
+            pages.extend(response.json() for response in responses)
+
+        items = []
+        for page in pages:
+            items.extend(item_filter(page) if item_filter else page)
+        return items[:max_items]
+
+    # ------------------------------------------------------------------
+    # Resource fetchers
+    # ------------------------------------------------------------------
+
+    async def fetch_repository_async(self, client, owner, repo):
+        """Fetch repository metadata"""
+        url = f"{self.base_url}/repos/{owner}/{repo}"
+
+        try:
+            response = await self._get(client, url)
+        except httpx.ConnectError as e:
+            raise ConnectionError(f"Network error connecting to GitHub API. Check your internet connection and firewall settings. Details: {str(e)}")
+        except httpx.TimeoutException:
+            raise TimeoutError("Request to GitHub API timed out. Please try again.")
+
+        if response.status_code == 404:
+            raise ValueError(f"Repository {owner}/{repo} not found")
+        elif response.status_code == 403:
+            raise ValueError("GitHub API rate limit exceeded. Please add a GitHub token.")
+
+        response.raise_for_status()
+        return response.json()
+
+    async def fetch_contributors_async(self, client, owner, repo, max_contributors=100, max_details=30):
+        """Fetch contributors, then fetch the top contributors' profiles concurrently"""
+        url = f"{self.base_url}/repos/{owner}/{repo}/contributors"
+        contributors = await self._fetch_paginated(client, url, {'per_page': 100}, max_contributors)
+
+        async def with_details(contributor):
+            try:
+                response = await self._get_ok(client, f"{self.base_url}/users/{contributor['login']}")
+                return {**contributor, 'details': response.json()}
+            except Exception as e:
+                print(f"    Warning: Could not fetch details for {contributor['login']}: {e}")
+                return contributor
+
+        return await asyncio.gather(*[with_details(c) for c in contributors[:max_details]])
+
+    async def fetch_commits_async(self, client, owner, repo, max_commits=500, max_detailed=100):
+        """Fetch commit list, then fetch detailed stats for the first `max_detailed` commits concurrently"""
+        if self.commit_mode == 'mirror':
+            return []  # Read from the local git mirror by the importer (api/git_mirror.py)
+        if self.commit_mode == 'graphql':
+            # Cursor pagination is inherently sequential - run it alongside the other fan-outs
+            return await asyncio.to_thread(self.fetch_commits_graphql, owner, repo)
+
+        url = f"{self.base_url}/repos/{owner}/{repo}/commits"
+        basic_commits = await self._fetch_paginated(client, url, {'per_page': 100}, max_commits)
+
+        print(f"  Fetching detailed stats for {min(max_detailed, len(basic_commits))} commits...")
+
+        async def with_details(commit):
+            try:
+                response = await self._get_ok(client, f"{url}/{commit['sha']}")
+                return response.json()
+            except Exception as e:
+                print(f"    Warning: Could not fetch details for commit {commit['sha'][:7]}: {e}")
+                return commit
+
+        detailed_commits = list(await asyncio.gather(*[with_details(c) for c in basic_commits[:max_detailed]]))
+        detailed_commits.extend(basic_commits[max_detailed:])
+
+        print(f"  ✓ Total commits ready: {len(detailed_commits)} ({min(max_detailed, len(detailed_commits))} with stats)")
+        return detailed_commits
+
+    async def fetch_issues_async(self, client, owner, repo, state='all', max_issues=500):
+        """Fetch repository issues (pull requests filtered out)"""
+        url = f"{self.base_url}/repos/{owner}/{repo}/issues"
+        return await self._fetch_paginated(
+            client, url, {'state': state, 'per_page': 100}, max_issues,
+            item_filter=lambda page: [item for item in page if 'pull_request' not in item],
+        )
+
+    async def fetch_all_data_async(self, repo_url):
+        """Async counterpart of fetch_all_data"""
+        owner, repo = self.parse_repo_url(repo_url)
+
+        print(f"Fetching data for {owner}/{repo} (concurrency={self.max_concurrency})...")
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._rate_lock = asyncio.Lock()
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+
+        async with httpx.AsyncClient(headers=self.headers, timeout=30, limits=limits) as client:
+            # Repository first - fails fast on 404 / bad token
+            repo_data = await self.fetch_repository_async(client, owner, repo)
+
+            async def issues_or_empty():
+                try:
+                    return await self.fetch_issues_async(client, owner, repo)
+                except Exception as e:
+                    print(f"    Warning: Could not fetch issues (rate limit?): {e}")
+                    return []
+
+            detailed_contributors, commits_data, issues_data = await asyncio.gather(
+                self.fetch_contributors_async(client, owner, repo),
+                self.fetch_commits_async(client, owner, repo),
+                issues_or_empty(),
+            )
+
+        print(f"✓ Fetched: {len(detailed_contributors)} contributors, {len(commits_data)} commits, {len(issues_data)} issues")
+
+        return {
+            'repository': repo_data,
+            'contributors': list(detailed_contributors),
+            'commits': commits_data,
+            'issues': issues_data,
+            'owner': owner,
+            'repo': repo
+        }
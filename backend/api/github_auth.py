@@ -11,6 +11,8 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
+from .github_http import CachedSession
+from .rate_governor import INTERACTIVE, github_priority
 import json
 
 
@@ -123,6 +125,7 @@ def github_callback(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@github_priority(INTERACTIVE)
 def github_repositories(request):
     """
     Fetch user's GitHub repositories
@@ -148,10 +151,11 @@ def github_repositories(request):
     
     all_repos = []
     page = 1
+    session = CachedSession()
     
     while True:
         params['page'] = page
-        response = requests.get(repos_url, headers=headers, params=params)
+        response = session.get(repos_url, headers=headers, params=params)
         
         if response.status_code != 200:
             return Response({'error': 'Failed to fetch repositories'}, status=400)
@@ -194,6 +198,7 @@ def github_repositories(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@github_priority(INTERACTIVE)
 def import_repositories(request):
     """
     Import selected repositories to the platform
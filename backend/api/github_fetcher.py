@@ -6,23 +6,34 @@ import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from datetime import datetime
+from urllib.parse import parse_qs, urlparse
 from django.conf import settings
-import time
+from api.github_graphql import GitHubGraphQLClient
+from api.github_http import CachedSession
 
 
 class GitHubFetcher:
     """Fetch data from GitHub API with retry logic"""
     
-    def __init__(self, github_token=None):
+    COMMIT_MODES = ('rest', 'graphql', 'mirror')
+    
+    def __init__(self, github_token=None, commit_mode='rest'):
+        if commit_mode not in self.COMMIT_MODES:
+            raise ValueError(f"Unknown commit_mode '{commit_mode}'. Use one of: {', '.join(self.COMMIT_MODES)}")
+        
         self.base_url = "https://api.github.com"
+        self.github_token = github_token
+        # GraphQL needs a token - fall back to REST for anonymous imports
+        self.commit_mode = 'rest' if commit_mode == 'graphql' and not github_token else commit_mode
         self.headers = {
             'Accept': 'application/vnd.github.v3+json',
         }
         if github_token:
             self.headers['Authorization'] = f'token {github_token}'
         
-        # Create session with retry strategy
-        self.session = requests.Session()
+        # Create session with retry strategy (conditional GETs via the ETag cache,
+        # pacing via the shared rate-limit governor instead of fixed sleeps)
+        self.session = CachedSession()
         retry_strategy = Retry(
             total=5,  # Total number of retries
             backoff_factor=2,  # Wait 1, 2, 4, 8, 16 seconds between retries
@@ -112,8 +123,14 @@ class GitHubFetcher:
         response.raise_for_status()
         return response.json()
     
-    def fetch_commits(self, owner, repo, max_commits=500):
-        """Fetch repository commits with detailed stats"""
+    def fetch_commits(self, owner, repo, max_commits=None):
+        """Fetch repository commits with detailed stats (REST or GraphQL per commit_mode)"""
+        if self.commit_mode == 'mirror':
+            return []  # Read from the local git mirror by the importer (api/git_mirror.py)
+        if self.commit_mode == 'graphql':
+            return self.fetch_commits_graphql(owner, repo, max_commits)
+        
+        max_commits = max_commits or 500
         commits = []
         page = 1
         per_page = 100
@@ -135,9 +152,6 @@ class GitHubFetcher:
             
             if len(data) < per_page:
                 break
-            
-            # Rate limiting
-            time.sleep(0.5)
         
         basic_commits = basic_commits[:max_commits]
         print(f"  Fetching detailed stats for {min(100, len(basic_commits))} commits...")
@@ -154,12 +168,6 @@ class GitHubFetcher:
                 
                 if (i + 1) % 10 == 0:
                     print(f"    Fetched {i + 1}/{min(100, len(basic_commits))} commits...")
-                
-                # Rate limiting - be gentle with API
-                if i % 10 == 0:
-                    time.sleep(1)
-                else:
-                    time.sleep(0.2)
             except Exception as e:
                 print(f"    Warning: Could not fetch details for commit {sha[:7]}: {e}")
                 # Fall back to basic commit data
@@ -171,8 +179,25 @@ class GitHubFetcher:
         print(f"  ✓ Total commits ready: {len(detailed_commits)} ({len(detailed_commits[:100])} with stats)")
         return detailed_commits
     
-    def fetch_issues(self, owner, repo, state='all', max_issues=500):
-        """Fetch repository issues (includes PRs)"""
+    def fetch_commits_graphql(self, owner, repo, max_commits=None):
+        """
+        Fetch commit history with stats via GraphQL - 100 commits per query,
+        so full history gets real additions/deletions/files_changed
+        """
+        max_commits = max_commits or settings.GITHUB_GRAPHQL_MAX_COMMITS or None
+        client = GitHubGraphQLClient(self.github_token, session=self.session)
+        
+        commits = []
+        for commit in client.iter_commit_history(owner, repo, max_commits=max_commits):
+            commits.append(commit)
+            if len(commits) % 1000 == 0:
+                print(f"    Fetched {len(commits)} commits...")
+        
+        print(f"  ✓ Total commits ready: {len(commits)} ({len(commits)} with stats, GraphQL)")
+        return commits
+    
+    def fetch_issues(self, owner, repo, state='all', max_issues=500, since=None):
+        """Fetch repository issues (PRs filtered out), optionally only those updated since a datetime"""
         issues = []
         page = 1
         per_page = 100
@@ -180,6 +205,9 @@ class GitHubFetcher:
         while len(issues) < max_issues:
             url = f"{self.base_url}/repos/{owner}/{repo}/issues"
             params = {'state': state, 'page': page, 'per_page': per_page}
+            if since:
+                # Oldest update first, so a capped fetch can be continued from its last issue
+                params.update({'since': since.isoformat(), 'sort': 'updated', 'direction': 'asc'})
             response = self.session.get(url, headers=self.headers, params=params, timeout=30)
             response.raise_for_status()
             
@@ -194,12 +222,53 @@ class GitHubFetcher:
             
             if len(data) < per_page:
                 break
-            
-            # Rate limiting
-            time.sleep(0.5)
         
         return issues[:max_issues]
     
+    def fetch_branches(self, owner, repo):
+        """{branch name: head SHA} for every branch"""
+        heads = {}
+        url = f"{self.base_url}/repos/{owner}/{repo}/branches"
+        params = {'per_page': 100}
+        while url:
+            response = self.session.get(url, headers=self.headers, params=params, timeout=30)
+            response.raise_for_status()
+            heads.update({branch['name']: branch['commit']['sha'] for branch in response.json()})
+            url = response.links.get('next', {}).get('url')
+            params = None  # `next` already carries the query string
+        return heads
+    
+    def fetch_newest_issue_update(self, owner, repo):
+        """updated_at of the most recently updated issue or PR (one request), None if there are none"""
+        url = f"{self.base_url}/repos/{owner}/{repo}/issues"
+        params = {'state': 'all', 'sort': 'updated', 'direction': 'desc', 'per_page': 1}
+        response = self.session.get(url, headers=self.headers, params=params, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        return data[0]['updated_at'] if data else None
+    
+    def count_contributors(self, owner, repo):
+        """Contributor count from one per_page=1 request (the Link header's last page number)"""
+        url = f"{self.base_url}/repos/{owner}/{repo}/contributors"
+        response = self.session.get(url, headers=self.headers, params={'per_page': 1}, timeout=30)
+        response.raise_for_status()
+        last = response.links.get('last', {}).get('url')
+        if last:
+            return int(parse_qs(urlparse(last).query)['page'][0])
+        # 204 for an empty repository
+        return len(response.json()) if response.status_code == 200 else 0
+    
+    def iter_commit_pages(self, owner, repo, sha, per_page=100):
+        """Pages of the commit list reachable from `sha`, newest first (no stats)"""
+        url = f"{self.base_url}/repos/{owner}/{repo}/commits"
+        params = {'sha': sha, 'per_page': per_page}
+        while url:
+            response = self.session.get(url, headers=self.headers, params=params, timeout=30)
+            response.raise_for_status()
+            yield response.json()
+            url = response.links.get('next', {}).get('url')
+            params = None
+    
     def fetch_commit_details(self, owner, repo, sha):
         """Fetch detailed commit information"""
         url = f"{self.base_url}/repos/{owner}/{repo}/commits/{sha}"
@@ -234,7 +303,6 @@ class GitHubFetcher:
                     **contributor,
                     'details': details
                 })
-                time.sleep(0.3)  # Rate limiting
             except Exception as e:
                 print(f"    Warning: Could not fetch details for {contributor['login']}: {e}")
                 detailed_contributors.append(contributor)
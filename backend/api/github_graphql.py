@@ -0,0 +1,209 @@
+"""
+GitHub GraphQL Client
+Batch commit-history fetching: one query returns up to 100 commits *with* stats,
+instead of one REST call per commit
+"""
+import logging
+import requests
+
+logger = logging.getLogger(__name__)
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+
+# `changedFiles` was removed from the Commit type; `changedFilesIfAvailable`
+# is its replacement (null only for pathological commits GitHub won't diff)
+COMMIT_HISTORY_QUERY = """
+query($owner: String!, $name: String!, $pageSize: Int!, $cursor: String, $since: GitTimestamp) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          history(first: $pageSize, after: $cursor, since: $since) {
+            pageInfo { hasNextPage endCursor }
+            nodes {
+              oid
+              url
+              message
+              additions
+              deletions
+              changedFilesIfAvailable
+              author { name email date user { login avatarUrl url } }
+              committer { name email date user { login avatarUrl url } }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# Same fields as a history node, for commits looked up by SHA
+COMMIT_LOOKUP_FIELDS = """
+      ... on Commit {
+        oid
+        url
+        message
+        additions
+        deletions
+        changedFilesIfAvailable
+        author { name email date user { login avatarUrl url } }
+        committer { name email date user { login avatarUrl url } }
+      }
+"""
+
+
+def commit_lookup_query(count):
+    """Query with `count` aliased object(oid:) lookups (c0..cN) against one repository"""
+    params = ''.join(f', $oid{i}: GitObjectID!' for i in range(count))
+    lookups = ''.join(
+        f'    c{i}: object(oid: $oid{i}) {{{COMMIT_LOOKUP_FIELDS}    }}\n' for i in range(count)
+    )
+    return (
+        f'query($owner: String!, $name: String!{params}) {{\n'
+        f'  repository(owner: $owner, name: $name) {{\n{lookups}  }}\n'
+        f'}}\n'
+    )
+
+
+class GitHubGraphQLError(Exception):
+    """GraphQL request returned errors"""
+
+
+def _user_to_rest(actor):
+    """Convert a GraphQL GitActor.user into the REST `author`/`committer` shape"""
+    user = (actor or {}).get('user')
+    if not user:
+        return None
+    return {
+        'login': user['login'],
+        'avatar_url': user.get('avatarUrl', ''),
+        'html_url': user.get('url', f"https://github.com/{user['login']}"),
+    }
+
+
+def commit_node_to_rest(node):
+    """
+    Convert a GraphQL Commit node into the shape of the REST
+    /repos/{owner}/{repo}/commits/{sha} response, so importers can treat both alike
+    """
+    additions = node.get('additions') or 0
+    deletions = node.get('deletions') or 0
+    author = node.get('author') or {}
+    committer = node.get('committer') or {}
+
+    return {
+        'sha': node['oid'],
+        'html_url': node['url'],
+        'commit': {
+            'message': node.get('message', ''),
+            'author': {'name': author.get('name'), 'email': author.get('email'), 'date': author.get('date')},
+            'committer': {'name': committer.get('name'), 'email': committer.get('email'), 'date': committer.get('date')},
+        },
+        'author': _user_to_rest(author),
+        'committer': _user_to_rest(committer),
+        'stats': {'additions': additions, 'deletions': deletions, 'total': additions + deletions},
+        # REST returns the file list; GraphQL only the count
+        'files_changed': node.get('changedFilesIfAvailable') or 0,
+    }
+
+
+class GitHubGraphQLClient:
+    """Minimal GitHub GraphQL v4 client (requires a token)"""
+
+    # GitHub may time out computing stats for large pages - shrink and retry
+    MIN_PAGE_SIZE = 10
+
+    def __init__(self, token, session=None):
+        if not token:
+            raise ValueError("GitHub GraphQL API requires a token")
+        self.session = session or requests.Session()
+        self.headers = {
+            'Authorization': f'Bearer {token}',
+            'Accept': 'application/vnd.github+json',
+        }
+
+    def execute(self, query, variables=None):
+        """Run a query and return its `data` (raises GitHubGraphQLError on errors)"""
+        response = self.session.post(
+            GRAPHQL_URL,
+            json={'query': query, 'variables': variables or {}},
+            headers=self.headers,
+            timeout=60,
+        )
+        response.raise_for_status()
+        payload = response.json()
+
+        if payload.get('errors'):
+            messages = '; '.join(error.get('message', str(error)) for error in payload['errors'])
+            raise GitHubGraphQLError(messages)
+
+        return payload['data']
+
+    def iter_commit_history(self, owner, repo, since=None, max_commits=None, page_size=100):
+        """
+        Yield default-branch commits (newest first) in REST shape, with
+        additions/deletions/files_changed, one GraphQL query per page
+        """
+        cursor = None
+        fetched = 0
+        variables = {'owner': owner, 'name': repo}
+        if since:
+            variables['since'] = since.isoformat() if hasattr(since, 'isoformat') else since
+
+        while True:
+            try:
+                data = self.execute(COMMIT_HISTORY_QUERY, {**variables, 'pageSize': page_size, 'cursor': cursor})
+            except requests.exceptions.HTTPError as e:
+                if e.response is not None and e.response.status_code in (502, 504) and page_size > self.MIN_PAGE_SIZE:
+                    page_size = max(self.MIN_PAGE_SIZE, page_size // 2)
+                    logger.warning(f"GraphQL history timed out for {owner}/{repo}, retrying with pageSize={page_size}")
+                    continue
+                raise
+
+            repository = data.get('repository')
+            if not repository:
+                raise GitHubGraphQLError(f"Repository {owner}/{repo} not found")
+
+            branch = repository.get('defaultBranchRef')
+            if not branch:
+                return  # Empty repository
+
+            history = branch['target']['history']
+            for node in history['nodes']:
+                yield commit_node_to_rest(node)
+                fetched += 1
+                if max_commits and fetched >= max_commits:
+                    return
+
+            if not history['pageInfo']['hasNextPage']:
+                return
+            cursor = history['pageInfo']['endCursor']
+
+    def fetch_commit_history(self, owner, repo, since=None, max_commits=None):
+        """List version of iter_commit_history"""
+        return list(self.iter_commit_history(owner, repo, since=since, max_commits=max_commits))
+
+    def fetch_commits(self, owner, repo, shas, batch_size=50):
+        """
+        Commits by SHA in REST shape (with stats) - `batch_size` SHAs per query
+        instead of one REST /commits/{sha} call each. Returns {sha: commit};
+        SHAs GitHub doesn't know are left out.
+        """
+        commits = {}
+        shas = list(dict.fromkeys(shas))
+        for start in range(0, len(shas), batch_size):
+            batch = shas[start:start + batch_size]
+            variables = {'owner': owner, 'name': repo}
+            variables.update((f'oid{i}', sha) for i, sha in enumerate(batch))
+
+            data = self.execute(commit_lookup_query(len(batch)), variables)
+            repository = data.get('repository')
+            if not repository:
+                raise GitHubGraphQLError(f"Repository {owner}/{repo} not found")
+
+            for i in range(len(batch)):
+                node = repository.get(f'c{i}')
+                if node and node.get('oid'):
+                    commits[node['oid']] = commit_node_to_rest(node)
+        return commits
@@ -0,0 +1,332 @@
+"""
+Conditional-request (ETag / Last-Modified) cache for GitHub API reads
+
+GitHub answers `If-None-Match` / `If-Modified-Since` with 304 Not Modified when a
+resource is unchanged, and 304s don't count against the rate limit. CachedSession
+stores the validators and body of every cacheable GET and replays the stored body
+on a 304, so periodic syncs only pay quota for pages that actually changed.
+
+Storage is pluggable: DatabaseCacheStore (Django model, shared across workers)
+or FileCacheStore (plain files, usable from standalone scripts like fetch.py).
+Django is only imported lazily so this module works outside a Django process.
+
+Entries are keyed by the caller's rate-limit identity (installation:<id> for
+App installations), not the token itself, so hourly token rotation keeps the
+cache warm. prune_cache() drops entries not fetched or hit for
+GITHUB_HTTP_CACHE_MAX_AGE.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import zlib
+from pathlib import Path
+from urllib.parse import urlencode
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Response headers needed to replay a cached page (pagination, content type)
+REPLAY_HEADERS = ('Content-Type', 'Link')
+
+
+class DatabaseCacheStore:
+    """Cache entries in the GitHubHTTPCacheEntry table"""
+
+    def get(self, key):
+        from api.models import GitHubHTTPCacheEntry
+        entry = GitHubHTTPCacheEntry.objects.filter(cache_key=key).first()
+        if not entry:
+            return None
+        return {
+            'etag': entry.etag,
+            'last_modified': entry.last_modified,
+            'body': zlib.decompress(bytes(entry.body)),
+            'headers': entry.headers,
+        }
+
+    def set(self, key, url, etag, last_modified, body, headers):
+        from api.models import GitHubHTTPCacheEntry
+        GitHubHTTPCacheEntry.objects.update_or_create(
+            cache_key=key,
+            defaults={
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+                'body': zlib.compress(body),
+                'headers': headers,
+            }
+        )
+
+    def record_hit(self, key):
+        from django.db.models import F
+        from django.utils import timezone
+        from api.models import GitHubHTTPCacheEntry
+        GitHubHTTPCacheEntry.objects.filter(cache_key=key).update(
+            hit_count=F('hit_count') + 1, last_hit_at=timezone.now()
+        )
+
+    def prune(self, max_age):
+        """Delete entries neither fetched nor hit in the last `max_age` seconds. Returns the count."""
+        from datetime import timedelta
+        from django.db.models import Q
+        from django.utils import timezone
+        from api.models import GitHubHTTPCacheEntry
+        cutoff = timezone.now() - timedelta(seconds=max_age)
+        deleted, _ = GitHubHTTPCacheEntry.objects.filter(
+            Q(last_hit_at__isnull=True) | Q(last_hit_at__lt=cutoff), fetched_at__lt=cutoff
+        ).delete()
+        return deleted
+
+
+class FileCacheStore:
+    """Cache entries as <key>.json + <key>.body files in a directory"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, key):
+        return self.directory / f'{key}.json', self.directory / f'{key}.body'
+
+    def get(self, key):
+        meta_path, body_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            meta['body'] = zlib.decompress(body_path.read_bytes())
+            return meta
+        except (OSError, ValueError, zlib.error):
+            return None
+
+    def set(self, key, url, etag, last_modified, body, headers):
+        meta_path, body_path = self._paths(key)
+        # Write body first and swap in atomically so readers never see a torn entry
+        # (per-thread temp names: fetch.py's crawler writes from several threads)
+        suffix = f'.{threading.get_ident()}.tmp'
+        tmp_body = body_path.with_suffix('.body' + suffix)
+        tmp_body.write_bytes(zlib.compress(body))
+        os.replace(tmp_body, body_path)
+        tmp_meta = meta_path.with_suffix('.json' + suffix)
+        tmp_meta.write_text(json.dumps({
+            'url': url, 'etag': etag, 'last_modified': last_modified, 'headers': headers,
+        }), encoding='utf-8')
+        os.replace(tmp_meta, meta_path)
+
+    def record_hit(self, key):
+        # A hit keeps the entry from being pruned
+        meta_path, _ = self._paths(key)
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+
+    def prune(self, max_age):
+        """Delete entries not written or hit in the last `max_age` seconds. Returns the count."""
+        import time
+        cutoff = time.time() - max_age
+        deleted = 0
+        for meta_path in self.directory.glob('*.json'):
+            try:
+                if meta_path.stat().st_mtime >= cutoff:
+                    continue
+                meta_path.unlink()
+                meta_path.with_suffix('.body').unlink(missing_ok=True)
+                deleted += 1
+            except OSError:
+                pass
+        return deleted
+
+
+class ConditionalRequestCache:
+    """
+    Transport-agnostic ETag logic plus hit/miss counters.
+    Used by CachedSession (requests) and AsyncGitHubFetcher (httpx).
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def cache_key(url, params=None, headers=None, identity=None):
+        """
+        Key on URL + query + the caller's identity. GitHub responses vary by
+        who asks, so one identity's cached body must never be served to another.
+        identity: rate-limit identity (e.g. 'installation:123', stable across token
+        rotation); defaults to a hash of the Authorization header
+        """
+        from api.rate_governor import rate_limit_key
+        headers = headers or {}
+        if params:
+            url = f"{url}{'&' if '?' in url else '?'}{urlencode(sorted(params.items()))}"
+        identity = identity or rate_limit_key(headers.get('Authorization'))
+        vary = f"{identity}|{headers.get('Accept', '')}"
+        return hashlib.sha256(f'{url}|{vary}'.encode()).hexdigest()
+
+    def lookup(self, key):
+        """Return (entry, conditional headers) for a key"""
+        try:
+            entry = self.store.get(key)
+        except Exception as e:
+            logger.warning(f"HTTP cache lookup failed: {e}")
+            return None, {}
+
+        if not entry:
+            return None, {}
+
+        conditional = {}
+        if entry.get('etag'):
+            conditional['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            conditional['If-Modified-Since'] = entry['last_modified']
+        return entry, conditional
+
+    def record(self, key, url, status_code, headers, body, entry):
+        """Update counters and the store after a response. Returns True on a cache hit."""
+        from api import metrics
+
+        if status_code == 304 and entry is not None:
+            with self._lock:
+                self.hits += 1
+            metrics.increment('github_http_cache.hits')
+            try:
+                self.store.record_hit(key)
+            except Exception as e:
+                logger.warning(f"HTTP cache hit bookkeeping failed: {e}")
+            return True
+
+        with self._lock:
+            self.misses += 1
+        metrics.increment('github_http_cache.misses')
+
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if status_code == 200 and (etag or last_modified):
+            replay = {name: headers[name] for name in REPLAY_HEADERS if name in headers}
+            try:
+                self.store.set(key, url, etag, last_modified, body, replay)
+            except Exception as e:
+                logger.warning(f"HTTP cache store failed for {url}: {e}")
+        return False
+
+    def prune(self, max_age):
+        try:
+            return self.store.prune(max_age)
+        except Exception as e:
+            logger.warning(f"HTTP cache prune failed: {e}")
+            return 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total) if total else 0.0,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """
+    Process-wide ConditionalRequestCache configured from Django settings
+    (GITHUB_HTTP_CACHE = 'db' | 'disk' | 'off'). Returns None when disabled.
+    """
+    global _default_cache
+    if _default_cache is not None:
+        return _default_cache or None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            from django.conf import settings
+            backend = getattr(settings, 'GITHUB_HTTP_CACHE', 'db')
+            if backend == 'db':
+                _default_cache = ConditionalRequestCache(DatabaseCacheStore())
+            elif backend == 'disk':
+                _default_cache = ConditionalRequestCache(FileCacheStore(settings.GITHUB_HTTP_CACHE_DIR))
+            else:
+                _default_cache = False
+    return _default_cache or None
+
+
+def cache_stats():
+    """Hit/miss counters for the default cache (zeros when disabled)"""
+    cache = get_default_cache()
+    return cache.stats() if cache else {'hits': 0, 'misses': 0, 'hit_rate': 0.0}
+
+
+def prune_cache(max_age=None):
+    """Drop stale entries from the default cache. Returns the number deleted."""
+    cache = get_default_cache()
+    if not cache:
+        return 0
+    if max_age is None:
+        from django.conf import settings
+        max_age = settings.GITHUB_HTTP_CACHE_MAX_AGE
+    return cache.prune(max_age)
+
+
+class CachedSession(requests.Session):
+    """
+    requests.Session for all GitHub API calls
+
+    - GETs become conditional requests. A 304 is returned to the caller as a
+      normal 200 with the stored body (and `response.from_cache = True`);
+      rate-limit headers come from the 304.
+    - Every request first takes a permit from the shared rate-limit governor
+      and reports the response's X-RateLimit-* headers back to it.
+    """
+
+    def __init__(self, cache=None, governor=None, rate_limit_key=None):
+        super().__init__()
+        from api.rate_governor import get_default_governor
+        # None = process defaults from settings, False = disabled
+        self.http_cache = (cache if cache is not None else get_default_cache()) or None
+        self.governor = (governor if governor is not None else get_default_governor()) or None
+        # e.g. 'installation:123' - defaults to a hash of the Authorization header
+        self.rate_limit_key = rate_limit_key
+
+    def _identity(self, headers):
+        from api.rate_governor import rate_limit_key
+        return self.rate_limit_key or rate_limit_key(headers.get('Authorization'))
+
+    def _bucket_key(self, url, headers):
+        from api.rate_governor import resource_for_url
+        return f'{self._identity(headers)}:{resource_for_url(url)}'
+
+    def request(self, method, url, params=None, headers=None, **kwargs):
+        merged_headers = {**self.headers, **(headers or {})}
+
+        bucket_key = None
+        if self.governor:
+            bucket_key = self._bucket_key(url, merged_headers)
+            self.governor.acquire(bucket_key)
+
+        cacheable = method.upper() == 'GET' and self.http_cache is not None and not kwargs.get('stream')
+        entry, conditional = None, {}
+        if cacheable:
+            key = self.http_cache.cache_key(url, params, merged_headers, identity=self._identity(merged_headers))
+            entry, conditional = self.http_cache.lookup(key)
+
+        response = super().request(method, url, params=params, headers={**(headers or {}), **conditional}, **kwargs)
+
+        if bucket_key:
+            self.governor.observe(bucket_key, response.headers)
+
+        response.from_cache = False
+        if cacheable:
+            hit = self.http_cache.record(key, response.url, response.status_code, response.headers, response.content, entry)
+            if hit:
+                response.from_cache = True
+                response.status_code = 200
+                response.reason = 'OK (cached)'
+                response._content = entry['body']
+                response.headers.update(entry.get('headers') or {})
+        return response
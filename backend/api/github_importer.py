@@ -1,314 +1,374 @@
 """
 Import GitHub data into database
 """
+from django.db import transaction
 from django.utils import timezone
-from datetime import datetime
+from datetime import datetime, timezone as dt_timezone
 from api.models import (
     Repository, Contributor, RepositoryWork, Commit, Issue,
-    ActivityLog, Collaboration
+    ActivityLog
 )
 from api.github_fetcher import GitHubFetcher
+from api.collaboration_graph import build_collaborations
+from api.contributor_stats import refresh_contributor_stats
+from api.github_async_fetcher import AsyncGitHubFetcher
+from api.jobs import schedule_stats_backfill
+from api.identity import commit_identity, github_user_identity, resolve_contributors
+from api.sync_lock import repository_sync
+from django.conf import settings
 import json
 
 
 class GitHubImporter:
     """Import GitHub data into database"""
     
-    def __init__(self, github_token=None):
-        self.fetcher = GitHubFetcher(github_token)
+    # Rows per bulk_create / activity-log chunk
+    BULK_BATCH_SIZE = 1000
     
-    def import_repository(self, repo_url):
+    def __init__(self, github_token=None, concurrent=None, commit_mode=None):
+        # Concurrent (asyncio) fetcher by default; pass concurrent=False for the sequential one
+        if concurrent is None:
+            concurrent = settings.GITHUB_ASYNC_FETCH
+        # 'graphql' pulls full history with stats in 100-commit pages, 'rest' is one call per commit,
+        # 'mirror' reads it from a local partial clone
+        commit_mode = commit_mode or settings.GITHUB_COMMIT_FETCH_MODE
+        
+        fetcher_class = AsyncGitHubFetcher if concurrent else GitHubFetcher
+        self.fetcher = fetcher_class(github_token, commit_mode=commit_mode)
+    
+    def import_repository(self, repo_url, progress=None):
         """
         Import a GitHub repository and all its data
+        progress: optional callback(phase, **counts), called after 'fetched' and 'inserted'
         Returns: Repository object
         """
         # Fetch all data from GitHub
         data = self.fetcher.fetch_all_data(repo_url)
+        if progress:
+            progress(
+                'fetched',
+                commits=len(data['commits']),
+                issues=len(data['issues']),
+                contributors=len(data['contributors']),
+            )
         
         # Create or update repository
         repo = self._create_repository(data['repository'])
         
-        # Import contributors
-        contributors = self._import_contributors(data['contributors'])
+        # The writes race with webhook and scheduled syncs of the same repository otherwise
+        with repository_sync(repo.id, wait=settings.SYNC_LOCK_WAIT):
+            # Import contributors
+            contributors = self._import_contributors(data['contributors'])
         
-        # Import commits and link to contributors
-        self._import_commits(repo, data['commits'], contributors)
+            # Import commits and link to contributors
+            if self.fetcher.commit_mode == 'mirror':
+                commit_count = self._import_commits_from_mirror(repo, f"{data['owner']}/{data['repo']}", contributors)
+            else:
+                commit_count = self._import_commits(repo, data['commits'])
         
-        # Import issues
-        self._import_issues(repo, data['issues'], contributors)
+            # Import issues
+            self._import_issues(repo, data['issues'])
         
-        # Update contributor stats
-        self._update_contributor_stats(contributors)
+            # Update contributor stats
+            self._update_contributor_stats(contributors)
         
-        # Create collaborations
-        self._create_collaborations(repo, contributors)
+            # Create collaborations
+            self._create_collaborations(repo, contributors)
         
-        # Update repository health
-        repo.calculate_health_score()
+            # Update repository health
+            repo.calculate_health_score()
         
+        if progress and self.fetcher.commit_mode == 'mirror':
+            # Commit count is only known once the mirror has been read
+            progress('inserted', commits=commit_count)
+        elif progress:
+            progress('inserted')
         return repo
     
+    def _repository_fields(self, repo_data):
+        """Repository model fields from GitHub repository data"""
+        return {
+            'name': repo_data['name'],
+            'avatar_url': repo_data['owner']['avatar_url'],
+            'summary': repo_data['description'] or f"{repo_data['name']} repository",
+            'raw_data': json.dumps(repo_data),
+            'stars': repo_data.get('stargazers_count', 0),
+            'forks': repo_data.get('forks_count', 0),
+            'open_issues': repo_data.get('open_issues_count', 0),
+            'primary_language': repo_data.get('language', 'Unknown'),
+            'created_at': self._parse_github_date(repo_data['created_at']),
+            'updated_at': self._parse_github_date(repo_data['updated_at']),
+        }
+    
     def _create_repository(self, repo_data):
         """Create or update repository from GitHub data"""
         repo, created = Repository.objects.update_or_create(
             url=repo_data['html_url'],
-            defaults={
-                'name': repo_data['name'],
-                'avatar_url': repo_data['owner']['avatar_url'],
-                'summary': repo_data['description'] or f"{repo_data['name']} repository",
-                'raw_data': json.dumps(repo_data),
-                'stars': repo_data.get('stargazers_count', 0),
-                'forks': repo_data.get('forks_count', 0),
-                'open_issues': repo_data.get('open_issues_count', 0),
-                'primary_language': repo_data.get('language', 'Unknown'),
-                'created_at': self._parse_github_date(repo_data['created_at']),
-                'updated_at': self._parse_github_date(repo_data['updated_at']),
-            }
+            defaults=self._repository_fields(repo_data),
         )
         
         print(f"{'Created' if created else 'Updated'} repository: {repo.name}")
         return repo
     
     def _import_contributors(self, contributors_data):
-        """Import contributors from GitHub data"""
-        contributors = []
+        """Import contributors from GitHub data (resolved through the identity aliases)"""
+        contributors_data = [c for c in contributors_data if c.get('login')]
+        resolved = resolve_contributors(github_user_identity(c) for c in contributors_data)
         
-        for contrib_data in contributors_data:
+        contributors = {}
+        for contributor, contrib_data in zip(resolved, contributors_data):
             details = contrib_data.get('details', contrib_data)
-            
-            contributor, created = Contributor.objects.update_or_create(
-                username=contrib_data['login'],
-                defaults={
-                    'url': contrib_data['html_url'],
-                    'avatar_url': contrib_data['avatar_url'],
-                    'summary': f"{contrib_data['login']} - {contrib_data.get('contributions', 0)} contributions",
-                    'bio': details.get('bio', ''),
-                    'company': details.get('company', ''),
-                    'location': details.get('location', ''),
-                }
-            )
-            contributors.append(contributor)
-            
-            if created:
-                print(f"  + Added contributor: {contributor.username}")
+            contributor.url = contrib_data['html_url']
+            contributor.avatar_url = contrib_data['avatar_url']
+            contributor.summary = f"{contrib_data['login']} - {contrib_data.get('contributions', 0)} contributions"
+            contributor.bio = details.get('bio', '')
+            contributor.company = details.get('company', '')
+            contributor.location = details.get('location', '')
+            contributors[contributor.id] = contributor
         
+        contributors = list(contributors.values())
+        Contributor.objects.bulk_update(
+            contributors, ['url', 'avatar_url', 'summary', 'bio', 'company', 'location'],
+            batch_size=self.BULK_BATCH_SIZE,
+        )
         print(f"Imported {len(contributors)} contributors")
         return contributors
     
-    def _import_commits(self, repo, commits_data, contributors):
-        """Import commits from GitHub data"""
-        contributor_map = {c.username: c for c in contributors}
-        commit_count = 0
-        
-        print(f"  Importing {len(commits_data)} commits...")
-        for commit_data in commits_data:
-            try:
-                # Get or create contributor
-                author_login = commit_data.get('author', {}).get('login') if commit_data.get('author') else None
-                
-                if not author_login:
-                    # Try committer if author not available
-                    author_login = commit_data.get('committer', {}).get('login') if commit_data.get('committer') else None
-                
-                if not author_login:
-                    continue
-                
-                contributor = contributor_map.get(author_login)
-                if not contributor:
-                    # Create contributor if not exists
-                    author_data = commit_data.get('author') or commit_data.get('committer')
-                    contributor, _ = Contributor.objects.get_or_create(
-                        username=author_login,
-                        defaults={
-                            'url': author_data.get('html_url', f'https://github.com/{author_login}'),
-                            'avatar_url': author_data.get('avatar_url', ''),
-                            'summary': f"{author_login} contributor",
-                        }
-                    )
-                    contributor_map[author_login] = contributor
-                
-                # Get or create repository work
-                work, _ = RepositoryWork.objects.get_or_create(
+    @staticmethod
+    def _chunks(items, size):
+        for i in range(0, len(items), size):
+            yield items[i:i + size]
+    
+    def _ensure_works(self, repo, contributors):
+        """RepositoryWork per contributor id for this repo, bulk-creating the missing ones"""
+        works = {w.contributor_id: w for w in RepositoryWork.objects.filter(repository=repo)}
+        missing = [c for c in contributors if c.id not in works]
+        if missing:
+            RepositoryWork.objects.bulk_create([
+                RepositoryWork(
                     repository=repo,
                     contributor=contributor,
-                    defaults={
-                        'summary': f"{contributor.username} contributions to {repo.name}",
-                    }
+                    summary=f"{contributor.username} contributions to {repo.name}",
                 )
-                
-                # Create commit
-                commit_info = commit_data.get('commit', {})
-                commit_date = commit_info.get('author', {}).get('date') or commit_info.get('committer', {}).get('date')
-                
-                # Debug: Check if stats are present
-                has_stats = 'stats' in commit_data
-                has_files = 'files' in commit_data
-                if not has_stats or not has_files:
-                    print(f"    ⚠ Commit {commit_data.get('sha', 'unknown')[:7]} missing stats:{not has_stats} files:{not has_files}")
-                
-                commit, created = Commit.objects.get_or_create(
-                    url=commit_data['html_url'],
-                    defaults={
-                        'work': work,
-                        'repository': repo,
-                        'contributor': contributor,
-                        'raw_data': commit_data,
-                        'summary': commit_info.get('message', 'No message')[:500],
-                        'committed_at': self._parse_github_date(commit_date) if commit_date else timezone.now(),
-                        'additions': commit_data.get('stats', {}).get('additions', 0),
-                        'deletions': commit_data.get('stats', {}).get('deletions', 0),
-                        'files_changed': len(commit_data.get('files', [])),
-                    }
+                for contributor in missing
+            ], batch_size=self.BULK_BATCH_SIZE, ignore_conflicts=True)
+            works = {w.contributor_id: w for w in RepositoryWork.objects.filter(repository=repo)}
+        return works
+    
+    def _import_commits(self, repo, commits_data, atomic=transaction.atomic):
+        """
+        Import commits from GitHub data
+        Set-based: one query for what's already stored, derived fields computed
+        here, then Commits + ActivityLogs written with bulk_create in chunks.
+        Authors are resolved by GitHub user and git email / name, so commits
+        without a linked GitHub account are kept too.
+        atomic: context manager factory for each chunk's transaction
+        """
+        print(f"  Importing {len(commits_data)} commits...")
+        
+        # Existing rows for this repo in one query
+        existing_shas, existing_urls = set(), set()
+        for sha, url in Commit.objects.filter(repository=repo).values_list('sha', 'url'):
+            existing_shas.add(sha)
+            existing_urls.add(url)
+        
+        pending = []
+        missing_stats = 0
+        for commit_data in commits_data:
+            sha = commit_data.get('sha')
+            if sha in existing_shas or commit_data.get('html_url') in existing_urls:
+                continue
+            if 'stats' not in commit_data:
+                missing_stats += 1
+            existing_shas.add(sha)  # Duplicate SHAs within one import
+            pending.append(commit_data)
+        
+        if missing_stats:
+            print(f"    ⚠ {missing_stats} commits missing stats (imported with zero additions/deletions, queued for backfill)")
+        
+        # GitHub author (committer if no author), plus the git author's email / name
+        authors = resolve_contributors(commit_identity(commit_data) for commit_data in pending)
+        pending = [(commit_data, author) for commit_data, author in zip(pending, authors) if author]
+        works = self._ensure_works(repo, {author.id: author for _, author in pending}.values())
+        
+        commit_count = 0
+        for chunk in self._chunks(pending, self.BULK_BATCH_SIZE):
+            commits = []
+            for commit_data, author in chunk:
+                try:
+                    commits.append(self._build_commit(repo, commit_data, author, works))
+                except Exception as e:
+                    print(f"    Warning: Could not import commit {commit_data.get('sha', 'unknown')[:7]}: {e}")
+            
+            with atomic():
+                # ignore_conflicts: the same SHA may already belong to a fork imported earlier
+                Commit.objects.bulk_create(commits, ignore_conflicts=True)
+                inserted = set(
+                    Commit.objects.filter(repository=repo, sha__in=[c.sha for c in commits]).values_list('sha', flat=True)
                 )
-                
-                if created:
-                    commit.calculate_churn()
-                    commit_count += 1
-                    
-                    # Create activity log
-                    ActivityLog.objects.create(
-                        contributor=contributor,
+                created = [c for c in commits if c.sha in inserted]
+                ActivityLog.objects.bulk_create([
+                    ActivityLog(
+                        contributor=commit.contributor,
                         repository=repo,
                         activity_type='commit',
                         timestamp=commit.committed_at,
-                        metadata={'sha': commit_data['sha'][:7]}
+                        metadata={'sha': commit.sha[:7]}
                     )
-            
-            except Exception as e:
-                print(f"    Warning: Could not import commit {commit_data.get('sha', 'unknown')[:7]}: {e}")
+                    for commit in created
+                ])
+            commit_count += len(created)
         
+        if missing_stats and commit_count:
+            schedule_stats_backfill(repo, self.fetcher.github_token)
         print(f"Imported {commit_count} commits")
+        return commit_count
     
-    def _import_issues(self, repo, issues_data, contributors):
-        """Import issues from GitHub data"""
-        contributor_map = {c.username: c for c in contributors}
-        issue_count = 0
+    def _import_commits_from_mirror(self, repo, full_name, contributors):
+        """
+        Clone / fetch the repository's mirror and ingest its new commits with numstat
+        Commit authors are added to `contributors` so their stats get refreshed.
+        """
+        from api.git_mirror import ingest_from_mirror
+
+        print(f"  Reading commits from the local mirror of {full_name}...")
+        result = ingest_from_mirror(repo, full_name, self.fetcher.github_token)
+        known = {c.id for c in contributors}
+        contributors.extend(c for c in result['contributors'] if c.id not in known)
+        print(f"Imported {result['created']} commits ({result['scanned']} read from the mirror)")
+        return result['created']
+    
+    def import_commits(self, repo, commits_data, atomic=transaction.atomic):
+        """
+        Bulk-import REST-shaped commits into an existing repository (e.g. from a push)
+        Returns the number of new commits
+        """
+        return self._import_commits(repo, commits_data, atomic=atomic)
+    
+    def _build_commit(self, repo, commit_data, contributor, works):
+        """Unsaved Commit with churn and other derived fields filled in"""
+        commit_info = commit_data.get('commit', {})
+        commit_date = (commit_info.get('author') or {}).get('date') or (commit_info.get('committer') or {}).get('date')
+        stats = commit_data.get('stats', {})
+        additions = stats.get('additions', 0)
+        deletions = stats.get('deletions', 0)
+        total = additions + deletions
+        message = commit_info.get('message', 'No message')
         
+        return Commit(
+            work=works[contributor.id],
+            sha=commit_data['sha'],
+            repository=repo,
+            contributor=contributor,
+            url=commit_data['html_url'],
+            raw_data=commit_data,
+            summary=message[:500],
+            message=message,
+            committed_at=self._parse_github_date(commit_date) if commit_date else timezone.now(),
+            additions=additions,
+            deletions=deletions,
+            files_changed=self._files_changed(commit_data),
+            code_churn_ratio=deletions / total if total > 0 else 0.0,
+            stats_complete='stats' in commit_data,
+        )
+    
+    def _import_issues(self, repo, issues_data):
+        """Import issues from GitHub data (bulk, same approach as _import_commits)"""
+        existing_ids, existing_urls = set(), set()
+        for github_issue_id, url in Issue.objects.filter(work__repository=repo).values_list('github_issue_id', 'url'):
+            existing_ids.add(github_issue_id)
+            existing_urls.add(url)
+        
+        pending = []
         for issue_data in issues_data:
-            try:
-                # Get or create contributor
-                creator_login = issue_data.get('user', {}).get('login')
-                if not creator_login:
-                    continue
-                
-                contributor = contributor_map.get(creator_login)
-                if not contributor:
-                    user_data = issue_data.get('user', {})
-                    contributor, _ = Contributor.objects.get_or_create(
-                        username=creator_login,
-                        defaults={
-                            'url': user_data.get('html_url', f'https://github.com/{creator_login}'),
-                            'avatar_url': user_data.get('avatar_url', ''),
-                            'summary': f"{creator_login} contributor",
-                        }
-                    )
-                    contributor_map[creator_login] = contributor
-                
-                # Get or create repository work
-                work, _ = RepositoryWork.objects.get_or_create(
-                    repository=repo,
-                    contributor=contributor,
-                    defaults={
-                        'summary': f"{contributor.username} contributions to {repo.name}",
-                    }
-                )
-                
-                # Determine issue type
-                is_bug = any(label.get('name', '').lower() in ['bug', 'bugfix'] 
-                           for label in issue_data.get('labels', []))
-                is_feature = any(label.get('name', '').lower() in ['feature', 'enhancement'] 
-                               for label in issue_data.get('labels', []))
-                
-                # Create issue
-                issue, created = Issue.objects.get_or_create(
-                    url=issue_data['html_url'],
-                    defaults={
-                        'work': work,
-                        'raw_data': issue_data,
-                        'summary': issue_data.get('title', 'No title')[:500],
-                        'state': issue_data.get('state', 'open'),
-                        'is_bug': is_bug,
-                        'is_feature': is_feature,
-                        'priority': 'medium',  # Default
-                        'created_at': self._parse_github_date(issue_data['created_at']),
-                        'updated_at': self._parse_github_date(issue_data['updated_at']),
-                    }
+            if issue_data.get('id') in existing_ids or issue_data.get('html_url') in existing_urls:
+                continue
+            if not (issue_data.get('user') or {}).get('login'):
+                continue
+            existing_ids.add(issue_data.get('id'))
+            pending.append(issue_data)
+        
+        creators = resolve_contributors(github_user_identity(issue_data['user']) for issue_data in pending)
+        pending = list(zip(pending, creators))
+        works = self._ensure_works(repo, {creator.id: creator for creator in creators}.values())
+        
+        issue_count = 0
+        for chunk in self._chunks(pending, self.BULK_BATCH_SIZE):
+            issues = []
+            for issue_data, contributor in chunk:
+                try:
+                    issues.append((self._build_issue(issue_data, works[contributor.id]), contributor, issue_data))
+                except Exception as e:
+                    print(f"    Warning: Could not import issue #{issue_data.get('number', 'unknown')}: {e}")
+            
+            with transaction.atomic():
+                Issue.objects.bulk_create([issue for issue, _, _ in issues], ignore_conflicts=True)
+                inserted = set(
+                    Issue.objects.filter(
+                        work__repository=repo, github_issue_id__in=[issue.github_issue_id for issue, _, _ in issues]
+                    ).values_list('github_issue_id', flat=True)
                 )
                 
-                if created:
-                    issue_count += 1
-                    
-                    # Create activity logs
-                    ActivityLog.objects.create(
+                # Activity timestamps come from GitHub (Issue.created_at/updated_at are auto_now)
+                activities = []
+                for issue, contributor, issue_data in issues:
+                    if issue.github_issue_id not in inserted:
+                        continue
+                    activities.append(ActivityLog(
                         contributor=contributor,
                         repository=repo,
                         activity_type='issue_created',
-                        timestamp=issue.created_at,
-                        metadata={'number': issue_data['number']}
-                    )
-                    
+                        timestamp=self._parse_github_date(issue_data['created_at']),
+                        metadata={'number': issue.number}
+                    ))
                     if issue.state == 'closed':
-                        ActivityLog.objects.create(
+                        activities.append(ActivityLog(
                             contributor=contributor,
                             repository=repo,
                             activity_type='issue_closed',
-                            timestamp=issue.updated_at,
-                            metadata={'number': issue_data['number']}
-                        )
-            
-            except Exception as e:
-                print(f"    Warning: Could not import issue #{issue_data.get('number', 'unknown')}: {e}")
+                            timestamp=issue.closed_at or self._parse_github_date(issue_data['updated_at']),
+                            metadata={'number': issue.number}
+                        ))
+                    issue_count += 1
+                ActivityLog.objects.bulk_create(activities, batch_size=self.BULK_BATCH_SIZE)
         
         print(f"Imported {issue_count} issues")
+        return issue_count
+    
+    def _build_issue(self, issue_data, work):
+        """Unsaved Issue with bug/feature flags derived from labels"""
+        labels = [label.get('name', '').lower() for label in issue_data.get('labels', [])]
+        return Issue(
+            work=work,
+            url=issue_data['html_url'],
+            raw_data=issue_data,
+            github_issue_id=issue_data['id'],
+            number=issue_data['number'],
+            title=issue_data.get('title', '')[:500],
+            summary=issue_data.get('title', 'No title')[:500],
+            state=issue_data.get('state', 'open'),
+            closed_at=self._parse_github_date(issue_data['closed_at']) if issue_data.get('closed_at') else None,
+            is_bug=any(name in ['bug', 'bugfix'] for name in labels),
+            is_feature=any(name in ['feature', 'enhancement'] for name in labels),
+            priority='medium',  # Default
+        )
     
     def _update_contributor_stats(self, contributors):
         """Update contributor statistics"""
-        for contributor in contributors:
-            contributor.total_commits = contributor.commits.count()
-            contributor.total_issues_closed = Issue.objects.filter(
-                work__contributor=contributor,
-                state='closed'
-            ).count()
-            contributor.last_activity = timezone.now()
-            
-            # Analyze work pattern
-            contributor.analyze_work_pattern()
-            
-            # Calculate score
-            contributor.calculate_score()
-            
-            contributor.save()
-        
+        refresh_contributor_stats(contributors)
         print(f"Updated stats for {len(contributors)} contributors")
     
     def _create_collaborations(self, repo, contributors):
-        """Create collaboration relationships"""
-        # Simple approach: contributors who both work on the same repo collaborate
-        from itertools import combinations
-        
-        collab_count = 0
-        for c1, c2 in combinations(contributors, 2):
-            # Check if both have commits
-            c1_commits = Commit.objects.filter(repository=repo, contributor=c1).count()
-            c2_commits = Commit.objects.filter(repository=repo, contributor=c2).count()
-            
-            if c1_commits > 0 and c2_commits > 0:
-                collab, created = Collaboration.objects.get_or_create(
-                    contributor_1=c1,
-                    contributor_2=c2,
-                    repository=repo,
-                    defaults={
-                        'shared_commits': min(c1_commits, c2_commits),
-                        'code_reviews': 0,
-                        'issue_discussions': 0,
-                    }
-                )
-                
-                if created:
-                    collab.calculate_strength()
-                    collab_count += 1
-        
-        print(f"Created {collab_count} collaborations")
+        """Create collaboration relationships (contributors who both commit to the same repo)"""
+        counts = build_collaborations(repo, contributors)
+        print(f"Created {counts['created']} collaborations, updated {counts['updated']}")
+    
+    @staticmethod
+    def _files_changed(commit_data):
+        """Changed-file count from a REST (files list) or GraphQL (files_changed count) commit"""
+        if 'files_changed' in commit_data:
+            return commit_data['files_changed']
+        return len(commit_data.get('files', []))
     
     def _parse_github_date(self, date_string):
         """Parse GitHub date string to Django datetime"""
@@ -318,6 +378,6 @@ class GitHubImporter:
         try:
             # GitHub uses ISO format: 2021-01-01T00:00:00Z
             dt = datetime.strptime(date_string, '%Y-%m-%dT%H:%M:%SZ')
-            return timezone.make_aware(dt, timezone.utc)
+            return timezone.make_aware(dt, dt_timezone.utc)
         except:
             return timezone.now()
@@ -2,24 +2,74 @@
 GitHub Auto-Sync System - Enterprise Grade
 Vercel-like automatic repository syncing with webhook processing and background jobs
 """
+import contextvars
 import hmac
 import hashlib
 import json
 import logging
-from datetime import datetime, timedelta
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime
 from typing import Optional, Dict, List
 from django.conf import settings
-from django.core.cache import cache
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import F
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from .models import (
-    GitHubAppInstallation, Repository, Contributor, 
-    RepositoryWork, Commit, Issue, SyncJob
+    GitHubAppInstallation, Repository,
+    RepositoryWork, Commit, Issue, SyncJob, RepositorySyncCursor, WebhookDelivery
 )
+from .contributor_stats import add_commits
 from .github_app import GitHubAppClient
+from .github_graphql import GitHubGraphQLClient
+from .github_importer import GitHubImporter
+from .github_http import CachedSession, cache_stats, prune_cache
+from .github_tokens import get_installation_token, invalidate_installation_token
+from .identity import commit_identity, github_user_identity, resolve_contributor, resolve_contributors
+from .jobs import report_progress, schedule_health_score, schedule_stats_backfill
+from .sync_lock import RepositoryBusy, repository_sync
+from .sync_schedule import SCHEDULE_FIELDS, due_repositories, schedule_next_sync
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
+# Push webhooks list at most this many commits; bigger pushes need the compare API
+PUSH_PAYLOAD_COMMIT_LIMIT = 2048
+NULL_SHA = '0' * 40
+
+
+@contextmanager
+def apply_transaction(event_type: str):
+    """
+    Write phase of a webhook event: one short transaction, timed per event type
+    Network calls go before it (fetch) or after it (webhook setup), never inside.
+    """
+    with metrics.timer('webhooks.transaction_seconds', event=event_type), transaction.atomic():
+        yield
+
+
+def push_commit_to_rest(commit: Dict) -> Dict:
+    """
+    Convert a push-payload commit into the REST commit shape (no additions/deletions -
+    the payload doesn't carry them)
+    """
+    author = commit.get('author') or {}
+    # Only a GitHub username is a login; the git name / email identify the rest
+    login = author.get('username')
+    return {
+        'sha': commit['id'],
+        'html_url': commit['url'],
+        'commit': {
+            'message': commit.get('message', ''),
+            'author': {'name': author.get('name'), 'email': author.get('email'), 'date': commit.get('timestamp')},
+        },
+        'author': {'login': login, 'html_url': f'https://github.com/{login}', 'avatar_url': ''} if login else None,
+        'files_changed': sum(len(commit.get(key) or []) for key in ('added', 'removed', 'modified')),
+    }
+
 
 class GitHubSyncManager:
     """
@@ -27,34 +77,39 @@ class GitHubSyncManager:
     Handles: auto-import, webhooks, background jobs, token caching
     """
     
-    def __init__(self, installation_id: int):
+    def __init__(self, installation_id: int, commit_mode: Optional[str] = None):
         self.installation_id = installation_id
         self.client = GitHubAppClient()
+        # Installation tokens rotate hourly; the rate-limit budget belongs to the installation
+        self.session = CachedSession(rate_limit_key=f'installation:{installation_id}')
+        # 'graphql' fetches new commits with stats in 100-commit pages, 'rest' uses the commits list
+        self.commit_mode = commit_mode or settings.GITHUB_COMMIT_FETCH_MODE
         
     def _get_cached_token(self) -> Optional[str]:
-        """Get cached installation token (tokens last 1 hour)"""
-        cache_key = f'gh_token_{self.installation_id}'
-        token = cache.get(cache_key)
-        
-        if not token:
-            # Generate new token and cache for 50 minutes (token lasts 60)
-            token = self.client.get_installation_token(self.installation_id)
-            cache.set(cache_key, token, timeout=3000)  # 50 minutes
-            logger.info(f"Generated new token for installation {self.installation_id}")
-        
-        return token
+        """Installation token from the shared token service (tokens last 1 hour)"""
+        return get_installation_token(self.installation_id)
     
-    def _invalidate_token_cache(self):
-        """Invalidate cached token (e.g., on 401 errors)"""
-        cache_key = f'gh_token_{self.installation_id}'
-        cache.delete(cache_key)
-        logger.warning(f"Invalidated token cache for installation {self.installation_id}")
+    def _invalidate_token_cache(self, token: Optional[str] = None):
+        """Invalidate the shared token (e.g., on 401 errors)"""
+        invalidate_installation_token(self.installation_id, token)
     
     def _make_api_request(self, url: str, method: str = 'GET', data: Dict = None, retry: bool = True):
         """
         Make GitHub API request with automatic token refresh on 401
         Implements retry logic for transient failures
         """
+        return self._api_response(url, method, data, retry=retry).json()
+    
+    def _iter_api_pages(self, url: str, params: Optional[Dict] = None):
+        """Yield each page of a list endpoint, following the Link header's `next` URL"""
+        while url:
+            response = self._api_response(url, params=params)
+            yield response.json()
+            url = response.links.get('next', {}).get('url')
+            params = None  # `next` already carries the query string
+    
+    def _api_response(self, url: str, method: str = 'GET', data: Dict = None, retry: bool = True, params: Optional[Dict] = None):
+        """Raw response for _make_api_request / _iter_api_pages"""
         import requests
         
         token = self._get_cached_token()
@@ -66,27 +121,27 @@ class GitHubSyncManager:
         
         try:
             if method == 'GET':
-                response = requests.get(url, headers=headers, timeout=30)
+                # Conditional GET - unchanged pages come back as free 304s
+                response = self.session.get(url, params=params, headers=headers, timeout=30)
             elif method == 'POST':
-                response = requests.post(url, json=data, headers=headers, timeout=30)
+                response = self.session.post(url, json=data, headers=headers, timeout=30)
             elif method == 'PATCH':
-                response = requests.patch(url, json=data, headers=headers, timeout=30)
+                response = self.session.patch(url, json=data, headers=headers, timeout=30)
             
             # Handle token expiration
             if response.status_code == 401 and retry:
                 logger.warning("Token expired, refreshing...")
-                self._invalidate_token_cache()
-                return self._make_api_request(url, method, data, retry=False)
+                self._invalidate_token_cache(token)
+                return self._api_response(url, method, data, retry=False, params=params)
             
             response.raise_for_status()
-            return response.json()
+            return response
             
         except requests.exceptions.RequestException as e:
             logger.error(f"API request failed: {url} - {str(e)}")
             raise
     
-    @transaction.atomic
-    def auto_import_all_repositories(self, installation: GitHubAppInstallation) -> Dict:
+    def auto_import_all_repositories(self, installation: GitHubAppInstallation, event_type: str = 'auto_import') -> Dict:
         """
         Automatically import all repositories when app is installed
         This runs on initial installation
@@ -94,30 +149,22 @@ class GitHubSyncManager:
         logger.info(f"Auto-importing repositories for installation {installation.installation_id}")
         
         try:
-            # Fetch all repos from GitHub
+            # Fetch all repos from GitHub (outside any transaction)
             repos = self.client.get_installation_repositories(installation.installation_id)
             
-            imported = []
-            skipped = []
-            errors = []
+            # Only the ones not imported yet
+            known = set(Repository.objects.filter(
+                github_id__in=[repo['id'] for repo in repos]
+            ).values_list('github_id', flat=True))
+            skipped = [repo['full_name'] for repo in repos if repo['id'] in known]
             
-            for repo in repos:
-                try:
-                    # Check if already imported
-                    if Repository.objects.filter(github_id=repo['id']).exists():
-                        skipped.append(repo['full_name'])
-                        continue
-                    
-                    # Import repository with idempotency
-                    repo_obj = self._import_repository_idempotent(repo, installation)
-                    imported.append(repo['full_name'])
-                    
-                    # Setup webhook (idempotent)
-                    self._setup_webhook_idempotent(repo['full_name'])
-                    
-                except Exception as e:
-                    logger.error(f"Failed to import {repo['full_name']}: {str(e)}")
-                    errors.append({'repo': repo['full_name'], 'error': str(e)})
+            imported, errors = self._import_repositories(
+                [repo for repo in repos if repo['id'] not in known], installation, event_type
+            )
+            
+            # Setup webhooks (idempotent) once the rows are committed
+            for full_name in imported:
+                self._setup_webhook_idempotent(full_name)
             
             # Record sync job
             SyncJob.objects.create(
@@ -155,6 +202,37 @@ class GitHubSyncManager:
             )
             raise
     
+    def _import_repositories(self, repos_data: List[Dict], installation: GitHubAppInstallation,
+                             event_type: str) -> tuple:
+        """
+        Create Repository rows in short transactions of WEBHOOK_APPLY_BATCH_SIZE
+        Returns (imported full names, errors)
+        """
+        imported = []
+        errors = []
+        batch_size = settings.WEBHOOK_APPLY_BATCH_SIZE
+        for i in range(0, len(repos_data), batch_size):
+            chunk = repos_data[i:i + batch_size]
+            try:
+                with apply_transaction(event_type):
+                    for repo_data in chunk:
+                        self._import_repository_idempotent(repo_data, installation)
+                imported.extend(repo_data['full_name'] for repo_data in chunk)
+                continue
+            except Exception as e:
+                logger.warning(f"Repository chunk failed ({str(e)}), retrying one by one")
+            
+            # One bad row shouldn't drop the rest of its chunk
+            for repo_data in chunk:
+                try:
+                    with apply_transaction(event_type):
+                        self._import_repository_idempotent(repo_data, installation)
+                    imported.append(repo_data['full_name'])
+                except Exception as e:
+                    logger.error(f"Failed to import {repo_data['full_name']}: {str(e)}")
+                    errors.append({'repo': repo_data['full_name'], 'error': str(e)})
+        return imported, errors
+    
     def _import_repository_idempotent(self, repo_data: Dict, installation: GitHubAppInstallation) -> Repository:
         """
         Import repository with idempotent operations
@@ -189,28 +267,19 @@ class GitHubSyncManager:
         Setup webhook for repository (idempotent)
         Safe to call multiple times - won't create duplicate webhooks
         """
+        import requests
+        
         try:
-            token = self._get_cached_token()
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Accept': 'application/vnd.github+json',
-                'X-GitHub-Api-Version': '2022-11-28'
-            }
-            
-            # Check if webhook already exists
-            import requests
-            hooks_url = f'https://api.github.com/repos/{repo_full_name}/hooks'
-            response = requests.get(hooks_url, headers=headers)
-            
-            if response.status_code == 200:
-                existing_hooks = response.json()
-                webhook_url = settings.GITHUB_WEBHOOK_URL
-                
-                # Check if our webhook already exists
-                for hook in existing_hooks:
-                    if hook.get('config', {}).get('url') == webhook_url:
-                        logger.info(f"Webhook already exists for {repo_full_name}")
-                        return {'status': 'exists', 'id': hook['id']}
+            # Check if our webhook already exists (conditional GETs, within the installation's budget)
+            webhook_url = settings.GITHUB_WEBHOOK_URL
+            try:
+                for existing_hooks in self._iter_api_pages(f'https://api.github.com/repos/{repo_full_name}/hooks'):
+                    for hook in existing_hooks:
+                        if hook.get('config', {}).get('url') == webhook_url:
+                            logger.info(f"Webhook already exists for {repo_full_name}")
+                            return {'status': 'exists', 'id': hook['id']}
+            except requests.exceptions.HTTPError as e:
+                logger.warning(f"Could not list webhooks of {repo_full_name}: {e}")
             
             # Create new webhook
             webhook = self.client.create_webhook(self.installation_id, repo_full_name)
@@ -225,8 +294,13 @@ class GitHubSyncManager:
     def sync_repository_data(self, repository: Repository) -> Dict:
         """
         Sync repository data (commits, issues, contributors)
-        This is called periodically or on-demand
+        This is called periodically or on-demand, under the repository's sync lock
+        (raises RepositoryBusy if another sync holds it)
         """
+        with repository_sync(repository.id):
+            return self._sync_repository_data(repository)
+    
+    def _sync_repository_data(self, repository: Repository) -> Dict:
         logger.info(f"Syncing repository: {repository.full_name}")
         
         try:
@@ -236,8 +310,14 @@ class GitHubSyncManager:
                 'contributors': self._sync_contributors(repository)
             }
             
+            changes = (
+                results['commits'].get('new_commits', 0)
+                + results['issues'].get('new_issues', 0)
+                + results['issues'].get('updated_issues', 0)
+            )
             repository.last_synced_at = timezone.now()
-            repository.save(update_fields=['last_synced_at'])
+            results['next_sync_in'] = schedule_next_sync(repository, changes=changes)
+            repository.save(update_fields=['last_synced_at', *SCHEDULE_FIELDS])
             
             return results
             
@@ -245,31 +325,145 @@ class GitHubSyncManager:
             logger.error(f"Sync failed for {repository.full_name}: {str(e)}")
             raise
     
+    def _get_sync_cursor(self, repository: Repository) -> RepositorySyncCursor:
+        cursor, created = RepositorySyncCursor.objects.get_or_create(repository=repository)
+        if created:
+            # Repositories synced before cursors existed: resume from the newest stored commit
+            latest_commit = Commit.objects.filter(
+                work__repository=repository
+            ).order_by('-committed_at').first()
+            if latest_commit:
+                cursor.last_commit_sha = latest_commit.sha
+                cursor.last_commit_date = latest_commit.committed_at
+                cursor.save(update_fields=['last_commit_sha', 'last_commit_date', 'updated_at'])
+        return cursor
+    
+    @staticmethod
+    def _commit_date(commit_data: Dict) -> Optional[datetime]:
+        """Committer date (what GitHub's `since` filters on), falling back to author date"""
+        commit_info = commit_data.get('commit', {})
+        date = (commit_info.get('committer') or {}).get('date') or (commit_info.get('author') or {}).get('date')
+        return parse_datetime(date) if date else None
+    
+    def _advance_commit_cursor(self, cursor: RepositorySyncCursor, newest: Optional[Dict]):
+        if newest:
+            cursor.last_commit_sha = newest['sha']
+            cursor.last_commit_date = self._commit_date(newest) or cursor.last_commit_date
+            cursor.save(update_fields=['last_commit_sha', 'last_commit_date', 'updated_at'])
+    
     def _sync_commits(self, repository: Repository) -> Dict:
-        """Sync commits for a repository"""
-        # Get latest commit SHA we have
-        latest_commit = Commit.objects.filter(
-            work__repository=repository
-        ).order_by('-committed_at').first()
+        """
+        Sync commits newer than the repository's cursor
+        Pages (newest first) until the cursor SHA shows up, so API calls scale
+        with the number of new commits, not with history size
+        """
+        cursor = self._get_sync_cursor(repository)
         
-        since = latest_commit.committed_at if latest_commit else None
+        if self.commit_mode == 'graphql':
+            return self._sync_commits_graphql(repository, cursor)
+        if self.commit_mode == 'mirror':
+            return self._sync_commits_mirror(repository)
         
-        # Fetch new commits from GitHub
         url = f'https://api.github.com/repos/{repository.full_name}/commits'
         params = {'per_page': 100}
-        if since:
-            params['since'] = since.isoformat()
+        if cursor.last_commit_date:
+            params['since'] = cursor.last_commit_date.isoformat()
         
-        commits_data = self._make_api_request(f"{url}?{'&'.join(f'{k}={v}' for k, v in params.items())}")
+        new_commits = 0
+        total_fetched = 0
+        pages = 0
+        newest = None
+        reached_cursor = False
+        for page in self._iter_api_pages(url, params):
+            pages += 1
+            known = set(Commit.objects.filter(sha__in=[c['sha'] for c in page]).values_list('sha', flat=True))
+            for commit_data in page:
+                if commit_data['sha'] == cursor.last_commit_sha:
+                    reached_cursor = True
+                    break
+                newest = newest or commit_data
+                total_fetched += 1
+                # Import commit (idempotent)
+                if commit_data['sha'] not in known and self._import_commit_idempotent(commit_data, repository):
+                    new_commits += 1
+            
+            # A page with nothing new means we're past the cursor (e.g. it was force-pushed away)
+            if reached_cursor or (page and all(c['sha'] in known for c in page)):
+                break
+        
+        self._advance_commit_cursor(cursor, newest)
+        if new_commits:
+            # The commits list carries no stats
+            schedule_stats_backfill(repository)
+        return {'new_commits': new_commits, 'total_fetched': total_fetched, 'pages': pages}
+    
+    def _sync_commits_graphql(self, repository: Repository, cursor: RepositorySyncCursor) -> Dict:
+        """Sync commits via GraphQL history pages (stats included, no per-commit calls)"""
+        owner, name = repository.full_name.split('/', 1)
+        client = GitHubGraphQLClient(self._get_cached_token(), session=self.session)
         
         new_commits = 0
-        for commit_data in commits_data:
-            # Import commit (idempotent)
-            created = self._import_commit_idempotent(commit_data, repository)
-            if created:
+        total_fetched = 0
+        newest = None
+        for commit_data in client.iter_commit_history(owner, name, since=cursor.last_commit_date):
+            if commit_data['sha'] == cursor.last_commit_sha:
+                break  # Stops the generator - no further pages are requested
+            newest = newest or commit_data
+            total_fetched += 1
+            if self._import_commit_idempotent(commit_data, repository):
                 new_commits += 1
         
-        return {'new_commits': new_commits, 'total_fetched': len(commits_data)}
+        self._advance_commit_cursor(cursor, newest)
+        return {'new_commits': new_commits, 'total_fetched': total_fetched}
+    
+    def _sync_commits_mirror(self, repository: Repository) -> Dict:
+        """Sync commits with one `git fetch` of the repository's local mirror (stats read locally)"""
+        from .git_mirror import ingest_from_mirror
+
+        result = ingest_from_mirror(repository, repository.full_name, self._get_cached_token())
+        if result['created']:
+            add_commits(result['commit_counts'])
+        return {'new_commits': result['created'], 'total_fetched': result['scanned']}
+    
+    def import_push(self, repository: Repository, payload: Dict) -> Dict:
+        """
+        Import the commits of a push event
+        SHAs, messages and authors come from the payload; additions/deletions for all
+        of them from one batched GraphQL lookup; rows go in with one bulk insert
+        """
+        commits = {c['id']: push_commit_to_rest(c) for c in payload.get('commits', [])}
+        
+        before, after = payload.get('before'), payload.get('after')
+        if len(commits) >= PUSH_PAYLOAD_COMMIT_LIMIT and before and before != NULL_SHA:
+            # Truncated payload: list the whole range with the compare API
+            compare_url = f"https://api.github.com/repos/{repository.full_name}/compare/{before}...{after}"
+            for page in self._iter_api_pages(compare_url, params={'per_page': 100}):
+                for commit_data in page.get('commits', []):
+                    commits.setdefault(commit_data['sha'], commit_data)
+        
+        # Only commits we don't have yet need stats
+        known = set(Commit.objects.filter(sha__in=list(commits)).values_list('sha', flat=True))
+        missing = [sha for sha in commits if sha not in known]
+        if not missing:
+            return {'new_commits': 0, 'pushed': len(commits)}
+        
+        owner, name = repository.full_name.split('/', 1)
+        client = GitHubGraphQLClient(self._get_cached_token(), session=self.session)
+        with_stats = client.fetch_commits(owner, name, missing)
+        
+        batch = []
+        for sha in missing:
+            commit = with_stats.get(sha, commits[sha])
+            # GraphQL has no login for emails not linked to an account; keep the payload's author
+            if not commit.get('author') and not commit.get('committer'):
+                commit['author'] = commits[sha].get('author')
+            batch.append(commit)
+        
+        # Everything above was fetch; only the chunked inserts run in transactions
+        new_commits = GitHubImporter(concurrent=False).import_commits(
+            repository, batch, atomic=lambda: apply_transaction('push')
+        )
+        return {'new_commits': new_commits, 'pushed': len(commits)}
     
     def _import_commit_idempotent(self, commit_data: Dict, repository: Repository) -> bool:
         """Import single commit (idempotent)"""
@@ -279,12 +473,10 @@ class GitHubSyncManager:
         if Commit.objects.filter(sha=sha).exists():
             return False
         
-        # Get or create contributor
-        author_data = commit_data['commit']['author']
-        contributor, _ = Contributor.objects.get_or_create(
-            username=author_data['name'],
-            defaults={'avatar_url': commit_data.get('author', {}).get('avatar_url', '')}
-        )
+        # Canonical contributor for the GitHub user / git author
+        contributor = resolve_contributor(**commit_identity(commit_data))
+        if contributor is None:
+            return False
         
         # Get or create RepositoryWork
         work, _ = RepositoryWork.objects.get_or_create(
@@ -294,35 +486,74 @@ class GitHubSyncManager:
         )
         
         # Create commit
-        Commit.objects.create(
+        stats = commit_data.get('stats', {})
+        if 'files_changed' in commit_data:
+            files_changed = commit_data['files_changed']
+        else:
+            files_changed = len(commit_data.get('files', []))
+        
+        commit = Commit(
             work=work,
+            repository=repository,
+            contributor=contributor,
             sha=sha,
+            url=commit_data.get('html_url', ''),
+            raw_data=commit_data,
+            summary=commit_data['commit']['message'][:500],
             message=commit_data['commit']['message'],
             committed_at=commit_data['commit']['author']['date'],
-            additions=commit_data['stats'].get('additions', 0) if 'stats' in commit_data else 0,
-            deletions=commit_data['stats'].get('deletions', 0) if 'stats' in commit_data else 0
+            additions=stats.get('additions', 0),
+            deletions=stats.get('deletions', 0),
+            files_changed=files_changed,
+            stats_complete='stats' in commit_data,
         )
+        commit.calculate_churn()
         
         return True
     
     def _sync_issues(self, repository: Repository) -> Dict:
-        """Sync issues for a repository"""
+        """
+        Sync issues updated since the repository's cursor
+        New issues are imported; already-known ones get their state refreshed
+        """
+        cursor = self._get_sync_cursor(repository)
         url = f'https://api.github.com/repos/{repository.full_name}/issues'
-        params = {'state': 'all', 'per_page': 100}
-        
-        issues_data = self._make_api_request(f"{url}?{'&'.join(f'{k}={v}' for k, v in params.items())}")
+        params = {'state': 'all', 'sort': 'updated', 'direction': 'asc', 'per_page': 100}
+        if cursor.issues_since:
+            params['since'] = cursor.issues_since.isoformat()
         
         new_issues = 0
-        for issue_data in issues_data:
-            # Skip pull requests (they appear as issues in GitHub API)
-            if 'pull_request' in issue_data:
-                continue
-            
-            created = self._import_issue_idempotent(issue_data, repository)
-            if created:
-                new_issues += 1
+        updated_issues = 0
+        total_fetched = 0
+        issues_since = cursor.issues_since
+        for page in self._iter_api_pages(url, params):
+            for issue_data in page:
+                total_fetched += 1
+                updated_at = parse_datetime(issue_data['updated_at'])
+                if not issues_since or updated_at > issues_since:
+                    issues_since = updated_at
+                
+                # Skip pull requests (they appear as issues in GitHub API)
+                if 'pull_request' in issue_data:
+                    continue
+                
+                # `since` is inclusive: issues at the cursor come back and are re-applied,
+                # one updated later in that same second may not have been seen yet
+                if self._import_issue_idempotent(issue_data, repository):
+                    new_issues += 1
+                else:
+                    # Only rows that really change count (they drive the adaptive sync interval)
+                    state, title = issue_data['state'], issue_data['title']
+                    closed_at = parse_datetime(issue_data['closed_at']) if issue_data.get('closed_at') else None
+                    updated_issues += Issue.objects.filter(github_issue_id=issue_data['id']).exclude(
+                        state=state, title=title, closed_at=closed_at,
+                    ).update(state=state, title=title, closed_at=closed_at)
+        
+        if issues_since != cursor.issues_since:
+            cursor.issues_since = issues_since
+            cursor.save(update_fields=['issues_since', 'updated_at'])
         
-        return {'new_issues': new_issues, 'total_fetched': len(issues_data)}
+        return {'new_issues': new_issues, 'updated_issues': updated_issues, 'total_fetched': total_fetched}
     
     def _import_issue_idempotent(self, issue_data: Dict, repository: Repository) -> bool:
         """Import single issue (idempotent)"""
@@ -332,12 +563,8 @@ class GitHubSyncManager:
         if Issue.objects.filter(github_issue_id=github_issue_id).exists():
             return False
         
-        # Get or create contributor
-        user_data = issue_data['user']
-        contributor, _ = Contributor.objects.get_or_create(
-            username=user_data['login'],
-            defaults={'avatar_url': user_data['avatar_url']}
-        )
+        # Canonical contributor for the issue author
+        contributor = resolve_contributor(**github_user_identity(issue_data['user']))
         
         # Get or create RepositoryWork
         work, _ = RepositoryWork.objects.get_or_create(
@@ -350,6 +577,9 @@ class GitHubSyncManager:
         Issue.objects.create(
             work=work,
             github_issue_id=github_issue_id,
+            url=issue_data.get('html_url', ''),
+            raw_data=issue_data,
+            summary=issue_data['title'][:500],
             title=issue_data['title'],
             body=issue_data.get('body', ''),
             state=issue_data['state'],
@@ -367,12 +597,8 @@ class GitHubSyncManager:
         contributors_data = self._make_api_request(url)
         
         synced = 0
-        for contrib_data in contributors_data:
-            contributor, created = Contributor.objects.get_or_create(
-                username=contrib_data['login'],
-                defaults={'avatar_url': contrib_data['avatar_url']}
-            )
-            
+        contributors = resolve_contributors(github_user_identity(c) for c in contributors_data)
+        for contributor in contributors:
             # Ensure RepositoryWork exists
             RepositoryWork.objects.get_or_create(
                 repository=repository,
@@ -390,6 +616,8 @@ class WebhookProcessor:
     Handles all webhook event types with idempotent operations
     """
     
+    REPOSITORY_SYNC_EVENTS = ('push', 'issues')
+    
     @staticmethod
     def verify_signature(payload_body: bytes, signature: str) -> bool:
         """Verify GitHub webhook signature"""
@@ -403,7 +631,76 @@ class WebhookProcessor:
         return hmac.compare_digest(expected_signature, signature)
     
     @staticmethod
-    @transaction.atomic
+    def process_event(event_type: str, payload: Dict) -> Dict:
+        """Route one event to its processor (all processors are idempotent)"""
+        processors = {
+            'installation': WebhookProcessor.process_installation_event,
+            'installation_repositories': WebhookProcessor.process_installation_repositories_event,
+            'repository': WebhookProcessor.process_repository_event,
+            'push': WebhookProcessor.process_push_event,
+            'pull_request': WebhookProcessor.process_pull_request_event,
+            'issues': WebhookProcessor.process_issues_event,
+        }
+        processor = processors.get(event_type)
+        if processor is None:
+            logger.info(f"Unhandled event type: {event_type}")
+            return {'status': 'ignored', 'event': event_type}
+        
+        # Events that write commits / issues of a stored repository wait for its sync lock
+        repository_id = None
+        if event_type in WebhookProcessor.REPOSITORY_SYNC_EVENTS:
+            repository_id = Repository.objects.filter(
+                github_id=(payload.get('repository') or {}).get('id')
+            ).values_list('id', flat=True).first()
+        if repository_id is None:
+            return processor(payload)
+        with repository_sync(repository_id):
+            return processor(payload)
+    
+    @staticmethod
+    def process_delivery(delivery: WebhookDelivery) -> Dict:
+        """
+        Process a stored delivery from the inbox
+        Raises on failure so the job queue retries it (at-least-once)
+        """
+        if delivery.status == 'processed':
+            return {'status': 'already_processed'}
+        
+        WebhookDelivery.objects.filter(id=delivery.id).update(
+            status='processing', attempts=F('attempts') + 1
+        )
+        try:
+            result = WebhookProcessor.process_event(delivery.event_type, delivery.payload)
+        except RepositoryBusy:
+            # Not a failure: the job queue hands it back once the repository's sync is done
+            WebhookDelivery.objects.filter(id=delivery.id).update(status='pending', attempts=F('attempts') - 1)
+            raise
+        except Exception as e:
+            WebhookDelivery.objects.filter(id=delivery.id).update(status='failed', error_message=str(e))
+            raise
+        
+        WebhookDelivery.objects.filter(id=delivery.id).update(
+            status='processed', result=result, error_message=None, processed_at=timezone.now()
+        )
+        return result
+    
+    # Event processors: fetch (GitHub API calls) outside any transaction, compute,
+    # then apply in short apply_transaction() blocks - a slow API call never holds
+    # row locks or a connection in a transaction
+    
+    @staticmethod
+    def _delete_repositories(repository_ids: List[int], event_type: str) -> int:
+        """Delete repositories one transaction each (every delete cascades to commits, issues, ...)"""
+        deleted = 0
+        for repository_id in repository_ids:
+            with apply_transaction(event_type):
+                repository = Repository.objects.filter(id=repository_id).first()
+                if repository:
+                    repository.delete()
+                    deleted += 1
+        return deleted
+    
+    @staticmethod
     def process_installation_event(payload: Dict) -> Dict:
         """
         Handle installation events (created, deleted, suspend, unsuspend)
@@ -416,19 +713,20 @@ class WebhookProcessor:
             # New installation - auto-import all repositories
             logger.info(f"Processing new installation: {installation_id}")
             
-            installation, created = GitHubAppInstallation.objects.get_or_create(
-                installation_id=installation_id,
-                defaults={
-                    'account_login': installation_data['account']['login'],
-                    'account_type': installation_data['account']['type'],
-                    'account_avatar_url': installation_data['account']['avatar_url'],
-                    'target_type': installation_data.get('target_type', 'User')
-                }
-            )
+            with apply_transaction('installation'):
+                installation, created = GitHubAppInstallation.objects.get_or_create(
+                    installation_id=installation_id,
+                    defaults={
+                        'account_login': installation_data['account']['login'],
+                        'account_type': installation_data['account']['type'],
+                        'account_avatar_url': installation_data['account']['avatar_url'],
+                        'target_type': installation_data.get('target_type', 'User')
+                    }
+                )
             
-            # Trigger auto-import in background
+            # Listing, chunked inserts and webhook setup (see auto_import_all_repositories)
             sync_manager = GitHubSyncManager(installation_id)
-            result = sync_manager.auto_import_all_repositories(installation)
+            result = sync_manager.auto_import_all_repositories(installation, event_type='installation')
             
             return {'status': 'imported', 'result': result}
         
@@ -443,9 +741,10 @@ class WebhookProcessor:
             if installation:
                 # Optionally: keep repos but mark as disconnected, or delete them
                 # For now, we'll delete associated repositories
-                repos_deleted = Repository.objects.filter(installation=installation).count()
-                Repository.objects.filter(installation=installation).delete()
-                installation.delete()
+                repository_ids = list(Repository.objects.filter(installation=installation).values_list('id', flat=True))
+                repos_deleted = WebhookProcessor._delete_repositories(repository_ids, 'installation')
+                with apply_transaction('installation'):
+                    installation.delete()
                 
                 return {'status': 'deleted', 'repos_removed': repos_deleted}
             
@@ -458,7 +757,6 @@ class WebhookProcessor:
         return {'status': 'ignored', 'action': action}
     
     @staticmethod
-    @transaction.atomic
     def process_installation_repositories_event(payload: Dict) -> Dict:
         """
         Handle repository add/remove from installation
@@ -479,44 +777,34 @@ class WebhookProcessor:
         if action == 'added':
             # New repositories added to installation
             repos_added = payload.get('repositories_added', [])
-            imported = []
             
+            # Fetch full repo details
+            fetched = []
             for repo_data in repos_added:
                 try:
-                    # Fetch full repo details
                     url = f"https://api.github.com/repositories/{repo_data['id']}"
-                    full_repo_data = sync_manager._make_api_request(url)
-                    
-                    # Import repository
-                    repo = sync_manager._import_repository_idempotent(full_repo_data, installation)
-                    sync_manager._setup_webhook_idempotent(repo.full_name)
-                    imported.append(repo.full_name)
-                    
+                    fetched.append(sync_manager._make_api_request(url))
                 except Exception as e:
                     logger.error(f"Failed to import {repo_data['full_name']}: {str(e)}")
             
+            # Import repositories, then set up their webhooks
+            imported, _ = sync_manager._import_repositories(fetched, installation, 'installation_repositories')
+            for full_name in imported:
+                sync_manager._setup_webhook_idempotent(full_name)
+            
             return {'status': 'added', 'imported': imported}
         
         elif action == 'removed':
             # Repositories removed from installation
-            repos_removed = payload.get('repositories_removed', [])
-            removed = []
-            
-            for repo_data in repos_removed:
-                try:
-                    repo = Repository.objects.get(github_id=repo_data['id'])
-                    repo_name = repo.full_name
-                    repo.delete()
-                    removed.append(repo_name)
-                except Repository.DoesNotExist:
-                    pass
+            removed_ids = [repo_data['id'] for repo_data in payload.get('repositories_removed', [])]
+            repositories = list(Repository.objects.filter(github_id__in=removed_ids).values_list('id', 'full_name'))
+            WebhookProcessor._delete_repositories([repo_id for repo_id, _ in repositories], 'installation_repositories')
             
-            return {'status': 'removed', 'removed': removed}
+            return {'status': 'removed', 'removed': [full_name for _, full_name in repositories]}
         
         return {'status': 'ignored', 'action': action}
     
     @staticmethod
-    @transaction.atomic
     def process_repository_event(payload: Dict) -> Dict:
         """
         Handle repository events (created, deleted, renamed, etc.)
@@ -539,7 +827,8 @@ class WebhookProcessor:
                 )
                 
                 sync_manager = GitHubSyncManager(installation_id)
-                repo = sync_manager._import_repository_idempotent(repo_data, installation)
+                with apply_transaction('repository'):
+                    repo = sync_manager._import_repository_idempotent(repo_data, installation)
                 sync_manager._setup_webhook_idempotent(repo.full_name)
                 
                 return {'status': 'imported', 'repository': repo.full_name}
@@ -551,23 +840,22 @@ class WebhookProcessor:
             # Repository deleted - remove from database
             logger.info(f"Repository deleted: {repo_data['full_name']}")
             
-            try:
-                repo = Repository.objects.get(github_id=repo_data['id'])
-                repo.delete()
-                return {'status': 'deleted', 'repository': repo_data['full_name']}
-            except Repository.DoesNotExist:
+            repository_ids = list(Repository.objects.filter(github_id=repo_data['id']).values_list('id', flat=True))
+            if not WebhookProcessor._delete_repositories(repository_ids, 'repository'):
                 return {'status': 'not_found'}
+            return {'status': 'deleted', 'repository': repo_data['full_name']}
         
         elif action == 'renamed':
             # Repository renamed - update name
             logger.info(f"Repository renamed: {repo_data['full_name']}")
             
             try:
-                repo = Repository.objects.get(github_id=repo_data['id'])
-                repo.name = repo_data['name']
-                repo.full_name = repo_data['full_name']
-                repo.url = repo_data['html_url']
-                repo.save(update_fields=['name', 'full_name', 'url'])
+                with apply_transaction('repository'):
+                    repo = Repository.objects.get(github_id=repo_data['id'])
+                    repo.name = repo_data['name']
+                    repo.full_name = repo_data['full_name']
+                    repo.url = repo_data['html_url']
+                    repo.save(update_fields=['name', 'full_name', 'url'])
                 return {'status': 'renamed', 'repository': repo.full_name}
             except Repository.DoesNotExist:
                 return {'status': 'not_found'}
@@ -575,11 +863,9 @@ class WebhookProcessor:
         return {'status': 'ignored', 'action': action}
     
     @staticmethod
-    @transaction.atomic
     def process_push_event(payload: Dict) -> Dict:
-        """Handle push events (new commits)"""
+        """Handle push events (new commits) - batched, see GitHubSyncManager.import_push"""
         repo_data = payload['repository']
-        commits = payload.get('commits', [])
         
         try:
             repo = Repository.objects.get(github_id=repo_data['id'])
@@ -591,20 +877,14 @@ class WebhookProcessor:
             return {'status': 'no_installation'}
         
         sync_manager = GitHubSyncManager(installation_id)
+        result = sync_manager.import_push(repo, payload)
         
-        new_commits = 0
-        for commit_data in commits:
-            # Fetch full commit details
-            url = f"https://api.github.com/repos/{repo.full_name}/commits/{commit_data['id']}"
-            full_commit = sync_manager._make_api_request(url)
-            created = sync_manager._import_commit_idempotent(full_commit, repo)
-            if created:
-                new_commits += 1
+        if result['new_commits']:
+            schedule_health_score(repo)
         
-        return {'status': 'processed', 'new_commits': new_commits}
+        return {'status': 'processed', **result}
     
     @staticmethod
-    @transaction.atomic
     def process_pull_request_event(payload: Dict) -> Dict:
         """Handle pull request events"""
         action = payload['action']
@@ -618,7 +898,6 @@ class WebhookProcessor:
         return {'status': 'processed', 'action': action, 'pr_number': pr['number']}
     
     @staticmethod
-    @transaction.atomic
     def process_issues_event(payload: Dict) -> Dict:
         """Handle issues events"""
         action = payload['action']
@@ -637,16 +916,18 @@ class WebhookProcessor:
         sync_manager = GitHubSyncManager(installation_id)
         
         if action in ['opened', 'reopened']:
-            created = sync_manager._import_issue_idempotent(issue_data, repo)
+            with apply_transaction('issues'):
+                created = sync_manager._import_issue_idempotent(issue_data, repo)
             return {'status': 'created' if created else 'exists', 'issue_number': issue_data['number']}
         
         elif action == 'closed':
             # Update issue status
             try:
-                issue = Issue.objects.get(github_issue_id=issue_data['id'])
-                issue.state = 'closed'
-                issue.closed_at = issue_data.get('closed_at')
-                issue.save(update_fields=['state', 'closed_at'])
+                with apply_transaction('issues'):
+                    issue = Issue.objects.get(github_issue_id=issue_data['id'])
+                    issue.state = 'closed'
+                    issue.closed_at = issue_data.get('closed_at')
+                    issue.save(update_fields=['state', 'closed_at'])
                 return {'status': 'closed', 'issue_number': issue_data['number']}
             except Issue.DoesNotExist:
                 return {'status': 'not_found'}
@@ -654,6 +935,147 @@ class WebhookProcessor:
         return {'status': 'processed', 'action': action}
 
 
+class PeriodicSyncScheduler:
+    """
+    Parallel periodic sync
+
+    Only repositories whose adaptive next_sync_at has passed are synced (see
+    api/sync_schedule.py). One worker per installation (its own token, session and
+    rate-limit bucket) syncs that installation's due repositories on a small thread
+    pool; a global semaphore caps how many repository syncs run at once.
+    """
+    
+    def __init__(self, job: Optional[SyncJob] = None,
+                 installation_workers: Optional[int] = None,
+                 repo_concurrency: Optional[int] = None,
+                 max_concurrency: Optional[int] = None):
+        self.job = job
+        self.installation_workers = installation_workers or settings.GITHUB_SYNC_INSTALLATION_WORKERS
+        self.repo_concurrency = repo_concurrency or settings.GITHUB_SYNC_REPO_CONCURRENCY
+        self.slots = threading.BoundedSemaphore(max_concurrency or settings.GITHUB_SYNC_MAX_CONCURRENCY)
+        self._lock = threading.Lock()
+        self.results = {
+            'installations_processed': 0,
+            'repositories_synced': 0,
+            'repositories_busy': 0,
+            'repositories_due': 0,
+            'errors': [],
+            'installations': [],
+            'repositories': [],
+        }
+        self.total = 0
+        self.done = 0
+    
+    @staticmethod
+    def _submit(pool, fn, *args):
+        # Each task gets its own copy of the caller's context (GitHub request priority)
+        return pool.submit(contextvars.copy_context().run, fn, *args)
+    
+    def _record(self, entry: Dict):
+        with self._lock:
+            self.done += 1
+            self.results['repositories'].append(entry)
+            if entry['status'] == 'synced':
+                self.results['repositories_synced'] += 1
+            elif entry['status'] == 'busy':
+                self.results['repositories_busy'] += 1
+            else:
+                self.results['errors'].append({
+                    'repository': entry['repository'],
+                    'error': entry['error']
+                })
+            if self.job:
+                report_progress(self.job, current=self.done, total=self.total)
+    
+    def _sync_repository(self, managers: threading.local, installation_id: int, repo: Repository):
+        """Sync one repository on an installation pool thread"""
+        entry = {'repository': repo.full_name, 'installation_id': installation_id}
+        try:
+            # requests sessions aren't shared across threads - one manager per thread
+            if not hasattr(managers, 'manager'):
+                managers.manager = GitHubSyncManager(installation_id)
+            
+            with self.slots:
+                started = time.monotonic()
+                try:
+                    sync_result = managers.manager.sync_repository_data(repo)
+                    entry['status'] = 'synced'
+                    entry['commits'] = sync_result['commits'].get('new_commits', 0)
+                    entry['issues'] = sync_result['issues'].get('new_issues', 0)
+                    entry['next_sync_in'] = sync_result['next_sync_in']
+                except RepositoryBusy:
+                    # A webhook or manual sync is on it and reschedules the repository itself
+                    entry['status'] = 'busy'
+                except Exception as e:
+                    logger.error(f"Failed to sync {repo.full_name}: {str(e)}")
+                    entry['status'] = 'error'
+                    entry['error'] = str(e)
+                    entry['next_sync_in'] = schedule_next_sync(repo, failed=True)
+                    repo.save(update_fields=SCHEDULE_FIELDS)
+                finally:
+                    entry['seconds'] = round(time.monotonic() - started, 3)
+                    metrics.observe('periodic_sync.repository_seconds', entry['seconds'])
+        finally:
+            self._record(entry)
+            connection.close()
+    
+    def _sync_installation(self, installation: GitHubAppInstallation, repos: List[Repository]):
+        """Sync all repositories of one installation"""
+        logger.info(f"Syncing installation: {installation.account_login} ({len(repos)} repositories)")
+        started = time.monotonic()
+        managers = threading.local()
+        
+        try:
+            with ThreadPoolExecutor(max_workers=self.repo_concurrency) as pool:
+                futures = [
+                    self._submit(pool, self._sync_repository, managers, installation.installation_id, repo)
+                    for repo in repos
+                ]
+                for future in futures:
+                    future.result()
+        finally:
+            connection.close()
+        
+        with self._lock:
+            self.results['installations_processed'] += 1
+            self.results['installations'].append({
+                'installation': installation.account_login,
+                'repositories': len(repos),
+                'seconds': round(time.monotonic() - started, 3),
+            })
+    
+    def run(self) -> Dict:
+        installations = list(GitHubAppInstallation.objects.all())
+        repos_by_installation = {installation.id: [] for installation in installations}
+        for repo in due_repositories(installations):
+            repos_by_installation[repo.installation_id].append(repo)
+        self.total = sum(len(repos) for repos in repos_by_installation.values())
+        self.results['repositories_due'] = self.total
+        if self.job:
+            report_progress(self.job, current=0, total=self.total)
+        
+        with ThreadPoolExecutor(max_workers=self.installation_workers) as pool:
+            futures = {
+                self._submit(pool, self._sync_installation, installation, repos_by_installation[installation.id]): installation
+                for installation in installations
+            }
+            for future in as_completed(futures):
+                installation = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Failed to sync installation {installation.id}: {str(e)}")
+                    with self._lock:
+                        self.results['errors'].append({
+                            'installation': installation.account_login,
+                            'error': str(e)
+                        })
+        
+        # Slowest first - the ones that set the cycle time
+        self.results['repositories'].sort(key=lambda entry: entry.get('seconds', 0), reverse=True)
+        return self.results
+
+
 class SyncJobRunner:
     """
     Background job runner for periodic syncs
@@ -661,57 +1083,32 @@ class SyncJobRunner:
     """
     
     @staticmethod
-    def run_periodic_sync() -> Dict:
+    def run_periodic_sync(job: Optional[SyncJob] = None) -> Dict:
         """
-        Run periodic sync for all installations
+        Run periodic sync for all installations (in parallel, see PeriodicSyncScheduler)
         Should be called by cron job every 15-30 minutes
+        When run from the job queue, progress goes to `job` and the queue records the result
         """
         logger.info("Starting periodic sync job")
+        cache_before = cache_stats()
+        started = time.monotonic()
         
-        results = {
-            'installations_processed': 0,
-            'repositories_synced': 0,
-            'errors': []
-        }
+        results = PeriodicSyncScheduler(job).run()
+        results['cycle_seconds'] = round(time.monotonic() - started, 3)
+        metrics.observe('periodic_sync.cycle_seconds', results['cycle_seconds'])
         
-        # Get all active installations
-        installations = GitHubAppInstallation.objects.all()
+        # How much quota the ETag cache saved this cycle
+        cache_after = cache_stats()
+        results['http_cache'] = {
+            'hits': cache_after['hits'] - cache_before['hits'],
+            'misses': cache_after['misses'] - cache_before['misses'],
+            'pruned': prune_cache(),
+        }
         
-        for installation in installations:
-            try:
-                logger.info(f"Syncing installation: {installation.account_login}")
-                
-                sync_manager = GitHubSyncManager(installation.installation_id)
-                
-                # Get all repositories for this installation
-                repos = Repository.objects.filter(installation=installation)
-                
-                for repo in repos:
-                    try:
-                        # Only sync if not synced in last 10 minutes
-                        if repo.last_synced_at:
-                            time_since_sync = timezone.now() - repo.last_synced_at
-                            if time_since_sync < timedelta(minutes=10):
-                                continue
-                        
-                        sync_result = sync_manager.sync_repository_data(repo)
-                        results['repositories_synced'] += 1
-                        
-                    except Exception as e:
-                        logger.error(f"Failed to sync {repo.full_name}: {str(e)}")
-                        results['errors'].append({
-                            'repository': repo.full_name,
-                            'error': str(e)
-                        })
-                
-                results['installations_processed'] += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to sync installation {installation.id}: {str(e)}")
-                results['errors'].append({
-                    'installation': installation.account_login,
-                    'error': str(e)
-                })
+        results['repositories_processed'] = results['repositories_synced']
+        if job:
+            logger.info(f"Periodic sync completed in {results['cycle_seconds']}s")
+            return results
         
         # Record sync job
         SyncJob.objects.create(
@@ -722,7 +1119,7 @@ class SyncJobRunner:
             details=results
         )
         
-        logger.info(f"Periodic sync completed: {results}")
+        logger.info(f"Periodic sync completed in {results['cycle_seconds']}s")
         return results
     
     @staticmethod
@@ -740,6 +1137,8 @@ class SyncJobRunner:
             
             return {'success': True, 'result': result}
             
+        except RepositoryBusy:
+            raise  # The job queue runs it again once the other sync is done
         except Repository.DoesNotExist:
             return {'error': 'Repository not found'}
         except Exception as e:
@@ -0,0 +1,196 @@
+"""
+Shared GitHub App token service
+
+Installation access tokens live for an hour. Instead of every caller signing a
+JWT and minting a new token, tokens are kept in the GitHubInstallationToken table
+(shared by all workers/pods, encrypted with a key derived from SECRET_KEY) plus a
+per-process copy, and are refreshed ahead of expiry on a background thread so
+requests rarely wait for a mint. Refreshes take the row lock and re-check the
+row first, so concurrent workers don't all mint.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+import jwt
+import requests
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api import metrics
+from api.models import GitHubInstallationToken
+
+logger = logging.getLogger(__name__)
+
+# Tokens are treated as expired this long before GitHub's expires_at
+EXPIRY_MARGIN = timedelta(minutes=5)
+# Inside this window a token is still served, but refreshed in the background
+REFRESH_AHEAD = timedelta(minutes=15)
+
+# App JWTs may live 10 minutes; iat is backdated for clock drift (GitHub's recommendation)
+JWT_LIFETIME = 540
+JWT_CLOCK_DRIFT = 60
+
+_lock = threading.Lock()
+_local_tokens = {}  # installation_id -> (token, expires_at)
+_refreshing = set()
+_app_jwt = (None, 0)
+
+
+def app_jwt():
+    """App JWT, reused until a minute before it expires"""
+    global _app_jwt
+    now = int(time.time())
+    with _lock:
+        token, expires = _app_jwt
+        if token and expires - now > 60:
+            return token
+
+        expires = now + JWT_LIFETIME
+        token = jwt.encode(
+            {'iat': now - JWT_CLOCK_DRIFT, 'exp': expires, 'iss': settings.GITHUB_APP_ID},
+            settings.GITHUB_APP_PRIVATE_KEY,
+            algorithm='RS256'
+        )
+        _app_jwt = (token, expires)
+        return token
+
+
+def mint_installation_token(installation_id):
+    """POST for a new installation token. Returns (token, expires_at)."""
+    headers = {
+        'Authorization': f'Bearer {app_jwt()}',
+        'Accept': 'application/vnd.github+json',
+        'X-GitHub-Api-Version': '2022-11-28'
+    }
+    url = f'https://api.github.com/app/installations/{installation_id}/access_tokens'
+    response = requests.post(url, headers=headers, timeout=30)
+
+    if response.status_code != 201:
+        logger.error(f"Failed to get installation token: {response.text}")
+        raise Exception("Failed to get installation access token")
+
+    data = response.json()
+    expires_at = parse_datetime(data['expires_at']) if data.get('expires_at') else None
+    metrics.increment('github_tokens.minted')
+    logger.info(f"Minted new token for installation {installation_id}")
+    return data['token'], expires_at or timezone.now() + timedelta(hours=1)
+
+
+def _remaining(expires_at, now):
+    return expires_at - now if expires_at else timedelta(0)
+
+
+def get_installation_token(installation_id):
+    """Valid installation token from the process cache, the shared table, or a fresh mint"""
+    now = timezone.now()
+
+    with _lock:
+        cached = _local_tokens.get(installation_id)
+    if cached and _remaining(cached[1], now) > EXPIRY_MARGIN:
+        if _remaining(cached[1], now) < REFRESH_AHEAD:
+            _refresh_in_background(installation_id)
+        metrics.increment('github_tokens.cache_hits')
+        return cached[0]
+
+    row = GitHubInstallationToken.objects.filter(installation_id=installation_id).first()
+    token = row.get_token() if row else ''
+    if token and _remaining(row.expires_at, now) > EXPIRY_MARGIN:
+        with _lock:
+            _local_tokens[installation_id] = (token, row.expires_at)
+        if _remaining(row.expires_at, now) < REFRESH_AHEAD:
+            _refresh_in_background(installation_id)
+        metrics.increment('github_tokens.cache_hits')
+        return token
+
+    return refresh_installation_token(installation_id)
+
+
+def refresh_installation_token(installation_id, stale_token=None):
+    """
+    Mint a token under the installation's row lock
+    If another worker refreshed while we waited (and it isn't `stale_token`), use theirs.
+    """
+    GitHubInstallationToken.objects.get_or_create(installation_id=installation_id)
+
+    with transaction.atomic():
+        row = GitHubInstallationToken.objects.select_for_update().get(installation_id=installation_id)
+        now = timezone.now()
+
+        token = row.get_token()
+        if token and token != stale_token and _remaining(row.expires_at, now) > REFRESH_AHEAD:
+            expires_at = row.expires_at
+        else:
+            token, expires_at = mint_installation_token(installation_id)
+
+            hour = now.replace(minute=0, second=0, microsecond=0)
+            if row.mint_hour != hour:
+                row.mint_hour = hour
+                row.mints_this_hour = 0
+            row.mints_this_hour += 1
+            row.total_mints += 1
+            row.set_token(token)
+            row.expires_at = expires_at
+            row.save()
+
+    with _lock:
+        _local_tokens[installation_id] = (token, expires_at)
+    return token
+
+
+def _refresh_in_background(installation_id):
+    """Refresh a soon-to-expire token without blocking the caller (one thread per installation)"""
+    with _lock:
+        if installation_id in _refreshing:
+            return
+        _refreshing.add(installation_id)
+
+    def refresh():
+        try:
+            refresh_installation_token(installation_id)
+        except Exception as e:
+            logger.warning(f"Background token refresh failed for installation {installation_id}: {e}")
+        finally:
+            with _lock:
+                _refreshing.discard(installation_id)
+            connection.close()
+
+    threading.Thread(target=refresh, name=f'token-refresh-{installation_id}', daemon=True).start()
+
+
+def invalidate_installation_token(installation_id, token=None):
+    """
+    Drop a token GitHub rejected (401)
+    With `token`, the shared row is only cleared if it still holds that token, so a
+    worker holding an old token doesn't throw away one another worker just minted.
+    """
+    with _lock:
+        cached = _local_tokens.get(installation_id)
+        if cached and (token is None or cached[0] == token):
+            del _local_tokens[installation_id]
+
+    with transaction.atomic():
+        row = GitHubInstallationToken.objects.select_for_update().filter(installation_id=installation_id).first()
+        # Stored tokens are encrypted with a random IV: compare the plaintext
+        if row and (token is None or row.get_token() == token):
+            row.set_token('')
+            row.expires_at = None
+            row.save(update_fields=['token', 'expires_at', 'updated_at'])
+    logger.warning(f"Invalidated token for installation {installation_id}")
+
+
+def token_stats():
+    """Expiry and mint rate per installation, for the metrics endpoint"""
+    hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+    return [
+        {
+            'installation_id': row.installation_id,
+            'expires_at': row.expires_at,
+            'mints_this_hour': row.mints_this_hour if row.mint_hour == hour else 0,
+            'total_mints': row.total_mints,
+        }
+        for row in GitHubInstallationToken.objects.order_by('installation_id')
+    ]
@@ -0,0 +1,496 @@
+"""
+Contributor identity resolution
+
+GitHub logins, numeric ids, commit emails and git author names all identify
+contributors. Every ingestion path (importer, sync, webhooks, git log) resolves
+authors through here so the same person maps to one canonical Contributor.
+
+Keys live in the ContributorAlias table (unique per kind + value) behind an
+in-process LRU cache, and resolve_contributors() handles a whole batch with one
+alias query plus one Contributor query. A weaker key only matches when the
+identity's GitHub id / login don't contradict the contributor's, so people who
+share an email (or a username) stay apart; new contributors get a free username
+(alice, alice-2, ...). Aliases are inserted with ignore_conflicts and read back,
+so concurrent workers agree on whichever row won. merge_duplicates() folds
+existing duplicates together.
+"""
+import logging
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+from api.models import Collaboration, Commit, Contributor, ContributorAlias, RepositoryWork
+
+logger = logging.getLogger(__name__)
+
+# Strongest first. A name only resolves an identity that has nothing stronger.
+STRONG_KINDS = ('github_id', 'login', 'email')
+# Keys of a GitHub account: a contributor has at most one person behind them
+ACCOUNT_KINDS = ('github_id', 'login')
+
+NOREPLY_EMAIL = re.compile(r'^(?:\d+\+)?([A-Za-z0-9-]+)@users\.noreply\.github\.com$', re.IGNORECASE)
+
+
+def login_from_email(email):
+    """GitHub login from a noreply commit email (123+login@users.noreply.github.com)"""
+    match = NOREPLY_EMAIL.match(email or '')
+    return match.group(1) if match else None
+
+
+def identity_keys(identity):
+    """(kind, value) alias keys of an identity dict, strongest first"""
+    login = identity.get('login') or login_from_email(identity.get('email'))
+    keys = []
+    if identity.get('github_id'):
+        keys.append(('github_id', str(identity['github_id'])))
+    if login:
+        keys.append(('login', login.lower()))
+    if identity.get('email'):
+        keys.append(('email', identity['email'].strip().lower()))
+    if identity.get('name'):
+        keys.append(('name', ' '.join(identity['name'].split()).lower()))
+    return [(kind, value[:255]) for kind, value in keys if value]
+
+
+def default_username(identity):
+    """Username for a new contributor: login, then the email's local part, then the name"""
+    login = identity.get('login') or login_from_email(identity.get('email'))
+    if login:
+        return login
+    email = identity.get('email') or ''
+    if '@' in email:
+        return email.split('@', 1)[0]
+    return identity.get('name') or 'unknown'
+
+
+def github_user_identity(user):
+    """Identity of a GitHub API user object (issue author, contributor list entry, ...)"""
+    user = user or {}
+    return {
+        'login': user.get('login'),
+        'github_id': user.get('id'),
+        'avatar_url': user.get('avatar_url'),
+        'html_url': user.get('html_url'),
+    }
+
+
+def commit_identity(commit_data, fallback_to_committer=True):
+    """Identity of a REST-shaped commit: the linked GitHub user plus the git author's email / name"""
+    user = commit_data.get('author') or {}
+    if not user.get('login') and fallback_to_committer:
+        user = commit_data.get('committer') or {}
+    git_author = (commit_data.get('commit') or {}).get('author') or {}
+    return {
+        **github_user_identity(user if user.get('login') else {}),
+        'email': git_author.get('email'),
+        'name': git_author.get('name'),
+    }
+
+
+class IdentityResolver:
+    """Alias-table lookups behind a thread-safe LRU of alias key -> contributor id"""
+
+    def __init__(self, maxsize=None):
+        self._maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxsize(self):
+        return self._maxsize or settings.CONTRIBUTOR_ALIAS_CACHE_SIZE
+
+    def _cached(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    found[key] = self._cache[key]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def _remember(self, mapping):
+        with self._lock:
+            for key, contributor_id in mapping.items():
+                self._cache[key] = contributor_id
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def forget(self, contributor_ids=None):
+        """Drop cached keys (all, or those pointing at `contributor_ids`)"""
+        with self._lock:
+            if contributor_ids is None:
+                self._cache.clear()
+                return
+            contributor_ids = set(contributor_ids)
+            for key in [k for k, v in self._cache.items() if v in contributor_ids]:
+                del self._cache[key]
+
+    @staticmethod
+    def _lookup(keys):
+        """One query for all keys: OR of a `value IN (...)` per kind"""
+        by_kind = {}
+        for kind, value in keys:
+            by_kind.setdefault(kind, []).append(value)
+        if not by_kind:
+            return {}
+        condition = Q()
+        for kind, values in by_kind.items():
+            condition |= Q(kind=kind, value__in=values)
+        return {
+            (kind, value): contributor_id
+            for kind, value, contributor_id in ContributorAlias.objects.filter(condition).values_list(
+                'kind', 'value', 'contributor_id'
+            )
+        }
+
+    @staticmethod
+    def _decisive(keys, found):
+        """(position, key) of the key that decides an identity: the strongest known one; the name only without stronger keys"""
+        strong = [key for key in keys if key[0] in STRONG_KINDS]
+        for position, key in enumerate(strong or keys):
+            if key in found:
+                return position, key
+        return None, None
+
+    @staticmethod
+    def _accounts(contributor_ids):
+        """GitHub ids and logins per contributor: {id: {kind: {values}}}"""
+        accounts = {}
+        for contributor_id, kind, value in ContributorAlias.objects.filter(
+            contributor_id__in=contributor_ids, kind__in=ACCOUNT_KINDS
+        ).values_list('contributor_id', 'kind', 'value'):
+            accounts.setdefault(contributor_id, {}).setdefault(kind, set()).add(value)
+        return accounts
+
+    def _assign(self, keys_per_identity, found):
+        """
+        Contributor id per identity, or a negative placeholder for a person to create
+        A match through a weaker key (login, email) only counts when the identity's
+        stronger keys (GitHub id, login) don't contradict the matched contributor:
+        a shared email never joins two GitHub accounts. Placeholders take the keys of
+        the new person, so later identities in the batch can match them too.
+        """
+        known = dict(found)
+        checked = set()
+        for keys in keys_per_identity:
+            position, key = self._decisive(keys, found)
+            if key is not None and position > 0:
+                checked.add(found[key])
+        accounts = self._accounts(checked) if checked else {}
+
+        assigned = []
+        placeholders = 0
+        for keys in keys_per_identity:
+            if not keys:
+                assigned.append(None)
+                continue
+            position, key = self._decisive(keys, known)
+            contributor_id = known[key] if key is not None else None
+            if contributor_id is not None:
+                owned = accounts.setdefault(contributor_id, {})
+                stronger = [(kind, value) for kind, value in keys[:position] if kind in ACCOUNT_KINDS]
+                if any(owned.get(kind) and value not in owned[kind] for kind, value in stronger):
+                    contributor_id = None
+            if contributor_id is None:
+                placeholders += 1
+                contributor_id = -placeholders
+            owned = accounts.setdefault(contributor_id, {})
+            for kind, value in keys:
+                if kind in ACCOUNT_KINDS:
+                    owned.setdefault(kind, set()).add(value)
+                known.setdefault((kind, value), contributor_id)
+            assigned.append(contributor_id)
+        return assigned
+
+    @staticmethod
+    def _unique_usernames(bases):
+        """One free username per base: the base itself, else base-2, base-3, ..."""
+        taken = set(Contributor.objects.filter(username__in=set(bases)).values_list('username', flat=True))
+        clashing = Q()
+        for base in set(bases) & taken:
+            clashing |= Q(username__startswith=f'{base[:250]}-')
+        if clashing:
+            taken.update(Contributor.objects.filter(clashing).values_list('username', flat=True))
+        usernames = []
+        for base in bases:
+            username, suffix = base, 1
+            while username in taken:
+                suffix += 1
+                username = f'{base[:250]}-{suffix}'
+            taken.add(username)
+            usernames.append(username)
+        return usernames
+
+    def _create_contributors(self, identities):
+        """A new Contributor per identity, never adopting an existing row with the same username"""
+        bases = [default_username(identity)[:255] for identity in identities]
+
+        def build(identity, username):
+            return Contributor(
+                username=username,
+                url=identity.get('html_url') or (
+                    f"https://github.com/{identity['login']}" if identity.get('login') else ''
+                ),
+                avatar_url=identity.get('avatar_url') or '',
+                summary=f"{username} contributor",
+            )
+
+        usernames = self._unique_usernames(bases)
+        try:
+            with transaction.atomic():
+                Contributor.objects.bulk_create([build(i, u) for i, u in zip(identities, usernames)])
+            by_username = dict(Contributor.objects.filter(username__in=usernames).values_list('username', 'id'))
+            return [by_username[username] for username in usernames]
+        except IntegrityError:
+            pass
+
+        # Another worker took one of the usernames meanwhile: one row at a time
+        created = []
+        for identity, base in zip(identities, bases):
+            while True:
+                username = self._unique_usernames([base])[0]
+                contributor = build(identity, username)
+                try:
+                    with transaction.atomic():
+                        contributor.save()
+                except IntegrityError:
+                    continue
+                created.append(contributor.id)
+                break
+        return created
+
+    def resolve_many(self, identities):
+        """
+        Contributor (or None for an identity without any key) per identity, in order
+        identities: dicts with any of login, github_id, email, name (+ avatar_url / html_url
+        used when a contributor has to be created)
+        """
+        identities = list(identities)
+        keys_per_identity = [identity_keys(identity) for identity in identities]
+        all_keys = {key for keys in keys_per_identity for key in keys}
+
+        found = self._cached(all_keys)
+        unknown = all_keys - set(found)
+        if unknown:
+            found.update(self._lookup(unknown))
+
+        assigned = self._assign(keys_per_identity, found)
+
+        # New people: one contributor per placeholder
+        first_seen = {}
+        for identity, contributor_id in zip(identities, assigned):
+            if contributor_id is not None and contributor_id < 0:
+                first_seen.setdefault(contributor_id, identity)
+        created = set()
+        if first_seen:
+            ids = dict(zip(first_seen, self._create_contributors(list(first_seen.values()))))
+            created = set(ids.values())
+            assigned = [ids.get(contributor_id, contributor_id) for contributor_id in assigned]
+
+        # Record keys seen for the first time; if another worker claimed one first, theirs wins
+        new_aliases = {}
+        for keys, contributor_id in zip(keys_per_identity, assigned):
+            for key in keys:
+                if key not in found and contributor_id is not None:
+                    new_aliases.setdefault(key, contributor_id)
+        if new_aliases:
+            ContributorAlias.objects.bulk_create([
+                ContributorAlias(kind=kind, value=value, contributor_id=contributor_id)
+                for (kind, value), contributor_id in new_aliases.items()
+            ], ignore_conflicts=True)
+            found.update(self._lookup(new_aliases))
+            assigned = self._assign(keys_per_identity, found)
+            # Contributors created for keys a concurrent worker claimed first
+            unused = created - set(assigned)
+            if unused:
+                Contributor.objects.filter(id__in=unused).delete()
+
+        self._remember(found)
+
+        contributors = Contributor.objects.in_bulk({cid for cid in assigned if cid is not None})
+        if len(contributors) < len({cid for cid in assigned if cid is not None}):
+            # A cached id was merged away in another process: retry from the table
+            self.forget(set(assigned) - set(contributors))
+            return self.resolve_many(identities)
+        return [contributors.get(cid) for cid in assigned]
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._cache), 'hits': self.hits, 'misses': self.misses}
+
+
+resolver = IdentityResolver()
+
+
+def resolve_contributors(identities):
+    """Canonical Contributor per identity dict (bulk; see IdentityResolver.resolve_many)"""
+    return resolver.resolve_many(identities)
+
+
+def resolve_contributor(**identity):
+    """Canonical Contributor for one identity (login=, github_id=, email=, name=, ...)"""
+    return resolver.resolve_many([identity])[0]
+
+
+# ----------------------------------------------------------------------------
+# Offline duplicate merging
+# ----------------------------------------------------------------------------
+
+def find_duplicates(batch_size=1000):
+    """
+    Groups of contributor ids that are the same person, from the alias table and
+    the author of every stored commit payload: a shared login or GitHub id joins
+    contributors; a shared email only joins contributors without a GitHub account
+    to the one account using it (never two accounts). Returns (groups,
+    payload_logins) where payload_logins are logins seen on GitHub payloads.
+    """
+    parent = {}
+    has_account = set()
+
+    def root(cid):
+        parent.setdefault(cid, cid)
+        while parent[cid] != cid:
+            parent[cid] = parent[parent[cid]]
+            cid = parent[cid]
+        return cid
+
+    def union(a, b):
+        a, b = root(a), root(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+            if max(a, b) in has_account:
+                has_account.add(min(a, b))
+
+    owner = {}
+    emails = {}
+    accounts = {}
+
+    def see(key, cid):
+        root(cid)
+        if key[0] == 'email':
+            emails.setdefault(key, set()).add(cid)
+            return
+        accounts.setdefault(key, set()).add(cid)
+        if key in owner:
+            union(owner[key], cid)
+        else:
+            owner[key] = cid
+
+    for kind, value, cid in ContributorAlias.objects.filter(kind__in=STRONG_KINDS).values_list(
+        'kind', 'value', 'contributor_id'
+    ).iterator():
+        see((kind, value), cid)
+
+    payload_logins = set()
+    last_id = 0
+    while True:
+        commits = list(
+            Commit.objects.filter(id__gt=last_id, contributor__isnull=False)
+            .select_related('payload').only('id', 'contributor_id', 'payload__data').order_by('id')[:batch_size]
+        )
+        if not commits:
+            break
+        last_id = commits[-1].id
+        for commit in commits:
+            # Author only: a committer like web-flow would join unrelated people
+            identity = commit_identity(commit.raw_data, fallback_to_committer=False)
+            if identity.get('login'):
+                payload_logins.add(identity['login'].lower())
+            for key in identity_keys(identity):
+                if key[0] in STRONG_KINDS:
+                    see(key, commit.contributor_id)
+
+    # A GitHub account: a GitHub id, or a login GitHub payloads use (usernames are login aliases too)
+    for (kind, value), cids in accounts.items():
+        if kind == 'github_id' or value in payload_logins:
+            has_account.update(root(cid) for cid in cids)
+
+    # Emails last, once the accounts are grouped: an email shared by two accounts joins nothing
+    for cids in emails.values():
+        roots = {root(cid) for cid in cids}
+        if len(roots) > 1 and len(roots & has_account) <= 1:
+            first, *rest = roots
+            for other in rest:
+                union(first, other)
+
+    groups = {}
+    for cid in parent:
+        groups.setdefault(root(cid), set()).add(cid)
+    return [sorted(group) for group in groups.values() if len(group) > 1], payload_logins
+
+
+def _move_rows(model, field, source, target):
+    """Re-point model.field from source to target; rows that would break a unique constraint are dropped"""
+    rows = model.objects.filter(**{field: source})
+    try:
+        with transaction.atomic():
+            rows.update(**{field: target})
+    except IntegrityError:
+        for pk in list(rows.values_list('pk', flat=True)):
+            try:
+                with transaction.atomic():
+                    model.objects.filter(pk=pk).update(**{field: target})
+            except IntegrityError:
+                model.objects.filter(pk=pk).delete()
+
+
+def merge_contributors(canonical, duplicates):
+    """Fold `duplicates` (Contributors) into `canonical`: commits, issues, works, badges, aliases, ..."""
+    from api.contributor_stats import refresh_contributor_stats
+
+    with transaction.atomic():
+        for duplicate in duplicates:
+            # One RepositoryWork per (repository, contributor): move its rows into the canonical work
+            for work in RepositoryWork.objects.filter(contributor=duplicate):
+                target = RepositoryWork.objects.filter(repository_id=work.repository_id, contributor=canonical).first()
+                if target is None:
+                    work.contributor = canonical
+                    work.save(update_fields=['contributor'])
+                    continue
+                for relation in RepositoryWork._meta.related_objects:
+                    _move_rows(relation.related_model, relation.field.name, work, target)
+                work.delete()
+
+            for relation in Contributor._meta.related_objects:
+                if relation.related_model is not RepositoryWork:
+                    _move_rows(relation.related_model, relation.field.name, duplicate, canonical)
+
+            # The old username keeps resolving to the canonical contributor
+            value = ' '.join(duplicate.username.split()).lower()[:255]
+            ContributorAlias.objects.bulk_create([ContributorAlias(
+                kind='name' if ' ' in value else 'login', value=value, contributor=canonical,
+            )], ignore_conflicts=True)
+            duplicate.delete()
+
+        # Pairs between the merged people are now self-pairs
+        Collaboration.objects.filter(contributor_1=F('contributor_2')).delete()
+        refresh_contributor_stats([canonical])
+
+    resolver.forget()
+    logger.info(f"Merged {len(duplicates)} contributor(s) into {canonical.username}")
+
+
+def merge_duplicates(dry_run=False):
+    """Find and merge duplicate contributors. Returns [(canonical username, [merged usernames])]"""
+    groups, payload_logins = find_duplicates()
+    merged = []
+    for ids in groups:
+        contributors = sorted(Contributor.objects.filter(id__in=ids), key=lambda c: c.id)
+        if len(contributors) < 2:
+            continue
+        # Prefer the account whose username is a real GitHub login
+        canonical = next((c for c in contributors if c.username.lower() in payload_logins), contributors[0])
+        duplicates = [c for c in contributors if c.id != canonical.id]
+        merged.append((canonical.username, [c.username for c in duplicates]))
+        if not dry_run:
+            merge_contributors(canonical, duplicates)
+    return merged
@@ -177,7 +177,7 @@ Return ONLY valid JSON, no markdown formatting.
             
             # Build comparison prompt
             issues_summary = "\n".join([
-                f"#{i.id}: {i.raw_data.get('title', 'No title')}"
+                f"#{i.id}: {i.title or i.summary or 'No title'}"
                 for i in recent_issues
             ])
             
@@ -0,0 +1,673 @@
+"""
+Database-backed background job queue
+
+Imports and syncs are too slow for a request/response cycle, so views enqueue a
+SyncJob row and return 202 with its id. `manage.py run_workers` processes claim
+pending rows with SELECT ... FOR UPDATE SKIP LOCKED (so any number of worker pods
+can poll the same table without handing out a job twice), run the handler
+registered for the job type, and write progress / results back to the row.
+Failed jobs are retried with exponential backoff up to max_attempts.
+"""
+import contextvars
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api import metrics
+from api.encryption import decrypt, encrypt
+from api.models import SyncJob
+from api.rate_governor import BACKGROUND, INTERACTIVE, github_priority
+from api.sync_lock import RepositoryBusy, repository_sync
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('pending', 'running')
+# Payload keys holding secrets (tokens the user pasted in): stored encrypted,
+# read with job_secret() and dropped when the job finishes
+SECRET_PAYLOAD_KEYS = ('github_token',)
+# Job types that sync job.repository under its sync lock (api/sync_lock.py)
+REPOSITORY_SYNC_JOB_TYPES = ('repository_import', 'repository_reconcile', 'manual_sync', 'git_ingest')
+
+_handlers = {}
+
+
+def job_handler(job_type, priority=BACKGROUND):
+    """
+    Register `func(job) -> dict` as the handler for `job_type`
+
+    The returned dict is stored in job.details; an 'errors' list in it marks the
+    job completed_with_errors. Raising marks the attempt failed (and retries it).
+    """
+    def decorator(func):
+        _handlers[job_type] = (func, priority)
+        return func
+    return decorator
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def status_url(job):
+    return f'/api/sync/jobs/{job.id}/'
+
+
+def job_links(job):
+    """How a caller follows a job: its id, status and the URL to poll"""
+    return {'job_id': job.id, 'status': job.status, 'status_url': status_url(job)}
+
+
+def enqueue(job_type, payload=None, installation=None, repository=None, dedupe_key=None, max_attempts=None,
+            delay=None, dedupe_running=True):
+    """
+    Queue a job and return its SyncJob row
+
+    With a dedupe_key, an already pending/running job with the same key is
+    returned instead of queueing a duplicate (e.g. a user clicking sync twice).
+    delay (seconds) + dedupe_running=False debounces: requests arriving before
+    the job starts coalesce into it, later ones queue a fresh run.
+    """
+    if dedupe_key:
+        statuses = ACTIVE_STATUSES if dedupe_running else ('pending',)
+        existing = SyncJob.objects.filter(dedupe_key=dedupe_key, status__in=statuses).first()
+        if existing:
+            return existing
+
+    job = SyncJob.objects.create(
+        job_type=job_type,
+        status='pending',
+        installation=installation,
+        repository=repository,
+        payload=_seal(payload or {}),
+        dedupe_key=dedupe_key,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_after=timezone.now() + timedelta(seconds=delay or 0),
+    )
+    metrics.increment('jobs.enqueued', job_type=job_type)
+    logger.info(f"Queued {job_type} job {job.id}")
+    return job
+
+
+def enqueue_repository_sync(job_type, repository, payload=None, installation=None, dedupe_key=None):
+    """
+    Queue a sync of one repository, coalescing triggers
+
+    Only pending jobs are deduped, so triggers that arrive while a sync of the
+    repository runs collapse into a single follow-up run, which starts once the
+    running one releases the lock. Returns (job, in_flight): in_flight is that
+    running sync (None if idle), whose result the caller can subscribe to.
+    """
+    job = enqueue(
+        job_type, payload=payload, installation=installation, repository=repository,
+        dedupe_key=dedupe_key, dedupe_running=False,
+    )
+    in_flight = SyncJob.objects.filter(
+        repository=repository, job_type__in=REPOSITORY_SYNC_JOB_TYPES, status='running'
+    ).exclude(id=job.id).first()
+    if in_flight:
+        metrics.increment('jobs.coalesced', job_type=job_type)
+    return job, in_flight
+
+
+def claim_job(worker, job_types=None):
+    """
+    Lock and return the next runnable job (or None)
+    SKIP LOCKED lets concurrent workers pass over rows another worker is claiming.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = SyncJob.objects.select_for_update(skip_locked=True).filter(
+            status='pending', run_after__lte=now
+        )
+        if job_types:
+            jobs = jobs.filter(job_type__in=job_types)
+        job = jobs.order_by('run_after', 'id').first()
+        if job is None:
+            return None
+
+        job.status = 'running'
+        job.attempts += 1
+        job.locked_by = worker
+        job.locked_at = now
+        job.started_at = now
+        job.completed_at = None
+        job.save(update_fields=['status', 'attempts', 'locked_by', 'locked_at', 'started_at', 'completed_at'])
+    return job
+
+
+def release_stale_jobs():
+    """Put jobs whose worker died mid-run (no heartbeat for JOB_LOCK_TIMEOUT) back in the queue"""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    released = SyncJob.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='pending', locked_by=None, locked_at=None, run_after=timezone.now()
+    )
+    if released:
+        logger.warning(f"Released {released} stale job(s)")
+    return released
+
+
+def report_progress(job, **progress):
+    """Merge progress fields (current, total, message, ...) into the job row (also a heartbeat)"""
+    job.progress = {**job.progress, **progress}
+    SyncJob.objects.filter(id=job.id).update(progress=job.progress)
+    if job.locked_by:
+        SyncJob.objects.filter(id=job.id, locked_by=job.locked_by, status='running').update(locked_at=timezone.now())
+
+
+class Heartbeat(threading.Thread):
+    """
+    Refresh a running job's locked_at every JOB_HEARTBEAT_INTERVAL seconds, so
+    release_stale_jobs() only re-queues jobs whose worker is really gone - not
+    long imports or rate-limit waits
+    """
+
+    def __init__(self, job):
+        super().__init__(name=f'job-{job.id}-heartbeat', daemon=True)
+        self.job_id = job.id
+        self.worker = job.locked_by
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.JOB_HEARTBEAT_INTERVAL):
+                try:
+                    beat = SyncJob.objects.filter(id=self.job_id, locked_by=self.worker, status='running').update(
+                        locked_at=timezone.now()
+                    )
+                except Exception as e:
+                    logger.warning(f"Job {self.job_id} heartbeat failed: {e}")
+                    continue
+                if not beat:
+                    self.lost = True
+                    logger.warning(f"Job {self.job_id} lost its lock to another worker")
+                    return
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def _save_owned(job, owner, fields=None):
+    """
+    Write the job's outcome only if `owner` still holds it - a job released as
+    stale and claimed by another worker belongs to that worker now.
+    Returns whether the row was written.
+    """
+    fields = fields or [f.attname for f in SyncJob._meta.concrete_fields if not f.primary_key]
+    written = SyncJob.objects.filter(id=job.id, locked_by=owner, status='running').update(
+        **{field: getattr(job, field) for field in fields}
+    )
+    if not written:
+        logger.warning(f"Job {job.id}: not recording the outcome of {owner}, which no longer holds the job")
+        metrics.increment('jobs.lost_lock', job_type=job.job_type)
+    return bool(written)
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base, 2x base, 4x base, ... capped at an hour"""
+    return min(settings.JOB_RETRY_BACKOFF * (2 ** max(attempts - 1, 0)), 3600)
+
+
+def _seal(payload):
+    """Encrypt the secrets in a payload (empty ones are left out)"""
+    return {
+        key: encrypt(value) if key in SECRET_PAYLOAD_KEYS else value
+        for key, value in payload.items() if value or key not in SECRET_PAYLOAD_KEYS
+    }
+
+
+def _scrub(payload):
+    return {key: value for key, value in payload.items() if key not in SECRET_PAYLOAD_KEYS}
+
+
+def job_secret(job, key):
+    """Plaintext of a secret payload value (None when absent)"""
+    value = job.payload.get(key)
+    return decrypt(value) if value else None
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome. Returns the final status."""
+    handler = _handlers.get(job.job_type)
+    if handler is None:
+        job.status = 'failed'
+        job.error_message = f'No handler registered for {job.job_type}'
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'completed_at'])
+        return job.status
+
+    func, priority = handler
+    owner = job.locked_by
+    logger.info(f"Running {job.job_type} job {job.id} (attempt {job.attempts}/{job.max_attempts})")
+
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        with github_priority(priority), metrics.timer('jobs.duration', job_type=job.job_type):
+            result = func(job) or {}
+    except RepositoryBusy as e:
+        heartbeat.stop()
+        return _requeue_busy(job, e)
+    except Exception as e:
+        heartbeat.stop()
+        logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+        job.error_message = str(e)
+        job.locked_by = None
+        job.locked_at = None
+        if job.attempts < job.max_attempts:
+            job.status = 'pending'
+            job.run_after = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+            metrics.increment('jobs.retried', job_type=job.job_type)
+        else:
+            job.status = 'failed'
+            job.completed_at = timezone.now()
+            job.payload = _scrub(job.payload)
+            metrics.increment('jobs.failed', job_type=job.job_type)
+        if not _save_owned(job, owner, ['status', 'error_message', 'locked_by', 'locked_at', 'run_after', 'completed_at', 'payload']):
+            job.refresh_from_db()
+        return job.status
+
+    heartbeat.stop()
+    errors = result.get('errors') or []
+    job.status = 'completed_with_errors' if errors else 'completed'
+    job.details = {**job.details, **result}
+    job.repositories_processed = result.get('repositories_processed', job.repositories_processed)
+    job.errors_count = len(errors)
+    job.error_message = None
+    job.completed_at = timezone.now()
+    job.locked_by = None
+    job.locked_at = None
+    job.payload = _scrub(job.payload)
+    if not _save_owned(job, owner):
+        job.refresh_from_db()
+        return job.status
+    metrics.increment('jobs.completed', job_type=job.job_type)
+    return job.status
+
+
+def _requeue_busy(job, busy):
+    """
+    Another sync holds the job's repository: run again once it's done, without
+    using up an attempt - unless a newer pending trigger already covers this one
+    """
+    logger.info(f"Job {job.id}: {busy}")
+    now = timezone.now()
+    owner = job.locked_by
+    job.attempts -= 1
+    job.locked_by = None
+    job.locked_at = None
+    newer = job.dedupe_key and SyncJob.objects.filter(
+        dedupe_key=job.dedupe_key, status='pending'
+    ).exclude(id=job.id).order_by('id').first()
+    if newer:
+        job.status = 'completed'
+        job.details = {**job.details, 'coalesced_into': newer.id}
+        job.completed_at = now
+        job.payload = _scrub(job.payload)
+    else:
+        job.status = 'pending'
+        job.run_after = now + timedelta(seconds=settings.SYNC_LOCK_RETRY_DELAY)
+    if not _save_owned(job, owner, ['status', 'attempts', 'locked_by', 'locked_at', 'run_after', 'details', 'completed_at', 'payload']):
+        job.refresh_from_db()
+        return job.status
+    metrics.increment('jobs.busy', job_type=job.job_type)
+    return job.status
+
+
+def serialize_job(job):
+    """Job status payload for the API"""
+    return {
+        'id': job.id,
+        'job_type': job.job_type,
+        'status': job.status,
+        'progress': job.progress,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'run_after': job.run_after,
+        'repositories_processed': job.repositories_processed,
+        'errors_count': job.errors_count,
+        'error_message': job.error_message,
+        'started_at': job.started_at,
+        'completed_at': job.completed_at,
+        'duration_seconds': job.duration_seconds(),
+        'repository_id': job.repository_id,
+        'installation': {
+            'id': job.installation.id,
+            'account_login': job.installation.account_login
+        } if job.installation else None,
+        'details': job.details,
+        'status_url': status_url(job),
+    }
+
+
+# ----------------------------------------------------------------------------
+# Handlers
+# ----------------------------------------------------------------------------
+
+def repository_summary(repository):
+    from api.models import Commit, Issue
+    return {
+        'id': repository.id,
+        'name': repository.name,
+        'url': repository.url,
+        'stars': repository.stars,
+        'forks': repository.forks,
+        'contributors_count': repository.works.values('contributor').distinct().count(),
+        'commits_count': Commit.objects.filter(repository=repository).count(),
+        'issues_count': Issue.objects.filter(work__repository=repository).count(),
+        'updated_at': repository.updated_at.isoformat() if repository.updated_at else None,
+    }
+
+
+@job_handler('repository_import', priority=INTERACTIVE)
+def import_repository_job(job):
+    """Import (or re-import) one repository by URL"""
+    from api.github_importer import GitHubImporter
+
+    report_progress(job, message=f"Importing {job.payload['repo_url']}")
+    importer = GitHubImporter(job_secret(job, 'github_token'))
+    if job.repository_id:
+        # Re-import of a known repository: not alongside another sync of it
+        with repository_sync(job.repository_id):
+            repository = importer.import_repository(job.payload['repo_url'])
+    else:
+        repository = importer.import_repository(job.payload['repo_url'])
+
+    if job.repository_id != repository.id:
+        job.repository = repository
+    report_progress(job, message='Done')
+    return {'repository': repository_summary(repository), 'repositories_processed': 1}
+
+
+@job_handler('repository_reconcile', priority=INTERACTIVE)
+def reconcile_repository_job(job):
+    """Refresh an imported repository, re-fetching only what the cheap probes show is stale"""
+    from api.reconcile import RepositoryReconciler
+
+    def progress(phase, **state):
+        report_progress(job, message=phase, **state)
+
+    with repository_sync(job.repository_id):
+        result = RepositoryReconciler(job_secret(job, 'github_token')).reconcile(job.repository, progress=progress)
+    return {'repository': repository_summary(job.repository), 'result': result, 'repositories_processed': 1}
+
+
+@job_handler('manual_sync', priority=INTERACTIVE)
+def sync_repository_job(job):
+    """Incremental sync of an installed repository through its GitHub App installation"""
+    from api.github_sync import SyncJobRunner
+
+    result = SyncJobRunner.sync_single_repository(job.repository_id)
+    if 'error' in result:
+        raise RuntimeError(result['error'])
+    return {'result': result['result'], 'repositories_processed': 1}
+
+
+class BulkImport:
+    """
+    Fan-out for a bulk_import job
+
+    Repositories are imported BULK_IMPORT_CONCURRENCY at a time, one GitHubImporter
+    per thread. Each repository's phase (queued, fetching, inserting, webhook, done,
+    busy, error) and counts are kept in job.progress['repositories'] for the status
+    endpoint. Successful results are written to job.details as they finish,
+    so a retry only imports what is left.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.installation = job.installation
+        self.auto_webhook = job.payload.get('auto_webhook', True)
+        self._lock = threading.Lock()
+        self._importers = threading.local()
+
+    def _selected_repositories(self, client):
+        """
+        [{id, full_name}] of the selected repositories, kept in the payload for retries
+        Already imported ones come from the database; the rest are looked up by id
+        (one request each, not a listing of the whole installation).
+        """
+        if 'repositories' not in self.job.payload:
+            from api.models import Repository
+
+            repo_ids = self.job.payload['repository_ids']
+            known = dict(Repository.objects.filter(
+                installation=self.installation, github_id__in=repo_ids
+            ).values_list('github_id', 'full_name'))
+            repositories = []
+            for repo_id in repo_ids:
+                full_name = known.get(repo_id)
+                if not full_name:
+                    repo = client.get_installation_repository(self.installation.installation_id, repo_id)
+                    if repo is None:
+                        logger.warning(f"Repository {repo_id} is not accessible to installation {self.installation.installation_id}")
+                        continue
+                    full_name = repo['full_name']
+                repositories.append({'id': repo_id, 'full_name': full_name})
+            self.job.payload['repositories'] = repositories
+            SyncJob.objects.filter(id=self.job.id).update(payload=self.job.payload)
+        return self.job.payload['repositories']
+
+    def _update(self, full_name, **fields):
+        with self._lock:
+            repositories = dict(self.job.progress.get('repositories', {}))
+            repositories[full_name] = {**repositories.get(full_name, {}), **fields}
+            report_progress(self.job, repositories=repositories)
+
+    def _finish(self, result, error=None):
+        with self._lock:
+            self.results.append(result)
+            if error:
+                self.errors.append({'repository': result['repository'], 'error': error})
+            # Keep partial results on the row so a retry can skip finished repositories
+            self.job.details = {**self.job.details, 'results': self.results}
+            SyncJob.objects.filter(id=self.job.id).update(details=self.job.details)
+            report_progress(
+                self.job,
+                current=len(self.results),
+                success=len(self.results) - len(self.errors),
+                failed=len(self.errors),
+            )
+
+    def _importer(self):
+        """
+        This thread's GitHubImporter, with a current installation token
+        Tokens expire after an hour, so each repository asks the token service
+        (cached, refreshed ahead of expiry) and gets a new importer once it rotates.
+        """
+        from api.github_importer import GitHubImporter
+        from api.github_tokens import get_installation_token
+
+        token = get_installation_token(self.installation.installation_id)
+        if getattr(self._importers, 'token', None) != token:
+            self._importers.importer = GitHubImporter(token)
+            self._importers.token = token
+        return self._importers.importer
+
+    def _import_one(self, client, full_name):
+
+        try:
+            self._update(full_name, phase='fetching')
+            repository = self._importer().import_repository(
+                full_name,
+                progress=lambda phase, **counts: self._update(
+                    full_name, phase='inserting' if phase == 'fetched' else phase, **counts
+                ),
+            )
+
+            webhook_status = None
+            if self.auto_webhook:
+                self._update(full_name, phase='webhook')
+                try:
+                    client.create_webhook(self.installation.installation_id, full_name)
+                    webhook_status = 'created'
+                except Exception as webhook_error:
+                    webhook_status = f'failed: {str(webhook_error)}'
+
+            summary = repository_summary(repository)
+            self._update(full_name, phase='done', webhook=webhook_status)
+            self._finish({
+                'repository': full_name,
+                'status': 'success',
+                'webhook': webhook_status,
+                'data': {
+                    'name': summary['name'],
+                    'contributors': summary['contributors_count'],
+                    'commits': summary['commits_count'],
+                    'issues': summary['issues_count'],
+                }
+            })
+        except RepositoryBusy as e:
+            # Left for the job's retry, once the running sync of the repository is done
+            logger.info(f"Import of {full_name} deferred: {e}")
+            self._update(full_name, phase='busy', error=str(e))
+            self._finish({'repository': full_name, 'status': 'busy', 'error': str(e)}, error=str(e))
+        except Exception as e:
+            logger.error(f"Failed to import {full_name}: {str(e)}")
+            self._update(full_name, phase='error', error=str(e))
+            self._finish({'repository': full_name, 'status': 'error', 'error': str(e)}, error=str(e))
+        finally:
+            connection.close()
+
+    def run(self):
+        from api.github_app import GitHubAppClient
+
+        client = GitHubAppClient()
+        selected = self._selected_repositories(client)
+
+        # Repositories finished by an earlier attempt aren't imported again
+        self.results = [r for r in self.job.details.get('results', []) if r['status'] == 'success']
+        self.errors = []
+        done = {r['repository'] for r in self.results}
+        pending = [r['full_name'] for r in selected if r['full_name'] not in done]
+
+        repositories = {
+            name: state for name, state in self.job.progress.get('repositories', {}).items() if name in done
+        }
+        repositories.update({name: {'phase': 'queued'} for name in pending})
+        report_progress(
+            self.job, current=len(done), total=len(selected), success=len(done), failed=0,
+            repositories=repositories
+        )
+
+        workers = max(min(settings.BULK_IMPORT_CONCURRENCY, len(pending)), 1)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'bulk-import-{self.job.id}') as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, self._import_one, client, name)
+                for name in pending
+            ]
+            for future in futures:
+                future.result()
+
+        if self.errors and self.job.attempts < self.job.max_attempts:
+            # Retried with backoff; successful repositories are skipped next attempt
+            raise RuntimeError(f'{len(self.errors)} of {len(selected)} repositories failed to import')
+
+        total = len(self.job.payload['repository_ids'])
+        success_count = len(self.results) - len(self.errors)
+        return {
+            'results': self.results,
+            'errors': self.errors,
+            'summary': {
+                'total': total,
+                'success': success_count,
+                'failed': len(self.errors)
+            },
+            'repositories_processed': success_count,
+            'message': f'Imported {success_count} of {total} repositories',
+        }
+
+
+@job_handler('bulk_import', priority=INTERACTIVE)
+def bulk_import_job(job):
+    """Import the selected repositories of an installation in parallel, with optional webhooks"""
+    return BulkImport(job).run()
+
+
+@job_handler('periodic_sync')
+def periodic_sync_job(job):
+    """Sync every installation (cron-triggered)"""
+    from api.github_sync import SyncJobRunner
+    return SyncJobRunner.run_periodic_sync(job=job)
+
+
+@job_handler('webhook_triggered')
+def webhook_delivery_job(job):
+    """Process one delivery from the webhook inbox"""
+    from api.github_sync import WebhookProcessor
+    from api.models import WebhookDelivery
+
+    delivery = WebhookDelivery.objects.get(delivery_id=job.payload['delivery_id'])
+    result = WebhookProcessor.process_delivery(delivery)
+    return {'event': delivery.event_type, 'delivery_id': delivery.delivery_id, 'result': result}
+
+
+def schedule_health_score(repository):
+    """Recompute a repository's health score soon, coalescing bursts of pushes into one run"""
+    return enqueue(
+        'health_score',
+        repository=repository,
+        dedupe_key=f'health:{repository.id}',
+        delay=settings.HEALTH_SCORE_DEBOUNCE,
+        dedupe_running=False,
+    )
+
+
+@job_handler('health_score')
+def health_score_job(job):
+    """Debounced Repository.calculate_health_score()"""
+    return {'health_score': job.repository.calculate_health_score()}
+
+
+def schedule_stats_backfill(repository, github_token=None):
+    """Fill in stats for a repository's commits stored without them, coalescing repeated imports"""
+    return enqueue(
+        'stats_backfill',
+        payload={'github_token': github_token} if github_token else {},
+        repository=repository,
+        dedupe_key=f'stats_backfill:{repository.id}',
+        delay=settings.STATS_BACKFILL_DELAY,
+        dedupe_running=False,
+    )
+
+
+@job_handler('stats_backfill')
+def stats_backfill_job(job):
+    """Fill additions / deletions / files_changed of commits imported without stats (resumes from job.progress)"""
+    from api.stats_backfill import StatsBackfill
+
+    return StatsBackfill(
+        repository_ids=[job.repository_id] if job.repository_id else job.payload.get('repository_ids'),
+        github_token=job_secret(job, 'github_token'),
+        resume=job.progress,
+        progress=lambda **state: report_progress(job, **state),
+    ).run()
+
+
+@job_handler('git_ingest')
+def git_ingest_job(job):
+    """Load commits from the repository's local git directory (`git log --numstat`, no API calls)"""
+    from api.git_ingest import ingest_push, ingest_repository
+
+    with repository_sync(job.repository_id):
+        if 'updates' in job.payload:
+            # Pushed ref updates from the post-receive hook: only the new commits
+            result = ingest_push(job.repository, job.payload['updates'], git_dir=job.payload.get('git_dir'))
+        else:
+            result = ingest_repository(
+                job.repository,
+                git_dir=job.payload.get('git_dir'),
+                revisions=job.payload.get('revisions'),
+                progress=lambda **counts: report_progress(job, **counts),
+            )
+    return {**result, 'repositories_processed': 1}
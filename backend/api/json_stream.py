@@ -0,0 +1,110 @@
+"""
+Incremental JSON readers for large export files
+Yields array items one at a time so memory stays proportional to a single item,
+not to the whole file (fetch.py org exports are several GB)
+"""
+import json
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+class _Reader:
+    """Buffered text reader with raw_decode on top"""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, grow=False):
+        # When an item didn't fit, read at least as much again so re-parsing stays linear
+        size = max(self.chunk_size, len(self.buffer) - self.pos) if grow else self.chunk_size
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character (None at end of file)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos}, found {self.peek()!r}")
+        self.pos += 1
+
+    def decode(self):
+        """Decode the next complete JSON value, reading more input until it parses"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or not self._fill(grow=True):
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(f, key, chunk_size=CHUNK_SIZE):
+    """
+    Yield the items of the top-level `key` array in a JSON object, one at a time
+    Other top-level values are parsed and discarded
+    """
+    reader = _Reader(f, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+
+    while True:
+        name = reader.decode()
+        reader.expect(':')
+
+        if name == key:
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.decode()
+                    if reader.peek() == ',':
+                        reader.pos += 1
+                        continue
+                    reader.expect(']')
+                    break
+            return
+
+        reader.decode()  # Skip this value
+        if reader.peek() != ',':
+            raise ValueError(f"Top-level key '{key}' not found")
+        reader.pos += 1
+
+
+def iter_ndjson(f):
+    """Yield one JSON value per non-empty line"""
+    for line_number, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {e}")
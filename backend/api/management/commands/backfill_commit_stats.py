@@ -0,0 +1,72 @@
+"""
+Management command to fill in stats for commits imported without them
+Run with: python manage.py backfill_commit_stats [--repo-id 1] [--github-token TOKEN] [--enqueue]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from api.jobs import enqueue
+from api.models import Repository
+from api.stats_backfill import StatsBackfill, pending_commits
+
+
+class Command(BaseCommand):
+    help = 'Fill additions / deletions / files_changed for commits stored without stats'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repo-id',
+            type=int,
+            help='Only backfill this repository'
+        )
+        parser.add_argument(
+            '--github-token',
+            type=str,
+            help='Token for GraphQL lookups (default: the repository\'s installation token)'
+        )
+        parser.add_argument(
+            '--enqueue',
+            action='store_true',
+            help='Queue a stats_backfill job for the workers instead of running here'
+        )
+
+    def handle(self, *args, **options):
+        repo_id = options.get('repo_id')
+        repository = None
+        if repo_id:
+            repository = Repository.objects.filter(id=repo_id).first()
+            if repository is None:
+                raise CommandError(f'Repository {repo_id} not found')
+
+        if options['enqueue']:
+            job = enqueue(
+                'stats_backfill',
+                payload={'github_token': options['github_token']} if options['github_token'] else {},
+                repository=repository,
+                dedupe_key=f'stats_backfill:{repo_id}' if repo_id else 'stats_backfill',
+            )
+            self.stdout.write(self.style.SUCCESS(f'Queued stats_backfill job {job.id}'))
+            return
+
+        pending = pending_commits(repository).count()
+        self.stdout.write(
+            self.style.SUCCESS(f'\nBackfilling stats for {pending} commits...\n')
+        )
+
+        def progress(repository, filled, unavailable, **state):
+            self.stdout.write(f'  {repository}: {filled} filled, {unavailable} unavailable')
+
+        result = StatsBackfill(
+            repository_ids=[repo_id] if repo_id else None,
+            github_token=options['github_token'],
+            progress=progress,
+        ).run()
+
+        for error in result['errors']:
+            self.stdout.write(self.style.ERROR(f"  ✗ {error['repository']}: {error['error']}"))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n✅ {result['filled']} commits filled, {result['unavailable']} unavailable, "
+                f"{result['remaining']} still pending\n"
+            )
+        )
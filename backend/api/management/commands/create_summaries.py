@@ -77,7 +77,7 @@ def process_single_issue(issue_id: int, api_key: str, base_url: str, model_name:
     summary=None; error_msg=None; client=None; issue=None
     try:
         client=openai.OpenAI(api_key=api_key, base_url=base_url, timeout=API_TIMEOUT)
-        issue=Issue.objects.get(pk=issue_id)
+        issue=Issue.objects.select_related('payload').get(pk=issue_id)
         if not isinstance(issue.raw_data, dict) or not issue.raw_data: return issue_id,None,"raw_data invalid."
         raw_data_str=json.dumps(issue.raw_data); user_prompt=f"GitHub issue JSON:\n{raw_data_str}\n\nGenerate summary."
         response=client.chat.completions.create(model=model_name, messages=[{"role":"system","content":system_prompt},{"role":"user","content":user_prompt}],temperature=0.3,max_tokens=100,n=1)
@@ -94,7 +94,7 @@ def process_single_commit(commit_id: int, api_key: str, base_url: str, model_nam
     summary=None; error_msg=None; client=None; commit=None
     try:
         client=openai.OpenAI(api_key=api_key, base_url=base_url, timeout=API_TIMEOUT)
-        commit=Commit.objects.get(pk=commit_id)
+        commit=Commit.objects.select_related('payload').get(pk=commit_id)
         if not isinstance(commit.raw_data, dict) or not commit.raw_data: return commit_id,None,"raw_data invalid."
         raw_data_str=json.dumps(commit.raw_data); user_prompt=f"GitHub commit JSON:\n{raw_data_str}\n\nGenerate summary."
         response=client.chat.completions.create(model=model_name, messages=[{"role":"system","content":system_prompt},{"role":"user","content":user_prompt}],temperature=0.3,max_tokens=100,n=1)
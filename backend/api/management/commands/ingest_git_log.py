@@ -0,0 +1,64 @@
+"""
+Management command to load commit history from a local git directory
+Run with: python manage.py ingest_git_log --repo-id 1 [--git-dir /path/to/clone/.git]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.git_ingest import GitLogError, ingest_repository
+from api.models import Repository
+
+
+class Command(BaseCommand):
+    help = 'Import commits with per-file stats from `git log --numstat` (no GitHub API calls)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repo-id',
+            type=int,
+            required=True,
+            help='Repository to load commits into'
+        )
+        parser.add_argument(
+            '--git-dir',
+            default=None,
+            help='Git directory to read (default: the repository\'s local_path)'
+        )
+        parser.add_argument(
+            'revisions',
+            nargs='*',
+            help='Revisions / ranges to ingest, e.g. main or old..new (default: all refs)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            repository = Repository.objects.get(id=options['repo_id'])
+        except Repository.DoesNotExist:
+            raise CommandError(f"Repository {options['repo_id']} not found")
+
+        self.stdout.write(
+            self.style.SUCCESS(f'\nIngesting git history for {repository.name}...\n')
+        )
+
+        started = time.monotonic()
+
+        def progress(scanned, created):
+            self.stdout.write(f'  {scanned} commits scanned, {created} new')
+
+        try:
+            result = ingest_repository(
+                repository,
+                git_dir=options['git_dir'],
+                revisions=options['revisions'] or None,
+                progress=progress,
+            )
+        except GitLogError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n✅ {result['created']} new commits of {result['scanned']} "
+                f"({result['contributors']} contributors) in {time.monotonic() - started:.1f}s\n"
+            )
+        )
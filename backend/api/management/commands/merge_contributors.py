@@ -0,0 +1,35 @@
+"""
+Management command to merge duplicate contributors
+Run with: python manage.py merge_contributors [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+
+from api.identity import merge_duplicates
+
+
+class Command(BaseCommand):
+    help = 'Merge contributors that share a GitHub login, id or commit email'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list the groups that would be merged'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            self.style.SUCCESS('\nLooking for duplicate contributors...\n')
+        )
+
+        merged = merge_duplicates(dry_run=options['dry_run'])
+
+        for canonical, duplicates in merged:
+            self.stdout.write(f"  {canonical} <- {', '.join(duplicates)}")
+
+        verb = 'Would merge' if options['dry_run'] else 'Merged'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n✅ {verb} {sum(len(d) for _, d in merged)} contributors into {len(merged)}\n"
+            )
+        )
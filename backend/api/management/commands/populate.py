@@ -1,5 +1,6 @@
 import json
 import os
+import time
 from urllib.parse import urlparse
 from typing import Optional, Tuple
 
@@ -10,6 +11,9 @@ from django.utils import timezone
 # Assuming your models are in an app named 'api'
 # Adjust the import if your app name is different
 from api.models import Repository, Contributor, RepositoryWork, Issue, Commit
+from api.json_stream import iter_json_array, iter_ndjson
+
+BULK_BATCH_SIZE = 1000
 
 # --- Helper Function (copied from fetch.py or imported) ---
 def parse_github_url(url: str) -> Optional[Tuple[str, str]]:
@@ -35,7 +39,7 @@ def parse_github_url(url: str) -> Optional[Tuple[str, str]]:
 
 # --- Django Management Command ---
 class Command(BaseCommand):
-    help = 'Populates the database with contributor and repository data from a JSON file.'
+    help = 'Populates the database with contributor and repository data from a JSON (or NDJSON) file.'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -48,173 +52,298 @@ class Command(BaseCommand):
             action='store_true',
             help='Clear existing data in the related tables before populating.',
         )
+        parser.add_argument(
+            '--format',
+            choices=['auto', 'json', 'ndjson'],
+            default='auto',
+            help="'json' = fetch.py output ({\"contributors\": [...]}), 'ndjson' = one contributor per line. "
+                 "Default: by file extension (.ndjson/.jsonl = ndjson).",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Contributors per upsert batch / transaction (default: 200).',
+        )
+        parser.add_argument(
+            '--offset',
+            type=int,
+            default=None,
+            help='Skip the first N contributors (resume an interrupted run).',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            default=None,
+            help='File recording the last committed contributor offset; resumes from it when present.',
+        )
 
-    @transaction.atomic
     def handle(self, *args, **options):
         json_file_path = options['json_file']
         clear_data = options['clear']
+        batch_size = options['batch_size']
+        checkpoint_path = options['checkpoint']
 
         if not os.path.exists(json_file_path):
             raise CommandError(f"JSON file not found at: {json_file_path}")
 
-        try:
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except json.JSONDecodeError as e:
-            raise CommandError(f"Error decoding JSON file: {e}")
-        except IOError as e:
-            raise CommandError(f"Error reading JSON file: {e}")
-
-        if 'contributors' not in data or not isinstance(data['contributors'], list):
-            raise CommandError("Invalid JSON format: Expected a 'contributors' key with a list value.")
+        offset = options['offset']
+        if offset is None:
+            offset = self._read_checkpoint(checkpoint_path)
+        if clear_data and offset:
+            raise CommandError("--clear can't be combined with resuming from an offset.")
 
-        contributors_data = data['contributors']
+        file_format = options['format']
+        if file_format == 'auto':
+            file_format = 'ndjson' if json_file_path.endswith(('.ndjson', '.jsonl')) else 'json'
 
         if clear_data:
             self.stdout.write(self.style.WARNING("Clearing existing data..."))
             # Clear in reverse order of dependencies
-            Commit.objects.all().delete()
-            Issue.objects.all().delete()
-            RepositoryWork.objects.all().delete()
-            Contributor.objects.all().delete()
-            Repository.objects.all().delete()
+            with transaction.atomic():
+                Commit.objects.all().delete()
+                Issue.objects.all().delete()
+                RepositoryWork.objects.all().delete()
+                Contributor.objects.all().delete()
+                Repository.objects.all().delete()
             self.stdout.write(self.style.SUCCESS("Existing data cleared."))
 
-        self.stdout.write(f"Starting population from {json_file_path}...")
+        self.stdout.write(f"Starting population from {json_file_path} ({file_format}, batch size {batch_size})...")
+        if offset:
+            self.stdout.write(f"Resuming after contributor {offset}.")
 
-        repo_cache = {} # Cache Repository objects to avoid repeated lookups
-        contributor_cache = {} # Cache Contributor objects
+        self.repo_cache = {}  # repository URL -> Repository
+        self.counts = {'repositories': 0, 'works': 0, 'issues': 0, 'commits': 0}
 
-        total_contributors = len(contributors_data)
+        started = time.monotonic()
+        position = 0
         processed_contributors = 0
-        repo_creation_count = 0
-        repo_work_count = 0
-        issue_count = 0
-        commit_count = 0
+        batch = []
 
+        try:
+            with open(json_file_path, 'r', encoding='utf-8') as f:
+                if file_format == 'ndjson':
+                    contributors = iter_ndjson(f)
+                else:
+                    contributors = iter_json_array(f, 'contributors')
+
+                for contributor_data in contributors:
+                    position += 1
+                    if position <= offset:
+                        continue
+                    batch.append(contributor_data)
+
+                    if len(batch) >= batch_size:
+                        processed_contributors += self._flush(batch)
+                        batch = []
+                        self._write_checkpoint(checkpoint_path, position)
+                        self._report(position, processed_contributors, started)
+
+                if batch:
+                    processed_contributors += self._flush(batch)
+                    self._write_checkpoint(checkpoint_path, position)
+        except (json.JSONDecodeError, ValueError) as e:
+            raise CommandError(f"Error decoding JSON file after contributor {position}: {e}")
+        except IOError as e:
+            raise CommandError(f"Error reading JSON file: {e}")
 
-        for contributor_data in contributors_data:
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"\nProcessed {processed_contributors} contributors in {elapsed:.1f}s."))
+        self.stdout.write(f"Created/updated {len(self.repo_cache)} repositories ({self.counts['repositories']} new).")
+        self.stdout.write(f"Created {self.counts['works']} new RepositoryWork links.")
+        self.stdout.write(f"Created/updated {self.counts['issues']} issues.")
+        self.stdout.write(f"Created/updated {self.counts['commits']} commits.")
+        self.stdout.write(self.style.SUCCESS("Database population completed successfully!"))
+
+    # --- Resume support ---
+
+    @staticmethod
+    def _read_checkpoint(path):
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path, 'r', encoding='utf-8') as f:
+            return int(f.read().strip() or 0)
+
+    @staticmethod
+    def _write_checkpoint(path, position):
+        if not path:
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(position))
+        os.replace(tmp_path, path)
+
+    def _report(self, position, processed, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        rows = sum(self.counts.values())
+        self.stdout.write(
+            f"Committed through contributor {position} - "
+            f"{processed / elapsed:.0f} contributors/s, {rows / elapsed:.0f} rows/s "
+            f"(resume with --offset {position})"
+        )
+
+    # --- Batched upserts ---
+
+    @transaction.atomic
+    def _flush(self, batch):
+        """Upsert one batch of contributors with their works, issues and commits"""
+        contributors_by_name = {}
+        for contributor_data in batch:
             username = contributor_data.get('username')
             if not username:
-                # self.stdout.write(self.style.WARNING("Skipping contributor entry with missing username."))
                 continue
+            if username in contributors_by_name:
+                # fetch.py --parallel writes one line per contributor per repository
+                works = contributors_by_name[username].get('works', []) + contributor_data.get('works', [])
+                contributor_data = {**contributor_data, 'works': works}
+            contributors_by_name[username] = contributor_data  # Last entry wins, like update_or_create
+
+        if not contributors_by_name:
+            return 0
+
+        # --- 1. Contributors ---
+        Contributor.objects.bulk_create(
+            [
+                Contributor(
+                    username=username,
+                    url=data.get('url', ''),
+                    avatar_url=data.get('avatar_url', ''),
+                    summary=data.get('summary', ''),  # Use summary if available in JSON, else empty
+                )
+                for username, data in contributors_by_name.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['username'],
+            update_fields=['url', 'avatar_url', 'summary', 'updated_at'],
+        )
+        contributors = {
+            c.username: c for c in Contributor.objects.filter(username__in=list(contributors_by_name))
+        }
+
+        # --- 2./3. Repositories (created once, cached for the whole run) ---
+        pending_works = []  # (contributor, repo_url, work_data)
+        for username, data in contributors_by_name.items():
+            for work_data in data.get('works', []):
+                repo_url = work_data.get('repository_url')
+                if repo_url:
+                    pending_works.append((contributors[username], repo_url, work_data))
+        self._ensure_repositories({repo_url for _, repo_url, _ in pending_works})
+
+        # --- 4. RepositoryWork ---
+        work_keys = {
+            (self.repo_cache[repo_url].id, contributor.id)
+            for contributor, repo_url, _ in pending_works if repo_url in self.repo_cache
+        }
+        existing_works = self._works_for(work_keys)
+        RepositoryWork.objects.bulk_create(
+            [
+                RepositoryWork(repository_id=repo_id, contributor_id=contributor_id, summary='')
+                for repo_id, contributor_id in work_keys - existing_works.keys()
+            ],
+            ignore_conflicts=True,
+        )
+        works = self._works_for(work_keys)
+        self.counts['works'] += len(works) - len(existing_works)
+
+        # --- 5./6. Issues and commits, keyed by (work, url) as before ---
+        issue_rows = {}
+        commit_rows = {}
+        for contributor, repo_url, work_data in pending_works:
+            repository = self.repo_cache.get(repo_url)
+            if not repository:
+                continue
+            work_id = works[(repository.id, contributor.id)]
 
-            # --- 1. Create or Update Contributor ---
-            contributor, created = Contributor.objects.update_or_create(
-                username=username,
-                defaults={
-                    'url': contributor_data.get('url', ''),
-                    'avatar_url': contributor_data.get('avatar_url', ''),
-                    'summary': contributor_data.get('summary', ''), # Use summary if available in JSON, else empty
+            for issue_data in work_data.get('issues', []):
+                # Get the URL from 'html_url' field
+                issue_url = issue_data.get('html_url')
+                if not issue_url:
+                    self.stdout.write(self.style.WARNING(f"Skipping issue for repo {repo_url} due to missing 'html_url'."))
+                    continue
+                # Store the rest of the data without the URL key
+                raw_data_for_db = {k: v for k, v in issue_data.items() if k != 'html_url'}
+                issue_rows[(work_id, issue_url)] = raw_data_for_db
+
+            for commit_data in work_data.get('commits', []):
+                commit_url = commit_data.get('url')
+                if not commit_url:
+                    continue
+                commit_rows[(work_id, commit_url)] = {
+                    'message': commit_data.get('message'),
+                    'files_changed': commit_data.get('files_changed'),
+                    'diff_patch': commit_data.get('diff_patch')
                 }
-            )
-            contributor_cache[username] = contributor
-            processed_contributors += 1
-            if created and processed_contributors % 50 == 0:
-                 self.stdout.write(f"Processed {processed_contributors}/{total_contributors} contributors...")
 
+        self.counts['issues'] += self._upsert_by_work_url(Issue, issue_rows)
+        self.counts['commits'] += self._upsert_by_work_url(Commit, commit_rows)
 
-            # --- 2. Process Works (Repositories) for this Contributor ---
-            works_data = contributor_data.get('works', [])
-            for work_data in works_data:
-                repo_url = work_data.get('repository_url')
-                if not repo_url:
-                    # self.stdout.write(self.style.WARNING(f"Skipping work entry for contributor {username} due to missing repository_url."))
-                    continue
+        return len(contributors_by_name)
 
-                # --- 3. Create or Update Repository ---
-                repository_obj = repo_cache.get(repo_url)
-                if not repository_obj:
-                    parsed_repo = parse_github_url(repo_url)
-                    if not parsed_repo:
-                        # self.stdout.write(self.style.WARNING(f"Skipping repository {repo_url} for contributor {username} due to invalid URL format."))
-                        continue
-                    owner, repo_name = parsed_repo
-                    full_name = f"{owner}/{repo_name}"
-
-                    repository_obj, repo_created = Repository.objects.update_or_create(
-                        url=repo_url,
-                        defaults={
-                            'name': full_name,
-                            'avatar_url': '', # Not available in input JSON
-                            'summary': '',     # Not available in input JSON
-                            'raw_data': '',    # Could store full repo details if fetched separately
-                        }
-                    )
-                    repo_cache[repo_url] = repository_obj
-                    if repo_created:
-                        repo_creation_count += 1
-
-
-                # --- 4. Create or Update RepositoryWork ---
-                repo_work, work_created = RepositoryWork.objects.update_or_create(
-                    repository=repository_obj,
-                    contributor=contributor,
-                    defaults={
-                        'summary': '', # Set RepositoryWork summary to empty or customize as needed
-                    }
-                )
-                if work_created:
-                    repo_work_count += 1
-
-
-                # --- 5. Create or Update Issues for this RepositoryWork ---
-                issues_data = work_data.get('issues', [])
-                for issue_data in issues_data:
-                    # --- MODIFICATION START ---
-                    # Get the URL from 'html_url' field
-                    issue_url = issue_data.get('html_url')
-                    if not issue_url:
-                        self.stdout.write(self.style.WARNING(f"Skipping issue for repo {repo_url} due to missing 'html_url'."))
-                        continue
+    def _ensure_repositories(self, repo_urls):
+        """Fill repo_cache for `repo_urls`, creating repositories that don't exist yet"""
+        missing = [url for url in repo_urls if url not in self.repo_cache]
+        if not missing:
+            return
 
-                    # Prepare the raw_data field by excluding the 'html_url'
-                    # Make a copy to avoid modifying the original dict during iteration
-                    raw_data_for_db = issue_data.copy()
-                    if 'html_url' in raw_data_for_db:
-                        del raw_data_for_db['html_url'] # Remove the URL key
-
-                    issue, issue_created = Issue.objects.update_or_create(
-                        work=repo_work,
-                        url=issue_url, # Use the extracted URL
-                        defaults={
-                            'raw_data': raw_data_for_db, # Store the rest of the data
-                            'summary': '', # Set summary to empty as requested
-                        }
-                    )
-                    # --- MODIFICATION END ---
-                    if issue_created:
-                        issue_count += 1
-
-
-                # --- 6. Create or Update Commits for this RepositoryWork ---
-                commits_data = work_data.get('commits', [])
-                for commit_data in commits_data:
-                    commit_url = commit_data.get('url')
-                    if not commit_url:
-                        continue
+        for repository in Repository.objects.filter(url__in=missing).order_by('id'):
+            self.repo_cache.setdefault(repository.url, repository)
 
-                    # Prepare raw_data for commit (keeping previous logic)
-                    commit_raw_data_subset = {
-                        'message': commit_data.get('message'),
-                        'files_changed': commit_data.get('files_changed'),
-                        'diff_patch': commit_data.get('diff_patch')
-                    }
-
-                    commit, commit_created = Commit.objects.update_or_create(
-                        work=repo_work,
-                        url=commit_url,
-                        defaults={
-                            'raw_data': commit_raw_data_subset, # Store the specific subset
-                            'summary': '', # Set summary to empty as requested
-                        }
-                    )
-                    if commit_created:
-                        commit_count += 1
-
-        self.stdout.write(self.style.SUCCESS(f"\nProcessed {processed_contributors} contributors."))
-        self.stdout.write(f"Created/updated {len(repo_cache)} repositories ({repo_creation_count} new).")
-        self.stdout.write(f"Created {repo_work_count} new RepositoryWork links.")
-        self.stdout.write(f"Created {issue_count} new issues.")
-        self.stdout.write(f"Created {commit_count} new commits.")
-        self.stdout.write(self.style.SUCCESS("Database population completed successfully!"))
\ No newline at end of file
+        new_repositories = []
+        for repo_url in missing:
+            if repo_url in self.repo_cache:
+                continue
+            parsed_repo = parse_github_url(repo_url)
+            if not parsed_repo:
+                continue
+            owner, repo_name = parsed_repo
+            repository = Repository.objects.create(
+                url=repo_url,
+                name=f"{owner}/{repo_name}",
+                avatar_url='',  # Not available in input JSON
+                summary='',     # Not available in input JSON
+                raw_data='',    # Could store full repo details if fetched separately
+            )
+            self.repo_cache[repo_url] = repository
+            new_repositories.append(repository)
+        self.counts['repositories'] += len(new_repositories)
+
+    @staticmethod
+    def _works_for(work_keys):
+        """(repository_id, contributor_id) -> RepositoryWork id for the given keys"""
+        if not work_keys:
+            return {}
+        works = RepositoryWork.objects.filter(
+            repository_id__in={repo_id for repo_id, _ in work_keys},
+            contributor_id__in={contributor_id for _, contributor_id in work_keys},
+        ).values_list('repository_id', 'contributor_id', 'id')
+        return {(repo_id, contributor_id): work_id for repo_id, contributor_id, work_id in works}
+
+    @staticmethod
+    def _upsert_by_work_url(model, rows):
+        """
+        Insert or update `model` rows keyed by (work_id, url) with raw_data and an
+        empty summary. There is no unique constraint on the pair, so existing ids
+        are looked up first and the rest inserted.
+        """
+        if not rows:
+            return 0
+
+        existing = {}
+        for row_id, work_id, url in model.objects.filter(
+            work_id__in={work_id for work_id, _ in rows},
+            url__in={url for _, url in rows},
+        ).values_list('id', 'work_id', 'url'):
+            existing[(work_id, url)] = row_id
+
+        to_update = [
+            model(id=existing[key], raw_data=raw_data, summary='')
+            for key, raw_data in rows.items() if key in existing
+        ]
+        to_create = [
+            model(work_id=work_id, url=url, raw_data=raw_data, summary='')
+            for (work_id, url), raw_data in rows.items() if (work_id, url) not in existing
+        ]
+
+        model.objects.bulk_update(to_update, ['raw_data', 'summary'], batch_size=BULK_BATCH_SIZE)
+        model.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+        return len(rows)
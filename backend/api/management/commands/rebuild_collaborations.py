@@ -0,0 +1,48 @@
+"""
+Management command to rebuild the collaboration graph for all repositories
+Run with: python manage.py rebuild_collaborations
+"""
+from django.core.management.base import BaseCommand
+from api.collaboration_graph import rebuild_all_collaborations
+
+
+class Command(BaseCommand):
+    help = 'Rebuild Collaboration rows for all repositories'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-contributors',
+            type=int,
+            default=None,
+            help='Only pair up the top N committers per repository (default: all)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            self.style.SUCCESS('\nRebuilding collaboration graph for all repositories...\n')
+        )
+
+        results = rebuild_all_collaborations(max_contributors=options['max_contributors'])
+
+        success_count = 0
+        for result in results:
+            if result['success']:
+                success_count += 1
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"✅ {result['repository']}: "
+                        f"{result['created']} created, {result['updated']} updated"
+                    )
+                )
+            else:
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"❌ {result['repository']}: {result['error']}"
+                    )
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\n✅ Completed: {success_count}/{len(results)} repositories\n'
+            )
+        )
@@ -0,0 +1,110 @@
+"""
+Management command to run background job workers (imports, syncs)
+Run with: python manage.py run_workers
+"""
+import logging
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+
+def work(poll_interval, job_types, burst):
+    """Worker process loop: claim a job, run it, repeat"""
+    from api.jobs import claim_job, release_stale_jobs, run_job, worker_id
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+    worker = worker_id()
+    last_stale_check = 0
+
+    while not stopping:
+        try:
+            if time.monotonic() - last_stale_check > 60:
+                release_stale_jobs()
+                last_stale_check = time.monotonic()
+
+            job = claim_job(worker, job_types)
+        except DatabaseError as e:
+            # Database restart / failover: reconnect on the next poll
+            logger.warning(f"Job queue poll failed: {e}")
+            connections.close_all()
+            time.sleep(poll_interval)
+            continue
+
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        run_job(job)
+        # Long imports can outlive the server's idle timeout
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run background job worker processes for imports and syncs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=settings.JOB_WORKER_PROCESSES,
+            help=f'Number of worker processes (default: {settings.JOB_WORKER_PROCESSES})'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help='Seconds to wait when the queue is empty'
+        )
+        parser.add_argument(
+            '--types',
+            nargs='+',
+            default=None,
+            help='Only run these job types (e.g. repository_import bulk_import)'
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling'
+        )
+
+    def handle(self, *args, **options):
+        processes = max(options['processes'], 1)
+        job_args = (options['poll_interval'], options['types'], options['burst'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'\nStarting {processes} job worker process(es)...\n')
+        )
+
+        if processes == 1:
+            work(*job_args)
+            return
+
+        # Children must open their own database connections
+        connections.close_all()
+        workers = [multiprocessing.Process(target=work, args=job_args) for _ in range(processes)]
+        for process in workers:
+            process.start()
+
+        def shutdown(*args):
+            for process in workers:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        try:
+            for process in workers:
+                process.join()
+        except KeyboardInterrupt:
+            shutdown()
+            for process in workers:
+                process.join()
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Workers stopped\n'))
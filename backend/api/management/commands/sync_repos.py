@@ -1,9 +1,13 @@
 """
 Sync imported repositories with latest GitHub data
+Cheap probes (branch heads, newest issue update, contributor count) decide what
+is re-fetched; --full re-imports everything
 """
 from django.core.management.base import BaseCommand
 from api.models import Repository
 from api.github_importer import GitHubImporter
+from api.reconcile import RepositoryReconciler
+from api.sync_lock import RepositoryBusy, repository_sync
 from django.utils import timezone
 
 
@@ -21,6 +25,11 @@ class Command(BaseCommand):
             type=str,
             help='GitHub Personal Access Token (optional)',
         )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Re-import everything instead of only what the probes show is stale',
+        )
 
     def handle(self, *args, **options):
         repo_id = options.get('repo_id')
@@ -41,26 +50,47 @@ class Command(BaseCommand):
         self.stdout.write(f'Syncing {repositories.count()} repositories...\n')
         
         importer = GitHubImporter(github_token)
+        reconciler = RepositoryReconciler(github_token)
         success_count = 0
+        busy_count = 0
         error_count = 0
         
         for repo in repositories:
             try:
                 self.stdout.write(f'Syncing: {repo.name} ({repo.url})')
                 
-                # Re-import the repository (will update existing data)
-                importer.import_repository(repo.url)
-                
-                repo.updated_at = timezone.now()
-                repo.save()
+                if options['full']:
+                    # Re-import the repository (will update existing data)
+                    with repository_sync(repo.id):
+                        importer.import_repository(repo.url)
+                    
+                    repo.updated_at = timezone.now()
+                    repo.save()
+                    
+                    success_count += 1
+                    self.stdout.write(self.style.SUCCESS(f'  ✓ {repo.name} synced successfully'))
+                    continue
                 
+                with repository_sync(repo.id):
+                    result = reconciler.reconcile(repo)
                 success_count += 1
-                self.stdout.write(self.style.SUCCESS(f'  ✓ {repo.name} synced successfully'))
+                if not result['stale']:
+                    self.stdout.write(self.style.SUCCESS(f'  ✓ {repo.name} up to date'))
+                    continue
+                self.stdout.write(self.style.SUCCESS(
+                    f"  ✓ {repo.name} synced ({', '.join(result['stale'])} stale): "
+                    f"{result['commits']} new commits, {result['issues']['new']} new / "
+                    f"{result['issues']['updated']} updated issues, {result['contributors']} new contributors"
+                ))
+            
+            except RepositoryBusy:
+                busy_count += 1
+                self.stdout.write(self.style.WARNING(f'  - {repo.name} skipped: another sync of it is running'))
             
             except Exception as e:
                 error_count += 1
                 self.stdout.write(self.style.ERROR(f'  ✗ Failed to sync {repo.name}: {str(e)}'))
         
         self.stdout.write(self.style.SUCCESS(
-            f'\n{success_count} repositories synced successfully, {error_count} errors'
+            f'\n{success_count} repositories synced successfully, {busy_count} busy, {error_count} errors'
         ))
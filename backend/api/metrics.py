@@ -0,0 +1,60 @@
+"""
+Lightweight in-process metrics
+Counters and timings for the sync pipeline, exposed via /api/sync/metrics/
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_timings = {}
+
+
+def _key(name, labels):
+    if not labels:
+        return name
+    label_str = ','.join(f'{k}={v}' for k, v in sorted(labels.items()))
+    return f'{name}{{{label_str}}}'
+
+
+def increment(name, value=1, **labels):
+    """Increment a counter"""
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def observe(name, seconds, **labels):
+    """Record a duration (count / total / max)"""
+    key = _key(name, labels)
+    with _lock:
+        timing = _timings.setdefault(key, {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+        timing['count'] += 1
+        timing['total_seconds'] += seconds
+        timing['max_seconds'] = max(timing['max_seconds'], seconds)
+
+
+@contextmanager
+def timer(name, **labels):
+    """Context manager that observes the duration of its block"""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        observe(name, time.monotonic() - start, **labels)
+
+
+def get_counter(name, **labels):
+    with _lock:
+        return _counters.get(_key(name, labels), 0)
+
+
+def snapshot():
+    """Copy of all counters and timings"""
+    with _lock:
+        timings = {
+            key: {**value, 'avg_seconds': value['total_seconds'] / value['count'] if value['count'] else 0.0}
+            for key, value in _timings.items()
+        }
+        return {'counters': dict(_counters), 'timings': timings}
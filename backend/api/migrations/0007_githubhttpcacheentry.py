@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-17 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_merge_20251109_1317'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GitHubHTTPCacheEntry',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('url', models.TextField()),
+                ('etag', models.CharField(blank=True, max_length=255, null=True)),
+                ('last_modified', models.CharField(blank=True, max_length=64, null=True)),
+                ('body', models.BinaryField()),
+                ('headers', models.JSONField(blank=True, default=dict)),
+                ('hit_count', models.IntegerField(default=0)),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fetched_at'], name='api_githubh_fetched_3ce23c_idx')],
+            },
+        ),
+    ]
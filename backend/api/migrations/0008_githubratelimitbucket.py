@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-17 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_githubhttpcacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GitHubRateLimitBucket',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('key', models.CharField(max_length=128, unique=True)),
+                ('limit', models.IntegerField(blank=True, null=True)),
+                ('remaining', models.IntegerField(blank=True, null=True)),
+                ('reset_epoch', models.BigIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-17 02:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_githubratelimitbucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepositorySyncCursor',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('last_commit_sha', models.CharField(blank=True, max_length=40, null=True)),
+                ('last_commit_date', models.DateTimeField(blank=True, null=True)),
+                ('issues_since', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('repository', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sync_cursor', to='api.repository')),
+            ],
+        ),
+    ]
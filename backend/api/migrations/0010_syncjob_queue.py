@@ -0,0 +1,73 @@
+# Generated by Django 5.2 on 2026-10-17 02:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_repositorysynccursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncjob',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='syncjob',
+            name='dedupe_key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='syncjob',
+            name='locked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='syncjob',
+            name='locked_by',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='syncjob',
+            name='max_attempts',
+            field=models.IntegerField(default=3),
+        ),
+        migrations.AddField(
+            model_name='syncjob',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='syncjob',
+            name='progress',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='syncjob',
+            name='repository',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sync_jobs', to='api.repository'),
+        ),
+        migrations.AddField(
+            model_name='syncjob',
+            name='run_after',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='syncjob',
+            name='job_type',
+            field=models.CharField(choices=[('auto_import', 'Auto Import'), ('periodic_sync', 'Periodic Sync'), ('manual_sync', 'Manual Sync'), ('webhook_triggered', 'Webhook Triggered'), ('repository_import', 'Repository Import'), ('bulk_import', 'Bulk Import')], max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='syncjob',
+            index=models.Index(fields=['status', 'run_after'], name='api_syncjob_status_149930_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='syncjob',
+            index=models.Index(fields=['dedupe_key'], name='api_syncjob_dedupe__9f38cc_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-17 02:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_syncjob_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repository',
+            name='last_webhook_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='repository',
+            name='next_sync_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='repository',
+            name='sync_interval_seconds',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='repository',
+            index=models.Index(fields=['next_sync_at'], name='api_reposit_next_sy_348805_idx'),
+        ),
+    ]
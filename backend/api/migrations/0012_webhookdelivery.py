@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-17 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_repository_adaptive_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookDelivery',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('delivery_id', models.CharField(max_length=64, unique=True)),
+                ('event_type', models.CharField(max_length=64)),
+                ('action', models.CharField(blank=True, max_length=64, null=True)),
+                ('repository_github_id', models.BigIntegerField(blank=True, null=True)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(fields=['status', 'received_at'], name='api_webhook_status_e2a854_idx'), models.Index(fields=['event_type'], name='api_webhook_event_t_19ea33_idx')],
+            },
+        ),
+    ]
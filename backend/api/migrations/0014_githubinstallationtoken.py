@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-17 02:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_syncjob_health_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GitHubInstallationToken',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('installation_id', models.BigIntegerField(unique=True)),
+                ('token', models.TextField(blank=True, default='')),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('mint_hour', models.DateTimeField(blank=True, null=True)),
+                ('mints_this_hour', models.IntegerField(default=0)),
+                ('total_mints', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
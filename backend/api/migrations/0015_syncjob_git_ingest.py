@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_githubinstallationtoken'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='syncjob',
+            name='job_type',
+            field=models.CharField(choices=[('auto_import', 'Auto Import'), ('periodic_sync', 'Periodic Sync'), ('manual_sync', 'Manual Sync'), ('webhook_triggered', 'Webhook Triggered'), ('repository_import', 'Repository Import'), ('bulk_import', 'Bulk Import'), ('health_score', 'Health Score'), ('git_ingest', 'Git Log Ingest')], max_length=50),
+        ),
+    ]
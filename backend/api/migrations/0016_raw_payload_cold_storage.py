@@ -0,0 +1,108 @@
+# Generated by Django 5.2 on 2026-10-17 02:47
+
+import json
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+PAYLOADS = (('Commit', 'CommitPayload', 'commit'), ('Issue', 'IssuePayload', 'issue'))
+
+
+def move_payloads_to_cold_storage(apps, schema_editor):
+    """Compress every raw_data into its payload table and fill Commit.file_paths"""
+    for model_name, payload_name, fk in PAYLOADS:
+        model = apps.get_model('api', model_name)
+        payload_model = apps.get_model('api', payload_name)
+
+        last_id = 0
+        while True:
+            rows = list(
+                model.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'raw_data')[:BATCH_SIZE]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            payload_model.objects.bulk_create([
+                payload_model(**{f'{fk}_id': pk, 'data': zlib.compress(json.dumps(data, separators=(',', ':')).encode())})
+                for pk, data in rows if data is not None
+            ], ignore_conflicts=True)
+
+            if model_name == 'Commit':
+                model.objects.bulk_update([
+                    model(id=pk, file_paths=[f['filename'] for f in data['files'] if f.get('filename')])
+                    for pk, data in rows if isinstance(data, dict) and data.get('files')
+                ], ['file_paths'])
+
+
+def restore_payloads(apps, schema_editor):
+    """Reverse: decompress payloads back into the raw_data columns"""
+    for model_name, payload_name, fk in PAYLOADS:
+        model = apps.get_model('api', model_name)
+        payload_model = apps.get_model('api', payload_name)
+
+        last_id = 0
+        while True:
+            rows = list(
+                payload_model.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', 'data')[:BATCH_SIZE]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            model.objects.bulk_update([
+                model(id=pk, raw_data=json.loads(zlib.decompress(bytes(data))))
+                for pk, data in rows
+            ], ['raw_data'])
+
+        model.objects.filter(raw_data__isnull=True).update(raw_data={})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_syncjob_git_ingest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommitPayload',
+            fields=[
+                ('commit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='api.commit')),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IssuePayload',
+            fields=[
+                ('issue', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='api.issue')),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='commit',
+            name='file_paths',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        # Nullable first so the reverse migration can re-add the columns before refilling them
+        migrations.AlterField(
+            model_name='commit',
+            name='raw_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='issue',
+            name='raw_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(move_payloads_to_cold_storage, restore_payloads),
+        migrations.RemoveField(
+            model_name='commit',
+            name='raw_data',
+        ),
+        migrations.RemoveField(
+            model_name='issue',
+            name='raw_data',
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-17 02:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def add_username_aliases(apps, schema_editor):
+    """Existing contributors are known by their username (a login, or a git author name)"""
+    Contributor = apps.get_model('api', 'Contributor')
+    ContributorAlias = apps.get_model('api', 'ContributorAlias')
+    aliases = []
+    for contributor_id, username in Contributor.objects.order_by('id').values_list('id', 'username').iterator():
+        value = ' '.join(username.split()).lower()
+        if value:
+            kind = 'name' if ' ' in value else 'login'
+            aliases.append(ContributorAlias(kind=kind, value=value[:255], contributor_id=contributor_id))
+    # Case-only duplicates keep the oldest contributor
+    ContributorAlias.objects.bulk_create(aliases, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_raw_payload_cold_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContributorAlias',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('github_id', 'GitHub ID'), ('login', 'Login'), ('email', 'Email'), ('name', 'Name')], max_length=20)),
+                ('value', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('contributor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='api.contributor')),
+            ],
+            options={
+                'unique_together': {('kind', 'value')},
+            },
+        ),
+        migrations.RunPython(add_username_aliases, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-17 02:58
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def mark_commits_with_stats(apps, schema_editor):
+    """Commits with any non-zero stat came with real stats; all-zero ones are left for the backfill"""
+    Commit = apps.get_model('api', 'Commit')
+    Commit.objects.filter(Q(additions__gt=0) | Q(deletions__gt=0) | Q(files_changed__gt=0)).update(stats_complete=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_contributoralias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commit',
+            name='stats_complete',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='syncjob',
+            name='job_type',
+            field=models.CharField(choices=[('auto_import', 'Auto Import'), ('periodic_sync', 'Periodic Sync'), ('manual_sync', 'Manual Sync'), ('webhook_triggered', 'Webhook Triggered'), ('repository_import', 'Repository Import'), ('bulk_import', 'Bulk Import'), ('health_score', 'Health Score'), ('git_ingest', 'Git Log Ingest'), ('stats_backfill', 'Commit Stats Backfill')], max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='commit',
+            index=models.Index(fields=['stats_complete', 'work'], name='api_commit_stats_c_a6cdea_idx'),
+        ),
+        migrations.RunPython(mark_commits_with_stats, migrations.RunPython.noop),
+    ]
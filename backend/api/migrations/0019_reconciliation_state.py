@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-17 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_commit_stats_complete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repositorysynccursor',
+            name='branch_heads',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='repositorysynccursor',
+            name='commit_bloom',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='repositorysynccursor',
+            name='contributor_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='repositorysynccursor',
+            name='reconciled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='syncjob',
+            name='job_type',
+            field=models.CharField(choices=[('auto_import', 'Auto Import'), ('periodic_sync', 'Periodic Sync'), ('manual_sync', 'Manual Sync'), ('webhook_triggered', 'Webhook Triggered'), ('repository_import', 'Repository Import'), ('bulk_import', 'Bulk Import'), ('health_score', 'Health Score'), ('git_ingest', 'Git Log Ingest'), ('stats_backfill', 'Commit Stats Backfill'), ('repository_reconcile', 'Repository Reconcile')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_reconciliation_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repositorysynccursor',
+            name='ingested_refs',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-17 09:40
+
+from django.db import migrations
+
+
+def drop_plaintext_tokens(apps, schema_editor):
+    # Tokens are stored encrypted from now on; plaintext ones are simply minted again
+    GitHubInstallationToken = apps.get_model('api', 'GitHubInstallationToken')
+    GitHubInstallationToken.objects.exclude(token='').update(token='', expires_at=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_repositorysynccursor_ingested_refs'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_plaintext_tokens, migrations.RunPython.noop),
+    ]
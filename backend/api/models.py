@@ -3,6 +3,8 @@ from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from datetime import timedelta
 import json
+from api.encryption import decrypt, encrypt
+from api.raw_payloads import RawPayloadMixin, RawPayloadQuerySet
 
 # Create your models here.
 
@@ -270,6 +272,10 @@ class Repository(models.Model):
     last_synced_at = models.DateTimeField(null=True, blank=True)
     auto_sync_enabled = models.BooleanField(default=True)
     webhook_configured = models.BooleanField(default=False)
+    # Adaptive periodic sync (api/sync_schedule.py): busy repos come due often, idle ones back off
+    next_sync_at = models.DateTimeField(default=timezone.now)
+    sync_interval_seconds = models.IntegerField(default=0)
+    last_webhook_at = models.DateTimeField(null=True, blank=True)
     
     # Organization (RBAC)
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, 
@@ -306,6 +312,7 @@ class Repository(models.Model):
             models.Index(fields=['github_id']),
             models.Index(fields=['installation']),
             models.Index(fields=['last_synced_at']),
+            models.Index(fields=['next_sync_at']),
         ]
 
     def __str__(self):
@@ -380,8 +387,8 @@ class Contributor(models.Model):
     def __str__(self):
         return self.username
     
-    def calculate_score(self):
-        """Calculate gamification score and level"""
+    def apply_score(self):
+        """Set score, XP and level from the current stats (no save)"""
         # Score calculation
         score = (
             self.total_commits * 10 +
@@ -398,7 +405,11 @@ class Contributor(models.Model):
         
         # Level calculation (every 1000 XP = 1 level)
         self.level = max(1, self.experience_points // 1000)
-        
+        return self.total_score
+    
+    def calculate_score(self):
+        """Calculate gamification score and level"""
+        self.apply_score()
         self.save()
         return self.total_score
     
@@ -425,19 +436,47 @@ class Contributor(models.Model):
         hour_counts = {'morning': 0, 'afternoon': 0, 'evening': 0, 'night': 0}
         
         for commit in commits:
-            hour = commit.committed_at.hour
-            if 5 <= hour < 12:
-                hour_counts['morning'] += 1
-            elif 12 <= hour < 17:
-                hour_counts['afternoon'] += 1
-            elif 17 <= hour < 22:
-                hour_counts['evening'] += 1
-            else:
-                hour_counts['night'] += 1
+            hour_counts[self.work_period(commit.committed_at.hour)] += 1
         
         self.preferred_work_hours = max(hour_counts, key=hour_counts.get)
         self.save()
         return self.preferred_work_hours
+    
+    @staticmethod
+    def work_period(hour):
+        """Bucket an hour of day (0-23) into morning / afternoon / evening / night"""
+        if 5 <= hour < 12:
+            return 'morning'
+        elif 12 <= hour < 17:
+            return 'afternoon'
+        elif 17 <= hour < 22:
+            return 'evening'
+        return 'night'
+
+
+class ContributorAlias(models.Model):
+    """
+    A login, GitHub id, email or name that identifies a Contributor (see api/identity.py)
+    Values are normalized (lower-case, collapsed whitespace).
+    """
+    KIND_CHOICES = [
+        ('github_id', 'GitHub ID'),
+        ('login', 'Login'),
+        ('email', 'Email'),
+        ('name', 'Name'),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    value = models.CharField(max_length=255)
+    contributor = models.ForeignKey(Contributor, on_delete=models.CASCADE, related_name='aliases')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['kind', 'value']
+
+    def __str__(self):
+        return f"{self.kind}:{self.value} -> {self.contributor_id}"
 
 
 class RepositoryAccess(models.Model):
@@ -491,11 +530,13 @@ class RepositoryWork(models.Model):
     def __str__(self):
         return f"{self.contributor.username} - {self.repository.name}"
     
-class Issue(models.Model):
+class Issue(RawPayloadMixin, models.Model):
+    # raw_data (full GitHub payload) is stored compressed in IssuePayload, see api/raw_payloads.py
+    PAYLOAD_LOOKUP_FIELD = 'github_issue_id'
+    
     id = models.AutoField(primary_key=True)
     work = models.ForeignKey(RepositoryWork, on_delete=models.CASCADE, related_name='issues')
     url = models.URLField()
-    raw_data = models.JSONField()
     summary = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -513,6 +554,8 @@ class Issue(models.Model):
     is_feature = models.BooleanField(default=False)
     priority = models.CharField(max_length=20, default='medium')  # low, medium, high, critical
     
+    objects = RawPayloadQuerySet.as_manager()
+    
     class Meta:
         indexes = [
             models.Index(fields=['github_issue_id']),
@@ -523,7 +566,10 @@ class Issue(models.Model):
     def __str__(self):
         return f"Issue #{self.id} - {self.work.repository.name}"
 
-class Commit(models.Model):
+class Commit(RawPayloadMixin, models.Model):
+    # raw_data (full GitHub payload) is stored compressed in CommitPayload, see api/raw_payloads.py
+    PAYLOAD_LOOKUP_FIELD = 'sha'
+    
     id = models.AutoField(primary_key=True)
     work = models.ForeignKey(RepositoryWork, on_delete=models.CASCADE, related_name='commits')
     sha = models.CharField(max_length=40, unique=True, null=True, blank=True)  # Git SHA
@@ -531,7 +577,6 @@ class Commit(models.Model):
     repository = models.ForeignKey(Repository, on_delete=models.CASCADE, related_name='commits', null=True)
     contributor = models.ForeignKey(Contributor, on_delete=models.CASCADE, related_name='commits', null=True)
     url = models.URLField()
-    raw_data = models.JSONField()
     summary = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -540,19 +585,31 @@ class Commit(models.Model):
     additions = models.IntegerField(default=0)
     deletions = models.IntegerField(default=0)
     files_changed = models.IntegerField(default=0)
+    file_paths = models.JSONField(default=list, blank=True)  # Changed paths from the payload's files list
     committed_at = models.DateTimeField(blank=True, null=True)
     code_churn_ratio = models.FloatField(default=0.0)  # deletions / (additions + deletions)
+    # False until additions/deletions/files_changed are real (see api/stats_backfill.py)
+    stats_complete = models.BooleanField(default=False)
+    
+    objects = RawPayloadQuerySet.as_manager()
     
     class Meta:
         indexes = [
             models.Index(fields=['sha']),
             models.Index(fields=['work']),
             models.Index(fields=['committed_at']),
+            models.Index(fields=['stats_complete', 'work']),
         ]
     
     def __str__(self):
         return f"Commit #{self.id} - {self.work.repository.name}"
     
+    def index_raw_data(self, data):
+        """Copy the payload's changed file paths into file_paths"""
+        files = data.get('files') if isinstance(data, dict) else None
+        if files:
+            self.file_paths = [f['filename'] for f in files if f.get('filename')]
+    
     def calculate_churn(self):
         """Calculate code churn ratio"""
         total = self.additions + self.deletions
@@ -563,6 +620,18 @@ class Commit(models.Model):
         self.save()
 
 
+class CommitPayload(models.Model):
+    """zlib-compressed raw GitHub payload of a Commit (Commit.raw_data)"""
+    commit = models.OneToOneField(Commit, on_delete=models.CASCADE, primary_key=True, related_name='payload')
+    data = models.BinaryField()
+
+
+class IssuePayload(models.Model):
+    """zlib-compressed raw GitHub payload of an Issue (Issue.raw_data)"""
+    issue = models.OneToOneField(Issue, on_delete=models.CASCADE, primary_key=True, related_name='payload')
+    data = models.BinaryField()
+
+
 class Badge(models.Model):
     """Gamification badges"""
     BADGE_TYPES = [
@@ -695,6 +764,12 @@ class SyncJob(models.Model):
         ('periodic_sync', 'Periodic Sync'),
         ('manual_sync', 'Manual Sync'),
         ('webhook_triggered', 'Webhook Triggered'),
+        ('repository_import', 'Repository Import'),
+        ('bulk_import', 'Bulk Import'),
+        ('health_score', 'Health Score'),
+        ('git_ingest', 'Git Log Ingest'),
+        ('stats_backfill', 'Commit Stats Backfill'),
+        ('repository_reconcile', 'Repository Reconcile'),
     ]
     
     STATUS_CHOICES = [
@@ -707,10 +782,21 @@ class SyncJob(models.Model):
     
     id = models.AutoField(primary_key=True)
     installation = models.ForeignKey(GitHubAppInstallation, on_delete=models.CASCADE, related_name='sync_jobs', null=True, blank=True)
+    repository = models.ForeignKey(Repository, on_delete=models.CASCADE, related_name='sync_jobs', null=True, blank=True)
     
     job_type = models.CharField(max_length=50, choices=JOB_TYPE_CHOICES)
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='pending')
     
+    # Queue (see api/jobs.py) - workers claim pending jobs with SELECT ... FOR UPDATE SKIP LOCKED
+    payload = models.JSONField(default=dict, blank=True)
+    dedupe_key = models.CharField(max_length=255, blank=True, null=True)  # One pending/running job per key
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True, null=True)  # host:pid of the worker
+    locked_at = models.DateTimeField(null=True, blank=True)
+    progress = models.JSONField(default=dict, blank=True)  # e.g. {'current': 3, 'total': 10}
+    
     # Metrics
     repositories_processed = models.IntegerField(default=0)
     errors_count = models.IntegerField(default=0)
@@ -719,7 +805,7 @@ class SyncJob(models.Model):
     details = models.JSONField(default=dict, blank=True)
     error_message = models.TextField(blank=True, null=True)
     
-    # Timing
+    # Timing (started_at is reset when a worker picks the job up)
     started_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     
@@ -730,6 +816,8 @@ class SyncJob(models.Model):
             models.Index(fields=['job_type']),
             models.Index(fields=['status']),
             models.Index(fields=['-started_at']),
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['dedupe_key']),
         ]
     
     def __str__(self):
@@ -740,3 +828,148 @@ class SyncJob(models.Model):
         if self.completed_at:
             return (self.completed_at - self.started_at).total_seconds()
         return (timezone.now() - self.started_at).total_seconds()
+
+
+
+class RepositorySyncCursor(models.Model):
+    """
+    Incremental sync position per repository
+    Commits: newest SHA (and its commit date) already imported
+    Issues: highest updated_at seen, passed back to GitHub as `since`
+    Reconciliation (api/reconcile.py): the cheap signals seen on the last run
+    Mirror ingestion: the ref tips ingested so far
+    """
+    id = models.AutoField(primary_key=True)
+    repository = models.OneToOneField(Repository, on_delete=models.CASCADE, related_name='sync_cursor')
+    
+    last_commit_sha = models.CharField(max_length=40, blank=True, null=True)
+    last_commit_date = models.DateTimeField(null=True, blank=True)
+    issues_since = models.DateTimeField(null=True, blank=True)
+    
+    branch_heads = models.JSONField(default=dict, blank=True)  # {branch: head SHA}
+    contributor_count = models.IntegerField(null=True, blank=True)
+    commit_bloom = models.BinaryField(null=True, blank=True)  # CommitBloomFilter of the repository's SHAs
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    
+    # {refname: SHA} of the mirror refs whose commits are all ingested (api/git_mirror.py); null = never recorded
+    ingested_refs = models.JSONField(null=True, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Sync cursor for {self.repository.full_name}"
+
+class GitHubHTTPCacheEntry(models.Model):
+    """
+    Conditional-request cache for GitHub API GETs
+    Stores ETag / Last-Modified and the (zlib-compressed) body per URL + caller
+    identity, so unchanged pages come back as free 304s and are replayed from here
+    """
+    id = models.AutoField(primary_key=True)
+    cache_key = models.CharField(max_length=64, unique=True)  # sha256(url + rate-limit identity)
+    url = models.TextField()
+    
+    etag = models.CharField(max_length=255, blank=True, null=True)
+    last_modified = models.CharField(max_length=64, blank=True, null=True)
+    body = models.BinaryField()
+    headers = models.JSONField(default=dict, blank=True)  # Link / Content-Type for replay
+    
+    # Cache effectiveness
+    hit_count = models.IntegerField(default=0)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+    fetched_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['fetched_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.url} ({self.etag or self.last_modified})"
+
+
+class GitHubRateLimitBucket(models.Model):
+    """
+    Shared GitHub rate-limit budget for one installation/token and API resource
+    Row-locked by the rate governor so all workers draw from the same bucket
+    """
+    id = models.AutoField(primary_key=True)
+    key = models.CharField(max_length=128, unique=True)  # e.g. installation:123:core
+    
+    limit = models.IntegerField(null=True, blank=True)
+    remaining = models.IntegerField(null=True, blank=True)
+    reset_epoch = models.BigIntegerField(null=True, blank=True)  # X-RateLimit-Reset
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.key}: {self.remaining}/{self.limit}"
+
+
+
+
+class WebhookDelivery(models.Model):
+    """
+    Inbox of raw GitHub webhook deliveries
+    Stored and acknowledged in the request, processed later by the job workers.
+    GitHub redelivers on timeouts - the unique delivery_id makes retries no-ops.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.AutoField(primary_key=True)
+    delivery_id = models.CharField(max_length=64, unique=True)  # X-GitHub-Delivery
+    event_type = models.CharField(max_length=64)  # X-GitHub-Event
+    action = models.CharField(max_length=64, blank=True, null=True)
+    repository_github_id = models.BigIntegerField(null=True, blank=True)
+    payload = models.JSONField(default=dict)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    result = models.JSONField(default=dict, blank=True)
+    error_message = models.TextField(blank=True, null=True)
+    
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-received_at']
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+            models.Index(fields=['event_type']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} {self.delivery_id} ({self.status})"
+
+
+class GitHubInstallationToken(models.Model):
+    """
+    Shared GitHub App installation access token (see api/github_tokens.py)
+    One row per installation so every worker reuses the same token until it
+    nears expiry; the row lock serialises refreshes
+    """
+    id = models.AutoField(primary_key=True)
+    installation_id = models.BigIntegerField(unique=True)  # GitHub installation id
+    
+    token = models.TextField(blank=True, default='')  # Encrypted (api/encryption.py), use get_token/set_token
+    expires_at = models.DateTimeField(null=True, blank=True)
+    
+    # Mint rate (tokens minted in the current clock hour)
+    mint_hour = models.DateTimeField(null=True, blank=True)
+    mints_this_hour = models.IntegerField(default=0)
+    total_mints = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def get_token(self):
+        """Plaintext token ('' when there is none or it can't be decrypted)"""
+        return (decrypt(self.token) or '') if self.token else ''
+    
+    def set_token(self, token):
+        self.token = encrypt(token) if token else ''
+    
+    def __str__(self):
+        return f"Token for installation {self.installation_id} (expires {self.expires_at})"
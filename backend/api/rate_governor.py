@@ -0,0 +1,276 @@
+"""
+Cross-process GitHub rate-limit governor
+
+One token bucket per (installation or token, API resource), shared by every
+gunicorn worker / pod through the GitHubRateLimitBucket table. Callers take a
+permit before each GitHub request and report X-RateLimit-* headers afterwards,
+so the bucket always tracks GitHub's real remaining budget. Each process works
+on its own copy of the buckets and reconciles it with the table every
+GITHUB_RATE_LIMIT_SYNC_INTERVAL seconds, so requests don't pay for row locks.
+
+Interactive work (user-triggered imports) may spend the whole budget; background
+work (periodic sync, webhooks) must leave GITHUB_RATE_LIMIT_BACKGROUND_RESERVE of
+it untouched and waits for the window to reset instead.
+"""
+import hashlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+from api import metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+_priority = ContextVar('github_request_priority', default=BACKGROUND)
+
+
+@contextmanager
+def github_priority(priority):
+    """
+    Run GitHub calls made inside the block (or decorated function) at `priority`
+
+        with github_priority(INTERACTIVE):
+            importer.import_repository(url)
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+class GitHubRateLimitExceeded(Exception):
+    """No permit could be obtained within the allowed wait"""
+
+
+def rate_limit_key(authorization=None, installation_id=None):
+    """Bucket identity: the installation when known (tokens rotate hourly), else a token hash"""
+    if installation_id:
+        return f'installation:{installation_id}'
+    if authorization:
+        return 'token:' + hashlib.sha256(authorization.encode()).hexdigest()[:16]
+    return 'anonymous'
+
+
+def resource_for_url(url):
+    """GitHub keeps separate budgets per resource (X-RateLimit-Resource)"""
+    path = urlparse(url).path
+    if path.endswith('/graphql'):
+        return 'graphql'
+    if path.startswith('/search/'):
+        return 'search'
+    return 'core'
+
+
+def _new_bucket():
+    # spent: permits taken and seen: latest (limit, remaining, reset_epoch) headers, both since the last reconciliation
+    return SimpleNamespace(limit=None, remaining=None, reset_epoch=None, spent=0, seen=None, synced_at=None)
+
+
+def _expire(bucket, now):
+    """Window has reset - full budget until a response says otherwise"""
+    if bucket.reset_epoch and bucket.reset_epoch <= now:
+        bucket.remaining = bucket.limit
+        bucket.reset_epoch = None
+
+
+def _merge_reading(bucket, limit, remaining, reset_epoch):
+    """Apply an X-RateLimit-* reading to a bucket; False if it belongs to an earlier window"""
+    if bucket.reset_epoch and reset_epoch and reset_epoch < bucket.reset_epoch:
+        return False  # Late response from a previous window
+
+    if bucket.reset_epoch == reset_epoch and bucket.remaining is not None:
+        # Same window: responses can arrive out of order, trust the lowest count
+        remaining = min(remaining, bucket.remaining)
+
+    bucket.limit = limit or bucket.limit
+    bucket.remaining = remaining
+    bucket.reset_epoch = reset_epoch
+    return True
+
+
+class MemoryBucketStore:
+    """Process-local buckets (standalone scripts, tests), each behind its own lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # Guards the dicts only, never held while a bucket is in use
+        self._buckets = {}
+        self._key_locks = {}
+
+    @contextmanager
+    def locked(self, key):
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+            bucket = self._buckets.setdefault(key, _new_bucket())
+        with key_lock:
+            yield bucket
+
+
+class DatabaseBucketStore(MemoryBucketStore):
+    """
+    Process-local buckets reconciled with the GitHubRateLimitBucket table
+
+    A bucket first used, or last reconciled sync_interval seconds ago, merges
+    the permits spent and the headers seen since then into its row (one
+    SELECT ... FOR UPDATE) and continues from the shared state. Between
+    reconciliations workers can overspend by what each takes in one interval.
+    The round trip only holds that bucket's lock, requests for other
+    installations and resources go on meanwhile.
+    """
+
+    def __init__(self, sync_interval=5):
+        super().__init__()
+        self.sync_interval = sync_interval
+
+    @contextmanager
+    def locked(self, key):
+        with super().locked(key) as bucket:
+            if bucket.synced_at is None or time.monotonic() - bucket.synced_at >= self.sync_interval:
+                try:
+                    self._reconcile(key, bucket)
+                except Exception as e:
+                    # Carry on with the local copy, the next interval tries again
+                    logger.warning(f"Rate limit governor could not reconcile {key}: {e}")
+                bucket.synced_at = time.monotonic()
+            yield bucket
+
+    def _reconcile(self, key, bucket):
+        from django.db import IntegrityError, transaction
+        from api.models import GitHubRateLimitBucket
+
+        try:
+            GitHubRateLimitBucket.objects.get_or_create(key=key)
+        except IntegrityError:
+            pass  # Created concurrently by another worker
+
+        with transaction.atomic():
+            row = GitHubRateLimitBucket.objects.select_for_update().get(key=key)
+            _expire(row, time.time())
+            if bucket.seen:
+                _merge_reading(row, *bucket.seen)
+            if bucket.spent and row.remaining is not None:
+                row.remaining = max(0, row.remaining - bucket.spent)
+            row.save(update_fields=['limit', 'remaining', 'reset_epoch', 'updated_at'])
+
+        bucket.limit, bucket.remaining, bucket.reset_epoch = row.limit, row.remaining, row.reset_epoch
+        bucket.spent = 0
+        bucket.seen = None
+
+
+class RateLimitGovernor:
+    """Hands out request permits from shared per-key token buckets"""
+
+    def __init__(self, store, background_reserve=0.2, max_wait=3600, poll_interval=5):
+        self.store = store
+        self.background_reserve = background_reserve
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+
+    def _floor(self, bucket, priority):
+        """Permits that must stay untouched for this priority"""
+        if priority == INTERACTIVE or not bucket.limit:
+            return 0
+        return int(bucket.limit * self.background_reserve)
+
+    def _try_acquire(self, key, priority):
+        """Take a permit; return None on success or the seconds to wait"""
+        now = time.time()
+        with self.store.locked(key) as bucket:
+            _expire(bucket, now)
+
+            if bucket.remaining is None:
+                return None  # Unknown budget: let the request through and learn from its headers
+
+            if bucket.remaining > self._floor(bucket, priority):
+                bucket.remaining -= 1
+                bucket.spent += 1
+                return None
+
+            return max(1.0, (bucket.reset_epoch or now + 60) - now)
+
+    def acquire(self, key, priority=None):
+        """Block until a permit for `key` is available"""
+        priority = priority or current_priority()
+        deadline = time.monotonic() + self.max_wait
+
+        while True:
+            try:
+                wait = self._try_acquire(key, priority)
+            except Exception as e:
+                # Governor storage trouble must not take GitHub access down with it
+                logger.warning(f"Rate limit governor unavailable for {key}: {e}")
+                wait = None
+            if wait is None:
+                metrics.increment('github_rate_governor.permits', priority=priority)
+                return
+
+            if time.monotonic() + min(wait, self.poll_interval) > deadline:
+                raise GitHubRateLimitExceeded(
+                    f"GitHub rate limit budget for {key} exhausted; resets in {wait:.0f}s"
+                )
+
+            metrics.increment('github_rate_governor.waits', priority=priority)
+            logger.info(f"Rate limit governor: {priority} request for {key} waiting {min(wait, self.poll_interval):.0f}s")
+            time.sleep(min(wait, self.poll_interval))
+
+    def observe(self, key, headers):
+        """Sync the bucket with X-RateLimit-* response headers"""
+        remaining = headers.get('X-RateLimit-Remaining')
+        if remaining is None:
+            return
+
+        remaining = int(remaining)
+        limit = int(headers.get('X-RateLimit-Limit', 0)) or None
+        reset_epoch = int(headers.get('X-RateLimit-Reset', 0)) or None
+
+        try:
+            with self.store.locked(key) as bucket:
+                if _merge_reading(bucket, limit, remaining, reset_epoch):
+                    # The headers count every permit taken before them
+                    bucket.spent = 0
+                    bucket.seen = (limit, remaining, reset_epoch)
+        except Exception as e:
+            logger.warning(f"Rate limit governor could not record headers for {key}: {e}")
+
+
+_default_governor = None
+_default_governor_lock = threading.Lock()
+
+
+def get_default_governor():
+    """
+    Process-wide governor configured from Django settings
+    (GITHUB_RATE_LIMIT_GOVERNOR = 'db' | 'memory' | 'off'). Returns None when disabled.
+    """
+    global _default_governor
+    if _default_governor is not None:
+        return _default_governor or None
+
+    with _default_governor_lock:
+        if _default_governor is None:
+            from django.conf import settings
+            backend = getattr(settings, 'GITHUB_RATE_LIMIT_GOVERNOR', 'db')
+            options = {
+                'background_reserve': settings.GITHUB_RATE_LIMIT_BACKGROUND_RESERVE,
+                'max_wait': settings.GITHUB_RATE_LIMIT_MAX_WAIT,
+            }
+            if backend == 'db':
+                _default_governor = RateLimitGovernor(
+                    DatabaseBucketStore(settings.GITHUB_RATE_LIMIT_SYNC_INTERVAL), **options
+                )
+            elif backend == 'memory':
+                _default_governor = RateLimitGovernor(MemoryBucketStore(), **options)
+            else:
+                _default_governor = False
+    return _default_governor or None
@@ -0,0 +1,108 @@
+"""
+Cold storage for Commit / Issue raw_data
+
+The full GitHub API payloads (file patches included) used to be JSON columns on
+the commit and issue tables, read by every query and serializer. They now live
+zlib-compressed in CommitPayload / IssuePayload rows keyed by the owning row's
+id, and `raw_data` is a property: read lazily (select_related('payload') or
+prefetch_related('payload') batch it), written after save() / bulk_create() /
+bulk_update() by the mixin and queryset below, so existing call sites such as
+`Commit(raw_data=...)` keep working. Fields analytics need (stats, file paths)
+are regular columns.
+"""
+import json
+import zlib
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+BULK_BATCH_SIZE = 500
+
+
+def compress(data):
+    return zlib.compress(json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode())
+
+
+def decompress(blob):
+    return json.loads(zlib.decompress(bytes(blob)))
+
+
+def store_payloads(model, objs):
+    """Write pending raw_data of `objs` (instances of `model`) to its payload table"""
+    dirty = [obj for obj in objs if obj.__dict__.pop('_raw_data_dirty', False)]
+    if not dirty:
+        return 0
+
+    relation = model._meta.get_field('payload')
+    payload_model, fk = relation.related_model, relation.field.name
+
+    # bulk_create(ignore_conflicts=True) leaves pk unset: find the rows by natural key
+    key = model.PAYLOAD_LOOKUP_FIELD
+    unsaved = [getattr(obj, key) for obj in dirty if obj.pk is None and getattr(obj, key) is not None]
+    ids = dict(
+        model.objects.filter(**{f'{key}__in': unsaved}).values_list(key, 'pk')
+    ) if unsaved else {}
+
+    saved, looked_up = {}, {}
+    for obj in dirty:
+        rows = saved if obj.pk is not None else looked_up
+        pk = obj.pk if obj.pk is not None else ids.get(getattr(obj, key))
+        if pk is not None:
+            rows[pk] = payload_model(**{f'{fk}_id': pk, 'data': compress(obj.__dict__['_raw_data'])})
+
+    payload_model.objects.bulk_create(
+        list(saved.values()), batch_size=BULK_BATCH_SIZE,
+        update_conflicts=True, unique_fields=[fk], update_fields=['data'],
+    )
+    # Rows found by natural key may be conflicts bulk_create skipped: keep their stored payload
+    payload_model.objects.bulk_create(list(looked_up.values()), batch_size=BULK_BATCH_SIZE, ignore_conflicts=True)
+    return len(saved) + len(looked_up)
+
+
+class RawPayloadQuerySet(models.QuerySet):
+    """bulk_create / bulk_update that also write raw_data to the payload table"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        created = super().bulk_create(objs, *args, **kwargs)
+        store_payloads(self.model, objs)
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = [name for name in fields if name != 'raw_data']
+        updated = super().bulk_update(objs, fields, *args, **kwargs) if fields else 0
+        store_payloads(self.model, objs)
+        return updated
+
+
+class RawPayloadMixin:
+    """
+    `raw_data` backed by the model's `payload` one-to-one (CommitPayload / IssuePayload)
+    Models set PAYLOAD_LOOKUP_FIELD (a unique column) and may define
+    index_raw_data(data) to copy hot fields into columns when raw_data is set.
+    """
+
+    @property
+    def raw_data(self):
+        if '_raw_data' not in self.__dict__:
+            data = {}
+            if self.pk is not None:
+                try:
+                    data = decompress(self.payload.data)
+                except ObjectDoesNotExist:
+                    pass
+            self.__dict__['_raw_data'] = data
+        return self.__dict__['_raw_data']
+
+    @raw_data.setter
+    def raw_data(self, value):
+        self.__dict__['_raw_data'] = value
+        self.__dict__['_raw_data_dirty'] = True
+        if hasattr(self, 'index_raw_data'):
+            self.index_raw_data(value)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        store_payloads(type(self), [self])
@@ -0,0 +1,290 @@
+"""
+Reconciliation: refresh an imported repository by probing cheap signals first
+
+Re-importing a repository re-fetches everything just to find out whether
+anything changed. RepositoryReconciler instead compares a handful of cheap
+probes with what the last run saw (kept on RepositorySyncCursor) and only runs
+the heavy path behind a signal that moved:
+
+- HEAD SHA per branch (one /branches listing): a branch whose head is not a
+  known commit is walked back page by page until a page is entirely known;
+  only the unknown commits are imported
+- updated_at of the most recently updated issue (one request): if newer than
+  the cursor, only issues updated since then are fetched
+- contributor count (one per_page=1 request, read from the Link header): if it
+  changed, the contributor list is re-fetched and new contributors imported
+
+"Known" is answered by a per-repository Bloom filter of commit SHAs stored on
+the cursor, so the walk needs no query per page; unknown candidates are then
+confirmed against the database in one query. A false positive only hides a
+commit until its branch moves again.
+
+All probes go through the fetcher's CachedSession, so unchanged ones come back
+as free conditional 304s.
+"""
+import logging
+import math
+import struct
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api import metrics
+from api.collaboration_graph import build_collaborations
+from api.models import Commit, Contributor, ContributorAlias, Issue, RepositorySyncCursor
+
+logger = logging.getLogger(__name__)
+
+
+class CommitBloomFilter:
+    """
+    Bloom filter over commit SHAs
+    SHAs are already uniformly distributed, so the k bit positions come straight
+    from the digest (double hashing over two 64-bit slices) - no extra hashing.
+    """
+
+    HEADER = struct.Struct('>IIII')  # bits, hashes, capacity, count
+
+    def __init__(self, capacity, error_rate=None, bits=None, hashes=None, count=0, data=None):
+        error_rate = error_rate or settings.RECONCILE_BLOOM_ERROR_RATE
+        self.capacity = max(capacity, 1)
+        self.bits = bits or max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = hashes or max(1, round(self.bits / self.capacity * math.log(2)))
+        self.count = count
+        self.data = bytearray(data) if data is not None else bytearray((self.bits + 7) // 8)
+
+    @classmethod
+    def build(cls, shas, count):
+        """Filter sized for twice `count` SHAs (room to grow before a rebuild)"""
+        bloom = cls(capacity=max(count * 2, 1024))
+        for sha in shas:
+            bloom.add(sha)
+        return bloom
+
+    @classmethod
+    def from_bytes(cls, blob):
+        bits, hashes, capacity, count = cls.HEADER.unpack_from(blob)
+        return cls(capacity, bits=bits, hashes=hashes, count=count, data=blob[cls.HEADER.size:])
+
+    def to_bytes(self):
+        return self.HEADER.pack(self.bits, self.hashes, self.capacity, self.count) + bytes(self.data)
+
+    def _positions(self, sha):
+        h1, h2 = int(sha[:16], 16), int(sha[16:32], 16) | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, sha):
+        for position in self._positions(sha):
+            self.data[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, sha):
+        return all(self.data[position >> 3] & (1 << (position & 7)) for position in self._positions(sha))
+
+    @property
+    def full(self):
+        return self.count > self.capacity
+
+
+class RepositoryReconciler:
+    """
+    Probe an imported repository and refresh only what is stale
+
+    importer: the GitHubImporter whose fetcher (token, commit mode, session) and
+    import helpers are used for the heavy paths (default: a sequential one)
+    """
+
+    def __init__(self, github_token=None, importer=None):
+        from api.github_importer import GitHubImporter
+
+        self.importer = importer or GitHubImporter(github_token, concurrent=False)
+        self.fetcher = self.importer.fetcher
+
+    def probe(self, owner, name):
+        """The cheap signals, straight from GitHub"""
+        return {
+            'repository': self.fetcher.fetch_repository(owner, name),
+            'branch_heads': self.fetcher.fetch_branches(owner, name),
+            'newest_issue_updated_at': self.fetcher.fetch_newest_issue_update(owner, name),
+            'contributor_count': self.fetcher.count_contributors(owner, name),
+        }
+
+    def reconcile(self, repository, progress=None):
+        """
+        Compare the probes with the cursor and run the stale paths
+        progress: optional callback(phase, **state)
+        Returns {'stale': [...], 'commits', 'issues', 'contributors', ...}
+        """
+        owner, name = self.fetcher.parse_repo_url(repository.full_name or repository.url)
+        cursor, _ = RepositorySyncCursor.objects.get_or_create(repository=repository)
+
+        probes = self.probe(owner, name)
+        for field, value in self.importer._repository_fields(probes['repository']).items():
+            setattr(repository, field, value)
+        repository.save()
+        bloom = self._bloom(repository, cursor)
+
+        moved = {
+            branch: head for branch, head in probes['branch_heads'].items()
+            if cursor.branch_heads.get(branch) != head and head not in bloom
+        }
+        newest_issue = parse_datetime(probes['newest_issue_updated_at'] or '')
+        stale = {
+            'commits': bool(moved),
+            'issues': bool(newest_issue) and (cursor.issues_since is None or newest_issue > cursor.issues_since),
+            'contributors': probes['contributor_count'] != cursor.contributor_count,
+        }
+        stale = [signal for signal, is_stale in stale.items() if is_stale]
+        for signal in stale:
+            metrics.increment('reconcile.stale', signal=signal)
+        if not stale:
+            metrics.increment('reconcile.clean')
+        if progress:
+            progress('probed', stale=stale, branches=len(probes['branch_heads']), moved_branches=len(moved))
+
+        result = {'stale': stale, 'commits': 0, 'issues': {'new': 0, 'updated': 0}, 'contributors': 0}
+        last_id = Commit.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        if 'contributors' in stale:
+            result['contributors'] = self._reconcile_contributors(repository, owner, name)
+        if 'commits' in stale:
+            result.update(self._reconcile_commits(repository, owner, name, moved, bloom))
+        if 'issues' in stale:
+            result['issues'], issues_since = self._reconcile_issues(repository, owner, name, cursor.issues_since)
+
+        # Everything this run inserted goes into the filter and the derived stats
+        created = list(Commit.objects.filter(repository=repository, id__gt=last_id).values_list('sha', 'contributor'))
+        for sha, _ in created:
+            bloom.add(sha)
+        touched = {contributor_id for _, contributor_id in created}
+        if touched:
+            self.importer._update_contributor_stats(list(Contributor.objects.filter(id__in=touched)))
+        if created or result['contributors']:
+            build_collaborations(repository)
+        if stale:
+            repository.calculate_health_score()
+
+        cursor.branch_heads = probes['branch_heads']
+        cursor.contributor_count = probes['contributor_count']
+        if 'issues' in stale:
+            # The probe may have seen a pull request, which the issue fetch skips
+            cursor.issues_since = issues_since or newest_issue
+        cursor.commit_bloom = bloom.to_bytes()
+        cursor.reconciled_at = timezone.now()
+        cursor.save()
+        repository.last_synced_at = cursor.reconciled_at
+        repository.save(update_fields=['last_synced_at'])
+
+        if progress:
+            progress('done', **{key: value for key, value in result.items() if key != 'stale'})
+        return result
+
+    def _bloom(self, repository, cursor):
+        """The repository's SHA filter, rebuilt from the database when missing or over capacity"""
+        if cursor.commit_bloom:
+            bloom = CommitBloomFilter.from_bytes(bytes(cursor.commit_bloom))
+            if not bloom.full:
+                return bloom
+        shas = Commit.objects.filter(repository=repository).values_list('sha', flat=True)
+        return CommitBloomFilter.build(shas.iterator(), shas.count())
+
+    def _missing_commits(self, owner, name, moved, bloom):
+        """
+        Commits reachable from the moved heads that aren't stored yet, newest first
+        Each branch is walked back until a page is entirely in the filter.
+        Returns (commits, truncated)
+        """
+        candidates = {}
+        truncated = []
+        for branch, head in moved.items():
+            for pages, page in enumerate(self.fetcher.iter_commit_pages(owner, name, head), start=1):
+                # A page with nothing new: the rest of the branch is known (or was walked for another branch)
+                unknown = [c for c in page if c['sha'] not in bloom and c['sha'] not in candidates]
+                if not unknown:
+                    break
+                candidates.update((c['sha'], c) for c in unknown)
+                if pages >= settings.RECONCILE_MAX_COMMIT_PAGES:
+                    truncated.append(branch)
+                    break
+
+        # Bloom says "unknown" for sure only about this repository's filter: commits
+        # stored under another repository (or missed by the filter) are confirmed here
+        stored = set(Commit.objects.filter(sha__in=list(candidates)).values_list('sha', flat=True))
+        for sha in stored:
+            bloom.add(sha)
+        return [commit for sha, commit in candidates.items() if sha not in stored], truncated
+
+    def _reconcile_commits(self, repository, owner, name, moved, bloom):
+        if self.fetcher.commit_mode == 'mirror':
+            # One incremental fetch brings in whatever the branches gained
+            created = self.importer._import_commits_from_mirror(repository, f'{owner}/{name}', [])
+            return {'commits': created}
+
+        missing, truncated = self._missing_commits(owner, name, moved, bloom)
+        if truncated:
+            logger.warning(
+                f"Reconcile of {owner}/{name}: stopped walking {', '.join(truncated)} after "
+                f"{settings.RECONCILE_MAX_COMMIT_PAGES} pages"
+            )
+        if missing and self.fetcher.commit_mode == 'graphql':
+            # Stats for all of them in batched lookups instead of one call per commit
+            from api.github_graphql import GitHubGraphQLClient
+            client = GitHubGraphQLClient(self.fetcher.github_token, session=self.fetcher.session)
+            with_stats = client.fetch_commits(owner, name, [c['sha'] for c in missing])
+            for i, commit in enumerate(missing):
+                if commit['sha'] in with_stats:
+                    # GraphQL has no login for emails not linked to an account; keep the list's author
+                    found = with_stats[commit['sha']]
+                    if not found.get('author') and not found.get('committer'):
+                        found['author'] = commit.get('author')
+                    missing[i] = found
+        # List entries carry no stats: import_commits queues the stats backfill for them
+        created = self.importer.import_commits(repository, missing) if missing else 0
+        return {'commits': created, 'moved_branches': sorted(moved), 'truncated_branches': truncated}
+
+    def _reconcile_issues(self, repository, owner, name, since):
+        """
+        Issues updated since the cursor: new ones imported, known ones get their state refreshed
+        Returns (counts, new cursor position); the position is only set when the
+        fetch hit its cap, so the next run picks up after the last issue seen.
+        """
+        max_issues = 500
+        issues = self.fetcher.fetch_issues(owner, name, since=since, max_issues=max_issues)
+        issues_since = max(parse_datetime(i['updated_at']) for i in issues) if len(issues) >= max_issues else None
+        # `since` is inclusive: issues at the cursor come back and are re-applied (only real
+        # changes count), one updated later in that same second may not have been seen yet
+        known = set(
+            Issue.objects.filter(github_issue_id__in=[i['id'] for i in issues]).values_list('github_issue_id', flat=True)
+        )
+        updated = 0
+        for issue_data in issues:
+            if issue_data['id'] in known:
+                # Only rows that really change count
+                state, title = issue_data['state'], issue_data['title'][:500]
+                closed_at = parse_datetime(issue_data['closed_at']) if issue_data.get('closed_at') else None
+                updated += Issue.objects.filter(github_issue_id=issue_data['id']).exclude(
+                    state=state, title=title, closed_at=closed_at,
+                ).update(state=state, title=title, closed_at=closed_at)
+        new = [issue_data for issue_data in issues if issue_data['id'] not in known]
+        created = self.importer._import_issues(repository, new) if new else 0
+        return {'new': created, 'updated': updated}, issues_since
+
+    def _reconcile_contributors(self, repository, owner, name):
+        """Import the contributors GitHub lists that aren't stored yet (with their profile details)"""
+        listed = [c for c in self.fetcher.fetch_contributors(owner, name) if c.get('login')]
+        stored = set(ContributorAlias.objects.filter(
+            kind='login', value__in=[c['login'].lower() for c in listed]
+        ).values_list('value', flat=True))
+        new = []
+        for contributor in listed:
+            if contributor['login'].lower() in stored:
+                continue
+            try:
+                contributor = {**contributor, 'details': self.fetcher.fetch_contributor_details(contributor['login'])}
+            except Exception as e:
+                logger.warning(f"Could not fetch details for {contributor['login']}: {e}")
+            new.append(contributor)
+        if not new:
+            return 0
+        return len(self.importer._import_contributors(new))
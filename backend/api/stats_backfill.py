@@ -0,0 +1,238 @@
+"""
+Commit stats backfill
+
+REST imports only fetch per-commit stats for the first 100 commits (and push
+payloads carry none), so the rest are stored with zero additions, deletions and
+files_changed and stats_complete=False, which skews every churn metric.
+StatsBackfill fills them in, repository by repository in id order:
+
+- from `git log --no-walk --numstat` when the repository has a local git
+  directory or mirror (no API calls), otherwise
+- from batched GraphQL lookups (GitHubGraphQLClient.fetch_commits, 50 SHAs per
+  query) that take their permits from the shared rate-limit governor,
+
+writing each chunk with one bulk_update. The position (repository, last commit
+id) is reported as progress; a failed lookup stops the run so the retried job
+resumes exactly there. Rows only ever move to stats_complete=True, so runs can
+overlap or repeat safely.
+"""
+import logging
+import subprocess
+from contextlib import ExitStack, contextmanager
+from functools import partial
+
+from django.conf import settings
+
+from api.models import Commit, Repository
+
+logger = logging.getLogger(__name__)
+
+UPDATE_FIELDS = ['additions', 'deletions', 'files_changed', 'file_paths', 'code_churn_ratio', 'stats_complete']
+
+
+def pending_commits(repository=None):
+    """Commits still stored without stats"""
+    commits = Commit.objects.filter(stats_complete=False, sha__isnull=False)
+    if repository is not None:
+        commits = commits.filter(work__repository=repository)
+    return commits
+
+
+def _known_shas(git_dir, shas, env=None):
+    """The subset of `shas` that are commits in git_dir (one `git cat-file --batch-check`)"""
+    result = subprocess.run(
+        ['git', f'--git-dir={git_dir}', 'cat-file', '--batch-check=%(objectname) %(objecttype)'],
+        input='\n'.join(shas), env=env, capture_output=True, text=True,
+    )
+    return {
+        parts[0] for parts in (line.split() for line in result.stdout.splitlines())
+        if len(parts) == 2 and parts[1] == 'commit'
+    }
+
+
+class LocalStats:
+    """
+    Stats from a git directory on disk (built-in git server repository or mirror)
+    prefetch: optional callable(shas) run before `git log`, e.g. to batch-fetch a partial clone's blobs
+    """
+
+    def __init__(self, git_dir, env=None, prefetch=None):
+        self.git_dir = git_dir
+        self.env = env
+        self.prefetch = prefetch
+
+    def __call__(self, shas):
+        from api.git_ingest import iter_git_log
+
+        known = _known_shas(self.git_dir, shas, self.env)
+        if not known:
+            return {}, set()
+        if self.prefetch:
+            self.prefetch(sorted(known))
+        stats = {}
+        for commit in iter_git_log(self.git_dir, ['--no-walk=unsorted', *sorted(known)], env=self.env):
+            stats[commit['sha']] = {
+                'additions': commit['additions'],
+                'deletions': commit['deletions'],
+                'files_changed': commit['files_changed'],
+                'file_paths': [f['filename'] for f in commit['files']],
+            }
+        # Missing locally isn't final: the commit may reach the mirror with a later fetch
+        return stats, set()
+
+
+class GraphQLStats:
+    """Stats from batched GraphQL object lookups"""
+
+    def __init__(self, repository, token):
+        from api.github_graphql import GitHubGraphQLClient
+        from api.github_http import CachedSession
+
+        # Same governor bucket as the installation's sync traffic
+        rate_limit_key = f'installation:{repository.installation.installation_id}' if repository.installation_id else None
+        self.client = GitHubGraphQLClient(token, session=CachedSession(rate_limit_key=rate_limit_key))
+        self.owner, self.name = repository.full_name.split('/', 1)
+
+    def __call__(self, shas):
+        found = self.client.fetch_commits(self.owner, self.name, shas)
+        stats = {
+            sha: {
+                'additions': commit['stats']['additions'],
+                'deletions': commit['stats']['deletions'],
+                'files_changed': commit['files_changed'],
+            }
+            for sha, commit in found.items()
+        }
+        # GitHub doesn't know these SHAs in this repository: nothing to wait for
+        return stats, set(shas) - set(stats)
+
+
+class StatsBackfill:
+    """
+    Fill in stats for commits stored without them
+
+    repository_ids: limit to these repositories (default: every repository with pending commits)
+    github_token: token for GraphQL lookups (default: the repository's installation token)
+    resume: a previous run's progress ({'repository_id', 'last_id', ...}) to continue from
+    progress: callback(**state) after every chunk
+    """
+
+    def __init__(self, repository_ids=None, github_token=None, resume=None, progress=None, batch_size=None):
+        self.repository_ids = repository_ids
+        self.github_token = github_token
+        self.resume = resume or {}
+        self.progress = progress
+        self.batch_size = batch_size or settings.STATS_BACKFILL_BATCH_SIZE
+        self.filled = self.resume.get('filled', 0)
+        self.unavailable = self.resume.get('unavailable', 0)
+        self.errors = []
+
+    def repositories(self):
+        ids = pending_commits().values_list('work__repository', flat=True).distinct()
+        repositories = Repository.objects.filter(id__in=ids)
+        if self.repository_ids:
+            repositories = repositories.filter(id__in=self.repository_ids)
+        if self.resume.get('repository_id'):
+            repositories = repositories.filter(id__gte=self.resume['repository_id'])
+        return repositories.select_related('installation').order_by('id')
+
+    @contextmanager
+    def source(self, repository):
+        """
+        Callable shas -> (stats by sha, shas known to have none) for this repository
+        A mirror stays locked until the block exits, so it can't be evicted mid-backfill.
+        """
+        from api.git_mirror import git_env, mirror_store
+
+        if repository.is_local and repository.local_path:
+            yield LocalStats(repository.local_path)
+            return
+
+        token = self.github_token
+        if repository.full_name:
+            mirror = mirror_store.path_for(repository.full_name)
+            if (mirror / 'HEAD').exists():
+                with mirror_store.lock(mirror):
+                    # Checked again under the lock: it may have been evicted while we waited
+                    if (mirror / 'HEAD').exists():
+                        env = git_env(token)
+                        prefetch = None
+                        if mirror_store.filter_spec:
+                            # Otherwise numstat fetches the missing blobs lazily, one round trip each
+                            prefetch = partial(mirror_store.prefetch_commit_blobs, mirror, env=env)
+                        yield LocalStats(mirror, env=env, prefetch=prefetch)
+                        return
+            if not token and repository.installation_id:
+                from api.github_tokens import get_installation_token
+                token = get_installation_token(repository.installation.installation_id)
+        if not token or not repository.full_name:
+            raise ValueError(f'No local git directory or GitHub token for {repository.name}')
+        yield GraphQLStats(repository, token)
+
+    def run(self):
+        repositories_processed = 0
+        for repository in self.repositories():
+            last_id = self.resume.get('last_id', 0) if repository.id == self.resume.get('repository_id') else 0
+            with ExitStack() as stack:
+                try:
+                    source = stack.enter_context(self.source(repository))
+                except Exception as e:
+                    # Nothing to look stats up with: retrying won't help, move on
+                    logger.warning(f"Stats backfill skipped {repository.name}: {e}")
+                    self.errors.append({'repository': repository.name, 'error': str(e)})
+                    continue
+                # Lookup errors (rate limits, network) propagate: the job retries from the last progress
+                filled = self._backfill_repository(repository, source, last_id)
+            repositories_processed += 1
+            if filled:
+                from api.jobs import schedule_health_score
+                schedule_health_score(repository)
+
+        return {
+            'filled': self.filled,
+            'unavailable': self.unavailable,
+            'remaining': pending_commits().filter(
+                **({'work__repository__in': self.repository_ids} if self.repository_ids else {})
+            ).count(),
+            'repositories_processed': repositories_processed,
+            'errors': self.errors,
+        }
+
+    def _backfill_repository(self, repository, source, last_id):
+        """Fill the repository's pending commits after `last_id` chunk by chunk. Returns the number filled."""
+        filled = 0
+        while True:
+            chunk = list(
+                pending_commits(repository).filter(id__gt=last_id).order_by('id')
+                .only('id', 'sha', *UPDATE_FIELDS)[:self.batch_size]
+            )
+            if not chunk:
+                return filled
+
+            stats, unavailable = source([commit.sha for commit in chunk])
+            changed = []
+            for commit in chunk:
+                found = stats.get(commit.sha)
+                if found:
+                    commit.additions = found['additions']
+                    commit.deletions = found['deletions']
+                    commit.files_changed = found['files_changed']
+                    if found.get('file_paths'):
+                        commit.file_paths = found['file_paths']
+                    total = commit.additions + commit.deletions
+                    commit.code_churn_ratio = commit.deletions / total if total > 0 else 0.0
+                elif commit.sha not in unavailable:
+                    continue
+                commit.stats_complete = True
+                changed.append(commit)
+            Commit.objects.bulk_update(changed, UPDATE_FIELDS, batch_size=self.batch_size)
+
+            filled += len(stats)
+            self.filled += len(stats)
+            self.unavailable += len(unavailable)
+            last_id = chunk[-1].id
+            if self.progress:
+                self.progress(
+                    repository_id=repository.id, repository=repository.name, last_id=last_id,
+                    filled=self.filled, unavailable=self.unavailable,
+                )
@@ -0,0 +1,124 @@
+"""
+Per-repository sync lock
+
+A webhook push, the periodic sync and a manual sync can all reach the same
+repository at once, doubling API usage and racing on Commit.sha. Every sync
+entry point runs inside repository_sync(), which holds a lock per repository:
+
+- PostgreSQL: a session-level advisory lock (pg_try_advisory_lock) keyed by
+  (LOCK_NAMESPACE, repository id), so it works across worker processes and hosts
+- other databases (SQLite in development): an fcntl lock file per repository
+  under SYNC_LOCK_DIR, which covers the processes of one host; without fcntl
+  (Windows) a threading.Lock per repository, which covers one process
+
+The lock is only ever tried, never queued for: a sync that finds the
+repository busy raises RepositoryBusy. Queued jobs are put back until the
+holder finishes (api/jobs.py), the periodic sync skips the repository.
+Nested repository_sync() calls for a repository the thread already holds pass
+straight through.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+from api import metrics
+
+# First key of the two-key advisory lock, so sync locks can't collide with other advisory lock users
+LOCK_NAMESPACE = 0x5359  # 'SY'
+
+_held = threading.local()
+
+# Fallback locks where fcntl is missing: repository id -> threading.Lock
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+class RepositoryBusy(Exception):
+    """Another sync holds the repository's lock"""
+
+    def __init__(self, repository_id):
+        super().__init__(f'A sync of repository {repository_id} is already running')
+        self.repository_id = repository_id
+
+
+def _held_ids():
+    if not hasattr(_held, 'ids'):
+        _held.ids = set()
+    return _held.ids
+
+
+def _try_advisory_lock(repository_id):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', [LOCK_NAMESPACE, repository_id])
+        return cursor.fetchone()[0]
+
+
+def _advisory_unlock(repository_id):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_unlock(%s, %s)', [LOCK_NAMESPACE, repository_id])
+
+
+class _HeldThreadLock:
+    """A held threading.Lock, released by close() like a lock file"""
+
+    def __init__(self, lock):
+        self.close = lock.release
+
+
+def _try_thread_lock(repository_id):
+    with _thread_locks_guard:
+        lock = _thread_locks.setdefault(repository_id, threading.Lock())
+    return _HeldThreadLock(lock) if lock.acquire(blocking=False) else None
+
+
+def _try_file_lock(repository_id):
+    try:
+        import fcntl
+    except ImportError:
+        return _try_thread_lock(repository_id)
+
+    os.makedirs(settings.SYNC_LOCK_DIR, exist_ok=True)
+    lock_file = open(os.path.join(settings.SYNC_LOCK_DIR, f'repository-{repository_id}.lock'), 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+@contextmanager
+def repository_sync(repository_id, wait=0):
+    """
+    Hold the sync lock of one repository for the duration of the block
+    wait: seconds to keep retrying a busy lock before raising RepositoryBusy
+    """
+    held = _held_ids()
+    if repository_id in held:
+        yield
+        return
+
+    postgres = connection.vendor == 'postgresql'
+    deadline = time.monotonic() + wait
+    while True:
+        lock = _try_advisory_lock(repository_id) if postgres else _try_file_lock(repository_id)
+        if lock:
+            break
+        if time.monotonic() >= deadline:
+            metrics.increment('sync_lock.busy')
+            raise RepositoryBusy(repository_id)
+        time.sleep(0.2)
+
+    held.add(repository_id)
+    try:
+        yield
+    finally:
+        held.discard(repository_id)
+        if postgres:
+            _advisory_unlock(repository_id)
+        else:
+            lock.close()  # Closing the file releases the flock
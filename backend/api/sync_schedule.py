@@ -0,0 +1,76 @@
+"""
+Adaptive Sync Scheduling
+Each repository carries its own next_sync_at. After every sync the interval is
+recomputed from recent commit/issue velocity: busy repositories come due every
+few minutes, repositories where a sync finds nothing back off exponentially, and
+repositories with live webhooks only need an occasional reconciliation pass.
+"""
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from api.models import Repository, Commit, Issue
+
+DAY = 86400
+VELOCITY_WINDOW = timedelta(days=7)
+# Aim for roughly a quarter of a day's changes per sync
+CHANGES_PER_SYNC = 0.25
+# A webhook delivery within this window means the repo's webhook is live
+WEBHOOK_FRESHNESS = timedelta(days=1)
+JITTER = 0.1
+
+SCHEDULE_FIELDS = ['next_sync_at', 'sync_interval_seconds']
+
+
+def activity_per_day(repository, now=None):
+    """Commits plus closed issues per day over the last week (GitHub timestamps)"""
+    since = (now or timezone.now()) - VELOCITY_WINDOW
+    commits = Commit.objects.filter(repository=repository, committed_at__gte=since).count()
+    closed = Issue.objects.filter(work__repository=repository, closed_at__gte=since).count()
+    return (commits + closed) / VELOCITY_WINDOW.days
+
+
+def schedule_next_sync(repository, changes=None, failed=False, now=None):
+    """
+    Set repository.next_sync_at / sync_interval_seconds (caller saves SCHEDULE_FIELDS)
+
+    changes: number of new/updated items the sync found (None = unknown)
+    failed: the sync raised - back off like an idle repository
+    """
+    now = now or timezone.now()
+    min_interval = settings.GITHUB_SYNC_MIN_INTERVAL
+    max_interval = settings.GITHUB_SYNC_MAX_INTERVAL
+
+    velocity_interval = DAY * CHANGES_PER_SYNC / (1 + activity_per_day(repository, now))
+    interval = min(max(velocity_interval, min_interval), max_interval)
+
+    if failed or changes == 0:
+        # Nothing new: double the previous interval
+        interval = min(max(repository.sync_interval_seconds * 2, interval), max_interval)
+
+    if repository.last_webhook_at and now - repository.last_webhook_at < WEBHOOK_FRESHNESS:
+        interval = max(interval, settings.GITHUB_SYNC_WEBHOOK_INTERVAL)
+
+    # Spread repositories out so they don't all come due on the same cycle
+    interval *= random.uniform(1 - JITTER, 1 + JITTER)
+
+    repository.sync_interval_seconds = int(interval)
+    repository.next_sync_at = now + timedelta(seconds=interval)
+    return repository.sync_interval_seconds
+
+
+def due_repositories(installations=None, now=None):
+    """Auto-synced repositories whose next_sync_at has passed (uses the next_sync_at index)"""
+    repos = Repository.objects.filter(
+        next_sync_at__lte=now or timezone.now(),
+        auto_sync_enabled=True,
+        installation__isnull=False,
+    )
+    if installations is not None:
+        repos = repos.filter(installation__in=installations)
+    return repos.order_by('next_sync_at')
+
+
+def record_webhook(github_repository_id):
+    """Note a webhook delivery for a repository (slows its periodic sync down)"""
+    Repository.objects.filter(github_id=github_repository_id).update(last_webhook_at=timezone.now())
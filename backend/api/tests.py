@@ -1,3 +1,1673 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import hmac
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api import github_tokens, jobs, metrics
+from api.collaboration_graph import build_collaborations
+from api.contributor_stats import add_commits, refresh_contributor_stats
+from api.git_ingest import iter_git_log, parse_git_log, push_revisions
+from api.git_mirror import ingest_from_mirror, mirror_store
+from api.git_server import GitRepository
+from api.github_async_fetcher import AsyncGitHubFetcher
+from api.github_fetcher import GitHubFetcher
+from api.github_graphql import GitHubGraphQLClient, commit_node_to_rest
+from api.github_http import CachedSession, ConditionalRequestCache, DatabaseCacheStore, FileCacheStore
+from api.github_sync import GitHubSyncManager, WebhookProcessor
+from api.identity import find_duplicates, merge_duplicates, resolve_contributor, resolve_contributors, resolver
+from api.json_stream import iter_json_array, iter_ndjson
+from api.management.commands import populate
+from api.models import (
+    Collaboration, Commit, CommitPayload, Contributor, ContributorAlias, GitHubAppInstallation, GitHubHTTPCacheEntry,
+    GitHubInstallationToken, GitHubRateLimitBucket, Issue, Repository, RepositorySyncCursor, RepositoryWork, SyncJob,
+    WebhookDelivery,
+)
+from api.rate_governor import (
+    BACKGROUND, INTERACTIVE, DatabaseBucketStore, GitHubRateLimitExceeded, MemoryBucketStore,
+    RateLimitGovernor, github_priority,
+)
+from api.reconcile import CommitBloomFilter, RepositoryReconciler
+from api.stats_backfill import StatsBackfill, pending_commits
+from api.sync_lock import RepositoryBusy, repository_sync
+from api.sync_schedule import due_repositories, schedule_next_sync
+
+
+# The fake servers' latency, unaffected by tests that skip retry backoff
+real_sleep = asyncio.sleep
+
+
+def make_repository(name='repo', **fields):
+    return Repository.objects.create(
+        name=name, full_name=f'octo/{name}', url=f'https://github.com/octo/{name}', avatar_url='', summary='', **fields
+    )
+
+
+def make_contributor(username):
+    return Contributor.objects.create(username=username, url='', avatar_url='', summary='')
+
+
+def make_commit(repository, contributor, sha, **fields):
+    work, _ = RepositoryWork.objects.get_or_create(repository=repository, contributor=contributor)
+    return Commit.objects.create(
+        work=work, repository=repository, contributor=contributor, sha=sha, url='', summary='', **fields
+    )
+
+
+def sha_of(value):
+    return hashlib.sha1(str(value).encode()).hexdigest()
+
+
+@contextmanager
+def held_sync_lock(repository_id):
+    """Hold a repository's sync lock from another thread, as a concurrent sync would"""
+    acquired, release = threading.Event(), threading.Event()
+
+    def hold():
+        try:
+            with repository_sync(repository_id):
+                acquired.set()
+                release.wait()
+        finally:
+            connection.close()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    acquired.wait()
+    try:
+        yield
+    finally:
+        release.set()
+        holder.join()
+
+
+# ----------------------------------------------------------------------------
+# Fetching from GitHub
+# ----------------------------------------------------------------------------
+
+class AsyncFetcherTests(TestCase):
+    def setUp(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+        self.failures = {'/repos/octo/repo/commits/' + sha_of(2): 1}
+
+    async def github(self, request):
+        """A small fake of the REST endpoints fetch_all_data reads"""
+        path, page = request.url.path, request.url.params.get('page', '1')
+        self.requests.append((path, page))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await real_sleep(0.01)
+            if self.failures.get(path):
+                self.failures[path] -= 1
+                return httpx.Response(502)
+            if path == '/repos/octo/repo':
+                return httpx.Response(200, json={'name': 'repo', 'full_name': 'octo/repo'})
+            if path == '/repos/octo/repo/contributors':
+                return httpx.Response(200, json=[{'login': f'dev{n}'} for n in range(1, 4)])
+            if path.startswith('/users/'):
+                return httpx.Response(200, json={'login': path.rsplit('/', 1)[1], 'name': 'Dev'})
+            if path == '/repos/octo/repo/commits':
+                return httpx.Response(200, json=[{'sha': sha_of(n)} for n in range(1, 4)])
+            if path.startswith('/repos/octo/repo/commits/'):
+                return httpx.Response(200, json={'sha': path.rsplit('/', 1)[1], 'stats': {'additions': 1}})
+            if path == '/repos/octo/repo/issues':
+                link = '<https://api.github.com/repos/octo/repo/issues?per_page=100&page=3>; rel="last"'
+                issues = [{'number': int(page)}, {'number': 10 + int(page), 'pull_request': {}}]
+                return httpx.Response(200, json=issues, headers={'Link': link})
+            return httpx.Response(404)
+        finally:
+            self.in_flight -= 1
+
+    def fetch(self, **options):
+        real_client = httpx.AsyncClient
+        fetcher = AsyncGitHubFetcher('token', **options)
+        fetcher.governor = None
+        fetcher.http_cache = None
+        with mock.patch('httpx.AsyncClient', lambda **kwargs: real_client(transport=httpx.MockTransport(self.github), **kwargs)), \
+                mock.patch('asyncio.sleep', mock.AsyncMock()):
+            return fetcher.fetch_all_data('https://github.com/octo/repo')
+
+    def test_fetch_all_data_fans_out_with_bounded_concurrency(self):
+        data = self.fetch(max_concurrency=3)
+
+        self.assertEqual(data['repository']['full_name'], 'octo/repo')
+        self.assertEqual([c['details']['login'] for c in data['contributors']], ['dev1', 'dev2', 'dev3'])
+        self.assertEqual([c['stats'] for c in data['commits']], [{'additions': 1}] * 3)
+        # Pages 2..3 come from the Link header's last page; pull requests are dropped
+        self.assertEqual(data['issues'], [{'number': 1}, {'number': 2}, {'number': 3}])
+        self.assertLessEqual(self.max_in_flight, 3)
+        self.assertGreater(self.max_in_flight, 1)
+
+    def test_server_errors_are_retried(self):
+        data = self.fetch(max_concurrency=2)
+
+        self.assertEqual(data['commits'][1], {'sha': sha_of(2), 'stats': {'additions': 1}})
+        detail = '/repos/octo/repo/commits/' + sha_of(2)
+        self.assertEqual(sum(path == detail for path, _ in self.requests), 2)
+
+
+def graphql_commit(n, **fields):
+    """A GraphQL Commit node as the history / object(oid:) queries return it"""
+    return {
+        'oid': sha_of(n),
+        'url': f'https://github.com/octo/repo/commit/{sha_of(n)}',
+        'message': f'commit {n}',
+        'additions': 3,
+        'deletions': 1,
+        'changedFilesIfAvailable': 2,
+        'author': {'name': 'Dev', 'email': 'dev@example.com', 'date': '2024-01-01T00:00:00Z',
+                   'user': {'login': 'dev', 'avatarUrl': 'https://avatars/dev', 'url': 'https://github.com/dev'}},
+        'committer': {'name': 'GitHub', 'email': 'noreply@github.com', 'date': '2024-01-01T00:00:00Z', 'user': None},
+        **fields,
+    }
+
+
+class FakeGraphQLSession:
+    """Answers GraphQL posts from a callable of (query, variables) -> data"""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = []
+
+    def post(self, url, json, headers, timeout):
+        self.calls.append(json['variables'])
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'data': self.answer(json['query'], json['variables'])}
+        return response
+
+
+class GraphQLCommitTests(TestCase):
+    def test_commit_node_is_converted_to_the_rest_shape(self):
+        commit = commit_node_to_rest(graphql_commit(1, additions=None))
+
+        self.assertEqual(commit['sha'], sha_of(1))
+        self.assertEqual(commit['commit']['author'], {'name': 'Dev', 'email': 'dev@example.com', 'date': '2024-01-01T00:00:00Z'})
+        self.assertEqual(commit['author'], {'login': 'dev', 'avatar_url': 'https://avatars/dev', 'html_url': 'https://github.com/dev'})
+        self.assertIsNone(commit['committer'])
+        self.assertEqual(commit['stats'], {'additions': 0, 'deletions': 1, 'total': 1})
+        self.assertEqual(commit['files_changed'], 2)
+
+    def test_fetch_commits_batches_lookups_and_skips_unknown_shas(self):
+        known = {sha_of(n): graphql_commit(n) for n in range(1, 5)}
+
+        def answer(query, variables):
+            oids = {key: value for key, value in variables.items() if key.startswith('oid')}
+            return {'repository': {f'c{key[3:]}': known.get(sha) for key, sha in oids.items()}}
+
+        session = FakeGraphQLSession(answer)
+        client = GitHubGraphQLClient('token', session=session)
+        shas = [sha_of(n) for n in (1, 2, 2, 3, 99, 4)]
+
+        commits = client.fetch_commits('octo', 'repo', shas, batch_size=2)
+
+        self.assertEqual(set(commits), {sha_of(n) for n in range(1, 5)})
+        self.assertEqual(commits[sha_of(3)]['stats']['total'], 4)
+        # Duplicates are dropped before batching: 5 distinct SHAs -> 3 queries
+        self.assertEqual([len(call) - 2 for call in session.calls], [2, 2, 1])
+
+    @override_settings(GITHUB_GRAPHQL_MAX_COMMITS=3)
+    def test_graphql_mode_pages_history_up_to_the_cap(self):
+        def answer(query, variables):
+            start = int(variables['cursor'] or 0)
+            nodes = [graphql_commit(n) for n in range(start, start + 2)]
+            page_info = {'hasNextPage': True, 'endCursor': str(start + 2)}
+            return {'repository': {'defaultBranchRef': {'target': {'history': {'pageInfo': page_info, 'nodes': nodes}}}}}
+
+        fetcher = GitHubFetcher('token', commit_mode='graphql')
+        fetcher.session = FakeGraphQLSession(answer)
+
+        commits = fetcher.fetch_commits('octo', 'repo')
+
+        self.assertEqual([c['sha'] for c in commits], [sha_of(n) for n in range(3)])
+        self.assertEqual([call['cursor'] for call in fetcher.session.calls], [None, '2'])
+
+    def test_graphql_mode_needs_a_token(self):
+        self.assertEqual(GitHubFetcher(None, commit_mode='graphql').commit_mode, 'rest')
+
+
+class FakeAdapter(requests.adapters.BaseAdapter):
+    """requests transport answering from a callable of PreparedRequest -> (status, headers, body)"""
+
+    def __init__(self, answer):
+        super().__init__()
+        self.answer = answer
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        status, headers, body = self.answer(request)
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = body
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class HTTPCacheTests(TestCase):
+    def session(self, store, answer, token='one'):
+        session = CachedSession(cache=ConditionalRequestCache(store), governor=False)
+        session.headers['Authorization'] = f'token {token}'
+        session.adapter = FakeAdapter(answer)
+        session.mount('https://', session.adapter)
+        return session
+
+    @staticmethod
+    def github(request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            return 304, {'ETag': '"v1"'}, b''
+        return 200, {'ETag': '"v1"', 'Content-Type': 'application/json', 'Link': '<next>; rel="next"'}, b'[1, 2]'
+
+    def assert_replays_304s(self, store):
+        first = self.session(store, self.github)
+        self.assertEqual(first.get('https://api.github.com/repos/octo/repo/issues', params={'page': 2}).json(), [1, 2])
+
+        second = self.session(store, self.github)
+        response = second.get('https://api.github.com/repos/octo/repo/issues', params={'page': 2})
+
+        self.assertEqual(second.adapter.requests[0].headers['If-None-Match'], '"v1"')
+        self.assertTrue(response.from_cache)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [1, 2])
+        self.assertEqual(response.headers['Link'], '<next>; rel="next"')
+        self.assertEqual(second.http_cache.stats()['hits'], 1)
+
+    def test_database_store_replays_304s(self):
+        self.assert_replays_304s(DatabaseCacheStore())
+        self.assertEqual(GitHubHTTPCacheEntry.objects.get().hit_count, 1)
+
+    def test_file_store_replays_304s(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assert_replays_304s(FileCacheStore(directory))
+
+    def test_entries_are_not_shared_between_identities(self):
+        store = DatabaseCacheStore()
+        self.session(store, self.github, token='one').get('https://api.github.com/user')
+
+        other = self.session(store, self.github, token='two')
+        response = other.get('https://api.github.com/user')
+
+        self.assertNotIn('If-None-Match', other.adapter.requests[0].headers)
+        self.assertFalse(response.from_cache)
+
+    def test_responses_without_validators_are_not_stored(self):
+        session = self.session(DatabaseCacheStore(), lambda request: (200, {}, b'{}'))
+        session.get('https://api.github.com/user')
+
+        self.assertFalse(GitHubHTTPCacheEntry.objects.exists())
+
+    def test_prune_keeps_recently_hit_entries(self):
+        store = DatabaseCacheStore()
+        for key in ('stale', 'hit'):
+            store.set(key, f'https://api.github.com/{key}', '"e"', None, b'{}', {})
+        GitHubHTTPCacheEntry.objects.update(fetched_at=timezone.now() - timedelta(days=30))
+        store.record_hit('hit')
+
+        self.assertEqual(store.prune(3600), 1)
+        self.assertEqual(list(GitHubHTTPCacheEntry.objects.values_list('cache_key', flat=True)), ['hit'])
+
+
+def rate_headers(remaining, limit=100, reset=None):
+    return {'X-RateLimit-Remaining': str(remaining), 'X-RateLimit-Limit': str(limit),
+            'X-RateLimit-Reset': str(reset or int(time.time()) + 3600)}
+
+
+class RateGovernorTests(TestCase):
+    def governor(self, store=None):
+        return RateLimitGovernor(store or MemoryBucketStore(), background_reserve=0.2, max_wait=0)
+
+    def test_background_work_leaves_the_reserve(self):
+        governor = self.governor()
+        governor.observe('installation:1:core', rate_headers(21))
+
+        governor.acquire('installation:1:core', BACKGROUND)
+        with self.assertRaises(GitHubRateLimitExceeded):
+            governor.acquire('installation:1:core', BACKGROUND)
+        # Interactive imports may spend the reserve
+        with github_priority(INTERACTIVE):
+            governor.acquire('installation:1:core')
+
+    def test_late_readings_from_an_earlier_window_are_ignored(self):
+        governor = self.governor()
+        now = int(time.time())
+        governor.observe('key', rate_headers(50, reset=now + 3600))
+        governor.observe('key', rate_headers(60, reset=now + 3600))
+        governor.observe('key', rate_headers(0, reset=now - 10))
+
+        with governor.store.locked('key') as bucket:
+            self.assertEqual(bucket.remaining, 50)
+
+    def test_a_held_bucket_does_not_block_other_keys(self):
+        store = MemoryBucketStore()
+        held, release = threading.Event(), threading.Event()
+
+        def hold():
+            with store.locked('installation:1:core'):
+                held.set()
+                release.wait(5)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        try:
+            held.wait(5)
+            self.assertTrue(self.governor(store)._try_acquire('installation:2:core', BACKGROUND) is None)
+        finally:
+            release.set()
+            holder.join()
+
+    def test_database_buckets_share_spending_between_processes(self):
+        first, second = DatabaseBucketStore(sync_interval=0), DatabaseBucketStore(sync_interval=0)
+        self.governor(first).observe('installation:1:core', rate_headers(30))
+        for _ in range(5):
+            self.governor(first).acquire('installation:1:core')
+        # Permits are flushed to the row, and picked up from it, on each store's next reconciliation
+        with first.locked('installation:1:core'):
+            pass
+
+        with second.locked('installation:1:core') as bucket:
+            self.assertEqual(bucket.remaining, 25)
+        self.assertEqual(GitHubRateLimitBucket.objects.get(key='installation:1:core').remaining, 25)
+
+    def test_storage_errors_let_requests_through(self):
+        store = DatabaseBucketStore(sync_interval=0)
+        with mock.patch.object(store, '_reconcile', side_effect=RuntimeError('db down')):
+            self.governor(store).acquire('installation:1:core')
+
+
+# ----------------------------------------------------------------------------
+# Incremental sync and scheduling
+# ----------------------------------------------------------------------------
+
+def issue_payload(number, updated_at, state='open', title='Bug'):
+    return {
+        'id': 1000 + number, 'number': number, 'title': title, 'state': state, 'body': '',
+        'html_url': f'https://github.com/octo/repo/issues/{number}',
+        'user': {'login': 'reporter', 'id': 50},
+        'created_at': '2024-01-01T00:00:00Z', 'updated_at': updated_at,
+        'closed_at': updated_at if state == 'closed' else None,
+    }
+
+
+def commit_payload(sha, date):
+    return {'sha': sha, 'commit': {'committer': {'date': date}, 'author': {'date': date}}}
+
+
+class SyncCursorTests(TestCase):
+    def setUp(self):
+        resolver.forget()
+        installation = GitHubAppInstallation.objects.create(
+            installation_id=1, account_login='octo', account_type='Organization'
+        )
+        self.repository = make_repository(installation=installation, github_id=1)
+        self.manager = GitHubSyncManager(1, commit_mode='rest')
+
+    def sync(self, method, pages):
+        calls = []
+
+        def iter_pages(url, params=None):
+            calls.append(dict(params or {}))
+            return iter(pages)
+
+        with mock.patch.object(self.manager, '_iter_api_pages', iter_pages):
+            return getattr(self.manager, method)(self.repository), calls[0]
+
+    def test_issue_cursor(self):
+        pages = [[issue_payload(1, '2024-01-01T00:00:00Z'), issue_payload(2, '2024-01-03T00:00:00Z')]]
+        result, params = self.sync('_sync_issues', pages)
+        self.assertEqual((result['new_issues'], result['updated_issues']), (2, 0))
+        self.assertNotIn('since', params)
+        cursor = RepositorySyncCursor.objects.get(repository=self.repository)
+        self.assertEqual(cursor.issues_since, parse_datetime('2024-01-03T00:00:00Z'))
+
+        # `since` is inclusive: the issue at the cursor comes back and is not counted again
+        result, params = self.sync('_sync_issues', [[issue_payload(2, '2024-01-03T00:00:00Z')]])
+        self.assertEqual((result['new_issues'], result['updated_issues']), (0, 0))
+        self.assertEqual(parse_datetime(params['since']), cursor.issues_since)
+
+        # Touched without a tracked change, then really closed
+        result, _ = self.sync('_sync_issues', [[issue_payload(1, '2024-01-05T00:00:00Z')]])
+        self.assertEqual(result['updated_issues'], 0)
+        result, _ = self.sync('_sync_issues', [[issue_payload(2, '2024-01-06T00:00:00Z', state='closed')]])
+        self.assertEqual(result['updated_issues'], 1)
+        self.assertEqual(Issue.objects.get(number=2).state, 'closed')
+
+    def test_issues_updated_in_the_cursor_second_are_not_lost(self):
+        self.sync('_sync_issues', [[issue_payload(1, '2024-01-03T00:00:00Z')]])
+
+        # Issue 2 opened, and issue 1 closed, later in the second the last sync stopped at
+        pages = [[issue_payload(1, '2024-01-03T00:00:00Z', state='closed'), issue_payload(2, '2024-01-03T00:00:00Z')]]
+        result, _ = self.sync('_sync_issues', pages)
+
+        self.assertEqual((result['new_issues'], result['updated_issues']), (1, 1))
+        self.assertEqual(Issue.objects.get(number=1).state, 'closed')
+
+    def test_reconcile_reapplies_issues_at_the_cursor(self):
+        since = parse_datetime('2024-01-03T00:00:00Z')
+        reconciler = RepositoryReconciler()
+        reconciler.importer._import_issues(self.repository, [issue_payload(1, '2024-01-03T00:00:00Z')])
+
+        issues = [issue_payload(1, '2024-01-03T00:00:00Z', state='closed'), issue_payload(2, '2024-01-03T00:00:00Z')]
+        with mock.patch.object(reconciler.fetcher, 'fetch_issues', return_value=issues):
+            counts, _ = reconciler._reconcile_issues(self.repository, 'octo', 'repo', since)
+
+        self.assertEqual(counts, {'new': 1, 'updated': 1})
+
+    def test_commit_cursor_stops_at_the_last_synced_sha(self):
+        imported = []
+
+        def import_commit(commit_data, repository):
+            imported.append(commit_data['sha'])
+            return True
+
+        with mock.patch.object(self.manager, '_import_commit_idempotent', import_commit):
+            pages = [[commit_payload(sha_of(n), f'2024-01-0{n}T00:00:00Z') for n in (3, 2, 1)]]
+            result, _ = self.sync('_sync_commits', pages)
+            self.assertEqual(result['new_commits'], 3)
+
+            pages = [[commit_payload(sha_of(n), f'2024-01-0{n}T00:00:00Z') for n in (5, 4, 3, 2)]]
+            result, params = self.sync('_sync_commits', pages)
+
+        self.assertEqual(result['new_commits'], 2)
+        self.assertEqual(imported, [sha_of(n) for n in (3, 2, 1, 5, 4)])
+        self.assertEqual(parse_datetime(params['since']), parse_datetime('2024-01-03T00:00:00Z'))
+        cursor = RepositorySyncCursor.objects.get(repository=self.repository)
+        self.assertEqual(cursor.last_commit_sha, sha_of(5))
+
+
+@override_settings(GITHUB_SYNC_MIN_INTERVAL=900, GITHUB_SYNC_MAX_INTERVAL=86400, GITHUB_SYNC_WEBHOOK_INTERVAL=21600)
+class SyncScheduleTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch('api.sync_schedule.random.uniform', return_value=1.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.installation = GitHubAppInstallation.objects.create(
+            installation_id=1, account_login='octo', account_type='Organization'
+        )
+
+    def test_idle_repository_backs_off(self):
+        repository = make_repository(installation=self.installation)
+        intervals = []
+        for _ in range(4):
+            intervals.append(schedule_next_sync(repository, changes=0))
+        self.assertEqual(intervals, [21600, 43200, 86400, 86400])
+
+        # Something new: back to the velocity-based interval
+        self.assertEqual(schedule_next_sync(repository, changes=5), 21600)
+
+    def test_busy_repository_syncs_more_often(self):
+        repository = make_repository(installation=self.installation)
+        contributor = make_contributor('dev')
+        now = timezone.now()
+        for n in range(70):
+            make_commit(repository, contributor, sha_of(n), committed_at=now - timedelta(hours=n))
+
+        self.assertEqual(schedule_next_sync(repository, changes=12, now=now), 1963)
+        self.assertEqual(repository.next_sync_at, now + timedelta(seconds=86400 * 0.25 / 11))
+
+    def test_live_webhooks_slow_the_periodic_sync(self):
+        repository = make_repository(installation=self.installation, last_webhook_at=timezone.now())
+        contributor = make_contributor('dev')
+        for n in range(70):
+            make_commit(repository, contributor, sha_of(n), committed_at=timezone.now())
+        self.assertEqual(schedule_next_sync(repository, changes=12), 21600)
+
+    def test_due_repositories(self):
+        now = timezone.now()
+        due = make_repository('due', installation=self.installation, next_sync_at=now - timedelta(minutes=1))
+        make_repository('later', installation=self.installation, next_sync_at=now + timedelta(minutes=1))
+        make_repository('paused', installation=self.installation, next_sync_at=now, auto_sync_enabled=False)
+        make_repository('unlinked', next_sync_at=now)
+        self.assertEqual(list(due_repositories(now=now)), [due])
+
+
+class SyncLockTests(TestCase):
+    def test_busy_repository_raises_and_nesting_passes_through(self):
+        with held_sync_lock(1):
+            with self.assertRaises(RepositoryBusy):
+                with repository_sync(1):
+                    pass
+            with repository_sync(2):
+                with repository_sync(2):
+                    pass
+        with repository_sync(1):
+            pass
+
+    def test_thread_locks_without_fcntl(self):
+        with mock.patch.dict('sys.modules', {'fcntl': None}):
+            with held_sync_lock(1):
+                with self.assertRaises(RepositoryBusy):
+                    with repository_sync(1):
+                        pass
+            with repository_sync(1):
+                pass
+
+
+# ----------------------------------------------------------------------------
+# Reconciliation
+# ----------------------------------------------------------------------------
+
+@override_settings(RECONCILE_BLOOM_ERROR_RATE=0.01)
+class CommitBloomFilterTests(TestCase):
+    def test_membership_without_false_negatives(self):
+        shas = [sha_of(n) for n in range(1000)]
+        bloom = CommitBloomFilter.build(shas, len(shas))
+
+        self.assertTrue(all(sha in bloom for sha in shas))
+        false_positives = sum(sha_of(f'absent-{n}') in bloom for n in range(10000))
+        self.assertLess(false_positives, 10000 * 0.01 * 2)
+        self.assertFalse(bloom.full)
+
+    def test_serialization_round_trip(self):
+        bloom = CommitBloomFilter(capacity=10)
+        for n in range(11):
+            bloom.add(sha_of(n))
+
+        restored = CommitBloomFilter.from_bytes(bloom.to_bytes())
+        self.assertEqual((restored.bits, restored.hashes, restored.capacity, restored.count),
+                         (bloom.bits, bloom.hashes, 10, 11))
+        self.assertTrue(all(sha_of(n) in restored for n in range(11)))
+        self.assertTrue(restored.full)
+
+
+class ReconcilerTests(TestCase):
+    def setUp(self):
+        resolver.forget()
+        self.repository = make_repository()
+        contributor = make_contributor('dev')
+        for n in range(1, 4):
+            make_commit(self.repository, contributor, sha_of(n))
+        RepositorySyncCursor.objects.create(
+            repository=self.repository, branch_heads={'main': sha_of(3)}, contributor_count=1,
+            issues_since=parse_datetime('2024-01-03T00:00:00Z'),
+        )
+        self.reconciler = RepositoryReconciler()
+        self.fetcher = self.reconciler.fetcher
+        self.commit_pages = []
+        self.pages_requested = 0
+        self.imported = []
+
+    def reconcile(self, branch_heads=None, newest_issue='2024-01-03T00:00:00Z', contributors=1):
+        probes = {
+            'repository': {
+                'name': 'repo', 'owner': {'avatar_url': ''}, 'description': None,
+                'created_at': '2024-01-01T00:00:00Z', 'updated_at': '2024-01-05T00:00:00Z',
+            },
+            'branch_heads': branch_heads or {'main': sha_of(3)},
+            'newest_issue_updated_at': newest_issue,
+            'contributor_count': contributors,
+        }
+
+        def iter_commit_pages(owner, name, head):
+            for page in self.commit_pages:
+                self.pages_requested += 1
+                yield [{'sha': sha} for sha in page]
+
+        def import_commits(repository, commits):
+            self.imported.extend(c['sha'] for c in commits)
+            return len(commits)
+
+        with mock.patch.object(self.reconciler, 'probe', return_value=probes), \
+                mock.patch.object(self.fetcher, 'iter_commit_pages', iter_commit_pages), \
+                mock.patch.object(self.fetcher, 'fetch_issues', return_value=[]) as fetch_issues, \
+                mock.patch.object(self.fetcher, 'fetch_contributors', return_value=[]) as fetch_contributors, \
+                mock.patch.object(self.reconciler.importer, 'import_commits', import_commits):
+            result = self.reconciler.reconcile(self.repository)
+        return result, fetch_issues, fetch_contributors
+
+    def test_unchanged_probes_run_no_heavy_path(self):
+        # A new branch pointing at a stored commit is no news either
+        result, fetch_issues, fetch_contributors = self.reconcile({'main': sha_of(3), 'feature': sha_of(2)})
+
+        self.assertEqual(result['stale'], [])
+        self.assertEqual(self.imported, [])
+        fetch_issues.assert_not_called()
+        fetch_contributors.assert_not_called()
+        cursor = RepositorySyncCursor.objects.get(repository=self.repository)
+        self.assertEqual(cursor.branch_heads, {'main': sha_of(3), 'feature': sha_of(2)})
+        self.assertIsNotNone(cursor.reconciled_at)
+        self.assertTrue(cursor.commit_bloom)
+
+    def test_moved_branch_is_walked_back_to_known_commits(self):
+        self.commit_pages = [[sha_of(5), sha_of(4)], [sha_of(3), sha_of(2)], [sha_of(1)]]
+
+        result, fetch_issues, _ = self.reconcile({'main': sha_of(5)})
+
+        self.assertEqual(result['stale'], ['commits'])
+        self.assertEqual(result['moved_branches'], ['main'])
+        # The second page is all known: the walk stops without requesting the third
+        self.assertEqual(self.pages_requested, 2)
+        self.assertEqual(self.imported, [sha_of(5), sha_of(4)])
+        fetch_issues.assert_not_called()
+
+    def test_newer_issue_and_contributor_count_are_stale(self):
+        result, fetch_issues, fetch_contributors = self.reconcile(newest_issue='2024-01-04T00:00:00Z', contributors=2)
+
+        self.assertEqual(result['stale'], ['issues', 'contributors'])
+        self.assertEqual(fetch_issues.call_args.kwargs['since'], parse_datetime('2024-01-03T00:00:00Z'))
+        fetch_contributors.assert_called_once()
+        cursor = RepositorySyncCursor.objects.get(repository=self.repository)
+        self.assertEqual((cursor.issues_since, cursor.contributor_count), (parse_datetime('2024-01-04T00:00:00Z'), 2))
+
+
+# ----------------------------------------------------------------------------
+# Derived statistics
+# ----------------------------------------------------------------------------
+
+class CollaborationGraphTests(TestCase):
+    def setUp(self):
+        self.repository = make_repository()
+        self.ada, self.bob, self.cy = (make_contributor(name) for name in ('ada', 'bob', 'cy'))
+        for contributor, count in ((self.ada, 5), (self.bob, 3), (self.cy, 1)):
+            for n in range(count):
+                make_commit(self.repository, contributor, sha_of(f'{contributor.username}{n}'))
+
+    def pairs(self):
+        return {
+            (c.contributor_1.username, c.contributor_2.username): (c.shared_commits, c.code_reviews, c.collaboration_strength)
+            for c in Collaboration.objects.select_related('contributor_1', 'contributor_2')
+        }
+
+    def test_every_pair_of_committers_is_linked(self):
+        self.assertEqual(build_collaborations(self.repository), {'created': 3, 'updated': 0})
+
+        self.assertEqual(self.pairs(), {
+            ('ada', 'bob'): (3, 0, 0.03), ('ada', 'cy'): (1, 0, 0.01), ('bob', 'cy'): (1, 0, 0.01),
+        })
+
+    def test_rebuild_keeps_existing_rows_and_their_reviews(self):
+        Collaboration.objects.create(
+            contributor_1=self.bob, contributor_2=self.ada, repository=self.repository, shared_commits=1, code_reviews=10,
+        )
+
+        self.assertEqual(build_collaborations(self.repository), {'created': 2, 'updated': 1})
+        # Orientation of the existing row is kept, reviews count twice towards strength
+        self.assertEqual(self.pairs()[('bob', 'ada')], (3, 10, 0.23))
+
+    def test_graph_can_be_limited_to_the_top_committers(self):
+        self.assertEqual(build_collaborations(self.repository, max_contributors=2), {'created': 1, 'updated': 0})
+        self.assertEqual(list(self.pairs()), [('ada', 'bob')])
+        self.assertEqual(build_collaborations(self.repository, contributors=[self.cy]), {'created': 0, 'updated': 0})
+
+
+class ContributorStatsTests(TestCase):
+    def setUp(self):
+        self.repository = make_repository()
+        self.ada, self.bob = make_contributor('ada'), make_contributor('bob')
+        hours = {self.ada: (9, 10, 20), self.bob: (23,)}
+        for contributor, commit_hours in hours.items():
+            for n, hour in enumerate(commit_hours):
+                committed_at = timezone.now().replace(hour=hour) - timedelta(days=n)
+                make_commit(self.repository, contributor, sha_of(f'{contributor.username}{n}'), committed_at=committed_at)
+        work = RepositoryWork.objects.get(repository=self.repository, contributor=self.ada)
+        for n, state in enumerate(('closed', 'closed', 'open')):
+            Issue.objects.create(work=work, url=f'https://github.com/octo/repo/issues/{n}', summary='', state=state)
+
+    def test_refresh_matches_the_per_contributor_methods(self):
+        expected = {}
+        for contributor in Contributor.objects.all():
+            contributor.total_commits = contributor.commits.count()
+            contributor.total_issues_closed = Issue.objects.filter(work__contributor=contributor, state='closed').count()
+            contributor.analyze_work_pattern()
+            expected[contributor.username] = (contributor.preferred_work_hours, contributor.calculate_score())
+
+        with self.assertNumQueries(4):
+            refresh_contributor_stats([self.ada, self.bob])
+
+        self.assertEqual(expected, {'ada': ('morning', 80), 'bob': ('night', 10)})
+        for contributor in Contributor.objects.all():
+            self.assertEqual(
+                (contributor.preferred_work_hours, contributor.total_score), expected[contributor.username]
+            )
+            self.assertIsNotNone(contributor.last_activity)
+
+    def test_add_commits_moves_score_and_level_per_commit(self):
+        Contributor.objects.filter(id=self.ada.id).update(total_commits=95, total_score=950, experience_points=950)
+
+        add_commits({self.ada.id: 10, self.bob.id: 2})
+
+        self.ada.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual((self.ada.total_commits, self.ada.total_score, self.ada.level), (105, 1050, 1))
+        self.assertEqual((self.bob.total_commits, self.bob.experience_points, self.bob.level), (2, 20, 1))
+
+        add_commits({self.ada.id: 100})
+        self.ada.refresh_from_db()
+        self.assertEqual((self.ada.experience_points, self.ada.level), (2050, 2))
+
+
+class FakeStatsSource:
+    """GraphQLStats stand-in: stats for the SHAs in `stats`, the rest unknown to GitHub"""
+
+    def __init__(self, stats, fail_on_call=None):
+        self.stats = stats
+        self.fail_on_call = fail_on_call
+        self.calls = []
+
+    def __call__(self, shas):
+        self.calls.append(shas)
+        if len(self.calls) == self.fail_on_call:
+            raise GitHubRateLimitExceeded('No permit for installation:1')
+        found = {sha: self.stats[sha] for sha in shas if sha in self.stats}
+        return found, set(shas) - set(found)
+
+
+class StatsBackfillTests(TestCase):
+    def setUp(self):
+        mirror_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, mirror_root)
+        mirror_settings = override_settings(GIT_MIRROR_ROOT=mirror_root)
+        mirror_settings.enable()
+        self.addCleanup(mirror_settings.disable)
+        self.repository = make_repository()
+        contributor = make_contributor('dev')
+        self.commits = [make_commit(self.repository, contributor, sha_of(n)) for n in range(5)]
+
+    def backfill(self, source, **kwargs):
+        with mock.patch('api.stats_backfill.GraphQLStats', return_value=source):
+            return StatsBackfill(github_token='token', batch_size=2, **kwargs).run()
+
+    def test_commits_unknown_to_github_are_marked_complete(self):
+        stats = {sha_of(n): {'additions': 3, 'deletions': 1, 'files_changed': 1} for n in (0, 1, 3)}
+
+        result = self.backfill(FakeStatsSource(stats))
+
+        self.assertEqual((result['filled'], result['unavailable'], result['remaining']), (3, 2, 0))
+        filled = Commit.objects.get(sha=sha_of(3))
+        self.assertEqual((filled.additions, filled.deletions, filled.code_churn_ratio), (3, 1, 0.25))
+        missing = Commit.objects.get(sha=sha_of(2))
+        self.assertEqual((missing.stats_complete, missing.additions), (True, 0))
+        self.assertEqual(pending_commits().count(), 0)
+
+    def test_failed_lookup_resumes_from_the_last_chunk(self):
+        stats = {sha_of(n): {'additions': n, 'deletions': 0, 'files_changed': 1} for n in range(5)}
+        progress = []
+        failing = FakeStatsSource(stats, fail_on_call=2)
+
+        with self.assertRaises(GitHubRateLimitExceeded):
+            self.backfill(failing, progress=lambda **state: progress.append(state))
+        self.assertEqual(progress[-1]['last_id'], self.commits[1].id)
+        self.assertEqual(pending_commits().count(), 3)
+
+        resumed = FakeStatsSource(stats)
+        result = self.backfill(resumed, resume=progress[-1])
+
+        self.assertEqual(resumed.calls, [[sha_of(2), sha_of(3)], [sha_of(4)]])
+        self.assertEqual((result['filled'], result['remaining']), (5, 0))
+
+    def test_mirror_stays_locked_during_the_backfill(self):
+        mirror = mirror_store.path_for(self.repository.full_name)
+        subprocess.run(['git', 'init', '-q', '--bare', str(mirror)], check=True)
+        lock_free = []
+
+        def lookup(source, shas):
+            with mirror_store.lock(mirror, blocking=False) as free:
+                lock_free.append(free)
+            return {}, set()
+
+        with mock.patch('api.stats_backfill.LocalStats.__call__', lookup):
+            StatsBackfill(batch_size=2).run()
+
+        self.assertEqual(lock_free, [False, False, False])
+        with mirror_store.lock(mirror, blocking=False) as free:
+            self.assertTrue(free)
+
+
+
+# ----------------------------------------------------------------------------
+# Export loading
+# ----------------------------------------------------------------------------
+
+class JSONStreamTests(TestCase):
+    def test_array_items_are_streamed_across_chunk_boundaries(self):
+        document = {
+            'meta': {'contributors': ['not', 'this'], 'note': 'a ] and a } in a string'},
+            'contributors': [{'username': f'dev{n}', 'score': 1234567 * n} for n in range(20)] + [3.25, None],
+            'after': 'ignored',
+        }
+        f = io.StringIO(json.dumps(document, indent=1))
+
+        items = list(iter_json_array(f, 'contributors', chunk_size=7))
+
+        self.assertEqual(items, document['contributors'])
+
+    def test_empty_and_missing_arrays(self):
+        self.assertEqual(list(iter_json_array(io.StringIO('{"contributors": [ ]}'), 'contributors')), [])
+        self.assertEqual(list(iter_json_array(io.StringIO('{}'), 'contributors')), [])
+        with self.assertRaisesMessage(ValueError, "'contributors' not found"):
+            list(iter_json_array(io.StringIO('{"other": [1]}'), 'contributors'))
+
+    def test_ndjson_skips_blank_lines_and_reports_bad_ones(self):
+        self.assertEqual(list(iter_ndjson(io.StringIO('{"a": 1}\n\n{"a": 2}\n'))), [{'a': 1}, {'a': 2}])
+        with self.assertRaisesMessage(ValueError, 'line 2'):
+            list(iter_ndjson(io.StringIO('{"a": 1}\n{"a": \n')))
+
+
+class PopulateTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def export(self, name, contributors, ndjson=False):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            if ndjson:
+                f.writelines(json.dumps(contributor) + '\n' for contributor in contributors)
+            else:
+                json.dump({'contributors': contributors}, f)
+        return path
+
+    @staticmethod
+    def contributor(username, repository='repo', issues=(), commits=()):
+        return {
+            'username': username, 'url': f'https://github.com/{username}', 'avatar_url': '',
+            'works': [{
+                'repository_url': f'https://github.com/octo/{repository}',
+                'issues': [{'html_url': f'https://github.com/octo/{repository}/issues/{n}', 'title': 'Bug'} for n in issues],
+                'commits': [{'url': f'https://github.com/octo/{repository}/commit/{sha}', 'message': 'm'} for sha in commits],
+            }],
+        }
+
+    def populate(self, path, *args):
+        out = io.StringIO()
+        call_command('populate', path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_batches_merge_works_and_upsert_rows(self):
+        path = self.export('export.ndjson', [
+            self.contributor('ada', issues=[1], commits=['a1']),
+            # fetch.py --parallel writes one line per contributor and repository
+            self.contributor('ada', repository='lib', commits=['a2']),
+            self.contributor('bob', commits=['b1', 'b2']),
+        ], ndjson=True)
+
+        self.populate(path, '--batch-size', '2')
+        self.populate(path, '--batch-size', '2')
+
+        self.assertEqual(sorted(Repository.objects.values_list('name', flat=True)), ['octo/lib', 'octo/repo'])
+        self.assertEqual(RepositoryWork.objects.count(), 3)
+        self.assertEqual(Issue.objects.count(), 1)
+        self.assertEqual(Commit.objects.count(), 4)
+        self.assertEqual(Commit.objects.get(url__endswith='/a2').work.repository.name, 'octo/lib')
+
+    def test_checkpoint_resumes_after_the_last_committed_batch(self):
+        checkpoint = os.path.join(self.directory, 'checkpoint')
+        path = self.export('export.json', [self.contributor(f'dev{n}', commits=[f'c{n}']) for n in range(5)])
+
+        real_flush = populate.Command._flush
+        flushed = []
+
+        def flush(command, batch):
+            if len(flushed) == 2:
+                raise RuntimeError('interrupted')
+            flushed.append(batch)
+            return real_flush(command, batch)
+
+        with mock.patch.object(populate.Command, '_flush', autospec=True, side_effect=flush):
+            with self.assertRaises(RuntimeError):
+                self.populate(path, '--batch-size', '2', '--checkpoint', checkpoint)
+
+        with open(checkpoint, encoding='utf-8') as f:
+            self.assertEqual(f.read(), '4')
+        output = self.populate(path, '--batch-size', '2', '--checkpoint', checkpoint)
+
+        self.assertIn('Resuming after contributor 4.', output)
+        self.assertIn('Processed 1 contributors', output)
+
+        self.assertEqual(Contributor.objects.count(), 5)
+        self.assertEqual(Commit.objects.count(), 5)
+
+
+# ----------------------------------------------------------------------------
+# Job queue
+# ----------------------------------------------------------------------------
+
+@override_settings(JOB_MAX_ATTEMPTS=2, JOB_RETRY_BACKOFF=30, SYNC_LOCK_RETRY_DELAY=15, JOB_LOCK_TIMEOUT=3600)
+class JobQueueTests(TestCase):
+    def handlers(self, **handlers):
+        return mock.patch.dict(jobs._handlers, {
+            job_type: (func, jobs.BACKGROUND) for job_type, func in handlers.items()
+        })
+
+    def test_claim_takes_the_oldest_runnable_job(self):
+        later = jobs.enqueue('health_score', delay=600)
+        first = jobs.enqueue('health_score')
+        second = jobs.enqueue('stats_backfill')
+
+        claimed = jobs.claim_job('worker-a')
+        self.assertEqual(claimed.id, first.id)
+        self.assertEqual((claimed.status, claimed.attempts, claimed.locked_by), ('running', 1, 'worker-a'))
+        self.assertEqual(jobs.claim_job('worker-b', job_types=['stats_backfill']).id, second.id)
+        # Not due yet
+        self.assertIsNone(jobs.claim_job('worker-b'))
+        self.assertEqual(SyncJob.objects.get(id=later.id).status, 'pending')
+
+    def test_enqueue_dedupes_active_jobs(self):
+        job = jobs.enqueue('manual_sync', dedupe_key='sync:1')
+        self.assertEqual(jobs.enqueue('manual_sync', dedupe_key='sync:1').id, job.id)
+        jobs.claim_job('worker-a')
+        # A running job only absorbs triggers when dedupe_running
+        self.assertEqual(jobs.enqueue('manual_sync', dedupe_key='sync:1').id, job.id)
+        self.assertNotEqual(jobs.enqueue('manual_sync', dedupe_key='sync:1', dedupe_running=False).id, job.id)
+
+    def test_tokens_are_stored_encrypted_and_scrubbed_on_success(self):
+        seen = []
+        jobs.enqueue('health_score', payload={'github_token': 'secret', 'repo_url': 'x'})
+        self.assertNotIn('secret', json.dumps(SyncJob.objects.get().payload))
+
+        def handler(job):
+            seen.append(jobs.job_secret(job, 'github_token'))
+            return {'repositories_processed': 3}
+
+        with self.handlers(health_score=handler):
+            self.assertEqual(jobs.run_job(jobs.claim_job('worker-a')), 'completed')
+
+        self.assertEqual(seen, ['secret'])
+        job = SyncJob.objects.get()
+        self.assertEqual(job.details['repositories_processed'], 3)
+        self.assertEqual(job.repositories_processed, 3)
+        self.assertEqual(job.payload, {'repo_url': 'x'})
+        self.assertIsNone(job.locked_by)
+
+    def test_missing_tokens_are_left_out(self):
+        job = jobs.enqueue('repository_import', payload={'repo_url': 'x', 'github_token': None})
+
+        self.assertEqual(job.payload, {'repo_url': 'x'})
+        self.assertIsNone(jobs.job_secret(job, 'github_token'))
+
+    def test_tokens_sealed_under_another_secret_key_read_as_absent(self):
+        job = jobs.enqueue('repository_import', payload={'github_token': 'secret'})
+
+        with override_settings(SECRET_KEY='rotated'):
+            self.assertIsNone(jobs.job_secret(job, 'github_token'))
+
+    def test_failures_retry_with_backoff_until_max_attempts(self):
+        def fail(job):
+            raise RuntimeError('GitHub is down')
+
+        jobs.enqueue('health_score', payload={'github_token': 'secret'})
+        with self.handlers(health_score=fail):
+            before = timezone.now()
+            self.assertEqual(jobs.run_job(jobs.claim_job('worker-a')), 'pending')
+            job = SyncJob.objects.get()
+            self.assertEqual((job.attempts, job.error_message), (1, 'GitHub is down'))
+            self.assertGreaterEqual(job.run_after, before + timedelta(seconds=30))
+            self.assertIn('github_token', job.payload)
+
+            SyncJob.objects.update(run_after=timezone.now())
+            self.assertEqual(jobs.run_job(jobs.claim_job('worker-a')), 'failed')
+
+        job = SyncJob.objects.get()
+        self.assertEqual(job.attempts, 2)
+        self.assertNotIn('github_token', job.payload)
+        self.assertEqual(jobs.retry_delay(3), 120)
+
+    def test_stale_jobs_are_released_and_the_old_worker_cannot_finish_them(self):
+        jobs.enqueue('health_score')
+        fresh = jobs.enqueue('stats_backfill')
+        stale = jobs.claim_job('worker-a', job_types=['health_score'])
+        jobs.claim_job('worker-b', job_types=['stats_backfill'])
+        SyncJob.objects.filter(id=stale.id).update(locked_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(jobs.release_stale_jobs(), 1)
+        self.assertEqual(SyncJob.objects.get(id=fresh.id).status, 'running')
+        reclaimed = jobs.claim_job('worker-c', job_types=['health_score'])
+        self.assertEqual((reclaimed.id, reclaimed.attempts), (stale.id, 2))
+
+        # worker-a was only slow: its late result must not overwrite worker-c's run
+        with self.handlers(health_score=lambda job: {'repositories_processed': 1}):
+            self.assertEqual(jobs.run_job(stale), 'running')
+        job = SyncJob.objects.get(id=stale.id)
+        self.assertEqual((job.status, job.locked_by), ('running', 'worker-c'))
+
+    def test_progress_refreshes_the_lock(self):
+        jobs.enqueue('health_score')
+        job = jobs.claim_job('worker-a')
+        SyncJob.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(hours=2))
+        jobs.report_progress(job, current=1)
+
+        self.assertEqual(jobs.release_stale_jobs(), 0)
+        self.assertEqual(SyncJob.objects.get(id=job.id).progress, {'current': 1})
+
+    def test_busy_repository_is_requeued_without_using_an_attempt(self):
+        repository = make_repository()
+
+        def busy(job):
+            raise RepositoryBusy(job.repository_id)
+
+        job, in_flight = jobs.enqueue_repository_sync(
+            'repository_reconcile', repository, dedupe_key=f'reconcile:{repository.id}'
+        )
+        self.assertIsNone(in_flight)
+        with self.handlers(repository_reconcile=busy):
+            before = timezone.now()
+            self.assertEqual(jobs.run_job(jobs.claim_job('worker-a')), 'pending')
+            job.refresh_from_db()
+            self.assertEqual((job.attempts, job.locked_by), (0, None))
+            self.assertGreaterEqual(job.run_after, before + timedelta(seconds=15))
+
+            # A newer trigger queued meanwhile covers this one
+            SyncJob.objects.filter(id=job.id).update(run_after=timezone.now())
+            claimed = jobs.claim_job('worker-a')
+            newer, in_flight = jobs.enqueue_repository_sync(
+                'repository_reconcile', repository, dedupe_key=f'reconcile:{repository.id}'
+            )
+            self.assertEqual(in_flight.id, job.id)
+            self.assertEqual(jobs.run_job(claimed), 'completed')
+        job.refresh_from_db()
+        self.assertEqual(job.details['coalesced_into'], newer.id)
+
+
+# ----------------------------------------------------------------------------
+# Webhooks
+# ----------------------------------------------------------------------------
+
+@override_settings(GITHUB_WEBHOOK_SECRET='hook-secret', SYNC_LOCK_WAIT=0, SYNC_LOCK_RETRY_DELAY=15)
+class WebhookInboxTests(TestCase):
+    def setUp(self):
+        self.repository = make_repository(github_id=77)
+        self.payload = {'ref': 'refs/heads/main', 'commits': [], 'repository': {'id': 77, 'full_name': 'octo/repo'}}
+
+    def deliver(self, delivery_id, secret='hook-secret'):
+        body = json.dumps(self.payload).encode()
+        signature = 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return self.client.post(
+            '/api/github/webhook/', body, content_type='application/json',
+            HTTP_X_HUB_SIGNATURE_256=signature, HTTP_X_GITHUB_EVENT='push', HTTP_X_GITHUB_DELIVERY=delivery_id,
+        )
+
+    def test_deliveries_are_acknowledged_then_processed_by_a_worker(self):
+        response = self.deliver('delivery-1')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.deliver('delivery-1').json()['duplicate'], True)
+
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual((delivery.status, delivery.repository_github_id), ('pending', 77))
+        job = SyncJob.objects.get()
+        self.assertEqual((job.job_type, job.payload), ('webhook_triggered', {'delivery_id': 'delivery-1'}))
+
+        # This push has no installation to fetch with
+        self.assertEqual(jobs.run_job(jobs.claim_job('worker-a')), 'completed')
+        delivery.refresh_from_db()
+        self.assertEqual((delivery.status, delivery.attempts), ('processed', 1))
+        self.assertEqual(delivery.result, {'status': 'no_installation'})
+        self.assertEqual(WebhookProcessor.process_delivery(delivery), {'status': 'already_processed'})
+
+    def test_bad_signatures_are_rejected(self):
+        self.assertEqual(self.deliver('delivery-1', secret='wrong').status_code, 401)
+        self.assertFalse(WebhookDelivery.objects.exists())
+
+    def test_busy_repository_puts_the_delivery_back(self):
+        self.deliver('delivery-1')
+        job = SyncJob.objects.get()
+        with held_sync_lock(self.repository.id):
+            self.assertEqual(jobs.run_job(jobs.claim_job('worker-a')), 'pending')
+
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual((delivery.status, delivery.attempts), ('pending', 0))
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 0)
+        self.assertGreater(job.run_after, timezone.now())
+
+        # Once the sync is done the delivery is processed
+        SyncJob.objects.filter(id=job.id).update(run_after=timezone.now())
+        self.assertEqual(jobs.run_job(jobs.claim_job('worker-a')), 'completed')
+        delivery.refresh_from_db()
+        self.assertEqual((delivery.status, delivery.attempts), ('processed', 1))
+
+    def test_busy_push_queues_a_follow_up_sync(self):
+        from api.webhooks import handle_push_event
+
+        with held_sync_lock(self.repository.id):
+            result = handle_push_event(self.payload)
+            again = handle_push_event(self.payload)
+
+        self.assertEqual(result['status'], 'queued')
+        self.assertEqual(again['job_id'], result['job_id'])
+        job = SyncJob.objects.get(id=result['job_id'])
+        self.assertEqual((job.job_type, job.repository_id), ('repository_reconcile', self.repository.id))
+
+
+def transaction_count(event_type):
+    timings = metrics.snapshot()['timings']
+    return timings.get(f'webhooks.transaction_seconds{{event={event_type}}}', {}).get('count', 0)
+
+
+@override_settings(WEBHOOK_APPLY_BATCH_SIZE=2)
+class WebhookPhasingTests(TransactionTestCase):
+    def setUp(self):
+        resolver.forget()
+        self.installation = GitHubAppInstallation.objects.create(
+            installation_id=1, account_login='octo', account_type='Organization'
+        )
+        self.in_transaction = []
+
+    def network(self, result=None):
+        """Stand-in for a GitHub call that notes whether it ran inside a transaction"""
+        def call(*args, **kwargs):
+            self.in_transaction.append(connection.in_atomic_block)
+            return result(*args) if callable(result) else result
+        return call
+
+    def test_push_stats_are_fetched_before_the_insert_transaction(self):
+        repository = make_repository(github_id=77, installation=self.installation)
+        payload = {
+            'repository': {'id': 77, 'full_name': 'octo/repo'}, 'installation': {'id': 1},
+            'before': sha_of(0), 'after': sha_of(3),
+            'commits': [
+                {'id': sha_of(n), 'url': '', 'message': f'Change {n}', 'timestamp': '2024-01-01T00:00:00Z',
+                 'author': {'name': 'Ada', 'email': 'ada@example.com', 'username': 'ada'}}
+                for n in range(1, 4)
+            ],
+        }
+        before = transaction_count('push')
+
+        with mock.patch.object(GitHubSyncManager, '_get_cached_token', return_value='token'), \
+                mock.patch.object(GitHubGraphQLClient, 'fetch_commits', self.network({})):
+            result = WebhookProcessor.process_push_event(payload)
+
+        self.assertEqual(result['new_commits'], 3)
+        self.assertEqual(self.in_transaction, [False])
+        self.assertEqual(Commit.objects.filter(repository=repository).count(), 3)
+        self.assertGreaterEqual(transaction_count('push') - before, 1)
+
+    def test_added_repositories_are_applied_in_chunks(self):
+        repositories = {
+            n: {'id': n, 'name': f'repo{n}', 'full_name': f'octo/repo{n}', 'html_url': f'https://github.com/octo/repo{n}'}
+            for n in range(1, 5)
+        }
+        del repositories[4]['html_url']  # Fails its chunk, then alone
+        payload = {
+            'action': 'added', 'installation': {'id': 1},
+            'repositories_added': [{'id': n, 'full_name': f'octo/repo{n}'} for n in repositories],
+        }
+        before = transaction_count('installation_repositories')
+
+        fetch = self.network(lambda manager, url: repositories[int(url.rsplit('/', 1)[1])])
+        with mock.patch.object(GitHubSyncManager, '_make_api_request', fetch), \
+                mock.patch.object(GitHubSyncManager, '_setup_webhook_idempotent', self.network()):
+            result = WebhookProcessor.process_installation_repositories_event(payload)
+
+        self.assertEqual(result['imported'], ['octo/repo1', 'octo/repo2', 'octo/repo3'])
+        self.assertEqual(self.in_transaction, [False] * 7)  # 4 fetches, 3 webhook setups
+        self.assertEqual(Repository.objects.count(), 3)
+        # Two chunks, then the failed one's rows one by one
+        self.assertEqual(transaction_count('installation_repositories') - before, 4)
+
+
+# ----------------------------------------------------------------------------
+# GitHub App tokens
+# ----------------------------------------------------------------------------
+
+class InstallationTokenTests(TestCase):
+    def setUp(self):
+        self.minted = []
+
+        def mint(installation_id):
+            token = f'ghs_{len(self.minted) + 1}'
+            self.minted.append(token)
+            return token, timezone.now() + timedelta(hours=1)
+
+        for patcher in (
+            mock.patch('api.github_tokens.mint_installation_token', mint),
+            mock.patch.dict(github_tokens._local_tokens, clear=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def restart(self):
+        """Forget the per-process copy, as another worker would start without it"""
+        github_tokens._local_tokens.clear()
+
+    def test_tokens_are_shared_through_the_table_encrypted(self):
+        self.assertEqual(github_tokens.get_installation_token(1), 'ghs_1')
+        row = GitHubInstallationToken.objects.get(installation_id=1)
+        self.assertNotIn('ghs_1', row.token)
+
+        self.restart()
+        self.assertEqual(github_tokens.get_installation_token(1), 'ghs_1')
+        self.assertEqual(self.minted, ['ghs_1'])
+
+    def test_invalidation_only_drops_the_rejected_token(self):
+        github_tokens.get_installation_token(1)
+        github_tokens.refresh_installation_token(1, stale_token='ghs_1')
+
+        # A worker still holding the first token must not throw away the new one
+        github_tokens.invalidate_installation_token(1, token='ghs_1')
+        self.restart()
+        self.assertEqual(github_tokens.get_installation_token(1), 'ghs_2')
+
+        github_tokens.invalidate_installation_token(1, token='ghs_2')
+        self.assertEqual(github_tokens.get_installation_token(1), 'ghs_3')
+
+    def test_unreadable_tokens_are_minted_again(self):
+        github_tokens.get_installation_token(1)
+        self.restart()
+
+        with override_settings(SECRET_KEY='rotated'):
+            self.assertEqual(github_tokens.get_installation_token(1), 'ghs_2')
+
+
+# ----------------------------------------------------------------------------
+# Bulk import
+# ----------------------------------------------------------------------------
+
+class FakeAppClient:
+    """The GitHubAppClient calls BulkImport makes"""
+
+    def __init__(self, accessible):
+        self.accessible = accessible
+        self.lookups = []
+        self.webhooks = []
+
+    def get_installation_repository(self, installation_id, repo_id):
+        self.lookups.append(repo_id)
+        return {'id': repo_id, 'full_name': self.accessible[repo_id]} if repo_id in self.accessible else None
+
+    def create_webhook(self, installation_id, full_name):
+        self.webhooks.append(full_name)
+
+
+@override_settings(BULK_IMPORT_CONCURRENCY=2, JOB_MAX_ATTEMPTS=2, JOB_RETRY_BACKOFF=30)
+class BulkImportTests(TransactionTestCase):
+    # Repositories are imported on pool threads, which need to see committed rows
+
+    def setUp(self):
+        self.installation = GitHubAppInstallation.objects.create(
+            installation_id=1, account_login='octo', account_type='Organization'
+        )
+        make_repository('known', installation=self.installation, github_id=1)
+        self.client_ = FakeAppClient({2: 'octo/flaky'})
+        self.imported = []
+        self.failures = {'octo/flaky': 1}
+
+        importer = mock.Mock()
+        importer.import_repository.side_effect = self.import_repository
+        for patcher in (
+            mock.patch('api.github_app.GitHubAppClient', lambda: self.client_),
+            mock.patch.object(jobs.BulkImport, '_importer', lambda bulk: importer),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def import_repository(self, full_name, progress=None):
+        self.imported.append(full_name)
+        progress('fetched', commits=3)
+        if self.failures.get(full_name):
+            self.failures[full_name] -= 1
+            raise RuntimeError('GitHub is down')
+        return Repository.objects.filter(full_name=full_name).first() or make_repository(
+            full_name.split('/')[1], installation=self.installation
+        )
+
+    def test_retry_only_imports_what_failed(self):
+        job = jobs.enqueue('bulk_import', installation=self.installation, payload={'repository_ids': [1, 2, 3]})
+
+        self.assertEqual(jobs.run_job(jobs.claim_job('worker-a')), 'pending')
+        job.refresh_from_db()
+        # Known repositories aren't looked up, inaccessible ones are dropped
+        self.assertEqual(self.client_.lookups, [2, 3])
+        self.assertEqual(job.payload['repositories'], [{'id': 1, 'full_name': 'octo/known'}, {'id': 2, 'full_name': 'octo/flaky'}])
+        self.assertEqual(job.progress['repositories']['octo/known'], {'phase': 'done', 'webhook': 'created', 'commits': 3})
+        self.assertEqual(job.progress['repositories']['octo/flaky']['phase'], 'error')
+        self.assertEqual((job.progress['success'], job.progress['failed']), (1, 1))
+
+        SyncJob.objects.filter(id=job.id).update(run_after=timezone.now())
+        self.assertEqual(jobs.run_job(jobs.claim_job('worker-a')), 'completed')
+        job.refresh_from_db()
+        self.assertEqual(sorted(self.imported), ['octo/flaky', 'octo/flaky', 'octo/known'])
+        self.assertEqual(self.client_.lookups, [2, 3])
+        self.assertEqual(job.details['summary'], {'total': 3, 'success': 2, 'failed': 0})
+        self.assertEqual(job.progress['repositories']['octo/flaky']['phase'], 'done')
+
+
+# ----------------------------------------------------------------------------
+# git log ingestion
+# ----------------------------------------------------------------------------
+
+def git_log_record(sha, parents, message, numstat):
+    header = f'\x1e{sha}\x1f{" ".join(parents)}\x1fAda Lovelace\x1fada@example.com\x1f2024-03-01T12:00:00+01:00\x1f'
+    return [header + message.split('\n')[0] + '\n', *(f'{line}\n' for line in message.split('\n')[1:]), '\x1f\n', '\n',
+            *(f'{line}\n' for line in numstat)]
+
+
+class ParseGitLogTests(TestCase):
+    def test_records_with_numstat(self):
+        lines = [
+            *git_log_record(sha_of(2), [sha_of(1)], 'Add parser\n\nLonger body', ['10\t2\tapi/parser.py', '-\t-\tlogo.png']),
+            *git_log_record(sha_of(1), [], 'Initial commit', []),
+        ]
+        first, second = parse_git_log(lines)
+
+        self.assertEqual(first['sha'], sha_of(2))
+        self.assertEqual(first['parents'], [sha_of(1)])
+        self.assertEqual(first['message'], 'Add parser\n\nLonger body')
+        self.assertEqual(first['authored_at'].isoformat(), '2024-03-01T12:00:00+01:00')
+        self.assertEqual((first['additions'], first['deletions'], first['files_changed']), (10, 2, 2))
+        self.assertEqual([f['filename'] for f in first['files']], ['api/parser.py', 'logo.png'])
+        self.assertEqual((second['sha'], second['parents'], second['files_changed']), (sha_of(1), [], 0))
+
+    def test_file_list_is_capped(self):
+        numstat = [f'1\t0\tfile{n}.txt' for n in range(350)]
+        commit, = parse_git_log(git_log_record(sha_of(1), [], 'Generated', numstat))
+        self.assertEqual(commit['files_changed'], 350)
+        self.assertEqual(commit['additions'], 350)
+        self.assertEqual(len(commit['files']), 300)
+
+
+class PushRevisionsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.work_tree = tempfile.mkdtemp()
+        cls.git_dir = os.path.join(cls.work_tree, '.git')
+        cls.env = {
+            **os.environ,
+            'GIT_AUTHOR_NAME': 'Ada', 'GIT_AUTHOR_EMAIL': 'ada@example.com',
+            'GIT_COMMITTER_NAME': 'Ada', 'GIT_COMMITTER_EMAIL': 'ada@example.com',
+        }
+        cls.git('init', '-q', '-b', 'main')
+        cls.base = cls.commit('base.txt', 'base\n')
+        cls.git('checkout', '-q', '-b', 'feature')
+        cls.feature = cls.commit('feature.txt', 'feature\n')
+        cls.git('checkout', '-q', 'main')
+        cls.pushed = cls.commit('base.txt', 'base\nmore\n')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.work_tree, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def git(cls, *args):
+        return subprocess.run(
+            ['git', *args], cwd=cls.work_tree, env=cls.env, capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    @classmethod
+    def commit(cls, path, content):
+        with open(os.path.join(cls.work_tree, path), 'w') as f:
+            f.write(content)
+        cls.git('add', path)
+        cls.git('commit', '-q', '-m', f'Update {path}')
+        return cls.git('rev-parse', 'HEAD')
+
+    def test_update_excludes_the_old_tip_and_untouched_refs(self):
+        revisions = push_revisions(self.git_dir, [{'old': self.base, 'new': self.pushed, 'ref': 'refs/heads/main'}])
+        self.assertEqual(revisions, [self.pushed, '--not', *sorted([self.base, self.feature])])
+
+        commit, = iter_git_log(self.git_dir, revisions)
+        self.assertEqual(commit['sha'], self.pushed)
+        self.assertEqual((commit['additions'], commit['deletions'], commit['files_changed']), (1, 0, 1))
+
+    def test_new_ref_only_brings_its_own_commits(self):
+        zero = '0' * 40
+        revisions = push_revisions(self.git_dir, [{'old': zero, 'new': self.feature, 'ref': 'refs/heads/feature'}])
+        self.assertEqual([c['sha'] for c in iter_git_log(self.git_dir, revisions)], [self.feature])
+
+    def test_deletions_and_invalid_updates(self):
+        zero = '0' * 40
+        self.assertIsNone(push_revisions(self.git_dir, [{'old': self.feature, 'new': zero, 'ref': 'refs/heads/feature'}]))
+        with self.assertRaises(ValueError):
+            push_revisions(self.git_dir, [{'old': '--all', 'new': self.pushed, 'ref': 'refs/heads/main'}])
+
+
+@override_settings(GIT_HOOK_SECRET='hook-secret', GIT_HOOK_URL='http://api/api/git/webhook/post-receive/')
+class GitHookTests(TestCase):
+    def setUp(self):
+        self.repo_path = Path(tempfile.mkdtemp()) / 'repo.git'
+        self.addCleanup(shutil.rmtree, self.repo_path.parent)
+        GitRepository(self.repo_path).initialize_bare_repo()
+        self.repository = make_repository(is_local=True, local_path=str(self.repo_path))
+
+    def post(self, body, token='hook-secret'):
+        return self.client.post(
+            '/api/git/webhook/post-receive/', json.dumps(body), content_type='application/json',
+            HTTP_X_GIT_HOOK_TOKEN=token,
+        )
+
+    def test_hooks_installed_before_the_token_are_rewritten(self):
+        hook = self.repo_path / 'hooks' / 'post-receive'
+        hook.write_text('#!/bin/sh\ncurl -s -X POST http://api/api/git/webhook/post-receive/ -d "$PWD"\n')
+
+        GitRepository(self.repo_path).ensure_hooks()
+
+        self.assertIn('X-Git-Hook-Token: hook-secret', hook.read_text())
+        self.assertTrue(os.access(hook, os.X_OK))
+
+    def test_pushed_updates_are_queued_for_ingestion(self):
+        update = {'old': sha_of(1), 'new': sha_of(2), 'ref': 'refs/heads/main'}
+        self.assertEqual(self.post({'repository': str(self.repo_path), 'updates': [update]}, token='wrong').status_code, 403)
+
+        response = self.post({'repository': str(self.repo_path), 'updates': [update]})
+
+        self.assertEqual(response.status_code, 200)
+        job = SyncJob.objects.get(id=response.json()['job_id'])
+        self.assertEqual((job.job_type, job.repository_id, job.payload), ('git_ingest', self.repository.id, {'updates': [update]}))
+        self.assertEqual(self.post({'repository': str(self.repo_path), 'updates': [{**update, 'old': '--all'}]}).status_code, 400)
+
+
+class MirrorIngestTests(TestCase):
+    def setUp(self):
+        resolver.forget()
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+        self.upstream = self.root / 'upstream' / 'octo' / 'repo'
+        self.upstream.mkdir(parents=True)
+        self.env = {
+            **os.environ,
+            'GIT_AUTHOR_NAME': 'Ada', 'GIT_AUTHOR_EMAIL': 'ada@example.com',
+            'GIT_COMMITTER_NAME': 'Ada', 'GIT_COMMITTER_EMAIL': 'ada@example.com',
+        }
+        self.git('init', '-q', '-b', 'main')
+        mirror_settings = override_settings(
+            GIT_MIRROR_ROOT=str(self.root / 'mirrors'), GIT_MIRROR_FILTER='',
+            GIT_MIRROR_REMOTE_URL=f'{self.root}/upstream/{{full_name}}',
+        )
+        mirror_settings.enable()
+        self.addCleanup(mirror_settings.disable)
+        self.repository = make_repository()
+
+    def git(self, *args):
+        return subprocess.run(
+            ['git', *args], cwd=self.upstream, env=self.env, capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    def commit(self, n):
+        (self.upstream / 'file.txt').write_text(f'{n}\n')
+        self.git('add', 'file.txt')
+        self.git('commit', '-q', '-m', f'Change {n}')
+        return self.git('rev-parse', 'HEAD')
+
+    def ingest(self):
+        return ingest_from_mirror(self.repository, 'octo/repo')
+
+    def ingested_refs(self):
+        return RepositorySyncCursor.objects.get(repository=self.repository).ingested_refs
+
+    def test_only_commits_since_the_last_ingest_are_read(self):
+        self.commit(1)
+        tip = self.commit(2)
+        self.assertEqual((self.ingest()['scanned'], Commit.objects.count()), (2, 2))
+        self.assertEqual(self.ingested_refs(), {'refs/heads/main': tip})
+
+        tip = self.commit(3)
+        self.assertEqual(self.ingest()['scanned'], 1)
+        self.assertEqual(self.ingest()['scanned'], 0)
+        self.assertEqual(self.ingested_refs(), {'refs/heads/main': tip})
+        self.assertEqual(Commit.objects.count(), 3)
+
+    def test_failed_ingest_is_picked_up_by_the_next_run(self):
+        first = self.commit(1)
+        self.ingest()
+        self.commit(2)
+
+        with mock.patch('api.git_ingest.GitLogIngester.ingest', side_effect=RuntimeError('database went away')):
+            with self.assertRaises(RuntimeError):
+                self.ingest()
+        self.assertEqual(self.ingested_refs(), {'refs/heads/main': first})
+
+        # The mirror already has the commit, so this fetch moves nothing; the cursor still knows it's missing
+        result = self.ingest()
+        self.assertEqual((result['scanned'], result['created']), (1, 1))
+        self.assertEqual(Commit.objects.count(), 2)
+
+    def test_cursor_is_recorded_for_a_mirror_that_predates_it(self):
+        self.commit(1)
+        self.ingest()
+        RepositorySyncCursor.objects.filter(repository=self.repository).update(ingested_refs=None)
+        tip = self.commit(2)
+
+        # The tips before this fetch count as ingested
+        self.assertEqual(self.ingest()['scanned'], 1)
+        self.assertEqual(self.ingested_refs(), {'refs/heads/main': tip})
+
+
+
+# ----------------------------------------------------------------------------
+# Contributor identity
+# ----------------------------------------------------------------------------
+
+class IdentityResolutionTests(TestCase):
+    def setUp(self):
+        resolver.forget()
+
+    def tearDown(self):
+        resolver.forget()
+
+    def test_accounts_sharing_an_email_stay_apart(self):
+        alice = resolve_contributor(login='alice', github_id=1, email='team@example.com')
+        bob = resolve_contributor(login='bob', github_id=2, email='team@example.com')
+
+        self.assertNotEqual(alice.id, bob.id)
+        self.assertEqual(resolve_contributor(login='Bob').id, bob.id)
+        self.assertEqual(ContributorAlias.objects.get(kind='email').contributor_id, alice.id)
+
+    def test_same_account_resolves_to_one_contributor(self):
+        carol = resolve_contributor(login='carol', email='carol@example.com')
+        self.assertEqual(resolve_contributor(login='CAROL', github_id=3).id, carol.id)
+        self.assertEqual(resolve_contributor(github_id=3).id, carol.id)
+        self.assertEqual(resolve_contributor(email='13+carol@users.noreply.github.com').id, carol.id)
+
+    def test_new_contributors_get_free_usernames(self):
+        first = resolve_contributor(email='admin@foo.com')
+        second = resolve_contributor(email='admin@bar.com')
+
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual({first.username, second.username}, {'admin', 'admin-2'})
+
+    def test_batch_resolution(self):
+        resolved = resolve_contributors([
+            {'login': 'dave', 'email': 'shared@example.com'},
+            {'login': 'erin', 'email': 'shared@example.com'},
+            {'login': 'frank'},
+            {'login': 'frank', 'github_id': 7},
+        ])
+
+        self.assertEqual([c.username for c in resolved], ['dave', 'erin', 'frank', 'frank'])
+        self.assertEqual(resolved[2].id, resolved[3].id)
+        self.assertEqual(Contributor.objects.count(), 3)
+
+    def test_find_and_merge_duplicates(self):
+        repository = make_repository()
+        legacy = make_contributor('grace-old')
+        ContributorAlias.objects.create(kind='email', value='grace@example.com', contributor=legacy)
+        make_commit(repository, legacy, sha_of('legacy'))
+        grace = resolve_contributor(login='grace', github_id=8)
+        make_commit(repository, grace, sha_of('grace'), raw_data={
+            'author': {'login': 'grace', 'id': 8}, 'commit': {'author': {'email': 'grace@example.com'}},
+        })
+        # Two accounts behind one email are not a duplicate
+        heidi = resolve_contributor(login='heidi', github_id=9, email='team@example.com')
+        ivan = resolve_contributor(login='ivan', github_id=10)
+        make_commit(repository, ivan, sha_of('ivan'), raw_data={
+            'author': {'login': 'ivan', 'id': 10}, 'commit': {'author': {'email': 'team@example.com'}},
+        })
+
+        groups, payload_logins = find_duplicates()
+        self.assertEqual(groups, [sorted([legacy.id, grace.id])])
+        self.assertEqual(payload_logins, {'grace', 'ivan'})
+
+        self.assertEqual(merge_duplicates(), [('grace', ['grace-old'])])
+        self.assertFalse(Contributor.objects.filter(id=legacy.id).exists())
+        self.assertEqual(Commit.objects.filter(contributor=grace).count(), 2)
+        self.assertEqual(resolve_contributor(email='grace@example.com').id, grace.id)
+        self.assertNotEqual(heidi.id, ivan.id)
+
+
+# ----------------------------------------------------------------------------
+# Raw payload storage
+# ----------------------------------------------------------------------------
+
+class RawPayloadTests(TestCase):
+    def setUp(self):
+        self.repository = make_repository()
+        self.contributor = make_contributor('dev')
+        self.work = RepositoryWork.objects.create(repository=self.repository, contributor=self.contributor)
+        self.payload = {
+            'sha': sha_of(1),
+            'commit': {'message': 'Fix parser'},
+            'files': [{'filename': 'api/parser.py', 'patch': '@@ -1 +1 @@\n-a\n+b'}],
+        }
+
+    def commit(self, sha, raw_data=None, **fields):
+        commit = Commit(work=self.work, repository=self.repository, sha=sha, url='', summary='', **fields)
+        if raw_data is not None:
+            commit.raw_data = raw_data
+        return commit
+
+    def test_save_round_trip(self):
+        commit = self.commit(sha_of(1), self.payload)
+        commit.save()
+
+        stored = Commit.objects.select_related('payload').get(id=commit.id)
+        self.assertEqual(stored.raw_data, self.payload)
+        self.assertEqual(stored.file_paths, ['api/parser.py'])
+        self.assertEqual(Commit.objects.get(id=commit.id).raw_data, self.payload)
+        self.assertEqual(self.commit(sha_of(2)).raw_data, {})
+
+    def test_bulk_create_and_update(self):
+        Commit.objects.bulk_create([self.commit(sha_of(n), {'n': n}) for n in range(3)])
+        self.assertEqual(CommitPayload.objects.count(), 3)
+
+        commits = list(Commit.objects.order_by('id'))
+        for commit in commits:
+            commit.raw_data = {**commit.raw_data, 'updated': True}
+        Commit.objects.bulk_update(commits, ['raw_data', 'additions'])
+        self.assertEqual(
+            [c.raw_data for c in Commit.objects.prefetch_related('payload').order_by('id')],
+            [{'n': n, 'updated': True} for n in range(3)],
+        )
+
+    def test_ignore_conflicts_keeps_the_stored_payload(self):
+        self.commit(sha_of(1), {'version': 1}).save()
+        Commit.objects.bulk_create(
+            [self.commit(sha_of(1), {'version': 2}), self.commit(sha_of(2), {'version': 1})], ignore_conflicts=True
+        )
+
+        self.assertEqual(Commit.objects.get(sha=sha_of(1)).raw_data, {'version': 1})
+        self.assertEqual(Commit.objects.get(sha=sha_of(2)).raw_data, {'version': 1})
@@ -574,11 +574,12 @@ def search_contributors(request):
 @api_view(['POST'])
 def import_github_repository(request):
     """
-    Import a GitHub repository and all its data
+    Queue a GitHub repository import (runs on the job workers)
     POST /api/repositories/import/
     Body: {"repo_url": "https://github.com/owner/repo"}
+    Returns 202 with a job id - poll GET /api/sync/jobs/<job_id>/ for progress
     """
-    from .github_importer import GitHubImporter
+    from .jobs import enqueue, status_url
     
     repo_url = request.data.get('repo_url')
     github_token = request.data.get('github_token')  # Optional
@@ -588,37 +589,19 @@ def import_github_repository(request):
             'error': 'repo_url is required'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        # Initialize importer
-        importer = GitHubImporter(github_token)
-        
-        # Import repository
-        print(f"Starting import for: {repo_url}")
-        repository = importer.import_repository(repo_url)
-        
-        return Response({
-            'success': True,
-            'message': f'Successfully imported {repository.name}',
-            'repository': {
-                'id': repository.id,
-                'name': repository.name,
-                'url': repository.url,
-                'stars': repository.stars,
-                'forks': repository.forks,
-                'contributors_count': repository.works.values('contributor').distinct().count(),
-                'commits_count': Commit.objects.filter(repository=repository).count(),
-                'issues_count': Issue.objects.filter(work__repository=repository).count(),
-            }
-        }, status=status.HTTP_201_CREATED)
+    job = enqueue(
+        'repository_import',
+        payload={'repo_url': repo_url, 'github_token': github_token},
+        dedupe_key=f"import:{repo_url.rstrip('/').lower()}",
+    )
     
-    except Exception as e:
-        print(f"Error importing repository: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        
-        return Response({
-            'error': f'Failed to import repository: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response({
+        'success': True,
+        'message': f'Import of {repo_url} queued',
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': status_url(job),
+    }, status=status.HTTP_202_ACCEPTED)
 
 
 @api_view(['GET'])
@@ -644,12 +627,19 @@ def import_status(request):
 @api_view(['POST'])
 def sync_repository(request, repo_id):
     """
-    Sync a specific repository with latest GitHub data
+    Queue a sync of a specific repository with latest GitHub data
     POST /api/repositories/<repo_id>/sync/
+    Body: {"github_token": "...", "full": false}
+    Only the parts the reconciliation probes show as stale are re-fetched;
+    "full": true re-imports everything.
+    Returns 202 with a job id - poll GET /api/sync/jobs/<job_id>/ for progress.
+    While a sync of the repository is running, requests coalesce into one
+    follow-up job and `in_flight` links the running one.
     """
-    from .github_importer import GitHubImporter
+    from .jobs import enqueue_repository_sync, job_links, status_url
     
     github_token = request.data.get('github_token')
+    full = request.data.get('full', False)
     
     try:
         repository = Repository.objects.get(id=repo_id)
@@ -658,36 +648,29 @@ def sync_repository(request, repo_id):
             'error': 'Repository not found'
         }, status=status.HTTP_404_NOT_FOUND)
     
-    try:
-        # Re-import to sync latest data
-        importer = GitHubImporter(github_token)
-        print(f"Syncing repository: {repository.url}")
-        updated_repo = importer.import_repository(repository.url)
-        
-        return Response({
-            'success': True,
-            'message': f'Successfully synced {repository.name}',
-            'repository': {
-                'id': updated_repo.id,
-                'name': updated_repo.name,
-                'url': updated_repo.url,
-                'stars': updated_repo.stars,
-                'forks': updated_repo.forks,
-                'contributors_count': updated_repo.works.values('contributor').distinct().count(),
-                'commits_count': Commit.objects.filter(repository=updated_repo).count(),
-                'issues_count': Issue.objects.filter(work__repository=updated_repo).count(),
-                'updated_at': updated_repo.updated_at,
-            }
-        })
+    if full:
+        job, in_flight = enqueue_repository_sync(
+            'repository_import',
+            repository,
+            payload={'repo_url': repository.url, 'github_token': github_token},
+            dedupe_key=f"import:{repository.url.rstrip('/').lower()}",
+        )
+    else:
+        job, in_flight = enqueue_repository_sync(
+            'repository_reconcile',
+            repository,
+            payload={'github_token': github_token},
+            dedupe_key=f"reconcile:{repository.id}",
+        )
     
-    except Exception as e:
-        print(f"Error syncing repository: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        
-        return Response({
-            'error': f'Failed to sync repository: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response({
+        'success': True,
+        'message': f'Sync of {repository.name} queued',
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': status_url(job),
+        'in_flight': job_links(in_flight) if in_flight else None,
+    }, status=status.HTTP_202_ACCEPTED)
 
 
 @api_view(['DELETE'])
@@ -3,15 +3,22 @@ Enhanced GitHub App Webhook Handler
 Enterprise-grade webhook processing with signature verification and background processing
 """
 import logging
+from django.db import transaction
+from django.db.models import Count
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from .github_sync import WebhookProcessor, GitHubSyncManager, SyncJobRunner
-from .models import GitHubAppInstallation, SyncJob
+from .github_sync import WebhookProcessor
+from .models import GitHubAppInstallation, Repository, SyncJob, WebhookDelivery
+from .jobs import enqueue, enqueue_repository_sync, job_links, serialize_job, status_url
+from .sync_schedule import record_webhook
 from django.utils import timezone
 from .live_stream import broadcast_push_event, broadcast_pull_request_event, broadcast_issues_event
+from .github_http import cache_stats
+from .github_tokens import token_stats
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +29,8 @@ logger = logging.getLogger(__name__)
 def github_webhook_handler(request):
     """
     Main webhook handler - receives ALL GitHub events
-    Verifies signature and routes to appropriate processor
+    Verifies the signature, stores the delivery in the WebhookDelivery inbox and
+    acknowledges with 202; the job workers run the actual processor
     """
     # Get headers
     signature = request.headers.get('X-Hub-Signature-256')
@@ -40,139 +48,137 @@ def github_webhook_handler(request):
     # Parse payload
     payload = request.data
     
-    try:
-        # Route to appropriate handler
-        if event_type == 'installation':
-            result = WebhookProcessor.process_installation_event(payload)
-            return JsonResponse({
-                'status': 'success',
-                'event': event_type,
-                'result': result
-            })
-        
-        elif event_type == 'installation_repositories':
-            result = WebhookProcessor.process_installation_repositories_event(payload)
-            return JsonResponse({
-                'status': 'success',
-                'event': event_type,
-                'result': result
-            })
-        
-        elif event_type == 'repository':
-            result = WebhookProcessor.process_repository_event(payload)
-            return JsonResponse({
-                'status': 'success',
-                'event': event_type,
-                'result': result
-            })
-        
-        elif event_type == 'push':
-            result = WebhookProcessor.process_push_event(payload)
-            # Broadcast to live activity feed
-            broadcast_push_event(payload)
-            return JsonResponse({
-                'status': 'success',
-                'event': event_type,
-                'result': result
-            })
-        
-        elif event_type == 'pull_request':
-            result = WebhookProcessor.process_pull_request_event(payload)
-            # Broadcast to live activity feed
-            broadcast_pull_request_event(payload)
-            return JsonResponse({
-                'status': 'success',
-                'event': event_type,
-                'result': result
-            })
-        
-        elif event_type == 'issues':
-            result = WebhookProcessor.process_issues_event(payload)
-            # Broadcast to live activity feed
-            broadcast_issues_event(payload)
-            return JsonResponse({
-                'status': 'success',
-                'event': event_type,
-                'result': result
-            })
-        
-        elif event_type == 'ping':
-            # Webhook health check
-            return JsonResponse({
-                'status': 'success',
-                'message': 'Webhook endpoint is healthy',
-                'zen': payload.get('zen', '')
-            })
-        
-        else:
-            # Log but don't fail for unhandled events
-            logger.info(f"Unhandled event type: {event_type}")
-            return JsonResponse({
-                'status': 'success',
-                'event': event_type,
-                'message': 'Event received but not processed'
-            })
+    if event_type == 'ping':
+        # Webhook health check
+        return JsonResponse({
+            'status': 'success',
+            'message': 'Webhook endpoint is healthy',
+            'zen': payload.get('zen', '')
+        })
+    
+    if not delivery_id or not event_type:
+        return JsonResponse({'error': 'Missing X-GitHub-Delivery / X-GitHub-Event header'}, status=400)
+    
+    # Store and acknowledge - GitHub gives up after 10s, so processing happens
+    # on the job workers. Redeliveries hit the unique delivery_id and are dropped.
+    repository = payload.get('repository') or {}
+    with transaction.atomic():
+        delivery, created = WebhookDelivery.objects.get_or_create(
+            delivery_id=delivery_id,
+            defaults={
+                'event_type': event_type,
+                'action': payload.get('action'),
+                'repository_github_id': repository.get('id'),
+                'payload': payload,
+            }
+        )
+        if created:
+            enqueue('webhook_triggered', payload={'delivery_id': delivery_id}, dedupe_key=f'webhook:{delivery_id}')
     
-    except Exception as e:
-        logger.error(f"Webhook processing error: {str(e)}", exc_info=True)
+    if not created:
+        logger.info(f"Duplicate delivery {delivery_id} ignored")
+        metrics.increment('webhooks.duplicates')
         return JsonResponse({
-            'status': 'error',
+            'status': 'accepted',
             'event': event_type,
-            'error': str(e)
-        }, status=500)
+            'delivery_id': delivery_id,
+            'duplicate': True
+        }, status=202)
+    
+    metrics.increment('webhooks.received', event=event_type)
+    
+    # Repositories with live webhooks need less periodic polling
+    if event_type in ('push', 'pull_request', 'issues') and repository.get('id'):
+        record_webhook(repository['id'])
+    
+    # Broadcast to live activity feed (in-memory, cheap)
+    broadcasters = {
+        'push': broadcast_push_event,
+        'pull_request': broadcast_pull_request_event,
+        'issues': broadcast_issues_event,
+    }
+    if event_type in broadcasters:
+        try:
+            broadcasters[event_type](payload)
+        except Exception as e:
+            logger.warning(f"Live stream broadcast failed: {e}")
+    
+    return JsonResponse({
+        'status': 'accepted',
+        'event': event_type,
+        'delivery_id': delivery_id,
+        'duplicate': False
+    }, status=202)
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def trigger_periodic_sync(request):
     """
-    Trigger periodic sync job
+    Queue the periodic sync job
     This should be called by a cron job every 15-30 minutes
     Can also be triggered manually for testing
+    Only one periodic sync is queued/running at a time; repeated calls return it
     """
-    try:
-        logger.info("🔄 Starting periodic sync job...")
-        result = SyncJobRunner.run_periodic_sync()
-        
-        return Response({
-            'success': True,
-            'message': 'Periodic sync completed',
-            'result': result
-        })
+    job = enqueue('periodic_sync', dedupe_key='periodic_sync')
+    logger.info(f"🔄 Periodic sync job {job.id} queued")
     
-    except Exception as e:
-        logger.error(f"Periodic sync failed: {str(e)}", exc_info=True)
-        return Response({
-            'success': False,
-            'error': str(e)
-        }, status=500)
+    return Response({
+        'success': True,
+        'message': 'Periodic sync queued',
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': status_url(job),
+    }, status=202)
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def sync_repository_endpoint(request, repo_id):
     """
-    Manually trigger sync for a single repository
+    Queue a sync for a single repository
     Useful for testing or on-demand updates
+    While a sync of the repository is running, requests coalesce into one
+    follow-up job and `in_flight` links the running one (poll its status_url)
     """
     try:
-        result = SyncJobRunner.sync_single_repository(repo_id)
-        
-        if 'error' in result:
-            return Response(result, status=400)
-        
-        return Response({
-            'success': True,
-            'message': f'Repository {repo_id} synced successfully',
-            'result': result
-        })
+        repo = Repository.objects.get(id=repo_id)
+    except Repository.DoesNotExist:
+        return Response({'error': 'Repository not found'}, status=400)
+    
+    if not repo.installation:
+        return Response({'error': 'No installation found for repository'}, status=400)
     
-    except Exception as e:
-        logger.error(f"Manual sync failed: {str(e)}", exc_info=True)
-        return Response({
-            'success': False,
-            'error': str(e)
-        }, status=500)
+    job, in_flight = enqueue_repository_sync(
+        'manual_sync',
+        repo,
+        installation=repo.installation,
+        dedupe_key=f'sync:{repo.id}',
+    )
+    
+    return Response({
+        'success': True,
+        'message': f'Sync of repository {repo_id} queued',
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': status_url(job),
+        'in_flight': job_links(in_flight) if in_flight else None,
+    }, status=202)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_job_detail(request, job_id):
+    """
+    Status, progress and result of one queued job
+    GET /api/sync/jobs/<job_id>/
+    """
+    try:
+        job = SyncJob.objects.select_related('installation').get(id=job_id)
+    except SyncJob.DoesNotExist:
+        return Response({'error': 'Job not found'}, status=404)
+    
+    return Response(serialize_job(job))
 
 
 @api_view(['GET'])
@@ -189,7 +195,7 @@ def sync_jobs_list(request):
     installation_id = request.GET.get('installation_id')
     
     # Build query
-    jobs = SyncJob.objects.all()
+    jobs = SyncJob.objects.select_related('installation')
     
     if job_type:
         jobs = jobs.filter(job_type=job_type)
@@ -201,23 +207,7 @@ def sync_jobs_list(request):
     jobs = jobs[:limit]
     
     # Format response
-    jobs_data = []
-    for job in jobs:
-        jobs_data.append({
-            'id': job.id,
-            'job_type': job.job_type,
-            'status': job.status,
-            'repositories_processed': job.repositories_processed,
-            'errors_count': job.errors_count,
-            'started_at': job.started_at,
-            'completed_at': job.completed_at,
-            'duration_seconds': job.duration_seconds(),
-            'installation': {
-                'id': job.installation.id if job.installation else None,
-                'account_login': job.installation.account_login if job.installation else None
-            } if job.installation else None,
-            'details': job.details
-        })
+    jobs_data = [serialize_job(job) for job in jobs]
     
     # Calculate stats
     total_jobs = SyncJob.objects.count()
@@ -264,6 +254,12 @@ def webhook_health_check(request):
         job_type='webhook_triggered'
     ).order_by('-started_at')[:5]
     
+    # Webhook inbox backlog
+    inbox = dict(
+        WebhookDelivery.objects.exclude(status='processed')
+        .values_list('status').annotate(n=Count('id')).order_by()
+    )
+    
     return Response({
         'status': 'healthy',
         'system': {
@@ -285,6 +281,7 @@ def webhook_health_check(request):
                 'started_at': job.started_at
             } for job in recent_jobs
         ],
+        'webhook_inbox': inbox,
         'recent_webhooks': [
             {
                 'id': job.id,
@@ -294,3 +291,38 @@ def webhook_health_check(request):
             } for job in webhook_jobs
         ]
     })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_metrics(request):
+    """
+    Sync pipeline metrics for this process
+    Includes ETag cache effectiveness (each hit is a request that cost no quota)
+    the shared rate-limit buckets, the job queue depth and installation-token
+    mints (each mint is an extra round trip; expect about one per installation per hour)
+    and the size of the local git mirror store
+    """
+    from django.db.models import Sum
+    from .git_mirror import mirror_store
+    from .models import GitHubHTTPCacheEntry, GitHubRateLimitBucket
+    
+    cached = GitHubHTTPCacheEntry.objects.aggregate(total_hits=Sum('hit_count'))
+    
+    return Response({
+        'http_cache': {
+            'process': cache_stats(),
+            'entries': GitHubHTTPCacheEntry.objects.count(),
+            'total_hits': cached['total_hits'] or 0,
+        },
+        'rate_limits': list(
+            GitHubRateLimitBucket.objects.order_by('key').values('key', 'limit', 'remaining', 'reset_epoch', 'updated_at')
+        ),
+        'installation_tokens': token_stats(),
+        'git_mirrors': mirror_store.stats(),
+        'job_queue': dict(
+            SyncJob.objects.filter(status__in=['pending', 'running'])
+            .values_list('status').annotate(n=Count('id')).order_by()
+        ),
+        'metrics': metrics.snapshot(),
+    })
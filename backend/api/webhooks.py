@@ -9,8 +9,12 @@ from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
-from api.models import Repository, Contributor, Commit, Issue, RepositoryWork
+from api.models import Repository, Issue, RepositoryWork
 from api.github_importer import GitHubImporter
+from api.github_sync import push_commit_to_rest
+from api.identity import github_user_identity, resolve_contributor
+from api.jobs import enqueue_repository_sync, job_links, schedule_health_score
+from api.sync_lock import RepositoryBusy, repository_sync
 import logging
 
 logger = logging.getLogger(__name__)
@@ -103,45 +107,34 @@ def handle_push_event(payload):
         logger.warning(f"Repository {repo_name} not found in database")
         return {'status': 'repository_not_found'}
     
-    # Process commits
-    importer = GitHubImporter()
-    for commit_data in commits:
-        try:
-            # Get or create contributor
-            author = commit_data.get('author', {})
-            contributor, _ = Contributor.objects.get_or_create(
-                username=author.get('username', author.get('name', 'unknown')),
-                defaults={
-                    'url': f"https://github.com/{author.get('username', '')}",
-                    'avatar_url': '',
-                    'summary': f"Contributor {author.get('username', 'unknown')}",
-                }
+    # Payload data only (no token here for stats lookups), one bulk insert
+    importer = GitHubImporter(concurrent=False)
+    try:
+        # Answered inline, so only a short wait for a running sync
+        with repository_sync(repo.id, wait=settings.SYNC_LOCK_WAIT):
+            new_commits = importer.import_commits(repo, [push_commit_to_rest(c) for c in commits])
+    except RepositoryBusy:
+        # The running sync may have listed commits before this push: queue one to run after it
+        if repo.installation_id:
+            job, _ = enqueue_repository_sync(
+                'manual_sync', repo, installation=repo.installation, dedupe_key=f'sync:{repo.id}'
             )
-            
-            # Create or update commit
-            Commit.objects.update_or_create(
-                url=commit_data['url'],
-                defaults={
-                    'repository': repo,
-                    'contributor': contributor,
-                    'summary': commit_data['message'][:200],
-                    'raw_data': commit_data,
-                    'committed_at': commit_data['timestamp'],
-                }
+        else:
+            job, _ = enqueue_repository_sync(
+                'repository_reconcile', repo, payload={}, dedupe_key=f'reconcile:{repo.id}'
             )
-            
-            logger.info(f"Processed commit: {commit_data['id'][:7]}")
-        
-        except Exception as e:
-            logger.error(f"Error processing commit {commit_data.get('id', 'unknown')}: {e}")
+        logger.info(f"Push to {repo_name} deferred to job {job.id}: a sync of the repository is running")
+        return {**job_links(job), 'status': 'queued', 'repository': repo_name, 'commits_processed': 0}
     
-    # Update repository stats
-    repo.calculate_health_score()
+    # Update repository stats (debounced - bursts of pushes share one recomputation)
+    if new_commits:
+        schedule_health_score(repo)
     
     return {
         'status': 'success',
         'repository': repo_name,
-        'commits_processed': len(commits)
+        'commits_processed': len(commits),
+        'new_commits': new_commits
     }
 
 
@@ -180,15 +173,8 @@ def handle_issues_event(payload):
         repo = Repository.objects.get(full_name=repo_name)
         
         # Get or create contributor (issue author)
-        author = issue.get('user', {})
-        contributor, _ = Contributor.objects.get_or_create(
-            username=author.get('login', 'unknown'),
-            defaults={
-                'url': author.get('html_url', ''),
-                'avatar_url': author.get('avatar_url', ''),
-                'summary': f"Contributor {author.get('login', 'unknown')}",
-            }
-        )
+        author = issue.get('user') or {'login': 'unknown'}
+        contributor = resolve_contributor(**github_user_identity(author))
         
         # Auto-triage new issues
         triage_result = None
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -194,4 +195,78 @@ GITHUB_APP_WEBHOOK_SECRET = os.getenv('GITHUB_APP_WEBHOOK_SECRET', '')
 GITHUB_APP_SLUG = os.getenv('GITHUB_APP_SLUG', 'lazysheeps-analytics')
 GITHUB_APP_BASE_URL = os.getenv('GITHUB_APP_BASE_URL', 'http://localhost:5173')
 GITHUB_APP_REDIRECT_URI = os.getenv('GITHUB_APP_REDIRECT_URI', 'http://localhost:5173/auth/github-app/callback')
-GITHUB_WEBHOOK_URL = os.getenv('GITHUB_WEBHOOK_URL', 'https://your-domain.com/api/github-app/webhook/')
\ No newline at end of file
+GITHUB_WEBHOOK_URL = os.getenv('GITHUB_WEBHOOK_URL', 'https://your-domain.com/api/github-app/webhook/')
+
+# GitHub Fetching Performance
+GITHUB_ASYNC_FETCH = os.getenv('GITHUB_ASYNC_FETCH', 'true').lower() == 'true'
+GITHUB_FETCH_CONCURRENCY = int(os.getenv('GITHUB_FETCH_CONCURRENCY', '8'))
+# 'rest' (stats for first 100 commits), 'graphql' (history with stats, needs a token)
+# or 'mirror' (local partial clone, see GIT_MIRROR_*)
+GITHUB_COMMIT_FETCH_MODE = os.getenv('GITHUB_COMMIT_FETCH_MODE', 'rest')
+# Cap on commits pulled per import in GraphQL mode (0 = full history)
+GITHUB_GRAPHQL_MAX_COMMITS = int(os.getenv('GITHUB_GRAPHQL_MAX_COMMITS', '5000'))
+# ETag / conditional-request cache for GitHub GETs: 'db', 'disk' or 'off'
+GITHUB_HTTP_CACHE = os.getenv('GITHUB_HTTP_CACHE', 'db')
+GITHUB_HTTP_CACHE_DIR = os.getenv('GITHUB_HTTP_CACHE_DIR', str(BASE_DIR / '.github_http_cache'))
+# Entries neither fetched nor hit for this many seconds are pruned after each periodic sync
+GITHUB_HTTP_CACHE_MAX_AGE = int(os.getenv('GITHUB_HTTP_CACHE_MAX_AGE', '604800'))
+# Cross-process rate-limit governor: 'db' (shared), 'memory' (per process) or 'off'
+GITHUB_RATE_LIMIT_GOVERNOR = os.getenv('GITHUB_RATE_LIMIT_GOVERNOR', 'db')
+# Share of each window background sync must leave for interactive imports
+GITHUB_RATE_LIMIT_BACKGROUND_RESERVE = float(os.getenv('GITHUB_RATE_LIMIT_BACKGROUND_RESERVE', '0.2'))
+GITHUB_RATE_LIMIT_MAX_WAIT = int(os.getenv('GITHUB_RATE_LIMIT_MAX_WAIT', '3600'))
+# Seconds each process works on its own copy of the budgets before reconciling with the table
+GITHUB_RATE_LIMIT_SYNC_INTERVAL = int(os.getenv('GITHUB_RATE_LIMIT_SYNC_INTERVAL', '5'))
+# Periodic sync parallelism: installations synced at once, repositories per installation,
+# and a global cap on repository syncs in flight
+GITHUB_SYNC_INSTALLATION_WORKERS = int(os.getenv('GITHUB_SYNC_INSTALLATION_WORKERS', '4'))
+GITHUB_SYNC_REPO_CONCURRENCY = int(os.getenv('GITHUB_SYNC_REPO_CONCURRENCY', '4'))
+GITHUB_SYNC_MAX_CONCURRENCY = int(os.getenv('GITHUB_SYNC_MAX_CONCURRENCY', '8'))
+# Adaptive sync interval bounds (seconds); repos with live webhooks sync at most every WEBHOOK_INTERVAL
+GITHUB_SYNC_MIN_INTERVAL = int(os.getenv('GITHUB_SYNC_MIN_INTERVAL', '900'))
+GITHUB_SYNC_MAX_INTERVAL = int(os.getenv('GITHUB_SYNC_MAX_INTERVAL', '86400'))
+GITHUB_SYNC_WEBHOOK_INTERVAL = int(os.getenv('GITHUB_SYNC_WEBHOOK_INTERVAL', '21600'))
+
+# Background job queue (api/jobs.py, run with `python manage.py run_workers`)
+JOB_WORKER_PROCESSES = int(os.getenv('JOB_WORKER_PROCESSES', '2'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '2'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+# Seconds before the first retry; doubles on each further attempt
+JOB_RETRY_BACKOFF = int(os.getenv('JOB_RETRY_BACKOFF', '30'))
+# Running jobs refresh their lock every HEARTBEAT_INTERVAL seconds; a lock not refreshed
+# for LOCK_TIMEOUT means the worker died and the job is re-queued
+JOB_HEARTBEAT_INTERVAL = int(os.getenv('JOB_HEARTBEAT_INTERVAL', '60'))
+JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', '3600'))
+# Built-in git server: URL the post-receive hook posts ref updates to, and the token it sends
+# (empty = derived from SECRET_KEY)
+GIT_HOOK_URL = os.getenv('GIT_HOOK_URL', 'http://localhost:8000/api/git/webhook/post-receive/')
+GIT_HOOK_SECRET = os.getenv('GIT_HOOK_SECRET', '')
+# Repositories a bulk import job imports at once
+BULK_IMPORT_CONCURRENCY = int(os.getenv('BULK_IMPORT_CONCURRENCY', '4'))
+# Pushes within this many seconds share one health-score recomputation
+HEALTH_SCORE_DEBOUNCE = int(os.getenv('HEALTH_SCORE_DEBOUNCE', '300'))
+# Local git mirrors for GITHUB_COMMIT_FETCH_MODE=mirror: where they live, the store's size cap
+# (least recently used mirrors are evicted past it), the clone filter ('' = full clone)
+# and the URL cloned for owner/repo
+GIT_MIRROR_ROOT = os.getenv('GIT_MIRROR_ROOT', str(BASE_DIR / 'git_mirrors'))
+GIT_MIRROR_MAX_BYTES = int(os.getenv('GIT_MIRROR_MAX_BYTES', str(20 * 1024 ** 3)))
+GIT_MIRROR_FILTER = os.getenv('GIT_MIRROR_FILTER', 'blob:none')
+GIT_MIRROR_REMOTE_URL = os.getenv('GIT_MIRROR_REMOTE_URL', 'https://github.com/{full_name}.git')
+# Commit stats backfill: commits per chunk (one lookup pass + one bulk_update) and how long
+# an import waits before its backfill runs (repeated imports share one run)
+STATS_BACKFILL_BATCH_SIZE = int(os.getenv('STATS_BACKFILL_BATCH_SIZE', '500'))
+STATS_BACKFILL_DELAY = int(os.getenv('STATS_BACKFILL_DELAY', '60'))
+# Reconciliation: false-positive rate of the per-repository commit SHA Bloom filter and
+# how many 100-commit pages one moved branch may be walked back to find missing commits
+RECONCILE_BLOOM_ERROR_RATE = float(os.getenv('RECONCILE_BLOOM_ERROR_RATE', '0.001'))
+RECONCILE_MAX_COMMIT_PAGES = int(os.getenv('RECONCILE_MAX_COMMIT_PAGES', '20'))
+# Per-repository sync lock (api/sync_lock.py): how long a job that found its repository busy
+# waits before trying again, how long an inline webhook waits for the lock, and where the
+# lock files live when the database isn't PostgreSQL (no advisory locks)
+SYNC_LOCK_RETRY_DELAY = int(os.getenv('SYNC_LOCK_RETRY_DELAY', '15'))
+SYNC_LOCK_WAIT = float(os.getenv('SYNC_LOCK_WAIT', '5'))
+SYNC_LOCK_DIR = os.getenv('SYNC_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'lazysheeps-sync-locks'))
+# Repositories written per transaction when installation webhooks import them
+WEBHOOK_APPLY_BATCH_SIZE = int(os.getenv('WEBHOOK_APPLY_BATCH_SIZE', '50'))
+# Contributor alias keys (login / email / ...) cached per process by the identity resolver
+CONTRIBUTOR_ALIAS_CACHE_SIZE = int(os.getenv('CONTRIBUTOR_ALIAS_CACHE_SIZE', '50000'))
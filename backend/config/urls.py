@@ -41,10 +41,11 @@ from api.github_app import (
 )
 from api.webhook_views import (
     github_webhook_handler, trigger_periodic_sync, sync_repository_endpoint,
-    sync_jobs_list, webhook_health_check
+    sync_jobs_list, sync_job_detail, webhook_health_check, sync_metrics
 )
 from api.team_health import team_health_radar, contributor_health_detail
 from api.live_stream import live_event_stream
+from api.git_server import post_receive_webhook
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework.routers import DefaultRouter
 from api.rbac_views import OrganizationViewSet, TeamViewSet, AuditLogViewSet
@@ -146,7 +147,9 @@ urlpatterns = [
     path('api/sync/periodic/', trigger_periodic_sync, name='trigger_periodic_sync'),
     path('api/sync/repository/<int:repo_id>/', sync_repository_endpoint, name='sync_repository_endpoint'),
     path('api/sync/jobs/', sync_jobs_list, name='sync_jobs_list'),
+    path('api/sync/jobs/<int:job_id>/', sync_job_detail, name='sync_job_detail'),
     path('api/sync/health/', webhook_health_check, name='webhook_health_check'),
+    path('api/sync/metrics/', sync_metrics, name='sync_metrics'),
     
     # DORA Metrics
     path('api/repositories/<int:repo_id>/dora/', repository_dora_metrics, name='repository_dora'),
@@ -158,4 +161,7 @@ urlpatterns = [
     
     # Live Activity Stream (SSE)
     path('api/events/stream/', live_event_stream, name='live_event_stream'),
+    
+    # Built-in git server post-receive hook
+    path('api/git/webhook/post-receive/', post_receive_webhook, name='git_post_receive'),
 ]
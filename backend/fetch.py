@@ -5,8 +5,14 @@ import os
 from urllib.parse import urlparse
 from typing import List, Dict, Optional, Tuple, Any
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import threading
 import time
 
+from api.github_http import CachedSession, ConditionalRequestCache, FileCacheStore
+from api.rate_governor import MemoryBucketStore, RateLimitGovernor
+
 # --- Load Environment Variables ---
 load_dotenv()
 
@@ -17,6 +23,31 @@ API_BASE_URL = "https://api.github.com"
 COMMIT_MESSAGE_MAX_LEN = 200
 MAX_COMMITS_TO_DETAIL_PER_REPO = 500
 MAX_ISSUES_TO_DETAIL_PER_REPO = 500
+HTTP_CACHE_DIR = os.getenv('GITHUB_HTTP_CACHE_DIR', '.github_http_cache')
+CRAWL_CHECKPOINT_DIR = os.getenv('FETCH_CHECKPOINT_DIR', '.fetch_checkpoints')
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> CachedSession:
+    """
+    Shared session, built on first use so importing this module creates no cache directory
+    - Conditional requests: re-runs only pay rate-limit quota for pages that changed
+    - Pace on X-RateLimit-* headers instead of fixed sleeps between requests
+    """
+    global _session
+    if _session is not None:
+        return _session
+
+    with _session_lock:
+        if _session is None:
+            _session = CachedSession(
+                cache=ConditionalRequestCache(FileCacheStore(HTTP_CACHE_DIR)),
+                governor=RateLimitGovernor(MemoryBucketStore()),
+            )
+    return _session
+
 
 # --- Helper Functions (Keep the existing parse_github_url, make_github_request, fetch_paginated_data) ---
 # (Include the full code for parse_github_url, make_github_request, fetch_paginated_data here from the previous version)
@@ -55,7 +86,7 @@ def make_github_request(
     retries = 2
     while retries >= 0:
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=60)
+            response = get_session().get(url, headers=headers, params=params, timeout=60)
             if response.status_code == 403 and 'X-RateLimit-Remaining' in response.headers and int(response.headers['X-RateLimit-Remaining']) == 0:
                 if retries > 0:
                     reset_time = int(response.headers.get('X-RateLimit-Reset', time.time() + 60))
@@ -130,7 +161,6 @@ def fetch_paginated_data(url: str, token: Optional[str], params: Optional[Dict]
             if 'next' in response.links:
                  current_url = response.links['next']['url']
                  page += 1
-                 time.sleep(0.3)
             else:
                  current_url = None
         except json.JSONDecodeError as e:
@@ -165,7 +195,6 @@ def fetch_issue_details(owner: str, repo: str, issue_number: int, token: Optiona
     if response and response.status_code == 200:
         try:
             details = response.json()
-            time.sleep(0.5)
             return details
         except json.JSONDecodeError as e:
             print(f"    Error decoding JSON for issue details #{issue_number}: {e}")
@@ -187,7 +216,6 @@ def fetch_commit_details(owner: str, repo: str, commit_sha: str, token: Optional
     if response and response.status_code == 200:
         try:
             details = response.json()
-            time.sleep(0.5)
             return details
         except json.JSONDecodeError as e:
             print(f"    Error decoding JSON for commit details {commit_sha}: {e}")
@@ -196,261 +224,431 @@ def fetch_commit_details(owner: str, repo: str, commit_sha: str, token: Optional
         return None
 
 
-# --- MODIFIED FUNCTION ---
-def process_repositories(repo_urls: List[str], token: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+class CrawlCheckpoint:
     """
-    Fetches contributors, their assigned closed issues (with specific details up to a limit),
-    and detailed commit info (up to a limit per repo, excluding stats) for multiple repositories.
-    Merges the data. Returns a dictionary of unique contributors keyed by username.
+    On-disk crawl progress: <directory>/<owner>__<repo>/done marks a finished repo,
+    issues/<number>.json and commits/<sha>.json hold already-fetched details.
     """
-    all_contributors_map: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
 
-    for repo_url in repo_urls:
-        print(f"\n--- Processing repository: {repo_url} ---")
-        parsed_info = parse_github_url(repo_url)
-        if not parsed_info: continue
-        owner, repo = parsed_info
-        canonical_repo_url = f"https://github.com/{owner}/{repo}"
-
-        # Step 1: Fetch Contributors (remains the same)
-        repo_contributors = fetch_contributors_from_repo(owner, repo, token)
-        if repo_contributors is None: repo_contributors = []
-        for contributor_data in repo_contributors:
-            required_keys = ['login', 'id', 'html_url', 'avatar_url']
-            if not all(k in contributor_data for k in required_keys) or contributor_data.get('type') != 'User': continue
-            username = contributor_data['login']
-            if not username: continue
-
-            if username not in all_contributors_map:
-                all_contributors_map[username] = {
-                    "id": contributor_data['id'],
-                    "username": username,
-                    "url": contributor_data['html_url'],
-                    "avatar_url": contributor_data['avatar_url'],
-                    "works": []
-                 }
-            all_contributors_map[username].setdefault('works', [])
+    def _repo_dir(self, owner: str, repo: str) -> str:
+        return os.path.join(self.directory, f"{owner}__{repo}")
 
-        # --- Step 2: Fetch and Process Closed Issues (with Specific Details) ---
-        repo_closed_issues_list = fetch_repository_issues_list(owner, repo, token, state="closed")
-        issues_assigned_to_user_in_repo: Dict[str, List[Dict]] = {}
-        assignee_details_cache: Dict[str, Dict] = {}
-        issues_detailed_count = 0
+    @staticmethod
+    def _write(path: str, content: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
 
-        if repo_closed_issues_list:
-            limit_str = f"{MAX_ISSUES_TO_DETAIL_PER_REPO}" if MAX_ISSUES_TO_DETAIL_PER_REPO is not None else "all"
-            print(f"Processing {len(repo_closed_issues_list)} fetched closed issue summaries. Fetching details (limit per repo: {limit_str})...")
+    def repo_done(self, owner: str, repo: str) -> bool:
+        return os.path.exists(os.path.join(self._repo_dir(owner, repo), 'done'))
 
-            for issue_summary_data in repo_closed_issues_list:
-                if 'pull_request' in issue_summary_data: continue
-                if issue_summary_data.get('state') != 'closed': continue
+    def mark_repo_done(self, owner: str, repo: str):
+        self._write(os.path.join(self._repo_dir(owner, repo), 'done'), time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))
 
-                issue_number = issue_summary_data.get('number')
-                if not issue_number:
-                    print(f"  Warning: Skipping issue summary without a number: {issue_summary_data.get('url')}")
-                    continue
+    def load_detail(self, owner: str, repo: str, kind: str, key: Any) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self._repo_dir(owner, repo), kind, f"{key}.json")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
 
-                should_fetch_details = (
-                    MAX_ISSUES_TO_DETAIL_PER_REPO is None or
-                    issues_detailed_count < MAX_ISSUES_TO_DETAIL_PER_REPO
-                )
-
-                if not should_fetch_details:
-                     if issues_detailed_count == MAX_ISSUES_TO_DETAIL_PER_REPO:
-                          print(f"  Reached issue detail limit ({MAX_ISSUES_TO_DETAIL_PER_REPO}). Skipping detail fetch for remaining issues in {owner}/{repo}.")
-                          issues_detailed_count += 1
-                     continue
-
-                print(f"  [{issues_detailed_count + 1}/{limit_str}] Fetching details for issue #{issue_number}...")
-                detailed_issue_data = fetch_issue_details(owner, repo, issue_number, token)
-
-                if detailed_issue_data:
-                    issues_detailed_count += 1
-
-                    # *** START MODIFICATION: Create simplified issue object ***
-                    simplified_issue_data = {
-                        "html_url": detailed_issue_data.get("html_url"),
-                        "number": detailed_issue_data.get("number"),
-                        "title": detailed_issue_data.get("title"),
-                        "body": detailed_issue_data.get("body"), # Raw markdown body
-                        "labels": detailed_issue_data.get("labels", []), # List of label objects
-                        "comments": detailed_issue_data.get("comments", 0), # Integer count of comments
-                        "state_reason": detailed_issue_data.get("state_reason") # e.g., "completed", "not_planned"
-                    }
-                    # *** END MODIFICATION ***
-
-                    # Use the simplified object from now on
-                    issue_data_to_store = simplified_issue_data
-                    issue_id_for_dedup = detailed_issue_data.get("id") # Still use original ID for de-duplication check
-
-                    assignees_list = detailed_issue_data.get('assignees', [])
-                    if not assignees_list and detailed_issue_data.get('assignee'):
-                        assignees_list = [detailed_issue_data['assignee']]
-
-                    if not assignees_list:
-                        continue
-
-                    for assignee in assignees_list:
-                        if assignee and isinstance(assignee, dict) and 'login' in assignee and assignee.get('type') == 'User':
-                            assignee_username = assignee['login']
-                            if not assignee_username: continue
-
-                            if assignee_username not in issues_assigned_to_user_in_repo:
-                                issues_assigned_to_user_in_repo[assignee_username] = []
-
-                            # Avoid adding duplicate issues (check by original ID)
-                            if not any(i.get('original_id_temp') == issue_id_for_dedup for i in issues_assigned_to_user_in_repo[assignee_username]):
-                                # Temporarily add original id for check, then remove if desired, or keep simplified structure
-                                # We'll store the simplified structure directly
-                                issues_assigned_to_user_in_repo[assignee_username].append(issue_data_to_store)
-
-
-                            if assignee_username not in all_contributors_map and assignee_username not in assignee_details_cache:
-                                assignee_details_cache[assignee_username] = {
-                                    "id": assignee.get('id'),
-                                    "url": assignee.get('html_url'),
-                                    "avatar_url": assignee.get('avatar_url')
-                                }
-                else:
-                    print(f"    Failed to fetch details for issue #{issue_number} or it's not accessible/found.")
+    def save_detail(self, owner: str, repo: str, kind: str, key: Any, data: Dict[str, Any]):
+        self._write(os.path.join(self._repo_dir(owner, repo), kind, f"{key}.json"), json.dumps(data, ensure_ascii=False))
+
+
+def fetch_details(
+    keys: List[Any],
+    fetch_one,
+    kind: str,
+    owner: str,
+    repo: str,
+    detail_pool: Optional[ThreadPoolExecutor] = None,
+    checkpoint: Optional[CrawlCheckpoint] = None,
+) -> Dict[Any, Optional[Dict[str, Any]]]:
+    """
+    Fetch detail objects for `keys` (issue numbers / commit SHAs) with fetch_one(key).
+    Checkpointed details are loaded from disk; the rest run on detail_pool when given.
+    """
+    results: Dict[Any, Optional[Dict[str, Any]]] = {}
+    to_fetch = []
+    for key in keys:
+        cached = checkpoint.load_detail(owner, repo, kind, key) if checkpoint else None
+        if cached is not None:
+            results[key] = cached
         else:
-            print(f"No closed issue summaries found or fetch failed for {owner}/{repo}.")
-
-
-        # --- Step 3: Fetch and Process Commits (remains the same) ---
-        repo_commits_list = fetch_repository_commits(owner, repo, token)
-        commits_authored_by_user_in_repo: Dict[str, List[Dict]] = {}
-        author_details_cache: Dict[str, Dict] = {} # Cache details for users found only via commits
-        commits_detailed_count = 0
-
-        if repo_commits_list:
-            limit_str_commits = f"{MAX_COMMITS_TO_DETAIL_PER_REPO}" if MAX_COMMITS_TO_DETAIL_PER_REPO is not None else "all"
-            print(f"Processing {len(repo_commits_list)} fetched commit summaries. Fetching details (limit per repo: {limit_str_commits})...")
-            for commit_summary_data in repo_commits_list:
-                commit_sha = commit_summary_data.get('sha')
-                if not commit_sha: continue
-
-                commit_author_info = commit_summary_data.get('author')
-                if not commit_author_info or not isinstance(commit_author_info, dict) \
-                   or 'login' not in commit_author_info or commit_author_info.get('type') != 'User':
-                   continue
-
-                author_username = commit_author_info['login']
-                if not author_username: continue
-
-                commit_message = commit_summary_data.get('commit', {}).get('message', 'No commit message')
-                commit_message_summary = commit_message.split('\n', 1)[0]
-                if len(commit_message_summary) > COMMIT_MESSAGE_MAX_LEN:
-                     commit_message_summary = commit_message_summary[:COMMIT_MESSAGE_MAX_LEN - 3] + '...'
-
-                simplified_commit = {
-                    "sha": commit_sha,
-                    "url": commit_summary_data.get('html_url'),
-                    "message": commit_message_summary,
-                    "files_changed": None,
-                    "comment_count": None,
-                    "diff_patch": None
+            to_fetch.append(key)
+
+    if checkpoint and len(to_fetch) < len(keys):
+        print(f"  {len(keys) - len(to_fetch)} {kind} details for {owner}/{repo} loaded from checkpoint.")
+
+    def fetch_and_save(key):
+        data = fetch_one(key)
+        if data is not None and checkpoint:
+            checkpoint.save_detail(owner, repo, kind, key, data)
+        return data
+
+    if detail_pool:
+        futures = {key: detail_pool.submit(fetch_and_save, key) for key in to_fetch}
+        for key, future in futures.items():
+            results[key] = future.result()
+    else:
+        for i, key in enumerate(to_fetch):
+            print(f"  [{i + 1}/{len(to_fetch)}] Fetching details for {kind[:-1]} {key}...")
+            results[key] = fetch_and_save(key)
+    return results
+
+
+def process_repository(
+    repo_url: str,
+    token: Optional[str] = None,
+    detail_pool: Optional[ThreadPoolExecutor] = None,
+    checkpoint: Optional[CrawlCheckpoint] = None,
+) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Fetches contributors, their assigned closed issues (with specific details up to a limit),
+    and detailed commit info (up to a limit, excluding stats) for one repository.
+    Returns a dictionary of contributors keyed by username, each with at most one work
+    entry for this repository (None if the URL can't be parsed).
+    """
+    contributors_map: Dict[str, Dict[str, Any]] = {}
+
+    print(f"\n--- Processing repository: {repo_url} ---")
+    parsed_info = parse_github_url(repo_url)
+    if not parsed_info: return None
+    owner, repo = parsed_info
+    canonical_repo_url = f"https://github.com/{owner}/{repo}"
+
+    # Step 1: Fetch Contributors (remains the same)
+    repo_contributors = fetch_contributors_from_repo(owner, repo, token)
+    if repo_contributors is None: repo_contributors = []
+    for contributor_data in repo_contributors:
+        required_keys = ['login', 'id', 'html_url', 'avatar_url']
+        if not all(k in contributor_data for k in required_keys) or contributor_data.get('type') != 'User': continue
+        username = contributor_data['login']
+        if not username: continue
+
+        if username not in contributors_map:
+            contributors_map[username] = {
+                "id": contributor_data['id'],
+                "username": username,
+                "url": contributor_data['html_url'],
+                "avatar_url": contributor_data['avatar_url'],
+                "works": []
+             }
+
+    # --- Step 2: Fetch and Process Closed Issues (with Specific Details) ---
+    repo_closed_issues_list = fetch_repository_issues_list(owner, repo, token, state="closed")
+    issues_assigned_to_user_in_repo: Dict[str, List[Dict]] = {}
+    assignee_details_cache: Dict[str, Dict] = {}
+
+    if repo_closed_issues_list:
+        limit_str = f"{MAX_ISSUES_TO_DETAIL_PER_REPO}" if MAX_ISSUES_TO_DETAIL_PER_REPO is not None else "all"
+        print(f"Processing {len(repo_closed_issues_list)} fetched closed issue summaries. Fetching details (limit per repo: {limit_str})...")
+
+        issue_numbers = []
+        for issue_summary_data in repo_closed_issues_list:
+            if 'pull_request' in issue_summary_data: continue
+            if issue_summary_data.get('state') != 'closed': continue
+
+            issue_number = issue_summary_data.get('number')
+            if not issue_number:
+                print(f"  Warning: Skipping issue summary without a number: {issue_summary_data.get('url')}")
+                continue
+            issue_numbers.append(issue_number)
+
+        if MAX_ISSUES_TO_DETAIL_PER_REPO is not None and len(issue_numbers) > MAX_ISSUES_TO_DETAIL_PER_REPO:
+            print(f"  Reached issue detail limit ({MAX_ISSUES_TO_DETAIL_PER_REPO}). Skipping detail fetch for remaining issues in {owner}/{repo}.")
+            issue_numbers = issue_numbers[:MAX_ISSUES_TO_DETAIL_PER_REPO]
+
+        issue_details = fetch_details(
+            issue_numbers, lambda number: fetch_issue_details(owner, repo, number, token),
+            'issues', owner, repo, detail_pool, checkpoint,
+        )
+
+        for issue_number in issue_numbers:
+            detailed_issue_data = issue_details.get(issue_number)
+
+            if detailed_issue_data:
+                # *** START MODIFICATION: Create simplified issue object ***
+                simplified_issue_data = {
+                    "html_url": detailed_issue_data.get("html_url"),
+                    "number": detailed_issue_data.get("number"),
+                    "title": detailed_issue_data.get("title"),
+                    "body": detailed_issue_data.get("body"), # Raw markdown body
+                    "labels": detailed_issue_data.get("labels", []), # List of label objects
+                    "comments": detailed_issue_data.get("comments", 0), # Integer count of comments
+                    "state_reason": detailed_issue_data.get("state_reason") # e.g., "completed", "not_planned"
                 }
-                if not simplified_commit["url"]: continue
-
-                should_fetch_details = (
-                    MAX_COMMITS_TO_DETAIL_PER_REPO is None or
-                    commits_detailed_count < MAX_COMMITS_TO_DETAIL_PER_REPO
-                )
-                detailed_commit_data = None
-                if should_fetch_details:
-                    print(f"  [{commits_detailed_count + 1}/{limit_str_commits}] Fetching details for commit {commit_sha[:7]} by {author_username}...")
-                    detailed_commit_data = fetch_commit_details(owner, repo, commit_sha, token)
-                    if detailed_commit_data:
-                         commits_detailed_count += 1
-                    else:
-                         print(f"    Failed to fetch details for commit {commit_sha[:7]}.")
-
-                if detailed_commit_data:
-                    files = detailed_commit_data.get('files', [])
-                    commit_details_commit_obj = detailed_commit_data.get('commit', {})
-                    comment_count = commit_details_commit_obj.get('comment_count', 0) if commit_details_commit_obj else 0
-
-                    simplified_commit["comment_count"] = comment_count
-                    simplified_commit["files_changed"] = [
-                        {"filename": f.get('filename'), "status": f.get('status')}
-                        for f in files if f.get('filename')
-                    ] if files else []
-
-                    combined_patch = ""
-                    if files:
-                         for f in files:
-                             if f and 'patch' in f and isinstance(f.get('patch'), str) and f['patch']:
-                                 combined_patch += f"--- File: {f.get('filename', 'Unknown')} ---\n"
-                                 combined_patch += f['patch']
-                                 combined_patch += "\n\n"
-                    simplified_commit["diff_patch"] = combined_patch.strip() if combined_patch else None
-
-                if author_username not in commits_authored_by_user_in_repo:
-                    commits_authored_by_user_in_repo[author_username] = []
-                if not any(c['sha'] == simplified_commit['sha'] for c in commits_authored_by_user_in_repo[author_username]):
-                     commits_authored_by_user_in_repo[author_username].append(simplified_commit)
-
-                if author_username not in all_contributors_map and author_username not in author_details_cache:
-                     author_details_cache[author_username] = {
-                         "id": commit_author_info.get('id'),
-                         "url": commit_author_info.get('html_url'),
-                         "avatar_url": commit_author_info.get('avatar_url')
-                     }
-        else:
-             print(f"No commit summaries found or fetch failed for {owner}/{repo}.")
-
-        # --- Step 4: Integrate Issues and Commits into Contributor Works ---
-        involved_users_in_repo = set()
-        if repo_contributors: involved_users_in_repo.update(c['login'] for c in repo_contributors if c.get('login'))
-        involved_users_in_repo.update(issues_assigned_to_user_in_repo.keys())
-        involved_users_in_repo.update(commits_authored_by_user_in_repo.keys())
-
-        print(f"Integrating activities for {len(involved_users_in_repo)} users in {owner}/{repo}...")
-
-        for username in involved_users_in_repo:
-            if username not in all_contributors_map:
-                details = assignee_details_cache.get(username) or author_details_cache.get(username)
-                if details and (details.get('id') or details.get('url')):
-                    print(f"Adding contributor '{username}' based on activity in {owner}/{repo}.")
-                    all_contributors_map[username] = {
-                        "id": details.get('id'),
-                        "username": username,
-                        "url": details.get('url'),
-                        "avatar_url": details.get('avatar_url'),
-                        "works": []
-                    }
-                else:
-                    print(f"Warning: Skipping user '{username}' found via activity in {owner}/{repo} as details couldn't be retrieved or cached.")
+                # *** END MODIFICATION ***
+
+                # Use the simplified object from now on
+                issue_data_to_store = simplified_issue_data
+                issue_id_for_dedup = detailed_issue_data.get("id") # Still use original ID for de-duplication check
+
+                assignees_list = detailed_issue_data.get('assignees', [])
+                if not assignees_list and detailed_issue_data.get('assignee'):
+                    assignees_list = [detailed_issue_data['assignee']]
+
+                if not assignees_list:
                     continue
 
-            contributor_works = all_contributors_map[username].setdefault('works', [])
+                for assignee in assignees_list:
+                    if assignee and isinstance(assignee, dict) and 'login' in assignee and assignee.get('type') == 'User':
+                        assignee_username = assignee['login']
+                        if not assignee_username: continue
 
-            # Get the simplified issues and commits for THIS user in THIS repo
-            user_issues_in_repo = issues_assigned_to_user_in_repo.get(username, []) # This now contains simplified issue objects
-            user_commits_in_repo = commits_authored_by_user_in_repo.get(username, [])
+                        if assignee_username not in issues_assigned_to_user_in_repo:
+                            issues_assigned_to_user_in_repo[assignee_username] = []
 
-            if user_issues_in_repo or user_commits_in_repo:
-                repo_work_entry = next((work for work in contributor_works if work.get("repository_url") == canonical_repo_url), None)
+                        # Avoid adding duplicate issues (check by original ID)
+                        if not any(i.get('original_id_temp') == issue_id_for_dedup for i in issues_assigned_to_user_in_repo[assignee_username]):
+                            # Temporarily add original id for check, then remove if desired, or keep simplified structure
+                            # We'll store the simplified structure directly
+                            issues_assigned_to_user_in_repo[assignee_username].append(issue_data_to_store)
 
-                if repo_work_entry is None:
-                    repo_work_entry = {
-                        "repository_url": canonical_repo_url,
-                        "issues": user_issues_in_repo, # Store the list of simplified issue objects
-                        "commits": user_commits_in_repo
-                    }
-                    contributor_works.append(repo_work_entry)
-                else:
-                    # Update existing entry - overwrite with potentially newer data from this run
-                    repo_work_entry["issues"] = user_issues_in_repo # Update with simplified issues
-                    repo_work_entry["commits"] = user_commits_in_repo
+
+                        if assignee_username not in contributors_map and assignee_username not in assignee_details_cache:
+                            assignee_details_cache[assignee_username] = {
+                                "id": assignee.get('id'),
+                                "url": assignee.get('html_url'),
+                                "avatar_url": assignee.get('avatar_url')
+                            }
+            else:
+                print(f"    Failed to fetch details for issue #{issue_number} or it's not accessible/found.")
+    else:
+        print(f"No closed issue summaries found or fetch failed for {owner}/{repo}.")
+
+
+    # --- Step 3: Fetch and Process Commits (remains the same) ---
+    repo_commits_list = fetch_repository_commits(owner, repo, token)
+    commits_authored_by_user_in_repo: Dict[str, List[Dict]] = {}
+    author_details_cache: Dict[str, Dict] = {} # Cache details for users found only via commits
+
+    if repo_commits_list:
+        limit_str_commits = f"{MAX_COMMITS_TO_DETAIL_PER_REPO}" if MAX_COMMITS_TO_DETAIL_PER_REPO is not None else "all"
+        print(f"Processing {len(repo_commits_list)} fetched commit summaries. Fetching details (limit per repo: {limit_str_commits})...")
+
+        eligible_commits = []
+        for commit_summary_data in repo_commits_list:
+            commit_sha = commit_summary_data.get('sha')
+            if not commit_sha: continue
+
+            commit_author_info = commit_summary_data.get('author')
+            if not commit_author_info or not isinstance(commit_author_info, dict) \
+               or 'login' not in commit_author_info or commit_author_info.get('type') != 'User':
+               continue
+
+            if not commit_author_info['login'] or not commit_summary_data.get('html_url'): continue
+            eligible_commits.append(commit_summary_data)
+
+        detail_shas = [c['sha'] for c in eligible_commits]
+        if MAX_COMMITS_TO_DETAIL_PER_REPO is not None:
+            detail_shas = detail_shas[:MAX_COMMITS_TO_DETAIL_PER_REPO]
+        commit_details = fetch_details(
+            detail_shas, lambda sha: fetch_commit_details(owner, repo, sha, token),
+            'commits', owner, repo, detail_pool, checkpoint,
+        )
+
+        for commit_summary_data in eligible_commits:
+            commit_sha = commit_summary_data['sha']
+            commit_author_info = commit_summary_data['author']
+            author_username = commit_author_info['login']
+
+            commit_message = commit_summary_data.get('commit', {}).get('message', 'No commit message')
+            commit_message_summary = commit_message.split('\n', 1)[0]
+            if len(commit_message_summary) > COMMIT_MESSAGE_MAX_LEN:
+                 commit_message_summary = commit_message_summary[:COMMIT_MESSAGE_MAX_LEN - 3] + '...'
+
+            simplified_commit = {
+                "sha": commit_sha,
+                "url": commit_summary_data.get('html_url'),
+                "message": commit_message_summary,
+                "files_changed": None,
+                "comment_count": None,
+                "diff_patch": None
+            }
+
+            detailed_commit_data = commit_details.get(commit_sha)
+            if commit_sha in commit_details and not detailed_commit_data:
+                 print(f"    Failed to fetch details for commit {commit_sha[:7]}.")
+
+            if detailed_commit_data:
+                files = detailed_commit_data.get('files', [])
+                commit_details_commit_obj = detailed_commit_data.get('commit', {})
+                comment_count = commit_details_commit_obj.get('comment_count', 0) if commit_details_commit_obj else 0
+
+                simplified_commit["comment_count"] = comment_count
+                simplified_commit["files_changed"] = [
+                    {"filename": f.get('filename'), "status": f.get('status')}
+                    for f in files if f.get('filename')
+                ] if files else []
+
+                combined_patch = ""
+                if files:
+                     for f in files:
+                         if f and 'patch' in f and isinstance(f.get('patch'), str) and f['patch']:
+                             combined_patch += f"--- File: {f.get('filename', 'Unknown')} ---\n"
+                             combined_patch += f['patch']
+                             combined_patch += "\n\n"
+                simplified_commit["diff_patch"] = combined_patch.strip() if combined_patch else None
+
+            if author_username not in commits_authored_by_user_in_repo:
+                commits_authored_by_user_in_repo[author_username] = []
+            if not any(c['sha'] == simplified_commit['sha'] for c in commits_authored_by_user_in_repo[author_username]):
+                 commits_authored_by_user_in_repo[author_username].append(simplified_commit)
+
+            if author_username not in contributors_map and author_username not in author_details_cache:
+                 author_details_cache[author_username] = {
+                     "id": commit_author_info.get('id'),
+                     "url": commit_author_info.get('html_url'),
+                     "avatar_url": commit_author_info.get('avatar_url')
+                 }
+    else:
+         print(f"No commit summaries found or fetch failed for {owner}/{repo}.")
+
+    # --- Step 4: Integrate Issues and Commits into Contributor Works ---
+    involved_users_in_repo = set()
+    if repo_contributors: involved_users_in_repo.update(c['login'] for c in repo_contributors if c.get('login'))
+    involved_users_in_repo.update(issues_assigned_to_user_in_repo.keys())
+    involved_users_in_repo.update(commits_authored_by_user_in_repo.keys())
+
+    print(f"Integrating activities for {len(involved_users_in_repo)} users in {owner}/{repo}...")
+
+    for username in involved_users_in_repo:
+        if username not in contributors_map:
+            details = assignee_details_cache.get(username) or author_details_cache.get(username)
+            if details and (details.get('id') or details.get('url')):
+                print(f"Adding contributor '{username}' based on activity in {owner}/{repo}.")
+                contributors_map[username] = {
+                    "id": details.get('id'),
+                    "username": username,
+                    "url": details.get('url'),
+                    "avatar_url": details.get('avatar_url'),
+                    "works": []
+                }
+            else:
+                print(f"Warning: Skipping user '{username}' found via activity in {owner}/{repo} as details couldn't be retrieved or cached.")
+                continue
+
+        # Get the simplified issues and commits for THIS user in THIS repo
+        user_issues_in_repo = issues_assigned_to_user_in_repo.get(username, []) # This now contains simplified issue objects
+        user_commits_in_repo = commits_authored_by_user_in_repo.get(username, [])
+
+        if user_issues_in_repo or user_commits_in_repo:
+            contributors_map[username]['works'] = [{
+                "repository_url": canonical_repo_url,
+                "issues": user_issues_in_repo, # Store the list of simplified issue objects
+                "commits": user_commits_in_repo
+            }]
+
+    return contributors_map
+
+
+def merge_contributors(all_contributors_map: Dict[str, Dict[str, Any]], repo_contributors_map: Dict[str, Dict[str, Any]]):
+    """Merge one repository's contributors into the cross-repo map (newer work entries replace older ones)"""
+    for username, contributor in repo_contributors_map.items():
+        if username not in all_contributors_map:
+            all_contributors_map[username] = {**contributor, "works": []}
+        contributor_works = all_contributors_map[username].setdefault('works', [])
+        for work in contributor.get('works', []):
+            existing = next((i for i, w in enumerate(contributor_works) if w.get("repository_url") == work["repository_url"]), None)
+            if existing is None:
+                contributor_works.append(work)
+            else:
+                # Update existing entry - overwrite with potentially newer data from this run
+                contributor_works[existing] = work
+
+
+def process_repositories(repo_urls: List[str], token: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Processes repositories one after another and merges the data.
+    Returns a dictionary of unique contributors keyed by username.
+    """
+    all_contributors_map: Dict[str, Dict[str, Any]] = {}
+
+    for repo_url in repo_urls:
+        repo_contributors_map = process_repository(repo_url, token)
+        if repo_contributors_map:
+            merge_contributors(all_contributors_map, repo_contributors_map)
 
     return all_contributors_map
 
 
+def crawl_repositories(
+    repo_urls: List[str],
+    output_path: str,
+    token: Optional[str] = None,
+    checkpoint_dir: str = CRAWL_CHECKPOINT_DIR,
+    repo_workers: int = 4,
+    detail_workers: int = 8,
+) -> Dict[str, int]:
+    """
+    Parallel, resumable crawl. Repositories run on `repo_workers` threads and share
+    one `detail_workers` pool for issue/commit detail calls. Each finished repository
+    appends its contributors to `output_path` as NDJSON (one contributor + that repo's
+    work per line, loadable with `manage.py populate`) and is checkpointed, so a
+    restart skips finished repositories and already-fetched details.
+    """
+    checkpoint = CrawlCheckpoint(checkpoint_dir)
+    output_lock = threading.Lock()
+    stats = {'repos_done': 0, 'repos_skipped': 0, 'repos_failed': 0, 'lines_written': 0}
+
+    def crawl_one(repo_url: str):
+        parsed_info = parse_github_url(repo_url)
+        if not parsed_info:
+            return 'failed'
+        owner, repo = parsed_info
+        if checkpoint.repo_done(owner, repo):
+            print(f"Skipping {owner}/{repo} (already crawled).")
+            return 'skipped'
+
+        repo_contributors_map = process_repository(repo_url, token, detail_pool, checkpoint)
+        lines = [json.dumps(c, ensure_ascii=False) + '\n' for c in repo_contributors_map.values()]
+        with output_lock:
+            with open(output_path, 'a', encoding='utf-8') as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            stats['lines_written'] += len(lines)
+        # Marked only after the lines are on disk; a crash in between re-crawls this repo
+        # (from detail checkpoints) and populate's upserts absorb the duplicate lines
+        checkpoint.mark_repo_done(owner, repo)
+        return 'done'
+
+    with ThreadPoolExecutor(max_workers=detail_workers) as detail_pool, \
+         ThreadPoolExecutor(max_workers=repo_workers) as repo_pool:
+        futures = {repo_pool.submit(crawl_one, url): url for url in repo_urls}
+        for future in as_completed(futures):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                print(f"Error crawling {futures[future]}: {e}")
+                outcome = 'failed'
+            stats[f'repos_{outcome}'] += 1
+            print(f"--- {sum(stats[k] for k in ('repos_done', 'repos_skipped', 'repos_failed'))}/{len(repo_urls)} repositories finished ---")
+
+    return stats
+
+
 # --- Main Execution (Keep the existing main block) ---
 if __name__ == "__main__":
-    repository_urls = [
+    parser = argparse.ArgumentParser(description="Fetch contributor activity for GitHub repositories.")
+    parser.add_argument('repo_urls', nargs='*', help="Repository URLs (default: the built-in list)")
+    parser.add_argument('--parallel', action='store_true',
+                        help="Parallel, checkpointed crawl with incremental NDJSON output")
+    parser.add_argument('--output', default="github_contributors.ndjson", help="NDJSON output file (--parallel)")
+    parser.add_argument('--checkpoint-dir', default=CRAWL_CHECKPOINT_DIR, help="Crawl checkpoint directory (--parallel)")
+    parser.add_argument('--repo-workers', type=int, default=4, help="Repositories crawled at once (--parallel)")
+    parser.add_argument('--detail-workers', type=int, default=8, help="Concurrent detail requests (--parallel)")
+    args = parser.parse_args()
+
+    repository_urls = args.repo_urls or [
         "https://github.com/meta- / -models",
         "https://github.com/meta- /code "
     ]
@@ -477,10 +675,25 @@ if __name__ == "__main__":
         print("--- NOTE: Attempting to fetch details (simplified) for ALL found closed issues per repository ---")
 
 
+    if args.parallel:
+        start_time = time.time()
+        crawl_stats = crawl_repositories(
+            repository_urls, args.output, GITHUB_TOKEN,
+            checkpoint_dir=args.checkpoint_dir,
+            repo_workers=args.repo_workers,
+            detail_workers=args.detail_workers,
+        )
+        print(f"\n--- Crawl completed in {time.time() - start_time:.2f} seconds: {crawl_stats} ---")
+        http_cache = get_session().http_cache
+        print(f"--- HTTP cache: {http_cache.hits} hits (free 304s), {http_cache.misses} misses ---")
+        print(f"--- Load with: python manage.py populate {args.output} ---")
+        raise SystemExit(0)
+
     start_time = time.time()
     contributors_map = process_repositories(repository_urls, GITHUB_TOKEN)
     end_time = time.time()
 
+    http_cache = get_session().http_cache
     final_contributor_list = list(contributors_map.values())
     final_contributor_list.sort(key=lambda x: x.get('username', '').lower())
 
@@ -490,11 +703,13 @@ if __name__ == "__main__":
            "processed_repos": repository_urls,
            "processing_time_seconds": round(end_time - start_time, 2),
            "commit_detail_limit_per_repo": MAX_COMMITS_TO_DETAIL_PER_REPO,
-           "issue_detail_limit_per_repo": MAX_ISSUES_TO_DETAIL_PER_REPO
+           "issue_detail_limit_per_repo": MAX_ISSUES_TO_DETAIL_PER_REPO,
+           "http_cache": http_cache.stats()
         }
     }
 
     print(f"\n--- Processing completed in {end_time - start_time:.2f} seconds ---")
+    print(f"--- HTTP cache: {http_cache.hits} hits (free 304s), {http_cache.misses} misses ---")
     print(f"--- Found data for {len(final_contributor_list)} unique contributors across processed repositories ---")
 
 
@@ -34,6 +34,7 @@ Write-Host ""
 Write-Host "💾 Step 3: Creating StorageClass and PVC..." -ForegroundColor Yellow
 kubectl apply -f k8s/storageclass.yaml
 kubectl apply -f k8s/postgres-pvc.yaml
+kubectl apply -f k8s/git-storage-pvc.yaml
 
 if ($LASTEXITCODE -ne 0) {
     Write-Host "❌ Failed to create StorageClass/PVC" -ForegroundColor Red
@@ -67,6 +68,7 @@ Write-Host ""
 Write-Host "🔧 Step 5: Deploying Backend..." -ForegroundColor Yellow
 kubectl apply -f k8s/backend-deployment.yaml
 kubectl apply -f k8s/backend-service.yaml
+kubectl apply -f k8s/worker-deployment.yaml
 
 if ($LASTEXITCODE -ne 0) {
     Write-Host "❌ Failed to deploy Backend" -ForegroundColor Red
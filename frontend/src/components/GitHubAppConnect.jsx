@@ -1,6 +1,22 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
 
+const isActive = (job) => job.status === 'pending' || job.status === 'running';
+
+// Poll a backend job until it finishes, reporting every update
+const followJob = async (statusUrl, onUpdate, interval = 2000) => {
+  const token = localStorage.getItem('token');
+  let job;
+  do {
+    await new Promise(r => setTimeout(r, interval));
+    ({ data: job } = await axios.get(`http://localhost:8000${statusUrl}`, {
+      headers: { Authorization: `Bearer ${token}` }
+    }));
+    onUpdate(job);
+  } while (isActive(job));
+  return job;
+};
+
 const GitHubAppConnect = () => {
   const [installations, setInstallations] = useState([]);
   const [selectedInstallation, setSelectedInstallation] = useState(null);
@@ -87,7 +103,7 @@ const GitHubAppConnect = () => {
 
     try {
       setIsImporting(true);
-      setImportProgress({ current: 0, total: selectedRepos.length });
+      setImportProgress({ current: 0, total: selectedRepos.length, success: 0, failed: 0 });
 
       const token = localStorage.getItem('token');
       const response = await axios.post(
@@ -99,7 +115,17 @@ const GitHubAppConnect = () => {
         { headers: { Authorization: `Bearer ${token}` } }
       );
 
-      setImportProgress(response.data.summary);
+      // The import runs on the backend job workers - stream its progress
+      const job = await followJob(response.data.status_url, (update) => {
+        if (update.progress.total !== undefined) {
+          setImportProgress({ ...update.progress, total: selectedRepos.length });
+        }
+      });
+
+      if (job.status === 'failed') {
+        throw new Error(job.error_message);
+      }
+      setImportProgress(job.details.summary);
       
       // Refresh the repository list
       setTimeout(() => {
@@ -342,6 +368,20 @@ const GitHubAppConnect = () => {
                         {importProgress.failed} failed
                       </p>
                     )}
+                    {importProgress.repositories && (
+                      <ul className="mt-2 max-h-32 overflow-y-auto text-xs text-gray-600 space-y-0.5">
+                        {Object.entries(importProgress.repositories).map(([name, repo]) => (
+                          <li key={name} className="flex justify-between gap-2">
+                            <span className="truncate">{name}</span>
+                            <span className={repo.phase === 'error' ? 'text-red-600' : ''}>
+                              {repo.phase}
+                              {repo.commits !== undefined && ` · ${repo.commits} commits`}
+                              {repo.webhook && ` · webhook ${repo.webhook}`}
+                            </span>
+                          </li>
+                        ))}
+                      </ul>
+                    )}
                   </div>
                 </div>
               </div>
@@ -1,6 +1,23 @@
 import { useState } from 'react';
 import axios from 'axios';
 
+// Imports run on the backend job workers - poll the job until it finishes
+const waitForJob = async (statusUrl, interval = 2000) => {
+  const token = localStorage.getItem('token');
+  while (true) {
+    const { data: job } = await axios.get(`http://localhost:8000${statusUrl}`, {
+      headers: { Authorization: `Bearer ${token}` }
+    });
+    if (job.status === 'completed' || job.status === 'completed_with_errors') {
+      return job;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error_message || 'Import failed');
+    }
+    await new Promise(resolve => setTimeout(resolve, interval));
+  }
+};
+
 const ImportRepository = ({ onImportSuccess }) => {
   const [repoUrl, setRepoUrl] = useState('');
   const [githubToken, setGithubToken] = useState('');
@@ -44,14 +61,17 @@ const ImportRepository = ({ onImportSuccess }) => {
       });
 
       if (response.data.success) {
-        setSuccess(`Successfully imported ${response.data.repository.name}!`);
-        setImportDetails(response.data.repository);
+        const job = await waitForJob(response.data.status_url);
+        const repository = job.details.repository;
+
+        setSuccess(`Successfully imported ${repository.name}!`);
+        setImportDetails(repository);
         setRepoUrl('');
         setGithubToken('');
         
         // Call success callback if provided
         if (onImportSuccess) {
-          onImportSuccess(response.data.repository);
+          onImportSuccess(repository);
         }
 
         // Close modal after 2 seconds
@@ -64,6 +84,7 @@ const ImportRepository = ({ onImportSuccess }) => {
       console.error('Import error:', err);
       setError(
         err.response?.data?.error || 
+        err.message ||
         'Failed to import repository. Please check the URL and try again.'
       );
     } finally {
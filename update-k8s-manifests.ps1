@@ -31,6 +31,9 @@ Write-Host "📄 Updating backend-deployment.yaml..." -ForegroundColor Yellow
 $backendDeployment = Get-Content "k8s\backend-deployment.yaml" -Raw
 $backendDeployment = $backendDeployment -replace 'image: your-registry/lazysheeps-backend:latest.*', "image: $BACKEND_IMAGE"
 $backendDeployment | Set-Content "k8s\backend-deployment.yaml"
+$workerDeployment = Get-Content "k8s\worker-deployment.yaml" -Raw
+$workerDeployment = $workerDeployment -replace 'image: your-registry/lazysheeps-backend:latest.*', "image: $BACKEND_IMAGE"
+$workerDeployment | Set-Content "k8s\worker-deployment.yaml"
 Write-Host "✅ Backend deployment updated!" -ForegroundColor Green
 
 # Update frontend-deployment.yaml